@@ -15,8 +15,8 @@ import logging
 from datetime import datetime
 from dotenv import load_dotenv
 import httpx
+import asyncio
 import base64
-import hashlib
 
 # 載入環境變數
 load_dotenv()
@@ -26,6 +26,7 @@ project_root = Path(__file__).parent.parent.parent
 sys.path.append(str(project_root))
 
 from common.llm_manager import LLMManager
+from agents.content_generator.media_cache import MediaAnalysisCache, content_hash, media_ref_key
 
 # 設置日誌
 logging.basicConfig(level=logging.INFO)
@@ -33,324 +34,305 @@ logger = logging.getLogger(__name__)
 
 app = FastAPI(title="Content Generator Agent", version="1.0.0")
 
-# 媒體分析快取（記憶體快取，避免重複分析同一媒體）
-media_analysis_cache: Dict[str, str] = {}
+# 媒體分析快取（有上限的 LRU + TTL，後援為 Redis，以內容雜湊為鍵）
+media_analysis_cache = MediaAnalysisCache()
+
+# 單次請求內同時下載/分析的媒體數上限
+MEDIA_ANALYSIS_CONCURRENCY = int(os.getenv("MEDIA_ANALYSIS_CONCURRENCY", "3"))
+
+_LOCAL_HOSTS = {"localhost", "127.0.0.1", "0.0.0.0"}
+
+# kind → (顯示名稱, 預設 MIME, 下載逾時秒數, fallback 提示)
+_MEDIA_KINDS = {
+    "img": ("圖片", "image/jpeg", 30.0, "需要體現圖片中的主要元素和特色"),
+    "vid": ("影片", "video/mp4", 120.0, "需要體現影片中的主要場景和內容"),
+}
+
+
+def _container_url(url: Optional[str]) -> Optional[str]:
+    """避免容器內使用 localhost/127.0.0.1/0.0.0.0：優先以 key 重新簽名，否則改用 RUSTFS_ENDPOINT 主機"""
+    if not url:
+        return url
+    from urllib.parse import urlparse, urlunparse
+    parsed = urlparse(url)
+    if (parsed.hostname or '').lower() not in _LOCAL_HOSTS:
+        return url
+
+    from services.rustfs_client import RustFSClient
+    _rclient = RustFSClient()
+    # 嘗試從原 URL path 還原 key，重新生成合法簽名 URL
+    key_from_url = parsed.path.lstrip('/')
+    try:
+        bucket = _rclient.bucket_name
+        if key_from_url.startswith(bucket + "/"):
+            key_from_url = key_from_url[len(bucket)+1:]
+    except Exception:
+        pass
+    regen = _rclient.get_public_or_presigned_url(key_from_url, prefer_presigned=True)
+    if regen:
+        logger.info(f"已用 key 重新產生簽名 URL（容器可用）: {regen}")
+        return regen
+
+    # 最後才嘗試直接替換主機（可能會導致簽名失效）
+    base_parsed = urlparse(_rclient.base_url)
+    url = urlunparse((
+        base_parsed.scheme or 'http',
+        base_parsed.netloc,
+        parsed.path,
+        '',
+        parsed.query,
+        ''
+    ))
+    logger.info(f"已替換 localhost 為 RUSTFS_ENDPOINT，用於容器內訪問: {url}")
+    return url
+
+
+def _resolve_media_url(item: Dict[str, Any]) -> Optional[str]:
+    """取得容器內可訪問的媒體 URL（RustFS key 優先產生 presigned URL）"""
+    fallback = item.get('url') or item.get('rustfs_url')
+    try:
+        if item.get('key'):
+            from services.rustfs_client import RustFSClient
+            url = RustFSClient().get_public_or_presigned_url(item['key'], prefer_presigned=True)
+        else:
+            url = fallback
+        return _container_url(url)
+    except Exception:
+        return fallback
+
+
+async def _load_media_bytes(item: Dict[str, Any], kind: str) -> tuple:
+    """讀取媒體內容：base64 直接解碼，否則下載；回傳 (bytes 或 None, content_type)"""
+    label, default_type, timeout, _ = _MEDIA_KINDS[kind]
+    content_type = item.get('content_type') or item.get('mime') or default_type
+
+    if item.get('data_base64'):
+        return base64.b64decode(item['data_base64']), content_type
+    if not (item.get('key') or item.get('url') or item.get('rustfs_url')):
+        return None, content_type
+
+    url = _resolve_media_url(item)
+    async with httpx.AsyncClient(timeout=timeout, follow_redirects=True) as client:
+        if url:
+            logger.info(f"下載{label}使用 URL: {url}")
+        response = await client.get(url)
+        response.raise_for_status()
+        return response.content, response.headers.get('content-type', content_type)
+
+
+def _extract_description(analysis_result: Any, kind: str) -> Optional[str]:
+    """從 GeminiVisionAnalyzer 結果萃取可讀描述（圖片優先 main_content，影片優先 narrative_overview）"""
+    if not isinstance(analysis_result, dict):
+        return None
+    try:
+        def _main_content():
+            if not analysis_result.get('main_content'):
+                return None
+            if kind != "img":
+                return analysis_result.get('main_content')
+            # 圖片主要描述
+            parts = [analysis_result.get('main_content')]
+            aux = []
+            if analysis_result.get('text_content'):
+                aux.append(f"文字: {analysis_result['text_content']}")
+            if analysis_result.get('visual_elements'):
+                aux.append(f"元素: {analysis_result['visual_elements']}")
+            if aux:
+                parts.append("；".join(aux))
+            return " ".join(parts)
+
+        def _narrative():
+            if analysis_result.get('narrative_overview'):
+                return analysis_result.get('narrative_overview')
+            if isinstance(analysis_result.get('segments'), list) and analysis_result['segments']:
+                seg = analysis_result['segments'][0]
+                return seg.get('visual_description') or str(seg)
+            return None
+
+        if kind == "img":
+            return _main_content() or _narrative()
+        return _narrative() or _main_content()
+    except Exception:
+        return None
+
+
+async def _load_uncached(kind: str, index: int, item: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    快取命中（引用或內容雜湊）時回傳 {"line": 描述行}，不下載或不呼叫 Gemini；
+    否則回傳待分析項目 {"data", "content_type", "digest", "ref_key"}（data 為 None 表示無媒體可讀）
+    """
+    label, _, _, _ = _MEDIA_KINDS[kind]
+    n = index + 1
+    ref_key = media_ref_key(kind, item)
+
+    desc = await media_analysis_cache.get_by_ref(ref_key)
+    if desc:
+        logger.info(f"{label} {n} 使用快取分析結果")
+        return {"line": f"{label} {n} 內容描述：{desc}"}
+
+    data, content_type = await _load_media_bytes(item, kind)
+    if not data:
+        return {"data": None, "content_type": content_type}
+
+    digest = content_hash(data)
+    desc = await media_analysis_cache.get_by_hash(digest)
+    if desc:
+        await media_analysis_cache.link_ref(ref_key, digest)
+        logger.info(f"{label} {n} 內容相同，使用快取分析結果")
+        return {"line": f"{label} {n} 內容描述：{desc}"}
+
+    return {"data": data, "content_type": content_type, "digest": digest, "ref_key": ref_key}
+
+
+async def _store_analysis(kind: str, index: int, loaded: Dict[str, Any], analysis_result: Any) -> str:
+    """萃取描述、寫入快取並回傳描述行"""
+    label = _MEDIA_KINDS[kind][0]
+    n = index + 1
+    desc = _extract_description(analysis_result, kind)
+    if not desc:
+        return f"{label} {n} 內容：（分析未獲得有效結果）"
+
+    logger.info(f"{label} {n} 分析完成")
+    await media_analysis_cache.put(loaded["digest"], desc, loaded["ref_key"])
+    return f"{label} {n} 內容描述：{desc}"
+
+
+def _fallback_line(kind: str, index: int, content_type: str, data: Optional[bytes]) -> str:
+    """分析失敗時的基本媒體描述"""
+    label, _, _, fallback_hint = _MEDIA_KINDS[kind]
+    n = index + 1
+    safe_size = len(data) if data is not None else '未知'
+    fallback_desc = f"已上傳{label} {n}（類型：{content_type}，大小：{safe_size} bytes）。請根據此{label}內容進行創作，{fallback_hint}。"
+    return f"{label} {n} 內容描述：{fallback_desc}"
+
+
+async def _describe_one(analyzer, kind: str, index: int, item: Dict[str, Any],
+                        semaphore: asyncio.Semaphore) -> Optional[str]:
+    """分析單一媒體並回傳描述行；快取命中（引用或內容雜湊）時不下載或不呼叫 Gemini"""
+    label, default_type, _, _ = _MEDIA_KINDS[kind]
+    n = index + 1
+    loaded: Dict[str, Any] = {"data": None, "content_type": item.get('content_type') or item.get('mime') or default_type}
+    try:
+        async with semaphore:
+            loaded = await _load_uncached(kind, index, item)
+            if "line" in loaded:
+                return loaded["line"]
+            if loaded["data"] is None:
+                return None
+
+            # 直接調用 GeminiVisionAnalyzer 分析
+            logger.info(f"開始分析第 {n} 個{label}（{len(loaded['data'])} bytes, 類型: {loaded['content_type']}）...")
+            analysis_result = await analyzer.analyze_media(loaded["data"], loaded["content_type"], profile="generate")
+
+        return await _store_analysis(kind, index, loaded, analysis_result)
+
+    except Exception as e:
+        logger.warning(f"{label} {n} 分析失敗: {e}")
+        # 提供基本的媒體描述作為 fallback
+        return _fallback_line(kind, index, loaded.get("content_type"), loaded.get("data"))
+
+
+async def _describe_images_batched(analyzer, images: List[Dict[str, Any]],
+                                   semaphore: asyncio.Semaphore) -> List[Optional[str]]:
+    """
+    圖片批次描述：先查快取，未命中的圖片下載並前處理後，依張數/token 上限打包成多圖請求；
+    批次失敗或回應缺漏的圖片沿用已前處理的內容逐張描述
+    """
+    from agents.vision.batch_describe import plan_image_batches
+
+    lines: List[Optional[str]] = [None] * len(images)
+    pending: Dict[int, Dict[str, Any]] = {}
+
+    async def load(index: int, item: Dict[str, Any]):
+        content_type = item.get('content_type') or item.get('mime') or _MEDIA_KINDS["img"][1]
+        try:
+            async with semaphore:
+                loaded = await _load_uncached("img", index, item)
+                if loaded.get("data") is not None:
+                    loaded["prepared"] = await analyzer.prepare_media(
+                        loaded["data"], loaded["content_type"], profile="generate")
+        except Exception as e:
+            logger.warning(f"圖片 {index + 1} 讀取失敗: {e}")
+            lines[index] = _fallback_line("img", index, content_type, None)
+            return
+        if "line" in loaded:
+            lines[index] = loaded["line"]
+        elif loaded["data"] is not None:
+            pending[index] = loaded
+
+    await asyncio.gather(*[load(i, img) for i, img in enumerate(images)])
+
+    results: Dict[str, Dict[str, Any]] = {}
+    entries = [(f"img{index + 1}", pending[index]["prepared"]) for index in sorted(pending)]
+
+    async def run_batch(batch):
+        logger.info(f"批次分析 {len(batch)} 張圖片：{', '.join(image_id for image_id, _ in batch)}")
+        try:
+            async with semaphore:
+                results.update(await analyzer.describe_images_batch(batch))
+        except Exception as e:
+            logger.warning(f"批次分析失敗，改為逐張分析: {e}")
+
+    await asyncio.gather(*[run_batch(batch) for batch in plan_image_batches(entries) if len(batch) > 1])
+
+    async def finish(index: int):
+        loaded = pending[index]
+        try:
+            analysis_result = results.get(f"img{index + 1}")
+            if analysis_result is None:
+                logger.info(f"開始分析第 {index + 1} 個圖片（{len(loaded['data'])} bytes, 類型: {loaded['content_type']}）...")
+                async with semaphore:
+                    analysis_result = await analyzer.analyze_prepared(loaded["prepared"])
+            lines[index] = await _store_analysis("img", index, loaded, analysis_result)
+        except Exception as e:
+            logger.warning(f"圖片 {index + 1} 分析失敗: {e}")
+            lines[index] = _fallback_line("img", index, loaded["content_type"], loaded["data"])
+
+    await asyncio.gather(*[finish(index) for index in pending])
+    return lines
+
 
 async def analyze_media_with_vision(media: Dict[str, Any]) -> List[str]:
     """
     使用 GeminiVisionAnalyzer 分析媒體內容，返回文字描述列表
+
+    圖片與影片在並發上限內同時處理，輸出順序與輸入一致（先圖片後影片）。
+    多張圖片時以批次請求描述（VISION_BATCH_DESCRIBE=false 可停用）。
     """
-    media_descriptions = []
-    
     try:
         # 導入 GeminiVisionAnalyzer
         from agents.vision.gemini_vision import GeminiVisionAnalyzer
-        
+        from agents.vision.batch_describe import BATCH_DESCRIBE_ENABLED
+
         # 檢查環境變數
-        import os
         gemini_key = os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")
         logger.info(f"GEMINI API KEY 狀態: {'已設置' if gemini_key else '未設置'}")
-        
+
         analyzer = GeminiVisionAnalyzer()
         logger.info("GeminiVisionAnalyzer 初始化成功")
-        
-        # 處理圖片
-        images = media.get('images', [])
-        for i, img in enumerate(images):
-            try:
-                # 生成快取鍵（基於 URL 或 key）
-                cache_key = None
-                if img.get('key'):
-                    cache_key = f"img:{img['key']}"
-                elif img.get('url'):
-                    cache_key = f"img:{hashlib.md5(img['url'].encode()).hexdigest()}"
-                
-                # 檢查快取
-                if cache_key and cache_key in media_analysis_cache:
-                    desc = media_analysis_cache[cache_key]
-                    media_descriptions.append(f"圖片 {i+1} 內容描述：{desc}")
-                    logger.info(f"圖片 {i+1} 使用快取分析結果")
-                    continue
-                
-                # 準備圖片數據
-                image_data = None
-                content_type = img.get('content_type') or img.get('mime') or 'image/jpeg'
-                
-                # 如果有 base64 數據，直接使用
-                if img.get('data_base64'):
-                    image_data = base64.b64decode(img['data_base64'])
-                # 否則嘗試透過 RustFS key 產生在容器內可訪問的 URL，再下載
-                elif img.get('key') or img.get('url') or img.get('rustfs_url'):
-                    url = None
-                    try:
-                        if img.get('key'):
-                            from services.rustfs_client import RustFSClient
-                            _rclient = RustFSClient()
-                            # 產生對容器可用的 URL（優先 presigned）
-                            url = _rclient.get_public_or_presigned_url(img['key'], prefer_presigned=True)
-                        else:
-                            url = img.get('url') or img.get('rustfs_url')
-                            # 避免容器內使用 localhost/127.0.0.1/0.0.0.0，若偵測到則改用 RUSTFS_ENDPOINT
-                            if url:
-                                from urllib.parse import urlparse, urlunparse
-                                parsed = urlparse(url)
-                                host = (parsed.hostname or '').lower()
-                                if host in {"localhost", "127.0.0.1", "0.0.0.0"}:
-                                    from services.rustfs_client import RustFSClient
-                                    _rclient = RustFSClient()
-                                    # 嘗試從原 URL path 還原 key，重新生成合法簽名 URL
-                                    path_no_slash = parsed.path.lstrip('/')
-                                    key_from_url = path_no_slash
-                                    try:
-                                        bucket = _rclient.bucket_name
-                                        if path_no_slash.startswith(bucket + "/"):
-                                            key_from_url = path_no_slash[len(bucket)+1:]
-                                    except Exception:
-                                        pass
-                                    regen = _rclient.get_public_or_presigned_url(key_from_url, prefer_presigned=True)
-                                    if regen:
-                                        url = regen
-                                        logger.info(f"已用 key 重新產生簽名 URL（容器可用）: {url}")
-                                    else:
-                                        # 最後才嘗試直接替換主機（可能會導致簽名失效）
-                                        base_parsed = urlparse(_rclient.base_url)
-                                        url = urlunparse((
-                                            base_parsed.scheme or 'http',
-                                            base_parsed.netloc,
-                                            parsed.path,
-                                            '',
-                                            parsed.query,
-                                            ''
-                                        ))
-                                        logger.info(f"已替換 localhost 為 RUSTFS_ENDPOINT，用於容器內訪問: {url}")
-                    except Exception:
-                        url = img.get('url') or img.get('rustfs_url')
-
-                    # 最後保險：無論來源，統一在請求前再做一次容器可用 URL 正規化
-                    try:
-                        if url:
-                            from urllib.parse import urlparse
-                            parsed = urlparse(url)
-                            host = (parsed.hostname or '').lower()
-                            if host in {"localhost", "127.0.0.1", "0.0.0.0"}:
-                                from services.rustfs_client import RustFSClient
-                                _rclient = RustFSClient()
-                                path_no_slash = parsed.path.lstrip('/')
-                                key_from_url = path_no_slash
-                                try:
-                                    bucket = _rclient.bucket_name
-                                    if path_no_slash.startswith(bucket + "/"):
-                                        key_from_url = path_no_slash[len(bucket)+1:]
-                                except Exception:
-                                    pass
-                                regen2 = _rclient.get_public_or_presigned_url(key_from_url, prefer_presigned=True)
-                                if regen2:
-                                    url = regen2
-                                    logger.info(f"已二次正規化為容器可用 URL: {url}")
-                    except Exception:
-                        pass
-
-                    async with httpx.AsyncClient(timeout=30.0, follow_redirects=True) as client:
-                        if url:
-                            logger.info(f"下載圖片使用 URL: {url}")
-                        response = await client.get(url)
-                        response.raise_for_status()
-                        image_data = response.content
-                        content_type = response.headers.get('content-type', content_type)
-                
-                if not image_data:
-                    continue
-                    
-                # 直接調用 GeminiVisionAnalyzer 分析圖片
-                logger.info(f"開始分析第 {i+1} 張圖片...")
-                logger.info(f"圖片大小: {len(image_data)} bytes, 類型: {content_type}")
-                analysis_result = await analyzer.analyze_media(image_data, content_type)
-
-                # 萃取可讀描述
-                desc = None
-                try:
-                    if isinstance(analysis_result, dict):
-                        if analysis_result.get('main_content'):
-                            # 圖片主要描述
-                            parts = [analysis_result.get('main_content')]
-                            aux = []
-                            if analysis_result.get('text_content'):
-                                aux.append(f"文字: {analysis_result['text_content']}")
-                            if analysis_result.get('visual_elements'):
-                                aux.append(f"元素: {analysis_result['visual_elements']}")
-                            if aux:
-                                parts.append("；".join(aux))
-                            desc = " ".join(parts)
-                        elif analysis_result.get('narrative_overview'):
-                            desc = analysis_result.get('narrative_overview')
-                        elif isinstance(analysis_result.get('segments'), list) and analysis_result['segments']:
-                            seg = analysis_result['segments'][0]
-                            desc = seg.get('visual_description') or str(seg)
-                except Exception:
-                    desc = None
-
-                if desc:
-                    media_descriptions.append(f"圖片 {i+1} 內容描述：{desc}")
-                    logger.info(f"圖片 {i+1} 分析完成")
-
-                    # 存入快取
-                    if cache_key:
-                        media_analysis_cache[cache_key] = desc
-                        logger.info(f"圖片 {i+1} 分析結果已快取")
-                else:
-                    media_descriptions.append(f"圖片 {i+1} 內容：（分析未獲得有效結果）")
-                    
-            except Exception as e:
-                logger.warning(f"圖片 {i+1} 分析失敗: {e}")
-                # 提供基本的圖片描述作為 fallback
-                safe_size = len(image_data) if ('image_data' in locals() and image_data is not None) else '未知'
-                fallback_desc = f"已上傳圖片 {i+1}（類型：{content_type}，大小：{safe_size} bytes）。請根據此圖片內容進行創作，需要體現圖片中的主要元素和特色。"
-                media_descriptions.append(f"圖片 {i+1} 內容描述：{fallback_desc}")
-        
-        # 處理影片
-        videos = media.get('videos', [])
-        for i, vid in enumerate(videos):
-            try:
-                # 生成快取鍵（基於 URL 或 key）
-                cache_key = None
-                if vid.get('key'):
-                    cache_key = f"vid:{vid['key']}"
-                elif vid.get('url'):
-                    cache_key = f"vid:{hashlib.md5(vid['url'].encode()).hexdigest()}"
-                
-                # 檢查快取
-                if cache_key and cache_key in media_analysis_cache:
-                    desc = media_analysis_cache[cache_key]
-                    media_descriptions.append(f"影片 {i+1} 內容描述：{desc}")
-                    logger.info(f"影片 {i+1} 使用快取分析結果")
-                    continue
-                
-                # 準備影片數據
-                video_data = None
-                content_type = vid.get('content_type') or vid.get('mime') or 'video/mp4'
-                
-                # 如果有 base64 數據，直接使用
-                if vid.get('data_base64'):
-                    video_data = base64.b64decode(vid['data_base64'])
-                # 否則從 RustFS 取得容器可訪問的 URL 再下載（注意影片可能很大）
-                elif vid.get('key') or vid.get('url') or vid.get('rustfs_url'):
-                    url = None
-                    try:
-                        if vid.get('key'):
-                            from services.rustfs_client import RustFSClient
-                            _rclient = RustFSClient()
-                            url = _rclient.get_public_or_presigned_url(vid['key'], prefer_presigned=True)
-                        else:
-                            url = vid.get('url') or vid.get('rustfs_url')
-                            if url:
-                                from urllib.parse import urlparse, urlunparse
-                                parsed = urlparse(url)
-                                host = (parsed.hostname or '').lower()
-                                if host in {"localhost", "127.0.0.1", "0.0.0.0"}:
-                                    from services.rustfs_client import RustFSClient
-                                    _rclient = RustFSClient()
-                                    path_no_slash = parsed.path.lstrip('/')
-                                    key_from_url = path_no_slash
-                                    try:
-                                        bucket = _rclient.bucket_name
-                                        if path_no_slash.startswith(bucket + "/"):
-                                            key_from_url = path_no_slash[len(bucket)+1:]
-                                    except Exception:
-                                        pass
-                                    regen = _rclient.get_public_or_presigned_url(key_from_url, prefer_presigned=True)
-                                    if regen:
-                                        url = regen
-                                        logger.info(f"已用 key 重新產生簽名 URL（容器可用）: {url}")
-                                    else:
-                                        base_parsed = urlparse(_rclient.base_url)
-                                        url = urlunparse((
-                                            base_parsed.scheme or 'http',
-                                            base_parsed.netloc,
-                                            parsed.path,
-                                            '',
-                                            parsed.query,
-                                            ''
-                                        ))
-                                        logger.info(f"已替換 localhost 為 RUSTFS_ENDPOINT，用於容器內訪問: {url}")
-                    except Exception:
-                        url = vid.get('url') or vid.get('rustfs_url')
-
-                    # 最後保險：統一對影片 URL 也做一次容器可用正規化
-                    try:
-                        if url:
-                            from urllib.parse import urlparse
-                            parsed = urlparse(url)
-                            host = (parsed.hostname or '').lower()
-                            if host in {"localhost", "127.0.0.1", "0.0.0.0"}:
-                                from services.rustfs_client import RustFSClient
-                                _rclient = RustFSClient()
-                                path_no_slash = parsed.path.lstrip('/')
-                                key_from_url = path_no_slash
-                                try:
-                                    bucket = _rclient.bucket_name
-                                    if path_no_slash.startswith(bucket + "/"):
-                                        key_from_url = path_no_slash[len(bucket)+1:]
-                                except Exception:
-                                    pass
-                                regen2 = _rclient.get_public_or_presigned_url(key_from_url, prefer_presigned=True)
-                                if regen2:
-                                    url = regen2
-                                    logger.info(f"已二次正規化為容器可用 URL: {url}")
-                    except Exception:
-                        pass
-
-                    async with httpx.AsyncClient(timeout=120.0, follow_redirects=True) as client:
-                        if url:
-                            logger.info(f"下載影片使用 URL: {url}")
-                        response = await client.get(url)
-                        response.raise_for_status()
-                        video_data = response.content
-                        content_type = response.headers.get('content-type', content_type)
-                
-                if not video_data:
-                    continue
-                    
-                # 直接調用 GeminiVisionAnalyzer 分析影片
-                logger.info(f"開始分析第 {i+1} 個影片...")
-                analysis_result = await analyzer.analyze_media(video_data, content_type)
-
-                # 萃取可讀描述
-                desc = None
-                try:
-                    if isinstance(analysis_result, dict):
-                        if analysis_result.get('narrative_overview'):
-                            desc = analysis_result.get('narrative_overview')
-                        elif isinstance(analysis_result.get('segments'), list) and analysis_result['segments']:
-                            seg = analysis_result['segments'][0]
-                            desc = seg.get('visual_description') or str(seg)
-                        elif analysis_result.get('main_content'):
-                            desc = analysis_result.get('main_content')
-                except Exception:
-                    desc = None
-
-                if desc:
-                    media_descriptions.append(f"影片 {i+1} 內容描述：{desc}")
-                    logger.info(f"影片 {i+1} 分析完成")
-
-                    # 存入快取
-                    if cache_key:
-                        media_analysis_cache[cache_key] = desc
-                        logger.info(f"影片 {i+1} 分析結果已快取")
-                else:
-                    media_descriptions.append(f"影片 {i+1} 內容：（分析未獲得有效結果）")
-                    
-            except Exception as e:
-                logger.warning(f"影片 {i+1} 分析失敗: {e}")
-                # 提供基本的影片描述作為 fallback
-                safe_vsize = len(video_data) if ('video_data' in locals() and video_data is not None) else '未知'
-                fallback_desc = f"已上傳影片 {i+1}（類型：{content_type}，大小：{safe_vsize} bytes）。請根據此影片內容進行創作，需要體現影片中的主要場景和內容。"
-                media_descriptions.append(f"影片 {i+1} 內容描述：{fallback_desc}")
-        
     except Exception as e:
         logger.error(f"媒體分析器初始化失敗: {e}")
-        media_descriptions.append("媒體內容：（分析服務不可用）")
-    
-    return media_descriptions
+        return ["媒體內容：（分析服務不可用）"]
+
+    semaphore = asyncio.Semaphore(max(1, MEDIA_ANALYSIS_CONCURRENCY))
+    images = media.get('images', [])
+
+    async def describe_images() -> List[Optional[str]]:
+        if BATCH_DESCRIBE_ENABLED and len(images) > 1:
+            return await _describe_images_batched(analyzer, images, semaphore)
+        return list(await asyncio.gather(*[
+            _describe_one(analyzer, "img", i, img, semaphore) for i, img in enumerate(images)
+        ]))
+
+    image_lines, video_lines = await asyncio.gather(
+        describe_images(),
+        asyncio.gather(*[
+            _describe_one(analyzer, "vid", i, vid, semaphore)
+            for i, vid in enumerate(media.get('videos', []))
+        ]),
+    )
+    logger.info(f"媒體快取狀態: {media_analysis_cache.stats()}")
+    return [line for line in list(image_lines) + list(video_lines) if line]
 
 # 初始化 LLM 管理器
 llm_manager = LLMManager()
@@ -0,0 +1,143 @@
+"""
+媒體分析快取 - 內容生成代理
+
+兩層快取，避免重複生成時再次呼叫 Gemini：
+- L1：行程內 LRU（容量上限 + TTL），命中時零網路往返
+- L2：Redis（跨副本共享、重啟不遺失），同樣帶 TTL
+
+以內容雜湊（sha256）為主鍵：同一張圖以不同 URL / RustFS key 傳入也會命中。
+另存「引用 → 內容雜湊」對照，讓帶 key/url 的媒體在下載前就能命中快取。
+"""
+
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CACHE_MAX_ENTRIES = int(os.getenv("MEDIA_ANALYSIS_CACHE_MAX_ENTRIES", "512"))
+CACHE_TTL_SECONDS = int(os.getenv("MEDIA_ANALYSIS_CACHE_TTL", str(7 * 24 * 3600)))
+REDIS_KEY_PREFIX = "content_generator:media_desc"
+
+
+def content_hash(data: bytes) -> str:
+    """媒體內容雜湊（快取主鍵）。"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def media_ref_key(kind: str, item: Dict[str, Any]) -> Optional[str]:
+    """媒體引用鍵（RustFS key 或 URL），用於下載前查詢；base64 內嵌媒體沒有引用鍵。"""
+    if item.get('key'):
+        return f"{kind}:key:{item['key']}"
+    url = item.get('url') or item.get('rustfs_url')
+    if url:
+        return f"{kind}:url:{hashlib.md5(url.encode()).hexdigest()}"
+    return None
+
+
+class MediaAnalysisCache:
+    """有容量上限與 TTL 的 LRU，後援為 Redis"""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl_seconds: int = CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    # ---------------------------------------------------------------- L1
+    def _local_get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self._entries.pop(key, None)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _local_set(self, key: str, value: str) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    # ---------------------------------------------------------------- L2
+    async def _redis(self):
+        try:
+            from common.redis_client import get_async_redis_client
+            return await get_async_redis_client()
+        except Exception as e:
+            logger.debug(f"Redis 不可用，媒體快取僅使用記憶體: {e}")
+            return None
+
+    async def _get(self, key: str) -> Optional[str]:
+        value = self._local_get(key)
+        if value is not None:
+            return value
+        redis = await self._redis()
+        if redis is None:
+            return None
+        try:
+            value = await redis.get(f"{REDIS_KEY_PREFIX}:{key}")
+        except Exception as e:
+            logger.debug(f"讀取 Redis 媒體快取失敗: {e}")
+            return None
+        if value is not None:
+            self._local_set(key, value)
+        return value
+
+    async def _set(self, key: str, value: str) -> None:
+        self._local_set(key, value)
+        redis = await self._redis()
+        if redis is None:
+            return
+        try:
+            await redis.set(f"{REDIS_KEY_PREFIX}:{key}", value, ex=self.ttl_seconds)
+        except Exception as e:
+            logger.debug(f"寫入 Redis 媒體快取失敗: {e}")
+
+    # ---------------------------------------------------------------- API
+    async def get_by_ref(self, ref_key: Optional[str]) -> Optional[str]:
+        """以引用鍵查詢描述（不需下載媒體）。"""
+        if not ref_key:
+            return None
+        digest = await self._get(f"ref:{ref_key}")
+        desc = await self._get(f"sha:{digest}") if digest else None
+        self._count(desc)
+        return desc
+
+    async def get_by_hash(self, digest: str) -> Optional[str]:
+        """以內容雜湊查詢描述（已下載媒體後）。"""
+        desc = await self._get(f"sha:{digest}")
+        self._count(desc)
+        return desc
+
+    async def put(self, digest: str, desc: str, ref_key: Optional[str] = None) -> None:
+        await self._set(f"sha:{digest}", desc)
+        if ref_key:
+            await self._set(f"ref:{ref_key}", digest)
+
+    async def link_ref(self, ref_key: Optional[str], digest: str) -> None:
+        """內容雜湊命中時補上引用對照，下次可在下載前命中。"""
+        if ref_key:
+            await self._set(f"ref:{ref_key}", digest)
+
+    def _count(self, desc: Optional[str]) -> None:
+        if desc is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
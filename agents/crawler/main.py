@@ -7,17 +7,17 @@ Crawler Agent 主程式
 import asyncio
 import json
 import uuid
-from typing import Dict, Any, AsyncIterable
+from typing import Dict, Any, AsyncIterable, Optional
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Header
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
 from sse_starlette.sse import EventSourceResponse
 
 from common.a2a import (
     A2AMessage, BaseAgent, stream_text, stream_error, 
-    MessageFormatError, TaskExecutionError
+    MessageFormatError, TaskExecutionError, a2a_event_response
 )
 from common.settings import get_settings
 from .crawler_logic import CrawlerLogic
@@ -206,27 +206,14 @@ async def get_agent_card():
 
 
 @app.post("/a2a/message")
-async def handle_a2a_message(message_data: Dict[str, Any]):
+async def handle_a2a_message(message_data: Dict[str, Any], accept: Optional[str] = Header(default=None)):
     """處理 A2A 訊息"""
     try:
         # 解析 A2A 訊息
         message = A2AMessage.from_dict(message_data)
         
-        # 創建流式回應
-        async def event_stream():
-            try:
-                async for result in crawler_agent.handle_message(message):
-                    yield {
-                        "event": "data",
-                        "data": json.dumps(result)
-                    }
-            except Exception as e:
-                yield {
-                    "event": "error", 
-                    "data": json.dumps({"error": str(e)})
-                }
-        
-        return EventSourceResponse(event_stream())
+        # 創建流式回應（SSE 或 msgpack 分框，依 Accept 協商）
+        return a2a_event_response(crawler_agent.handle_message(message), accept)
         
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"處理訊息失敗: {str(e)}")
@@ -9,7 +9,6 @@ Jina Markdown Agent 核心邏輯 - Plan E 重構版
 不再包含 Vision 整合，符合 Plan E 的單一職責原則
 """
 
-import re
 import requests
 import aiohttp
 import asyncio
@@ -22,6 +21,7 @@ from common.redis_client import get_redis_client
 from common.db_client import get_db_client
 from common.settings import get_settings
 from common.a2a import stream_text, stream_status, stream_data, stream_error
+from common.reader_markdown import parse_number, parse_reader_markdown
 
 
 class JinaMarkdownAgent:
@@ -51,12 +51,6 @@ class JinaMarkdownAgent:
         # Redis 和資料庫客戶端
         self.redis_client = get_redis_client()
         
-        # 正則表達式模式 - 更新以匹配實際的 Jina 回應格式
-        self.metrics_pattern = re.compile(
-            r'Thread.*?(?P<views>[\d\.KM,]+)\s*views',
-            re.IGNORECASE | re.DOTALL
-        )
-        
         # 任務狀態追蹤
         self.active_tasks = {}
 
@@ -84,28 +78,9 @@ class JinaMarkdownAgent:
         if self._session and not self._session.closed:
             await self._session.close()
     
-    def _clean_num(self, s: str) -> str:
-        """移除數字字串中的不可見字元，例如 U+FE0F"""
-        return re.sub(r'[\u200d\u200c\uFE0F]', '', s)
-
     def _parse_number(self, text: str) -> Optional[int]:
         """解析數字字串（支援 K, M 後綴）"""
-        if not text:
-            return None
-        
-        text = text.strip()
-        if not text:
-            return None
-            
-        try:
-            if text.lower().endswith(('k', 'K')):
-                return int(float(text[:-1]) * 1_000)
-            elif text.lower().endswith(('m', 'M')):
-                return int(float(text[:-1]) * 1_000_000)
-            else:
-                return int(text.replace(',', ''))
-        except (ValueError, TypeError):
-            return None
+        return parse_number(text)
     
     def get_markdown_metrics(self, post_url: str) -> Dict[str, Optional[int]]:
         """從 Markdown 解析貼文指標"""
@@ -118,26 +93,7 @@ class JinaMarkdownAgent:
             )
             response.raise_for_status()
             
-            markdown_text = response.text
-            match = self.metrics_pattern.search(markdown_text)
-            
-            if not match:
-                return {
-                    "views": None,
-                    "likes": None, 
-                    "comments": None,
-                    "reposts": None,
-                    "shares": None
-                }
-            
-            groups = match.groupdict()
-            return {
-                "views": self._parse_number(groups.get("views")),
-                "likes": self._parse_number(groups.get("likes")),
-                "comments": self._parse_number(groups.get("comments")),
-                "reposts": self._parse_number(groups.get("reposts")),
-                "shares": self._parse_number(groups.get("shares"))
-            }
+            return self._extract_metrics_from_markdown(response.text)
             
         except Exception as e:
             raise Exception(f"Markdown 解析失敗 {post_url}: {str(e)}")
@@ -246,61 +202,12 @@ class JinaMarkdownAgent:
             raise Exception(f"處理貼文失敗 {post_url}: {str(e)}")
     
     def _extract_metrics_from_markdown(self, markdown_text: str) -> Dict[str, Optional[int]]:
-        """從 Markdown 文本提取指標"""
-        result = {
-            "views": None,
-            "likes": None, 
-            "comments": None,
-            "reposts": None,
-            "shares": None
-        }
-        
-        # 提取 views 
-        views_match = self.metrics_pattern.search(markdown_text)
-        if views_match:
-            views_value = views_match.groupdict().get("views")
-            result["views"] = self._parse_number(views_value)
-        
-        # 使用更強大的數字解析邏輯（移植自 jina_markdown_logic.py）
-        # 先找到 "Translate" 或作者名稱後的部分
-        after_translate = markdown_text
-        
-        # 嘗試找到 "Translate" 分隔線
-        translate_match = re.search(r'\nTranslate\n', markdown_text)
-        if translate_match:
-            after_translate = markdown_text[translate_match.end():]
-        
-        # 收集所有看起來像數字的行（使用 U+FE0F 清理）
-        all_numbers = []
-        lines = after_translate.splitlines()
-        
-        for line in lines:
-            cleaned = self._clean_num(line.strip())
-            if cleaned and re.match(r'^[\d.,KMB]+$', cleaned):
-                num = self._parse_number(cleaned)
-                if num is not None and num > 0:  # 排除0值
-                    all_numbers.append(num)
-        
-        # 尋找最可能的互動數據序列（通常是前3-4個數字）
-        if len(all_numbers) >= 3:
-            # 取前4個數字作為 likes, comments, reposts, shares
-            if len(all_numbers) >= 4:
-                result["likes"], result["comments"], result["reposts"], result["shares"] = all_numbers[0], all_numbers[1], all_numbers[2], all_numbers[3]
-            else:  # 3個數字
-                result["likes"], result["comments"], result["reposts"] = all_numbers[0], all_numbers[1], all_numbers[2]
-        
-        return result
+        """從 Markdown 文本提取指標（單次解析，見 common.reader_markdown）"""
+        return parse_reader_markdown(markdown_text).counts()
     
     def _extract_media_urls(self, markdown_text: str) -> Optional[List[str]]:
-        """從 Markdown 文本提取媒體 URL（簡單實現）"""
-        try:
-            # 簡單的圖片 URL 提取
-            import re
-            img_pattern = r'!\[.*?\]\((https?://[^\)]+)\)'
-            urls = re.findall(img_pattern, markdown_text)
-            return urls if urls else None
-        except:
-            return None
+        """從 Markdown 文本提取媒體 URL（主貼文的圖片/影片，不含大頭貼）"""
+        return parse_reader_markdown(markdown_text).media_urls or None
 
     async def enrich_batch(self, batch: PostMetricsBatch) -> PostMetricsBatch:
         """
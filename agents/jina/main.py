@@ -9,7 +9,7 @@ import asyncio
 import json
 import logging
 import uuid
-from typing import Dict, Any, AsyncIterable
+from typing import Dict, Any, AsyncIterable, Optional
 from contextlib import asynccontextmanager
 
 # 配置日誌
@@ -18,14 +18,13 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Header
 from fastapi.middleware.cors import CORSMiddleware
-from sse_starlette.sse import EventSourceResponse
 from starlette.responses import StreamingResponse
 
 from common.a2a import (
     A2AMessage, BaseAgent, stream_text, stream_error, 
-    MessageFormatError, TaskExecutionError
+    MessageFormatError, TaskExecutionError, a2a_event_response
 )
 from common.settings import get_settings
 from common.models import PostMetrics, PostMetricsBatch, TaskState, A2APostMetricsRequest
@@ -229,27 +228,14 @@ async def get_agent_card():
 
 
 @app.post("/a2a/message")
-async def handle_a2a_message(message_data: Dict[str, Any]):
+async def handle_a2a_message(message_data: Dict[str, Any], accept: Optional[str] = Header(default=None)):
     """處理 A2A 訊息 - 與現有架構完全一致"""
     try:
         # 解析 A2A 訊息
         message = A2AMessage.from_dict(message_data)
         
-        # 創建流式回應
-        async def event_stream():
-            try:
-                async for result in jina_agent.handle_message(message):
-                    yield {
-                        "event": "data",
-                        "data": json.dumps(result)
-                    }
-            except Exception as e:
-                yield {
-                    "event": "error", 
-                    "data": json.dumps({"error": str(e)})
-                }
-        
-        return EventSourceResponse(event_stream())
+        # 創建流式回應（SSE 或 msgpack 分框，依 Accept 協商）
+        return a2a_event_response(jina_agent.handle_message(message), accept)
         
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"處理訊息失敗: {str(e)}")
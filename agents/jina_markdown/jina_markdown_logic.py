@@ -19,6 +19,7 @@ from common.models import PostMetrics, PostMetricsBatch, TaskState
 from common.redis_client import get_redis_client
 from common.db_client import get_db_client
 from common.a2a import stream_text, stream_status, stream_data, stream_error
+from common.reader_markdown import parse_number, parse_reader_markdown
 
 # 僅允許數字 . , K M 的正規表示式
 NUM_RE = re.compile(r'^[\d\.,]+[KkMm]?$')
@@ -42,98 +43,20 @@ class JinaMarkdownAgent:
         # Redis 和資料庫客戶端
         self.redis_client = get_redis_client()
         
-        # 根據新的解析規則，定義更精準的正規表示式
-        # 1. 提取觀看數，例如: "[Thread ====== 3.9K views]"
-        self.views_pattern = re.compile(
-            r"\[Thread\s*======\s*([\d\.,KkMm]+)\s*views\]",
-            re.IGNORECASE
-        )
-        
         # 任務狀態追蹤
         self.active_tasks = {}
     
-    def _clean_num(self, s: str) -> str:
-        """移除數字字串中的不可見字元，例如 U+FE0F"""
-        return re.sub(r'[\u200d\u200c\uFE0F]', '', s)
-
     def _parse_number(self, text: str) -> Optional[int]:
         """解析數字字串（支援 K, M 後綴）"""
-        if not text:
-            return None
-        
-        text = text.strip()
-        if not text:
-            return None
-            
-        try:
-            if text.lower().endswith(('k', 'K')):
-                return int(float(text[:-1]) * 1_000)
-            elif text.lower().endswith(('m', 'M')):
-                return int(float(text[:-1]) * 1_000_000)
-            else:
-                return int(text.replace(',', ''))
-        except (ValueError, TypeError):
-            return None
+        return parse_number(text)
     
     def _extract_metrics_from_markdown(self, md: str) -> Dict[str, Optional[int]]:
-        """從 Jina Markdown 中提取互動指標"""
-        
-        # 1️⃣ 提取 views (從各種可能的 views 格式)
-        views = None
-        views_patterns = [
-            r'Thread\s*=+\s*([\d.,KMB]+)\s*views?',
-            r'([\d.,KMB]+)\s*views?',
-            r'views?\s*[:\-]?\s*([\d.,KMB]+)'
-        ]
-        
-        for pattern in views_patterns:
-            match = re.search(pattern, md, re.IGNORECASE)
-            if match:
-                views = self._parse_number(match.group(1))
-                break
-        
-        # 2️⃣ 尋找互動數據 - 簡化策略
-        # 在 Translate 後尋找連續的數字行
-        parts = re.split(r'translate', md, maxsplit=1, flags=re.IGNORECASE)
-        after_translate = parts[1] if len(parts) > 1 else ""
-        
-        # 收集所有數字
-        all_numbers = []
-        lines = after_translate.splitlines()
-        
-        for line in lines:
-            cleaned = self._clean_num(line.strip())
-            if cleaned and re.match(r'^[\d.,KMB]+$', cleaned):
-                num = self._parse_number(cleaned)
-                if num is not None and num > 0:  # 排除0值
-                    all_numbers.append(num)
-        
-        # 3️⃣ 尋找最可能的互動數據序列
-        # 策略：尋找3-4個連續數字的序列
-        likes = comments = reposts = shares = None
-        
-        if len(all_numbers) >= 3:
-            # 取前4個數字作為 likes, comments, reposts, shares
-            if len(all_numbers) >= 4:
-                likes, comments, reposts, shares = all_numbers[0], all_numbers[1], all_numbers[2], all_numbers[3]
-            else:  # 3個數字
-                likes, comments, reposts = all_numbers[0], all_numbers[1], all_numbers[2]
-        elif len(all_numbers) == 2:
-            likes, comments = all_numbers[0], all_numbers[1]
-        elif len(all_numbers) == 1:
-            likes = all_numbers[0]
-            
-        return {
-            'views': views,
-            'likes': likes, 
-            'comments': comments,
-            'reposts': reposts,
-            'shares': shares
-        }
+        """從 Jina Markdown 中提取互動指標（單次解析，見 common.reader_markdown）"""
+        return parse_reader_markdown(md).counts()
     
     def _extract_media_urls(self, markdown_text: str) -> Optional[List[str]]:
         """
-        從 Markdown 文本提取媒體 URL
+        從 Markdown 文本提取媒體 URL（主貼文的圖片/影片，不含大頭貼）
         
         Args:
             markdown_text: Markdown 文本
@@ -141,21 +64,7 @@ class JinaMarkdownAgent:
         Returns:
             Optional[List[str]]: 媒體 URL 列表，如果沒有則返回 None
         """
-        try:
-            # 提取圖片 URL
-            img_pattern = r'!\[.*?\]\((https?://[^\)]+)\)'
-            img_urls = re.findall(img_pattern, markdown_text)
-            
-            # 提取視頻 URL（如果有的話）
-            video_pattern = r'<video[^>]*src=["\']([^"\']+)["\']'
-            video_urls = re.findall(video_pattern, markdown_text)
-            
-            all_urls = img_urls + video_urls
-            return all_urls if all_urls else None
-            
-        except Exception as e:
-            print(f"提取媒體 URL 失敗: {e}")
-            return None
+        return parse_reader_markdown(markdown_text).media_urls or None
     
     async def process_single_post_with_storage(
         self, 
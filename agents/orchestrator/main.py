@@ -6,7 +6,6 @@ Orchestrator Agent - 總協調器
 
 import json
 import uuid
-import httpx
 from typing import Dict, Any, List
 from fastapi import FastAPI, HTTPException
 from fastapi.responses import StreamingResponse
@@ -20,6 +19,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 from common.redis_client import get_async_redis_client
 from common.settings import get_settings
 from common.nats_client import get_nats_client
+from common.http_clients import get_http_client, get_http_registry
 
 app = FastAPI(title="Orchestrator Agent", version="1.0.0")
 
@@ -44,45 +44,42 @@ class OrchestratorAgent:
     
     async def call_clarification_agent(self, session_id: str, text: str) -> Dict[str, Any]:
         """調用澄清代理"""
-        async with httpx.AsyncClient() as client:
-            clarification_url = f"{self.settings.service_urls.clarification_url}/clarify"
-            response = await client.post(
-                clarification_url,
-                json={"session_id": session_id, "text": text},
-                timeout=30
-            )
-            response.raise_for_status()
-            return response.json()
+        client = get_http_client("clarification", base_url=self.settings.service_urls.clarification_url)
+        response = await client.post(
+            "/clarify",
+            json={"session_id": session_id, "text": text},
+            timeout=30
+        )
+        response.raise_for_status()
+        return response.json()
     
     async def call_form_api(self, session_id: str, questions: List[Dict[str, Any]]):
         """調用表單 API 存儲問卷"""
-        async with httpx.AsyncClient() as client:
-            form_api_url = f"{self.settings.service_urls.form_api_url}/form/{session_id}/questions"
-            response = await client.post(
-                form_api_url,
-                json={"session_id": session_id, "questions": questions},
-                timeout=30
-            )
-            response.raise_for_status()
-            return response.json()
+        client = get_http_client("form-api", base_url=self.settings.service_urls.form_api_url)
+        response = await client.post(
+            f"/form/{session_id}/questions",
+            json={"session_id": session_id, "questions": questions},
+            timeout=30
+        )
+        response.raise_for_status()
+        return response.json()
     
     async def call_content_writer(self, session_id: str, template_style: str, 
                                 requirements_json: Dict[str, Any], original_text: str) -> Dict[str, Any]:
         """調用內容寫手代理"""
-        async with httpx.AsyncClient() as client:
-            content_writer_url = f"{self.settings.service_urls.content_writer_url}/generate"
-            response = await client.post(
-                content_writer_url,
-                json={
-                    "session_id": session_id,
-                    "template_style": template_style,
-                    "requirements_json": requirements_json,
-                    "original_text": original_text
-                },
-                timeout=60
-            )
-            response.raise_for_status()
-            return response.json()
+        client = get_http_client("content-writer", base_url=self.settings.service_urls.content_writer_url)
+        response = await client.post(
+            "/generate",
+            json={
+                "session_id": session_id,
+                "template_style": template_style,
+                "requirements_json": requirements_json,
+                "original_text": original_text
+            },
+            timeout=60
+        )
+        response.raise_for_status()
+        return response.json()
     
     def synthesize_requirements(self, original_text: str, answers: Dict[str, str]) -> Dict[str, Any]:
         """智能合成完整的 JSON 結構需求"""
@@ -392,6 +389,15 @@ async def health_check():
     """健康檢查端點"""
     return {"status": "healthy", "service": "Orchestrator Agent"}
 
+@app.get("/peers")
+async def peer_stats():
+    """下游服務的連線統計：斷路器狀態、請求/錯誤/重試數、延遲分位數"""
+    return get_http_registry().stats()
+
+@app.on_event("shutdown")
+async def close_http_clients():
+    await get_http_registry().aclose()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,266 @@
+"""
+Playwright 爬取任務（非同步 Job）
+
+`POST /v1/playwright/crawl` 會佔住連線直到整個爬取結束；Job 模式改為：
+- 提交後立即回傳 job_id，爬取在 Agent 行程內的背景 asyncio Task 執行
+- 每輪補齊並去重後的新貼文立即 RPUSH 到 Redis，客戶端斷線不影響已完成的結果
+- 進度沿用 publish_progress 寫入的 task:{job_id}（真實的階段與 done/total）
+- 結果可分頁讀取，或以 NDJSON 串流邊爬邊收
+- 執行中的 Job 定期寫入 heartbeat_at；Agent 重啟後心跳中斷的 queued/running Job
+  於下次讀取狀態時標記為 failed，不會一直停在 running 直到 TTL 過期
+
+Redis 鍵（TTL 24 小時）：
+    playwright:job:{job_id}          任務狀態 hash
+    playwright:job:{job_id}:results  已完成貼文（JSON 字串 list，依完成順序）
+"""
+
+import os
+import json
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from common.models import PostMetrics
+from common.redis_client import get_async_redis_client
+
+from .playwright_logic import PlaywrightLogic
+
+
+JOB_TTL_SECONDS = int(os.getenv("PLAYWRIGHT_JOB_TTL", str(24 * 3600)))
+MAX_CONCURRENT_JOBS = int(os.getenv("PLAYWRIGHT_MAX_CONCURRENT_JOBS", "3"))
+JOB_HEARTBEAT_SECONDS = int(os.getenv("PLAYWRIGHT_JOB_HEARTBEAT", "15"))
+# 超過此秒數沒有心跳的未結束 Job 視為已中斷（應為心跳間隔的數倍）
+JOB_STALE_SECONDS = int(os.getenv("PLAYWRIGHT_JOB_STALE_AFTER", "120"))
+KEY_PREFIX = "playwright:job"
+
+TERMINAL_STATUSES = {"completed", "failed"}
+
+
+def _job_key(job_id: str) -> str:
+    return f"{KEY_PREFIX}:{job_id}"
+
+
+def _results_key(job_id: str) -> str:
+    return f"{KEY_PREFIX}:{job_id}:results"
+
+
+def _read_int(path: str) -> Optional[int]:
+    try:
+        with open(path) as f:
+            value = f.read().strip()
+        return None if value == "max" else int(value)
+    except (OSError, ValueError):
+        return None
+
+
+def _memory_snapshot() -> Dict[str, Optional[int]]:
+    """可用記憶體（MB）：容器 cgroup 限制優先，否則取 /proc/meminfo 的 MemAvailable"""
+    limit = _read_int("/sys/fs/cgroup/memory.max")
+    current = _read_int("/sys/fs/cgroup/memory.current")
+    if limit is not None and current is not None:
+        return {"limit_mb": limit // 2**20, "available_mb": max(0, limit - current) // 2**20}
+    try:
+        with open("/proc/meminfo") as f:
+            meminfo = {line.split(":")[0]: int(line.split()[1]) for line in f if line.split()[1:2]}
+        return {"limit_mb": meminfo["MemTotal"] // 1024, "available_mb": meminfo["MemAvailable"] // 1024}
+    except (OSError, KeyError, ValueError):
+        return {"limit_mb": None, "available_mb": None}
+
+
+def _decode_hash(raw: Dict[str, str]) -> Dict[str, Any]:
+    """hash 值中的 JSON（list/dict/數字）還原為 Python 值"""
+    decoded = {}
+    for key, value in raw.items():
+        try:
+            decoded[key] = json.loads(value)
+        except (TypeError, ValueError):
+            decoded[key] = value
+    return decoded
+
+
+class CrawlJobStore:
+    """Job 狀態與分段結果的 Redis 存取"""
+
+    async def create(self, job_id: str, request_summary: Dict[str, Any]) -> None:
+        redis = await get_async_redis_client()
+        pipe = redis.pipeline(transaction=True)
+        pipe.delete(_results_key(job_id))
+        pipe.hset(_job_key(job_id), mapping={
+            "job_id": job_id,
+            "status": "queued",
+            "result_count": 0,
+            "created_at": datetime.utcnow().isoformat(),
+            "heartbeat_at": datetime.utcnow().isoformat(),
+            "request": json.dumps(request_summary, ensure_ascii=False),
+        })
+        pipe.expire(_job_key(job_id), JOB_TTL_SECONDS)
+        await pipe.execute()
+
+    async def update(self, job_id: str, **fields: Any) -> None:
+        redis = await get_async_redis_client()
+        mapping = {
+            k: json.dumps(v, ensure_ascii=False) if isinstance(v, (dict, list)) else str(v)
+            for k, v in fields.items()
+        }
+        mapping["updated_at"] = datetime.utcnow().isoformat()
+        await redis.hset(_job_key(job_id), mapping=mapping)
+
+    async def heartbeat(self, job_id: str) -> None:
+        redis = await get_async_redis_client()
+        await redis.hset(_job_key(job_id), "heartbeat_at", datetime.utcnow().isoformat())
+
+    async def append_posts(self, job_id: str, posts: List[PostMetrics]) -> int:
+        """追加已完成貼文，回傳目前結果總數"""
+        if not posts:
+            return await self.result_count(job_id)
+        redis = await get_async_redis_client()
+        pipe = redis.pipeline(transaction=True)
+        pipe.rpush(_results_key(job_id), *[post.model_dump_json() for post in posts])
+        pipe.expire(_results_key(job_id), JOB_TTL_SECONDS)
+        pipe.hincrby(_job_key(job_id), "result_count", len(posts))
+        pipe.hset(_job_key(job_id), "updated_at", datetime.utcnow().isoformat())
+        results = await pipe.execute()
+        return int(results[2])
+
+    async def result_count(self, job_id: str) -> int:
+        redis = await get_async_redis_client()
+        return int(await redis.llen(_results_key(job_id)))
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Job 狀態，合併 publish_progress 寫入的即時階段進度"""
+        redis = await get_async_redis_client()
+        raw = await redis.hgetall(_job_key(job_id))
+        if not raw:
+            return None
+        job = _decode_hash(raw)
+        job["job_id"] = job_id
+        job.setdefault("dropped_post_ids", [])
+        if job.get("status") not in TERMINAL_STATUSES and self._is_stale(job):
+            # 執行 Job 的 Agent 已不在（重啟或崩潰），改標為失敗讓等待端結束
+            fields = {"status": "failed", "error": "Job 心跳逾時，執行的 Agent 可能已重啟",
+                      "finished_at": datetime.utcnow().isoformat()}
+            await self.update(job_id, **fields)
+            job.update(fields)
+
+        progress = _decode_hash(await redis.hgetall(f"task:{job_id}"))
+        progress.pop("final_data", None)  # 完整結果請走 results 端點
+        job["progress"] = progress or None
+        return job
+
+    @staticmethod
+    def _is_stale(job: Dict[str, Any]) -> bool:
+        last_seen = job.get("heartbeat_at") or job.get("updated_at") or job.get("created_at")
+        try:
+            age = (datetime.utcnow() - datetime.fromisoformat(str(last_seen))).total_seconds()
+        except ValueError:
+            return False
+        return age > JOB_STALE_SECONDS
+
+    async def get_results(self, job_id: str, offset: int, limit: int,
+                          dropped: Optional[Set[str]] = None) -> Tuple[List[Dict[str, Any]], int]:
+        """分頁讀取結果；回傳 (貼文, 下一頁 offset)。dropped 為最終去重移除的 post_id。"""
+        redis = await get_async_redis_client()
+        raw_posts = await redis.lrange(_results_key(job_id), offset, offset + limit - 1)
+        posts = [json.loads(raw) for raw in raw_posts]
+        if dropped:
+            posts = [post for post in posts if post.get("post_id") not in dropped]
+        return posts, offset + len(raw_posts)
+
+
+class CrawlJobRunner:
+    """在 Agent 行程內排程爬取 Job（同時執行數上限 MAX_CONCURRENT_JOBS）"""
+
+    def __init__(self, store: Optional[CrawlJobStore] = None):
+        self.store = store or CrawlJobStore()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._active = 0
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(max(1, MAX_CONCURRENT_JOBS))
+        return self._semaphore
+
+    def is_running(self, job_id: str) -> bool:
+        task = self._tasks.get(job_id)
+        return task is not None and not task.done()
+
+    def capacity(self) -> Dict[str, Any]:
+        """可用容量（供排程器做容量感知的放置）：瀏覽器槽位與記憶體"""
+        slots = max(1, MAX_CONCURRENT_JOBS)
+        pending = sum(1 for task in self._tasks.values() if not task.done())
+        return {
+            "max_jobs": slots,
+            "running": self._active,
+            "queued": max(0, pending - self._active),
+            "free_slots": max(0, slots - pending),
+            "memory": _memory_snapshot(),
+        }
+
+    async def submit(self, job_id: str, crawl_kwargs: Dict[str, Any]) -> None:
+        """建立 Job 記錄並在背景啟動爬取（與提交請求的連線生命週期無關）"""
+        summary = {k: v for k, v in crawl_kwargs.items() if k != "auth_json_content"}
+        await self.store.create(job_id, summary)
+        task = asyncio.create_task(self._run(job_id, crawl_kwargs), name=f"crawl-job-{job_id}")
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+
+    async def _run(self, job_id: str, crawl_kwargs: Dict[str, Any]) -> None:
+        # 排隊等待槽位期間也要維持心跳，否則久候的 Job 會被誤判為中斷
+        heartbeat = asyncio.create_task(self._heartbeat(job_id), name=f"crawl-job-heartbeat-{job_id}")
+        try:
+            async with self._get_semaphore():
+                self._active += 1
+                try:
+                    await self._execute(job_id, crawl_kwargs)
+                finally:
+                    self._active -= 1
+        finally:
+            heartbeat.cancel()
+
+    async def _heartbeat(self, job_id: str) -> None:
+        while True:
+            await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+            try:
+                await self.store.heartbeat(job_id)
+            except Exception as e:
+                logging.warning(f"⚠️ [Job: {job_id}] 心跳寫入失敗: {e}")
+
+    async def _execute(self, job_id: str, crawl_kwargs: Dict[str, Any]) -> None:
+        await self.store.update(job_id, status="running", started_at=datetime.utcnow().isoformat())
+        logging.info(f"🚀 [Job: {job_id}] 開始爬取 @{crawl_kwargs.get('username')}")
+
+        async def post_sink(posts: List[PostMetrics]) -> None:
+            total = await self.store.append_posts(job_id, posts)
+            logging.info(f"📦 [Job: {job_id}] 已完成 {total} 篇貼文")
+
+        try:
+            batch = await PlaywrightLogic().fetch_posts(task_id=job_id, post_sink=post_sink, **crawl_kwargs)
+        except Exception as e:
+            logging.error(f"❌ [Job: {job_id}] 爬取失敗: {e}", exc_info=True)
+            await self.store.update(job_id, status="failed", error=str(e),
+                                    finished_at=datetime.utcnow().isoformat())
+            return
+
+        # 對齊最終批次：補上未經 post_sink 交付的貼文，記錄後續輪次去重移除的貼文
+        redis = await get_async_redis_client()
+        emitted = {
+            json.loads(raw).get("post_id")
+            for raw in await redis.lrange(_results_key(job_id), 0, -1)
+        }
+        final_ids = [post.post_id for post in batch.posts]
+        await self.store.append_posts(job_id, [p for p in batch.posts if p.post_id not in emitted])
+        await self.store.update(
+            job_id,
+            status="completed",
+            total_count=len(final_ids),
+            dropped_post_ids=sorted(emitted - set(final_ids)),
+            processing_stage=batch.processing_stage,
+            finished_at=datetime.utcnow().isoformat(),
+        )
+        logging.info(f"✅ [Job: {job_id}] 完成，共 {len(final_ids)} 篇貼文")
+
+
+# 全域實例（單例模式）
+crawl_job_runner = CrawlJobRunner()
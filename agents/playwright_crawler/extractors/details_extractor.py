@@ -9,13 +9,17 @@
 同時提取內容和媒體數據 (content, images, videos)
 """
 
+from __future__ import annotations
+
 import asyncio
 import logging
 import random
 import re
 from datetime import datetime
-from typing import Dict, List, Optional, Any, Set
-from playwright.async_api import BrowserContext, Page
+from typing import TYPE_CHECKING, Dict, List, Optional, Any, Set
+
+if TYPE_CHECKING:  # 僅供型別標註，執行時不載入 playwright
+    from playwright.async_api import BrowserContext, Page
 
 from common.models import PostMetrics
 from common.nats_client import publish_progress
@@ -4,10 +4,14 @@ URL 提取器
 負責從用戶頁面提取貼文 URLs，保持時間順序
 """
 
+from __future__ import annotations
+
 import asyncio
 import logging
-from typing import List
-from playwright.async_api import Page
+from typing import TYPE_CHECKING, List
+
+if TYPE_CHECKING:  # 僅供型別標註，執行時不載入 playwright
+    from playwright.async_api import Page
 
 
 class URLExtractor:
@@ -6,12 +6,16 @@
 2. DOM 選擇器解析
 """
 
+from __future__ import annotations
+
 import asyncio
 import logging
 import random
 from datetime import datetime, timezone, timedelta
-from typing import List, Optional
-from playwright.async_api import BrowserContext
+from typing import TYPE_CHECKING, List, Optional
+
+if TYPE_CHECKING:  # 僅供型別標註，執行時不載入 playwright
+    from playwright.async_api import BrowserContext
 
 from common.models import PostMetrics
 from common.nats_client import publish_progress
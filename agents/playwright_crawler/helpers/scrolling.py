@@ -4,11 +4,15 @@
 實現智能滾動邏輯，支持 NEW-POST 和 HIST-BACKFILL 兩種模式
 """
 
+from __future__ import annotations
+
 import asyncio
 import logging
 import random
-from typing import List, Tuple, Set
-from playwright.async_api import Page
+from typing import TYPE_CHECKING, List, Tuple, Set
+
+if TYPE_CHECKING:  # 僅供型別標註，執行時不載入 playwright
+    from playwright.async_api import Page
 
 
 async def extract_current_post_ids(page: Page) -> List[str]:
@@ -286,14 +290,15 @@ async def collect_urls_from_dom(page: Page, existing_set: Set[str], target_usern
     
     Args:
         page: Playwright頁面對象
-        existing_set: 已存在的貼文ID集合 (用於去重)
+        existing_set: 已存在的貼文ID集合 (用於去重)；若為 ExistingPostIds，
+            會先以 Bloom Filter 解析本輪候選 ID，不再把整個集合序列化進瀏覽器
         
     Returns:
         新發現的貼文URLs列表
     """
     try:
-        new_urls = await page.evaluate("""
-            (existingIds, targetUsername) => {
+        candidates = await page.evaluate("""
+            (targetUsername) => {
                 // 使用與原始url_extractor完全相同的邏輯
                 function normalizePostUrl(url) {
                     const match = url.match(/https:\\/\\/www\\.threads\\.com\\/@([^\\/]+)\\/post\\/([^\\/\\?]+)/);
@@ -324,12 +329,8 @@ async def collect_urls_from_dom(page: Page, existing_set: Set[str], target_usern
                             
                             // 只收集目標用戶的貼文（過濾轉貼）
                             if (!targetUsername || urlUsername === targetUsername) {
-                                const fullId = `${urlUsername}_${postId}`;
-                                
-                                if (!existingIds.includes(fullId)) {
-                                    seen.add(normalizedUrl);
-                                    urls.push(normalizedUrl);
-                                }
+                                seen.add(normalizedUrl);
+                                urls.push([normalizedUrl, `${urlUsername}_${postId}`]);
                             }
                         }
                     }
@@ -337,7 +338,13 @@ async def collect_urls_from_dom(page: Page, existing_set: Set[str], target_usern
                 
                 return urls;
             }
-        """, list(existing_set), target_username)
+        """, target_username)
+        
+        # 已存在判斷在 Python 端進行：集合查找 O(1)，且只解析本輪看到的候選 ID
+        resolve = getattr(existing_set, "resolve", None)
+        if resolve is not None:
+            await resolve([full_id for _, full_id in candidates])
+        new_urls = [url for url, full_id in candidates if full_id not in existing_set]
         
         logging.debug(f"🔗 收集到 {len(new_urls)} 個新URLs (目標用戶: {target_username})")
         return new_urls
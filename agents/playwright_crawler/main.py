@@ -1,7 +1,7 @@
 import uuid
 import asyncio
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Query, Header
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from typing import Dict, Any, Optional, List
@@ -11,11 +11,30 @@ from pathlib import Path
 import logging
 
 from .playwright_logic import PlaywrightLogic
+from .crawl_jobs import MAX_CONCURRENT_JOBS, TERMINAL_STATUSES, crawl_job_runner
 from common.models import PostMetricsBatch
 from common.a2a import stream_error, TaskState
 from common.mcp_client import agent_startup, agent_shutdown, get_mcp_client
 from common.settings import get_settings
-from common.history import CrawlHistoryDAO
+from common.history import CrawlHistoryDAO, crawl_history
+from common.csv_export_manager import CSVExportManager
+from common.streaming_export import export_filename, export_media_type
+from common.wire_format import wire_response
+from common.db_client import keep_pools_warm
+from common.warmup import ServiceWarmup, warm_db_pool, warm_nats, warm_redis
+
+# 長駐服務：連線池以常駐設定建立（須在第一個池建立前，池都是第一次使用時才建）
+keep_pools_warm()
+
+# 暖機：爬蟲歷史的連線池、Job 狀態用的 Redis、進度用的 NATS，以及實際啟動一次瀏覽器
+warmup = ServiceWarmup("playwright_crawler")
+warmup.add("db_pool", lambda: warm_db_pool(
+    ["SELECT latest_post_id, total_crawled, last_crawl_at FROM crawl_state WHERE username = $1"],
+    client=crawl_history.db_client,
+))
+warmup.add("redis", warm_redis)
+warmup.add("nats", warm_nats, required=False)
+warmup.add("browser", PlaywrightLogic.warm_up_browser)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -33,7 +52,7 @@ async def lifespan(app: FastAPI):
     metadata = {
         "version": "1.0.0",
         "author": "AI Assistant",
-        "max_concurrent_crawls": 3,
+        "max_concurrent_crawls": MAX_CONCURRENT_JOBS,
         "supported_platforms": ["threads"],
         "requires_auth": True
     }
@@ -43,10 +62,14 @@ async def lifespan(app: FastAPI):
         print("✅ Playwright Crawler Agent registered to MCP Server")
     else:
         print("❌ Failed to register Playwright Crawler Agent to MCP Server")
+
+    # 背景暖機：/health 立即可達，/ready 在必要步驟完成前回 503
+    warmup.start()
     
     yield
     
     # 關閉時清理
+    await warmup.stop()
     await agent_shutdown()
     print("🛑 Playwright Crawler Agent shutdown completed")
 
@@ -98,30 +121,186 @@ playwright_logic = PlaywrightLogic()
 
 # --- API Endpoints ---
 @app.post("/v1/playwright/crawl", response_model=PostMetricsBatch, tags=["Plan F"])
-async def crawl_and_get_batch(request: CrawlRequest):
+async def crawl_and_get_batch(request: CrawlRequest, accept: Optional[str] = Header(default=None)):
     """
     接收爬取請求，執行 Playwright 爬蟲，並一次性返回完整的 PostMetricsBatch。
     認證內容由請求方在 request body 中提供。
+    Accept 含 application/msgpack(+zstd) 時以二進位格式回應（見 common.wire_format）。
     """
     # 使用傳入的 task_id，如果沒有則生成新的
     task_id = request.task_id or str(uuid.uuid4())
     logic = PlaywrightLogic()
 
     try:
-        batch = await logic.fetch_posts(
-            username=request.username,
-            extra_posts=request.max_posts,  # 向後兼容：max_posts作為extra_posts傳入
-            auth_json_content=request.auth_json_content, # 使用傳入的認證內容
-            task_id=task_id,
-            incremental=request.incremental,  # 傳遞增量模式參數
-            enable_deduplication=request.enable_deduplication,  # 傳遞去重開關參數
-            realtime_download=request.realtime_download  # 🆕 傳遞即時下載參數
-        )
-        return batch
+        batch = await logic.fetch_posts(task_id=task_id, **_crawl_kwargs(request))
+        return wire_response(batch, accept) or batch
     except Exception as e:
         logging.error(f"Crawling failed in main: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+
+def _crawl_kwargs(request: CrawlRequest) -> Dict[str, Any]:
+    """CrawlRequest → PlaywrightLogic.fetch_posts 參數（同步與 Job 端點共用）"""
+    return {
+        "username": request.username,
+        "extra_posts": request.max_posts,  # 向後兼容：max_posts作為extra_posts傳入
+        "auth_json_content": request.auth_json_content,  # 使用傳入的認證內容
+        "incremental": request.incremental,  # 傳遞增量模式參數
+        "enable_deduplication": request.enable_deduplication,  # 傳遞去重開關參數
+        "realtime_download": request.realtime_download,  # 🆕 傳遞即時下載參數
+    }
+
+
+# --- Async Job API ---
+class CrawlJobResponse(BaseModel):
+    """Job 提交結果"""
+    job_id: str
+    status: str
+    status_url: str
+    results_url: str
+    stream_url: str
+
+
+@app.post("/v1/playwright/jobs", response_model=CrawlJobResponse, status_code=202, tags=["Jobs"])
+async def submit_crawl_job(request: CrawlRequest):
+    """
+    提交爬取 Job，立即回傳 job_id；爬取在背景執行，客戶端斷線不影響。
+    進度查 GET /v1/playwright/jobs/{job_id}，結果分頁讀取或以 NDJSON 串流。
+    """
+    job_id = request.task_id or str(uuid.uuid4())
+    if crawl_job_runner.is_running(job_id):
+        raise HTTPException(status_code=409, detail=f"Job {job_id} 正在執行中")
+
+    await crawl_job_runner.submit(job_id, _crawl_kwargs(request))
+    base = f"/v1/playwright/jobs/{job_id}"
+    return CrawlJobResponse(
+        job_id=job_id,
+        status="queued",
+        status_url=base,
+        results_url=f"{base}/results",
+        stream_url=f"{base}/stream",
+    )
+
+
+@app.get("/v1/playwright/capacity", tags=["Jobs"])
+async def get_crawl_capacity():
+    """本副本的可用容量（瀏覽器槽位、記憶體），供 crawl scheduler 放置 Job"""
+    return crawl_job_runner.capacity()
+
+
+async def _get_job_or_404(job_id: str) -> Dict[str, Any]:
+    job = await crawl_job_runner.store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"找不到 Job {job_id}（可能已過期）")
+    return job
+
+
+@app.get("/v1/playwright/jobs/{job_id}", tags=["Jobs"])
+async def get_crawl_job(job_id: str):
+    """Job 狀態與即時階段進度（stage、done/total、progress）"""
+    return await _get_job_or_404(job_id)
+
+
+@app.get("/v1/playwright/jobs/{job_id}/results", tags=["Jobs"])
+async def get_crawl_job_results(
+    job_id: str,
+    offset: int = Query(default=0, ge=0, description="從第幾筆開始（上一頁回傳的 next_offset）"),
+    limit: int = Query(default=50, ge=1, le=500, description="每頁筆數"),
+    accept: Optional[str] = Header(default=None),
+):
+    """分頁讀取已完成的貼文；Job 執行中也可讀取目前的部分結果（格式依 Accept 協商）"""
+    job = await _get_job_or_404(job_id)
+    posts, next_offset = await crawl_job_runner.store.get_results(
+        job_id, offset, limit, set(job.get("dropped_post_ids") or [])
+    )
+    available = await crawl_job_runner.store.result_count(job_id)
+    page = {
+        "job_id": job_id,
+        "status": job.get("status"),
+        "posts": posts,
+        "offset": offset,
+        "next_offset": next_offset,
+        "has_more": next_offset < available or job.get("status") not in TERMINAL_STATUSES,
+    }
+    return wire_response(page, accept) or page
+
+
+@app.get("/v1/playwright/jobs/{job_id}/stream", tags=["Jobs"])
+async def stream_crawl_job(
+    job_id: str,
+    offset: int = Query(default=0, ge=0, description="從第幾筆開始（斷線重連時帶上最後收到的 offset + 1）"),
+    poll_interval: float = Query(default=1.0, ge=0.2, le=10.0),
+):
+    """
+    以 NDJSON 串流 Job：每行一個事件
+    {"type": "progress", ...} / {"type": "post", "offset": n, "post": {...}} /
+    最後一行 {"type": "completed" | "failed", ...}
+    """
+    await _get_job_or_404(job_id)
+    store = crawl_job_runner.store
+
+    async def event_stream():
+        cursor = offset
+        last_stage = None
+        while True:
+            job = await store.get(job_id)
+            if job is None:
+                yield json.dumps({"type": "failed", "error": "Job 已過期"}, ensure_ascii=False) + "\n"
+                return
+
+            progress = job.get("progress") or {}
+            if progress.get("stage") != last_stage:
+                last_stage = progress.get("stage")
+                yield json.dumps({"type": "progress", **progress}, ensure_ascii=False, default=json_serializer) + "\n"
+
+            dropped = set(job.get("dropped_post_ids") or [])
+            while True:
+                posts, next_cursor = await store.get_results(job_id, cursor, 100)
+                for i, post in enumerate(posts):
+                    if post.get("post_id") not in dropped:
+                        yield json.dumps({"type": "post", "offset": cursor + i, "post": post}, ensure_ascii=False) + "\n"
+                if next_cursor == cursor:
+                    break
+                cursor = next_cursor
+
+            if job.get("status") in TERMINAL_STATUSES:
+                yield json.dumps({
+                    "type": job["status"],
+                    "total_count": job.get("total_count", cursor - len(dropped)),
+                    "dropped_post_ids": sorted(dropped),
+                    "error": job.get("error"),
+                }, ensure_ascii=False) + "\n"
+                return
+            await asyncio.sleep(poll_interval)
+
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
+
+_export_manager: Optional[CSVExportManager] = None
+
+
+@app.get("/v1/playwright/users/{username}/export", tags=["Export"])
+async def export_user_posts(
+    username: str,
+    format: str = Query(default="csv", pattern="^(csv|csv\\.gz|parquet)$", description="csv / csv.gz / parquet"),
+    layout: str = Query(default="zh", pattern="^(zh|raw)$", description="zh：中文欄位含序號；raw：與 JSON 欄位一致"),
+):
+    """
+    串流匯出用戶全部貼文：伺服器端游標逐批讀取並直接編碼，記憶體用量與貼文數無關
+    （僅在內部網路開放；瀏覽器下載經 MCP Server 的簽章匯出代理 /exports/playwright/{token} 轉送）
+    """
+    global _export_manager
+    if _export_manager is None:
+        _export_manager = CSVExportManager()
+
+    timestamp = datetime.datetime.now(datetime.timezone(datetime.timedelta(hours=8))).strftime('%Y%m%d_%H%M%S')
+    filename = export_filename(f"user_posts_{username}_{timestamp}", format)
+    return StreamingResponse(
+        _export_manager.stream_playwright_user_posts(username, format, layout),
+        media_type=export_media_type(format),
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
 @app.get("/urls/{username}", response_model=URLStatusResponse, tags=["URL Status"])
 async def get_user_urls_status(
     username: str, 
@@ -193,6 +372,12 @@ async def health_check():
     """
     return {"status": "healthy", "service": "Playwright Crawler Agent"}
 
+
+@app.get("/ready", tags=["Monitoring"])
+async def readiness_check():
+    """就緒探針：暖機（連線池、Redis、瀏覽器）完成前回 503"""
+    return warmup.ready_response()
+
 # MCP 整合端點
 @app.get("/mcp/capabilities", tags=["MCP"])
 async def get_capabilities():
@@ -6,17 +6,30 @@ import asyncio
 import logging
 import tempfile
 from pathlib import Path
-from typing import Dict, List, Optional, Any, Literal
+from typing import Awaitable, Callable, Dict, List, Optional, Any, Literal
 from datetime import datetime, timezone, timedelta
 
-from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
-
+from common.lazy_import import lazy_module
 from common.settings import get_settings
 from common.models import PostMetrics, PostMetricsBatch
 from common.nats_client import publish_progress
 from common.utils import generate_post_url, first_of, parse_thread_item
 from common.history import crawl_history
 
+# playwright 延遲到第一次啟動瀏覽器才載入，服務啟動與 /health 不需要它
+playwright_api = lazy_module("playwright.async_api")
+
+# 🎬 2025新版Threads影片提取優化 - 無手勢自動播放
+BROWSER_LAUNCH_ARGS = [
+    "--autoplay-policy=no-user-gesture-required",
+    "--disable-background-media-suspend",
+    "--disable-features=MediaSessionService",
+    "--force-prefers-reduced-motion=0",
+    "--disable-blink-features=AutomationControlled",
+    "--disable-web-security",
+    "--disable-features=VizDisplayCompositor",
+]
+
 def get_taipei_time():
     """獲取當前台北時間（無時區信息）"""
     taipei_tz = timezone(timedelta(hours=8))
@@ -29,7 +42,7 @@ from .extractors.url_extractor import URLExtractor
 from .extractors.views_extractor import ViewsExtractor
 from .extractors.details_extractor import DetailsExtractor
 from .config.field_mappings import FIELD_MAP
-from .utils.post_deduplicator import apply_deduplication
+from .utils.post_deduplicator import IncrementalPostDeduplication
 from .helpers.scrolling import (
     extract_current_post_ids, check_page_bottom, scroll_once, 
     is_anchor_visible, collect_urls_from_dom, 
@@ -56,6 +69,10 @@ if not logging.getLogger().handlers:
 
 class PlaywrightLogic:
     """使用 Playwright 進行爬蟲的核心邏輯（重構版）"""
+
+    # 已驗證可用的瀏覽器啟動選項（見 _launch_browser）
+    _working_launch_option: Optional[Dict[str, Any]] = None
+
     def __init__(self):
         self.playwright = None
         self.browser = None
@@ -82,7 +99,8 @@ class PlaywrightLogic:
         max_scroll_rounds: int = 30,           # 最大滾動輪次
         incremental: bool = True,              # 新增：增量模式
         enable_deduplication: bool = True,     # 新增：去重開關
-        realtime_download: bool = False        # 🆕 新增：即時下載媒體
+        realtime_download: bool = False,       # 🆕 新增：即時下載媒體
+        post_sink: Optional[Callable[[List[PostMetrics]], Awaitable[None]]] = None  # 每輪完成補齊的新貼文回呼
     ) -> PostMetricsBatch:
         """
         智能增量爬取貼文 - 支持新貼文補足和歷史回溯
@@ -95,6 +113,7 @@ class PlaywrightLogic:
             mode: 爬取模式 ("new"=新貼文補足, "hist"=歷史回溯)
             anchor_post_id: 錨點貼文ID，自動從crawl_state獲取
             max_scroll_rounds: 最大滾動輪次，防止無限滾動
+            post_sink: 每輪補齊並去重後，新出現的貼文會交給此回呼（用於非同步 Job 的分段結果）
         """
         if task_id is None:
             task_id = f"task_{get_taipei_time().strftime('%Y%m%d_%H%M%S')}"
@@ -105,15 +124,24 @@ class PlaywrightLogic:
             taipei_tz = timezone(timedelta(hours=8))
             return datetime.now(taipei_tz).replace(tzinfo=None)
         
-        # 內部條件去重函數
-        def conditional_deduplication(posts_list):
-            """根據 enable_deduplication 參數決定是否執行去重"""
-            if enable_deduplication:
-                return apply_deduplication(posts_list)
-            else:
-                logging.info(f"⚠️ [Task: {task_id}] 去重已關閉，保留所有 {len(posts_list)} 篇貼文")
-                return posts_list
+        # 增量去重索引：每輪只加入新批次（enable_deduplication=False 時僅累加）
+        deduplication = IncrementalPostDeduplication(enabled=enable_deduplication)
             
+        # 內部分段結果輸出：每篇貼文只交付一次，回呼失敗不影響爬取
+        emitted_post_ids = set()
+
+        async def emit_new_posts(posts_list):
+            if post_sink is None:
+                return
+            new_posts = [p for p in posts_list if p.post_id not in emitted_post_ids]
+            if not new_posts:
+                return
+            emitted_post_ids.update(p.post_id for p in new_posts)
+            try:
+                await post_sink(new_posts)
+            except Exception as e:
+                logging.warning(f"⚠️ [Task: {task_id}] 分段結果輸出失敗: {e}")
+
         logging.info(f"🚀 [Task: {task_id}] 開始{mode.upper()}模式爬取 @{username}，目標: {extra_posts} 篇")
         logging.info(f"🧹 [Task: {task_id}] 去重功能: {'啟用' if enable_deduplication else '關閉'}")
         logging.info(f"⬇️ [Task: {task_id}] 即時下載: {'啟用' if realtime_download else '關閉'}")
@@ -132,14 +160,10 @@ class PlaywrightLogic:
                 if anchor_post_id is None and crawl_state:
                     anchor_post_id = crawl_state.get('latest_post_id')
                     
-                logging.info(f"🔍 增量模式: 已爬取 {len(existing_post_ids)} 個貼文")
+                logging.info(f"🔍 增量模式: 已爬取 {existing_post_ids.total_count} 個貼文")
                 logging.info(f"📍 錨點設定: {anchor_post_id or '無'}")
                 
-                # 調試：顯示已存在的貼文ID（最多顯示10個）
-                if existing_post_ids:
-                    sample_ids = list(existing_post_ids)[:10]
-                    logging.info(f"🔍 [DEBUG] 已存在貼文範例: {sample_ids}")
-                else:
+                if not existing_post_ids.total_count:
                     logging.info(f"🔍 [DEBUG] 資料庫中無現有貼文")
             else:
                 logging.info(f"📋 全量模式: 爬取所有找到的貼文")
@@ -239,14 +263,14 @@ class PlaywrightLogic:
                     logging.warning(f"⚠️ [Task: {task_id}] 第 {process_round} 輪數據補齊失敗: {e}")
                 
                 # 合併並去重處理（重點：每輪都要去重檢查）
-                combined_posts = final_posts + batch_posts
-                before_dedup_count = len(combined_posts)
-                combined_posts = conditional_deduplication(combined_posts)
+                before_dedup_count = len(final_posts) + len(batch_posts)
+                combined_posts = deduplication.add_batch(batch_posts)
                 after_dedup_count = len(combined_posts)
                 
                 added_count = after_dedup_count - len(final_posts)
                 removed_count = before_dedup_count - after_dedup_count
                 final_posts = combined_posts
+                await emit_new_posts(final_posts)
                 
                 logging.info(f"✅ [Task: {task_id}] 第 {process_round} 輪完成：新增 {added_count} 篇，去重移除 {removed_count} 篇，累計 {len(final_posts)} 篇")
                 
@@ -286,11 +310,14 @@ class PlaywrightLogic:
                         )
                         await supplement_page.close()
                         
-                        # 過濾出新的貼文URLs
+                        # 過濾出新的貼文URLs（增量模式先解析這批候選ID是否已存在）
+                        if incremental:
+                            await self._resolve_existing(existing_post_ids, username, supplement_urls)
                         existing_post_ids_expanded = existing_post_ids | {p.post_id for p in final_posts}
+                        known_post_count = getattr(existing_post_ids, "total_count", 0) + len(final_posts)
                         supplement_posts = []
                         
-                        logging.info(f"🔍 [Task: {task_id}] 補足過濾：找到 {len(supplement_urls)} 個URLs，已有 {len(existing_post_ids_expanded)} 個ID")
+                        logging.info(f"🔍 [Task: {task_id}] 補足過濾：找到 {len(supplement_urls)} 個URLs，已有 {known_post_count} 個ID")
                         
                         for url in supplement_urls:
                             # 驗證URL是否確實屬於目標用戶
@@ -304,7 +331,7 @@ class PlaywrightLogic:
                             logging.debug(f"🔍 檢查URL: {url} → {full_post_id} → 存在: {full_post_id in existing_post_ids_expanded}")
                             
                             # 臨時修復：在測試模式下允許重新爬取（如果existing很少）
-                            is_test_mode = len(existing_post_ids_expanded) < 50  # 小於50個ID認為是測試
+                            is_test_mode = known_post_count < 50  # 小於50個ID認為是測試
                             should_include = (full_post_id not in existing_post_ids_expanded) or is_test_mode
                             
                             if should_include:
@@ -326,15 +353,12 @@ class PlaywrightLogic:
                             supplement_posts = await self.details_extractor.fill_post_details_from_page(supplement_posts, self.context, task_id=task_id, username=username)
                             supplement_posts = await self.views_extractor.fill_views_from_page(supplement_posts, self.context, task_id=task_id, username=username)
                             
-                            # 本輪去重
-                            supplement_posts = conditional_deduplication(supplement_posts)
-                            
                             # 與現有貼文合併去重
-                            combined_posts = final_posts + supplement_posts
-                            combined_posts = conditional_deduplication(combined_posts)
+                            combined_posts = deduplication.add_batch(supplement_posts)
                             
                             added_count = len(combined_posts) - len(final_posts)
                             final_posts = combined_posts
+                            await emit_new_posts(final_posts)
                             
                             logging.info(f"✅ [Task: {task_id}] 補足第 {supplement_round} 輪完成：新增 {added_count} 則，累計 {len(final_posts)} 則")
                             
@@ -363,12 +387,13 @@ class PlaywrightLogic:
                         await asyncio.sleep(3)  # 等待頁面載入
                         
                         # 使用增強的收集策略
-                        existing_post_ids_final = existing_post_ids | {p.post_id for p in final_posts}
+                        # 就地合併（保留 ExistingPostIds 的按需解析能力）
+                        existing_post_ids.update(p.post_id for p in final_posts)
                         extended_max_scroll_rounds = max_scroll_rounds + 30  # 額外30輪滾動
                         
                         additional_urls = await self._collect_urls_realtime_style(
                             enhanced_page, username, final_shortage + 10,  # 多收集10個作為緩衝
-                            existing_post_ids_final, incremental, extended_max_scroll_rounds
+                            existing_post_ids, incremental, extended_max_scroll_rounds
                         )
                         
                         await enhanced_page.close()
@@ -383,12 +408,11 @@ class PlaywrightLogic:
                             )
                             
                             # 去重並合併
-                            additional_posts = conditional_deduplication(additional_posts)
-                            combined_posts = final_posts + additional_posts
-                            combined_posts = conditional_deduplication(combined_posts)
+                            combined_posts = deduplication.add_batch(additional_posts)
                             
                             final_added = len(combined_posts) - len(final_posts)
                             final_posts = combined_posts
+                            await emit_new_posts(final_posts)
                             
                             logging.info(f"🎉 [Task: {task_id}] 增強收集完成：新增 {final_added} 篇，最終累計 {len(final_posts)} 篇")
                             
@@ -498,27 +522,8 @@ class PlaywrightLogic:
     async def _setup_browser_and_auth(self, auth_json_content: Dict, task_id: str):
         """設置瀏覽器和認證"""
         # 保存 playwright 實例，便於完整清理，避免 Windows Proactor 殘留管道
-        self.playwright = await async_playwright().start()
-        # 🎬 2025新版Threads影片提取優化 - 無手勢自動播放
-        launch_args = [
-            "--autoplay-policy=no-user-gesture-required",
-            "--disable-background-media-suspend",
-            "--disable-features=MediaSessionService",
-            "--force-prefers-reduced-motion=0",
-            "--disable-blink-features=AutomationControlled",
-            "--disable-web-security",
-            "--disable-features=VizDisplayCompositor",
-        ]
-        # 嚴格降級順序：channel=chrome → system 安裝 → 內建 chromium
-        try:
-            self.browser = await self.playwright.chromium.launch(channel="chrome", headless=True, args=launch_args)
-        except Exception as e1:
-            logging.warning(f"⚠️ Chrome channel 啟動失敗，嘗試 system chromium: {e1}")
-            try:
-                self.browser = await self.playwright.chromium.launch(executable_path="/usr/bin/chromium" , headless=True, args=launch_args)
-            except Exception as e2:
-                logging.warning(f"⚠️ system chromium 不可用，回退內建 chromium: {e2}")
-                self.browser = await self.playwright.chromium.launch(headless=True, args=launch_args)
+        self.playwright = await playwright_api.async_playwright().start()
+        self.browser = await self._launch_browser(self.playwright)
         # 創建context（自動播放通過launch args控制）
         self.context = await self.browser.new_context()
         
@@ -529,6 +534,48 @@ class PlaywrightLogic:
         await self.context.add_cookies(auth_json_content.get('cookies', []))
         logging.info(f"🔐 [Task: {task_id}] 認證設置完成")
 
+    @classmethod
+    async def _launch_browser(cls, playwright):
+        """
+        啟動 Chromium；嚴格降級順序：channel=chrome → system 安裝 → 內建 chromium
+
+        成功的選項記在類別上，之後的爬取（與暖機後的第一個請求）直接使用，不再逐一嘗試失敗的選項。
+        """
+        options = [
+            {"channel": "chrome"},
+            {"executable_path": "/usr/bin/chromium"},
+            {},
+        ]
+        if cls._working_launch_option is not None:
+            options.remove(cls._working_launch_option)
+            options.insert(0, cls._working_launch_option)
+
+        last_error = None
+        for option in options:
+            try:
+                browser = await playwright.chromium.launch(headless=True, args=BROWSER_LAUNCH_ARGS, **option)
+                cls._working_launch_option = option
+                return browser
+            except Exception as e:
+                logging.warning(f"⚠️ 瀏覽器啟動失敗 {option or '內建 chromium'}，嘗試下一個選項: {e}")
+                last_error = e
+        raise last_error
+
+    @classmethod
+    async def warm_up_browser(cls) -> Dict[str, Any]:
+        """暖機：啟動一次瀏覽器並開一個 context，確認可用的啟動選項並預熱 Chromium 檔案快取"""
+        playwright = await playwright_api.async_playwright().start()
+        try:
+            browser = await cls._launch_browser(playwright)
+            try:
+                context = await browser.new_context()
+                await context.close()
+                return {"launch_option": cls._working_launch_option or "bundled", "version": browser.version}
+            finally:
+                await browser.close()
+        finally:
+            await playwright.stop()
+
     async def _cleanup(self, task_id: str):
         """清理資源（加強版：shield + timeout，避免 Chromium 殘留）"""
         try:
@@ -831,6 +878,8 @@ class PlaywrightLogic:
                 }
             """
             current_urls = await page.evaluate(js_code, username)
+            if incremental:
+                await self._resolve_existing(existing_post_ids, username, current_urls)
             
             before_count = len(urls)
             new_urls_this_round = 0
@@ -896,6 +945,8 @@ class PlaywrightLogic:
                         # 檢查最後嘗試是否有新內容
                         final_urls = await page.evaluate(js_code, username)
                         final_new_count = 0
+                        if incremental:
+                            await self._resolve_existing(existing_post_ids, username, final_urls)
                         
                         for url in final_urls:
                             raw_post_id = url.split('/')[-1] if url else None
@@ -940,6 +991,13 @@ class PlaywrightLogic:
         logging.info(f"✅ URL收集完成：{len(urls)} 個URL，滾動 {scroll_rounds} 輪")
         return urls
     
+    @staticmethod
+    async def _resolve_existing(existing_post_ids: set, username: str, urls: List[str]) -> None:
+        """讓按需解析的已存在集合（ExistingPostIds）先確認本輪候選URL的post_id。"""
+        resolve = getattr(existing_post_ids, "resolve", None)
+        if resolve is not None:
+            await resolve(f"{username}_{url.split('/')[-1]}" for url in urls if url)
+    
     async def _convert_urls_to_posts(self, urls: List[str], username: str, mode: str, task_id: str) -> List[PostMetrics]:
         """轉換URLs為PostMetrics並過濾非目標用戶"""
         valid_posts = []
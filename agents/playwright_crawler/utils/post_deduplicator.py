@@ -2,91 +2,290 @@
 貼文去重工具
 
 處理主貼文 vs 回應的重複問題，基於多維度判斷保留主貼文
+
+近似重複以 MinHash + LSH 判斷（字元 shingle，Jaccard 相似度門檻可調），
+索引可逐批加入貼文（IncrementalDeduplicator），每篇攤銷 O(1)，
+不必每輪把 final_posts + batch_posts 全部重新分組。
 """
 
+import hashlib
 import logging
-from typing import List, Dict, Set
+import os
+import re
+import unicodedata
 from collections import defaultdict
+from typing import Callable, Dict, Generic, List, Optional, Sequence, Tuple, TypeVar
+
 from common.models import PostMetrics
 
 
+T = TypeVar("T")
+
+DEFAULT_SIMILARITY_THRESHOLD = float(os.getenv("DEDUP_SIMILARITY_THRESHOLD", "0.8"))
+NUM_PERM = 64
+SHINGLE_SIZE = 3
+MAX_SHINGLE_CHARS = 2000   # 超長內容只取前段計算簽章
+EXACT_PREFIX_CHARS = 100   # 與舊版相同：正規化後前 100 字相同視為重複
+
+_INVISIBLE_RE = re.compile(r'[\u200b-\u200d\u2060\ufeff\ufe0f]')
+_NON_WORD_RE = re.compile(r'[\W_]+', re.UNICODE)
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """NFKC、轉小寫、移除不可見字元，標點與空白壓縮為單一空格"""
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKC", _INVISIBLE_RE.sub("", text)).lower()
+    return _NON_WORD_RE.sub(" ", text).strip()
+
+
+def _lsh_params(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """選擇 bands × rows，使 LSH 的 S 曲線轉折點 (1/b)^(1/r) 最接近門檻"""
+    candidates = [(num_perm // rows, rows) for rows in range(1, num_perm + 1) if num_perm % rows == 0]
+    return min(candidates, key=lambda br: abs((1 / br[0]) ** (1 / br[1]) - threshold))
+
+
+class MinHasher:
+    """
+    字元 shingle 的 MinHash 簽章（one-permutation hashing）
+
+    每個 shingle 只雜湊一次，依低位元分到 num_perm 個桶、各桶取最小值，
+    計算量與內容長度成正比（不是長度 × num_perm）；空桶以右側最近的非空桶填補
+    （rotation densification），短文也能得到完整簽章。固定雜湊，跨行程結果一致。
+    """
+
+    def __init__(self, num_perm: int = NUM_PERM, shingle_size: int = SHINGLE_SIZE):
+        if num_perm & (num_perm - 1):
+            raise ValueError("num_perm 必須是 2 的次方")
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self._bin_bits = num_perm.bit_length() - 1
+
+    def signature(self, normalized: str) -> Tuple[int, ...]:
+        text = normalized[:MAX_SHINGLE_CHARS].replace(" ", "")
+        k = self.shingle_size
+        empty = 1 << 64
+        bins = [empty] * self.num_perm
+        mask = self.num_perm - 1
+        for shingle in {text[i:i + k] for i in range(max(1, len(text) - k + 1))}:
+            h = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+            slot, value = h & mask, h >> self._bin_bits
+            if value < bins[slot]:
+                bins[slot] = value
+
+        # densification：空桶取右側（環狀）第一個非空桶的值，並加上距離作區隔
+        for slot in range(self.num_perm):
+            if bins[slot] == empty:
+                for distance in range(1, self.num_perm):
+                    value = bins[(slot + distance) & mask]
+                    if value < empty:
+                        bins[slot] = value + distance * empty
+                        break
+        return tuple(bins)
+
+
+def _similarity(sig_a: Sequence[int], sig_b: Sequence[int]) -> float:
+    return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / len(sig_a)
+
+
+class _Cluster(Generic[T]):
+    __slots__ = ("main", "score", "signatures", "members")
+
+    def __init__(self, item: T, score: tuple, signature: Optional[Tuple[int, ...]]):
+        self.main = item
+        self.score = score
+        self.signatures = [signature] if signature else []
+        self.members = 1
+
+
+class IncrementalDeduplicator(Generic[T]):
+    """
+    增量近似重複索引：逐批加入項目，每個相似群組只保留分數最高者
+
+    - 同 id、或正規化後前 100 字相同 → 直接同組（舊版規則）
+    - 否則以 LSH 找候選群組，再以 MinHash 估計的 Jaccard ≥ threshold 判定相似
+    - 分數相同時保留先加入者；輸出順序依群組建立順序
+    """
+
+    def __init__(
+        self,
+        text_of: Callable[[T], Optional[str]],
+        id_of: Callable[[T], str],
+        score_of: Callable[[T], tuple],
+        scope_of: Optional[Callable[[T], str]] = None,
+        threshold: float = DEFAULT_SIMILARITY_THRESHOLD,
+        num_perm: int = NUM_PERM,
+    ):
+        self.text_of = text_of
+        self.id_of = id_of
+        self.score_of = score_of
+        self.scope_of = scope_of or (lambda item: "")
+        self.threshold = threshold
+        self.bands, self.rows = _lsh_params(threshold, num_perm)
+        self.hasher = MinHasher(num_perm)
+
+        self._clusters: List[_Cluster[T]] = []
+        self._by_id: Dict[str, int] = {}
+        self._by_prefix: Dict[Tuple[str, str], int] = {}
+        self._buckets: Dict[Tuple[str, int, Tuple[int, ...]], List[int]] = defaultdict(list)
+        self.dropped: List[T] = []
+
+    def _bands(self, signature: Tuple[int, ...]):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows]
+
+    def _find_cluster(self, scope: str, normalized: str, signature: Tuple[int, ...]) -> Optional[int]:
+        index = self._by_prefix.get((scope, normalized[:EXACT_PREFIX_CHARS]))
+        if index is not None:
+            return index
+        checked = set()
+        for band, values in self._bands(signature):
+            for candidate in self._buckets.get((scope, band, values), ()):
+                if candidate in checked:
+                    continue
+                checked.add(candidate)
+                if any(_similarity(signature, other) >= self.threshold
+                       for other in self._clusters[candidate].signatures):
+                    return candidate
+        return None
+
+    def add(self, item: T) -> Optional[T]:
+        """加入一個項目；回傳因此被淘汰的項目（可能是新項目本身），無重複時為 None"""
+        item_id = self.id_of(item)
+        scope = self.scope_of(item)
+        normalized = normalize_text(self.text_of(item))
+        signature = self.hasher.signature(normalized) if normalized else None
+
+        index = self._by_id.get(item_id)
+        if index is None and signature is not None:
+            index = self._find_cluster(scope, normalized, signature)
+
+        score = self.score_of(item)
+        if index is None:
+            index = len(self._clusters)
+            self._clusters.append(_Cluster(item, score, signature))
+            loser = None
+        else:
+            cluster = self._clusters[index]
+            cluster.members += 1
+            if signature is not None:
+                cluster.signatures.append(signature)
+            if score > cluster.score:
+                loser, cluster.main, cluster.score = cluster.main, item, score
+            else:
+                loser = item
+            self.dropped.append(loser)
+
+        self._by_id[item_id] = index
+        if signature is not None:
+            self._by_prefix.setdefault((scope, normalized[:EXACT_PREFIX_CHARS]), index)
+            for band, values in self._bands(signature):
+                bucket = self._buckets[(scope, band, values)]
+                if index not in bucket:
+                    bucket.append(index)
+        return loser
+
+    def add_batch(self, items: Sequence[T]) -> List[T]:
+        """加入一批項目；回傳這批加入後被淘汰的項目"""
+        dropped = [self.add(item) for item in items]
+        return [item for item in dropped if item is not None]
+
+    @property
+    def items(self) -> List[T]:
+        """目前保留的項目（每個群組的主項目，依群組建立順序）"""
+        return [cluster.main for cluster in self._clusters]
+
+    def __len__(self) -> int:
+        return len(self._clusters)
+
+
 class PostDeduplicator:
     """
     貼文去重器 - 識別並保留主貼文，過濾回應
     """
-    
+
     @staticmethod
-    def deduplicate_posts(posts: List[PostMetrics]) -> List[PostMetrics]:
+    def calculate_score(post: PostMetrics) -> tuple:
+        """
+        計算貼文重要性分數 (返回tuple用於排序)
+        優先級：views_count > 互動分數 > 內容長度 > 時間戳
         """
-        去重邏輯：當發現相似內容時，保留主貼文
-        
+        views_score = post.views_count or 0
+        interaction_score = (
+            (post.likes_count or 0) +
+            (post.comments_count or 0) +
+            (post.reposts_count or 0) +
+            (post.shares_count or 0)
+        )
+        content_length = len(post.content) if post.content else 0
+        # 時間戳轉為負數，讓早期的貼文分數更高
+        timestamp_score = -(post.created_at.timestamp() if post.created_at else 0)
+
+        return (views_score, interaction_score, content_length, timestamp_score)
+
+    @staticmethod
+    def create_index(threshold: float = DEFAULT_SIMILARITY_THRESHOLD) -> "IncrementalDeduplicator[PostMetrics]":
+        """
+        建立可逐批加入貼文的去重索引
+
         判斷標準（按優先級）：
         1. views_count - 主貼文通常瀏覽數更高
         2. 綜合互動分數 - likes + comments + reposts + shares
         3. 內容長度 - 主貼文通常更詳細
         4. 時間戳 - 主貼文通常更早發布
         """
-        if not posts:
-            return posts
-            
-        # 按內容分組（處理相同用戶的相同/相似內容）
-        content_groups = defaultdict(list)
-        
-        for post in posts:
-            # 使用內容的前100字符作為分組key（處理完全相同的內容）
-            content_key = post.content[:100].strip() if post.content else post.post_id
-            content_groups[content_key].append(post)
-        
-        deduplicated_posts = []
-        
-        for content_key, group_posts in content_groups.items():
-            if len(group_posts) == 1:
-                # 單一貼文，直接保留
-                deduplicated_posts.extend(group_posts)
-            else:
-                # 多個相似貼文，選擇主貼文
-                main_post = PostDeduplicator._select_main_post(group_posts)
-                deduplicated_posts.append(main_post)
-                
-                # 記錄去重信息
-                filtered_ids = [p.post_id for p in group_posts if p.post_id != main_post.post_id]
-                logging.info(f"🔄 去重：保留主貼文 {main_post.post_id}，過濾回應 {filtered_ids}")
-        
-        return deduplicated_posts
-    
+        return IncrementalDeduplicator(
+            text_of=lambda post: post.content,
+            id_of=lambda post: post.post_id,
+            score_of=PostDeduplicator.calculate_score,
+            threshold=threshold,
+        )
+
     @staticmethod
-    def _select_main_post(posts: List[PostMetrics]) -> PostMetrics:
+    def deduplicate_posts(posts: List[PostMetrics],
+                          threshold: float = DEFAULT_SIMILARITY_THRESHOLD) -> List[PostMetrics]:
         """
-        從相似貼文中選擇主貼文
+        去重邏輯：當發現相似內容時，保留主貼文（一次性；多輪累加請用 create_index）
         """
-        def calculate_score(post: PostMetrics) -> tuple:
-            """
-            計算貼文重要性分數 (返回tuple用於排序)
-            優先級：views_count > 互動分數 > 內容長度 > 時間戳
-            """
-            views_score = post.views_count or 0
-            interaction_score = (
-                (post.likes_count or 0) + 
-                (post.comments_count or 0) + 
-                (post.reposts_count or 0) + 
-                (post.shares_count or 0)
-            )
-            content_length = len(post.content) if post.content else 0
-            # 時間戳轉為負數，讓早期的貼文分數更高
-            timestamp_score = -(post.created_at.timestamp() if post.created_at else 0)
-            
-            return (views_score, interaction_score, content_length, timestamp_score)
-        
-        # 按分數排序，選擇最高分的作為主貼文
-        sorted_posts = sorted(posts, key=calculate_score, reverse=True)
-        main_post = sorted_posts[0]
-        
-        # 輸出判斷依據
-        for post in sorted_posts:
-            score = calculate_score(post)
-            logging.info(f"   📊 {post.post_id}: views={score[0]:,}, 互動={score[1]}, 內容長度={score[2]}")
-        
-        return main_post
+        if not posts:
+            return posts
+
+        index = PostDeduplicator.create_index(threshold)
+        dropped = index.add_batch(posts)
+        PostDeduplicator._log_dropped(dropped)
+        return index.items
+
+    @staticmethod
+    def _log_dropped(dropped: List[PostMetrics]) -> None:
+        for post in dropped:
+            score = PostDeduplicator.calculate_score(post)
+            logging.info(f"🔄 去重：過濾相似貼文 {post.post_id}（views={score[0]:,}, 互動={score[1]}, 內容長度={score[2]}）")
+
+
+class IncrementalPostDeduplication:
+    """
+    爬取流程用的增量去重：每輪只把新批次加入索引
+
+    enabled=False 時僅累加（保留所有貼文）
+    """
+
+    def __init__(self, enabled: bool = True, threshold: float = DEFAULT_SIMILARITY_THRESHOLD):
+        self.enabled = enabled
+        self.index = PostDeduplicator.create_index(threshold) if enabled else None
+        self._posts: List[PostMetrics] = []
+
+    def add_batch(self, posts: List[PostMetrics]) -> List[PostMetrics]:
+        """加入一批貼文，回傳目前保留的全部貼文"""
+        if not self.enabled:
+            self._posts.extend(posts)
+            return list(self._posts)
+
+        before = len(self.index)
+        dropped = self.index.add_batch(posts)
+        PostDeduplicator._log_dropped(dropped)
+        if dropped:
+            logging.info(f"✅ 去重完成：{before} + {len(posts)} → {len(self.index)} 篇貼文")
+        return self.index.items
 
 
 def apply_deduplication(posts: List[PostMetrics]) -> List[PostMetrics]:
@@ -95,8 +294,8 @@ def apply_deduplication(posts: List[PostMetrics]) -> List[PostMetrics]:
     """
     original_count = len(posts)
     deduplicated = PostDeduplicator.deduplicate_posts(posts)
-    
+
     if len(deduplicated) < original_count:
         logging.info(f"✅ 去重完成：{original_count} → {len(deduplicated)} 篇貼文")
-    
-    return deduplicated
\ No newline at end of file
+
+    return deduplicated
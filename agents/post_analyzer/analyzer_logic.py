@@ -1,8 +1,9 @@
 import asyncio
+import functools
 import json
 import re
 import random
-from typing import Dict, Any, List
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 
 from common.db_client import get_db_client
 from common.settings import get_settings
@@ -10,6 +11,8 @@ from common.llm_manager import get_llm_manager, chat_completion
 from common.llm_client import parse_llm_json_response
 from datetime import datetime
 
+from .llm_fanout import LLMFanOut
+
 class PostAnalyzerAgent:
     """
     Analyzes posts to extract success patterns based on different modes.
@@ -676,92 +679,38 @@ class PostAnalyzerAgent:
             print(f"批量模式識別 - LLM調用錯誤: {e}")
             return {"error": f"模式識別失敗: {str(e)}"}
     
-    async def _representative_deep_analysis(self, posts_content: List[str], pattern_analysis: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """第二層：對代表性貼文進行深度結構分析"""
-        analyses = []
+    async def _generate_structure_templates(self, posts_content: List[str], pattern_analysis: Dict[str, Any],
+                                            fanout: Optional[LLMFanOut] = None,
+                                            on_template: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None
+                                            ) -> List[Dict[str, Any]]:
+        """第二層：為每個結構模式生成創作模板（各模式並行；on_template 於每個模板完成時呼叫）"""
+        fanout = fanout or LLMFanOut()
         patterns = pattern_analysis.get("identified_patterns", [])
         
-        for pattern in patterns:
-            pattern_name = pattern.get("pattern_name", "未知模式")
-            representative_indices = pattern.get("representative_indices", [])
-            
-            # 確保至少有代表性貼文
-            if not representative_indices:
-                continue
-            
-            # 🔧 修正：每個模式分析多篇貼文（2-3篇）
-            # 確保每個模式至少分析2篇，最多3篇
-            analysis_count = min(len(representative_indices), random.randint(2, 3))
-            selected_indices = random.sample(representative_indices, analysis_count)
-            
-            pattern_analyses = []
-            
-            for selected_index in selected_indices:
-                if selected_index <= len(posts_content):
-                    post_content = posts_content[selected_index - 1]  # 轉換為0基索引
-                    
-                    # 使用變化的分析風格
-                    style_word = self._get_random_variation("style_words")
-                    focus_word = self._get_random_variation("focus_words")
-                    
-                    try:
-                        structure_guide = await self._analyze_pattern_structure(
-                            post_content, pattern_name, style_word, focus_word
-                        )
-                        
-                        pattern_analyses.append({
-                            "post_index": selected_index,
-                            "post_content_preview": post_content[:100] + "..." if len(post_content) > 100 else post_content,
-                            "structure_guide": structure_guide,
-                            "analysis_variations": {
-                                "style_focus": style_word,
-                                "analysis_focus": focus_word
-                            }
-                        })
-                        
-                    except Exception as e:
-                        print(f"代表性分析錯誤 - 模式 {pattern_name}, 貼文 {selected_index}: {e}")
-                        continue
-            
-            # 將該模式的多篇分析結果整合
-            if pattern_analyses:
-                analyses.append({
-                    "pattern_id": pattern.get("pattern_id"),
-                    "pattern_name": pattern_name,
-                    "analysis_count": len(pattern_analyses),
-                    "analyzed_posts": pattern_analyses,
-                    "representative_indices": selected_indices
-                })
-        
-        return analyses
-    
-    async def _generate_structure_templates(self, posts_content: List[str], pattern_analysis: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """第二層：為每個結構模式生成創作模板"""
-        templates = []
-        patterns = pattern_analysis.get("identified_patterns", [])
+        async def build(pattern: Dict[str, Any]) -> Dict[str, Any]:
+            template = await self._generate_universal_structure_template(
+                pattern.get("pattern_name", "未知模式"),
+                pattern.get("structure_characteristics", {}),
+                posts_content,
+                pattern.get("sample_indices", [])
+            )
+            return {
+                "pattern_id": pattern.get("pattern_id"),
+                "pattern_name": pattern.get("pattern_name", "未知模式"),
+                "template_type": "universal",
+                "structure_template": template
+            }
         
-        for pattern in patterns:
-            pattern_name = pattern.get("pattern_name", "未知模式")
-            structure_chars = pattern.get("structure_characteristics", {})
-            sample_indices = pattern.get("sample_indices", [])
-            
-            try:
-                template = await self._generate_universal_structure_template(
-                    pattern_name, structure_chars, posts_content, sample_indices
-                )
-                
-                templates.append({
-                    "pattern_id": pattern.get("pattern_id"),
-                    "pattern_name": pattern_name,
-                    "template_type": "universal",
-                    "structure_template": template
-                })
-                
-            except Exception as e:
-                print(f"結構模板生成錯誤 - 模式 {pattern_name}: {e}")
-                continue
+        async def emit(index: int, template: Dict[str, Any]) -> None:
+            if on_template is not None:
+                await on_template(template)
         
-        return templates
+        templates = await fanout.map(
+            [functools.partial(build, pattern) for pattern in patterns],
+            on_result=emit,
+            label="結構模板生成"
+        )
+        return [template for template in templates if template is not None]
     
     def _estimate_avg_length(self, posts_content: List[str], post_indices: List[int]) -> int:
         """估算模式的平均字數"""
@@ -3,13 +3,15 @@
 統籌語料庫分析、模式生成和結構模板生成的完整流程
 """
 
+import asyncio
 import json
-from typing import List, Dict, Any
+from typing import Any, AsyncIterator, Dict, List
 from datetime import datetime
 
 from .corpus_analyzer import CorpusAnalyzer
 from .pattern_generator import PatternGenerator
 from .structure_templater import StructureTemplater
+from .llm_fanout import LLMFanOut
 from common.llm_manager import chat_completion
 from common.llm_client import parse_llm_json_response
 
@@ -26,26 +28,62 @@ class BatchAnalyzer:
                                     username: str = "unknown") -> Dict[str, Any]:
         """執行完整的批量結構分析流程"""
         try:
-            # 第一階段：語料庫特徵分析
-            corpus_features = self.corpus_analyzer.analyze_corpus_features(posts_content)
-            
-            # 第二階段：動態模式生成
-            min_groups = self._decide_min_groups(len(posts_content))
-            applicable_patterns = self.pattern_generator.generate_applicable_patterns(
-                corpus_features, min_groups
-            )
-            
-            # 第三階段：LLM智能分組
-            pattern_analysis = await self._intelligent_pattern_recognition(
-                posts_content, applicable_patterns, corpus_features
-            )
-            
-            # 第四階段：結構模板生成
-            structure_templates = await self.structure_templater.generate_structure_templates(
-                posts_content, pattern_analysis, corpus_features
-            )
+            result = None
+            async for event in self.iter_batch_structure(posts_content, username):
+                if event["event"] == "completed":
+                    result = event["result"]
+            return result
             
+        except Exception as e:
             return {
+                "status": "error", 
+                "message": f"智能批量結構分析失敗: {str(e)}",
+                "error_details": str(e)
+            }
+    
+    async def iter_batch_structure(self, posts_content: List[str],
+                                   username: str = "unknown") -> AsyncIterator[Dict[str, Any]]:
+        """
+        批量結構分析，逐階段產出事件（供串流端點邊算邊推送）
+        
+        事件依序為：corpus_features → pattern_analysis → template（每個模式完成時一個，
+        依完成順序）→ completed（完整結果，模板依模式順序）
+        """
+        # 第一階段：語料庫特徵分析
+        corpus_features = await self.corpus_analyzer.analyze_corpus_features_cached(posts_content)
+        
+        # 第二階段：動態模式生成
+        min_groups = self._decide_min_groups(len(posts_content))
+        applicable_patterns = self.pattern_generator.generate_applicable_patterns(
+            corpus_features, min_groups
+        )
+        yield {"event": "corpus_features", "corpus_features": corpus_features,
+               "applicable_patterns": applicable_patterns}
+        
+        # 第三階段：LLM智能分組
+        pattern_analysis = await self._intelligent_pattern_recognition(
+            posts_content, applicable_patterns, corpus_features
+        )
+        yield {"event": "pattern_analysis", "pattern_analysis": pattern_analysis}
+        
+        # 第四階段：結構模板生成（各模式並行，完成一個推送一個）
+        completed_templates: asyncio.Queue = asyncio.Queue()
+        templates_task = asyncio.create_task(self.structure_templater.generate_structure_templates(
+            posts_content, pattern_analysis, corpus_features,
+            fanout=LLMFanOut(), on_template=completed_templates.put
+        ))
+        templates_task.add_done_callback(lambda _: completed_templates.put_nowait(None))
+        try:
+            while (template := await completed_templates.get()) is not None:
+                yield {"event": "template", "template": template}
+            structure_templates = await templates_task
+        finally:
+            if not templates_task.done():
+                templates_task.cancel()
+        
+        yield {
+            "event": "completed",
+            "result": {
                 "status": "success",
                 "username": username,
                 "analysis_type": "intelligent_batch_structure_analysis",
@@ -57,13 +95,7 @@ class BatchAnalyzer:
                 "structure_templates": structure_templates,
                 "analyzed_at": datetime.utcnow().isoformat()
             }
-            
-        except Exception as e:
-            return {
-                "status": "error", 
-                "message": f"智能批量結構分析失敗: {str(e)}",
-                "error_details": str(e)
-            }
+        }
     
     def _decide_min_groups(self, total_posts: int) -> int:
         """根據總貼文數決定最低分組數"""
@@ -1,50 +1,200 @@
 """
 語料庫特徵檢測器
 分析貼文集合中實際存在的結構特徵，避免生成不存在的模式
+
+- 檢測規則在模組載入時預先編譯，同類規則合併為單一 alternation，每篇每類只掃描一次
+- 每篇貼文先抽成精簡的特徵向量（長度、段落數、句數、各結構標記），語料庫特徵由向量彙總
+- 向量以內容雜湊快取：行程內 LRU + 資料庫 `post_feature_vectors`，
+  同一帳號重跑分析時只需計算新貼文，其餘直接由快取彙總
 """
 
+import hashlib
+import json
 import re
-from typing import List, Dict, Any
-from collections import Counter
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+
+from common.db_client import get_db_client
+
+
+# 規則有變動時遞增，舊版快取自動失效
+FEATURE_EXTRACTOR_VERSION = 1
+PROCESS_CACHE_SIZE = 50_000
+
+# 對話檢測規則
+DIALOGUE_PATTERNS = [
+    r'["「『].*?["」』]',  # 引號對話
+    r'：\s*[^：\n]{1,50}[。！？]',  # 冒號對話
+    r'說[：:\s]*[^：\n]{1,50}[。！？]',  # "說："對話
+]
+
+# 列點檢測規則
+BULLET_PATTERNS = [
+    r'[•·・]',  # 圓點
+    r'^\s*\d+[.、]\s',  # 數字列點
+    r'^\s*[一二三四五六七八九十][.、]\s',  # 中文數字
+    r'^\s*[①②③④⑤⑥⑦⑧⑨⑩]\s',  # 圓圈數字
+    r'^\s*[-*+]\s',  # 短橫線
+]
+
+# 引用檢測規則
+QUOTE_PATTERNS = [
+    r'[（(].*?[）)]',  # 括號補充
+    r'【.*?】',  # 方括號
+    r'〈.*?〉',  # 書名號
+    r'『.*?』',  # 重引號
+]
+
+
+def _merge(patterns: List[str], flags: int = 0) -> "re.Pattern":
+    return re.compile("|".join(f"(?:{pattern})" for pattern in patterns), flags)
+
+
+_DIALOGUE_RE = _merge(DIALOGUE_PATTERNS, re.MULTILINE)
+_BULLET_RE = _merge(BULLET_PATTERNS, re.MULTILINE)
+_QUOTE_RE = _merge(QUOTE_PATTERNS)
+# 簡單的emoji檢測（可以更精確）
+_EMOJI_RE = re.compile(r'[\U0001F600-\U0001F64F\U0001F300-\U0001F5FF\U0001F680-\U0001F6FF\U0001F1E0-\U0001F1FF]')
+_SENTENCE_END_RE = re.compile(r'[。！？.!?]')
+
+# 特徵向量欄位 → 語料庫特徵中對應的貼文索引清單
+_FLAG_LISTS = {
+    "dialogue": "dialogue_posts",
+    "bullet": "bullet_posts",
+    "quote": "quote_posts",
+    "emoji": "emoji_posts",
+    "hashtag": "hashtag_posts",
+}
+
+_UPSERT_VECTORS_SQL = """
+    INSERT INTO post_feature_vectors (content_hash, extractor_version, features)
+    VALUES ($1, $2, $3::jsonb)
+    ON CONFLICT (content_hash) DO UPDATE
+       SET extractor_version = EXCLUDED.extractor_version,
+           features = EXCLUDED.features,
+           updated_at = NOW()
+"""
+
+
+def content_hash(post: str) -> str:
+    """貼文內容雜湊（快取鍵）"""
+    return hashlib.sha1(post.encode("utf-8")).hexdigest()
+
+
+def extract_post_features(post: str) -> Dict[str, Any]:
+    """單篇貼文的特徵向量"""
+    return {
+        "length": len(post),
+        "paragraphs": sum(1 for line in post.split('\n') if line.strip()),
+        "sentences": sum(1 for sentence in _SENTENCE_END_RE.split(post) if sentence.strip()),
+        "dialogue": _DIALOGUE_RE.search(post) is not None,
+        "bullet": _BULLET_RE.search(post) is not None,
+        "quote": _QUOTE_RE.search(post) is not None,
+        "emoji": _EMOJI_RE.search(post) is not None,
+        "hashtag": '#' in post,
+    }
+
+
+class _VectorLRU:
+    """行程內的特徵向量快取（content_hash → 向量）"""
+
+    def __init__(self, max_size: int = PROCESS_CACHE_SIZE):
+        self.max_size = max_size
+        self._data: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        vector = self._data.get(key)
+        if vector is not None:
+            self._data.move_to_end(key)
+        return vector
+
+    def put(self, key: str, vector: Dict[str, Any]) -> None:
+        self._data[key] = vector
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
 
 
 class CorpusAnalyzer:
     """語料庫結構特徵分析器"""
-    
-    def __init__(self):
-        # 對話檢測規則
-        self.dialogue_patterns = [
-            r'["「『].*?["」』]',  # 引號對話
-            r'：\s*[^：\n]{1,50}[。！？]',  # 冒號對話
-            r'說[：:\s]*[^：\n]{1,50}[。！？]',  # "說："對話
-        ]
-        
-        # 列點檢測規則
-        self.bullet_patterns = [
-            r'[•·・]',  # 圓點
-            r'^\s*\d+[.、]\s',  # 數字列點
-            r'^\s*[一二三四五六七八九十][.、]\s',  # 中文數字
-            r'^\s*[①②③④⑤⑥⑦⑧⑨⑩]\s',  # 圓圈數字
-            r'^\s*[-*+]\s',  # 短橫線
-        ]
-        
-        # 引用檢測規則
-        self.quote_patterns = [
-            r'[（(].*?[）)]',  # 括號補充
-            r'【.*?】',  # 方括號
-            r'〈.*?〉',  # 書名號
-            r'『.*?』',  # 重引號
-        ]
-    
+
+    # 所有實例共用（特徵只由內容決定）
+    _vector_cache = _VectorLRU()
+
     def analyze_corpus_features(self, posts_content: List[str]) -> Dict[str, Any]:
-        """分析語料庫的結構特徵"""
-        total_posts = len(posts_content)
-        
+        """分析語料庫的結構特徵（只用行程內快取）"""
+        hashes = [content_hash(post) for post in posts_content]
+        return self.aggregate_features([self._local_vector(h, post) for h, post in zip(hashes, posts_content)])
+
+    async def analyze_corpus_features_cached(self, posts_content: List[str]) -> Dict[str, Any]:
+        """分析語料庫的結構特徵；行程內未命中的向量向資料庫查詢，新算出的寫回資料庫"""
+        hashes = [content_hash(post) for post in posts_content]
+        vectors: Dict[str, Dict[str, Any]] = {}
+        for h in hashes:
+            vector = self._vector_cache.get(h)
+            if vector is not None:
+                vectors[h] = vector
+
+        missing = list({h for h in hashes if h not in vectors})
+        if missing:
+            for h, vector in (await self._load_vectors(missing)).items():
+                vectors[h] = vector
+                self._vector_cache.put(h, vector)
+
+            computed = {}
+            for h, post in zip(hashes, posts_content):
+                if h not in vectors:
+                    vectors[h] = computed[h] = self._local_vector(h, post)
+            if computed:
+                await self._store_vectors(computed)
+
+        return self.aggregate_features([vectors[h] for h in hashes])
+
+    def _local_vector(self, h: str, post: str) -> Dict[str, Any]:
+        vector = self._vector_cache.get(h)
+        if vector is None:
+            vector = extract_post_features(post)
+            self._vector_cache.put(h, vector)
+        return vector
+
+    async def _load_vectors(self, hashes: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        try:
+            rows = await (await get_db_client()).fetch_all(
+                """
+                SELECT content_hash, features
+                FROM post_feature_vectors
+                WHERE content_hash = ANY($1::text[]) AND extractor_version = $2
+                """,
+                list(hashes), FEATURE_EXTRACTOR_VERSION
+            )
+        except Exception as e:
+            print(f"特徵向量快取讀取失敗（改為直接計算）: {e}")
+            return {}
+        return {
+            row["content_hash"]: json.loads(row["features"]) if isinstance(row["features"], str) else row["features"]
+            for row in rows
+        }
+
+    async def _store_vectors(self, vectors: Dict[str, Dict[str, Any]]) -> None:
+        records = [(h, FEATURE_EXTRACTOR_VERSION, json.dumps(vector)) for h, vector in vectors.items()]
+
+        async def _op(conn):
+            await conn.executemany(_UPSERT_VECTORS_SQL, records)
+
+        try:
+            await (await get_db_client()).run_in_transaction(_op)
+        except Exception as e:
+            print(f"特徵向量快取寫入失敗: {e}")
+
+    def aggregate_features(self, vectors: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """由逐篇特徵向量彙總語料庫特徵（貼文索引依向量順序）"""
+        total_posts = len(vectors)
+
         features = {
             # 基本統計
             "total_posts": total_posts,
-            "avg_length": sum(len(post) for post in posts_content) / total_posts,
-            
+            "avg_length": sum(vector["length"] for vector in vectors) / max(total_posts, 1),
+
             # 結構特徵存在性
             "has_dialogue": False,
             "has_bullet_points": False,
@@ -52,7 +202,7 @@ class CorpusAnalyzer:
             "has_multi_paragraph": False,
             "has_emoji": False,
             "has_hashtags": False,
-            
+
             # 詳細統計
             "dialogue_posts": [],
             "bullet_posts": [],
@@ -60,103 +210,33 @@ class CorpusAnalyzer:
             "multi_paragraph_posts": [],
             "emoji_posts": [],
             "hashtag_posts": [],
-            
+
             # 句數分布
             "sentence_distribution": {},
             "paragraph_distribution": {},
             "length_distribution": {},
-            
+
             # 標點符號模式
             "punctuation_density": {},
             "emoji_usage": {},
         }
-        
-        for i, post in enumerate(posts_content):
-            self._analyze_single_post(post, i, features)
-        
+
+        for post_index, vector in enumerate(vectors):
+            for flag, list_key in _FLAG_LISTS.items():
+                if vector[flag]:
+                    features[list_key].append(post_index)
+            if vector["paragraphs"] > 1:
+                features["multi_paragraph_posts"].append(post_index)
+
+            self._update_distribution(features["sentence_distribution"], vector["sentences"])
+            self._update_distribution(features["paragraph_distribution"], vector["paragraphs"])
+            self._update_distribution(features["length_distribution"], self._categorize_length(vector["length"]))
+
         # 計算比例和閾值判斷
         self._calculate_feature_thresholds(features)
-        
+
         return features
-    
-    def _analyze_single_post(self, post: str, post_index: int, features: Dict[str, Any]):
-        """分析單篇貼文的特徵"""
-        
-        # 對話檢測
-        if self._has_dialogue(post):
-            features["dialogue_posts"].append(post_index)
-            features["has_dialogue"] = True
-        
-        # 列點檢測
-        if self._has_bullet_points(post):
-            features["bullet_posts"].append(post_index)
-            features["has_bullet_points"] = True
-        
-        # 引用檢測
-        if self._has_quotes(post):
-            features["quote_posts"].append(post_index)
-            features["has_quotes"] = True
-        
-        # 多段落檢測
-        paragraphs = [p.strip() for p in post.split('\n') if p.strip()]
-        if len(paragraphs) > 1:
-            features["multi_paragraph_posts"].append(post_index)
-            features["has_multi_paragraph"] = True
-        
-        # Emoji檢測
-        if self._has_emoji(post):
-            features["emoji_posts"].append(post_index)
-            features["has_emoji"] = True
-        
-        # Hashtag檢測
-        if '#' in post:
-            features["hashtag_posts"].append(post_index)
-            features["has_hashtags"] = True
-        
-        # 句數統計
-        sentences = self._count_sentences(post)
-        self._update_distribution(features["sentence_distribution"], sentences)
-        
-        # 段落數統計
-        self._update_distribution(features["paragraph_distribution"], len(paragraphs))
-        
-        # 長度統計
-        length_category = self._categorize_length(len(post))
-        self._update_distribution(features["length_distribution"], length_category)
-    
-    def _has_dialogue(self, post: str) -> bool:
-        """檢測是否包含對話"""
-        for pattern in self.dialogue_patterns:
-            if re.search(pattern, post, re.MULTILINE):
-                return True
-        return False
-    
-    def _has_bullet_points(self, post: str) -> bool:
-        """檢測是否包含列點"""
-        for pattern in self.bullet_patterns:
-            if re.search(pattern, post, re.MULTILINE):
-                return True
-        return False
-    
-    def _has_quotes(self, post: str) -> bool:
-        """檢測是否包含引用或補充說明"""
-        for pattern in self.quote_patterns:
-            if re.search(pattern, post):
-                return True
-        return False
-    
-    def _has_emoji(self, post: str) -> bool:
-        """檢測是否包含emoji"""
-        # 簡單的emoji檢測（可以更精確）
-        emoji_pattern = r'[\U0001F600-\U0001F64F\U0001F300-\U0001F5FF\U0001F680-\U0001F6FF\U0001F1E0-\U0001F1FF]'
-        return bool(re.search(emoji_pattern, post))
-    
-    def _count_sentences(self, post: str) -> int:
-        """計算句子數量"""
-        sentence_endings = r'[。！？.!?]'
-        sentences = re.split(sentence_endings, post)
-        return len([s for s in sentences if s.strip()])
-    
+
     def _categorize_length(self, length: int) -> str:
         """將長度分類"""
         if length <= 30:
@@ -169,59 +249,60 @@ class CorpusAnalyzer:
             return "長"
         else:
             return "極長"
-    
+
     def _update_distribution(self, distribution: Dict, key):
         """更新分布統計"""
         distribution[str(key)] = distribution.get(str(key), 0) + 1
-    
+
     def _calculate_feature_thresholds(self, features: Dict[str, Any]):
         """計算特徵的閾值判斷"""
         total_posts = features["total_posts"]
-        
+
         # 只有當至少10%的貼文包含某特徵時，才認為該特徵存在
         threshold = max(2, total_posts * 0.1)
-        
+
         features["has_dialogue"] = len(features["dialogue_posts"]) >= threshold
         features["has_bullet_points"] = len(features["bullet_posts"]) >= threshold
         features["has_quotes"] = len(features["quote_posts"]) >= threshold
         features["has_multi_paragraph"] = len(features["multi_paragraph_posts"]) >= threshold
         features["has_emoji"] = len(features["emoji_posts"]) >= threshold
         features["has_hashtags"] = len(features["hashtag_posts"]) >= threshold
-        
+
         # 添加特徵覆蓋率
+        denominator = max(total_posts, 1)
         features["feature_coverage"] = {
-            "dialogue_rate": len(features["dialogue_posts"]) / total_posts,
-            "bullet_rate": len(features["bullet_posts"]) / total_posts,
-            "quote_rate": len(features["quote_posts"]) / total_posts,
-            "multi_paragraph_rate": len(features["multi_paragraph_posts"]) / total_posts,
-            "emoji_rate": len(features["emoji_posts"]) / total_posts,
-            "hashtag_rate": len(features["hashtag_posts"]) / total_posts,
+            "dialogue_rate": len(features["dialogue_posts"]) / denominator,
+            "bullet_rate": len(features["bullet_posts"]) / denominator,
+            "quote_rate": len(features["quote_posts"]) / denominator,
+            "multi_paragraph_rate": len(features["multi_paragraph_posts"]) / denominator,
+            "emoji_rate": len(features["emoji_posts"]) / denominator,
+            "hashtag_rate": len(features["hashtag_posts"]) / denominator,
         }
-    
+
     def get_dominant_patterns(self, features: Dict[str, Any]) -> List[str]:
         """獲取語料庫中的主導模式"""
         dominant = []
-        
+
         if features["has_dialogue"]:
             dominant.append("對話插入型")
-        
+
         if features["has_bullet_points"]:
             dominant.append("列點摘要型")
-        
+
         if features["has_quotes"]:
             dominant.append("引用補充型")
-        
+
         if features["has_multi_paragraph"]:
             dominant.append("多段敘事型")
         else:
             dominant.append("單段直述型")
-        
+
         # 根據長度分布添加長度相關模式
         length_dist = features["length_distribution"]
         if length_dist.get("極短", 0) + length_dist.get("短", 0) > features["total_posts"] * 0.3:
             dominant.append("簡潔快節奏型")
-        
+
         if length_dist.get("長", 0) + length_dist.get("極長", 0) > features["total_posts"] * 0.2:
             dominant.append("深度展開型")
-        
+
         return dominant
@@ -1,76 +1,130 @@
 """
 數據獲取器 - 從實時爬蟲數據庫獲取真實貼文數據
+
+- 共用 `common.db_client` 的連線池，不再每次呼叫都新建連線
+- 用戶名比對統一使用 `replace(lower(username),'@','')`，對應 migration 002 的表達式索引
+- 查詢文字固定（排序欄位預先展開）並登記為具名查詢，每條連線只 prepare 一次，耗時列入 query_stats
+- 主要來源（post_metrics_sql）與後備來源（playwright_post_metrics）合併為單次往返
 """
 
 from typing import List, Dict, Any, Optional
-import asyncpg
-import json
-from common.settings import get_settings, get_database_url
-import os
+
+from common.db_client import get_db_client
+from common.query_registry import register_query
+
+
+# 排序方式 → 欄位（兩張表欄位名稱一致）
+SORT_COLUMNS = {
+    "views": "views_count",
+    "likes": "likes_count",
+    "comments": "comments_count",
+    "reposts": "reposts_count",
+    "shares": "shares_count",
+    "score": "calculated_score",
+}
+DEFAULT_SORT_COLUMN = "views_count"
+
+# 與表達式索引 idx_*_username_norm 完全一致的正規化表達式
+_NORM_USERNAME = "replace(lower(username),'@','')"
+
+AVAILABLE_USERS_QUERY = f"""
+WITH primary_users AS (
+    SELECT DISTINCT username
+    FROM post_metrics_sql
+    WHERE username IS NOT NULL
+      AND content IS NOT NULL
+      AND trim(content) != ''
+)
+SELECT username FROM primary_users
+UNION ALL
+SELECT DISTINCT {_NORM_USERNAME} AS username
+FROM playwright_post_metrics
+WHERE NOT EXISTS (SELECT 1 FROM primary_users)
+  AND username IS NOT NULL
+  AND trim(username) != ''
+ORDER BY username
+LIMIT $1;
+"""
+
+
+def _build_user_posts_query(sort_column: str) -> str:
+    """組出主要/後備合併的貼文查詢；後備分支只在主要來源無資料時才會產生列。
+
+    sort_value 必須是 COALESCE(<欄位>, 0)（不加型別轉換），views/likes 才能直接走
+    idx_*_user_views / idx_*_user_likes 的排序，不需另外排序整個用戶的貼文。
+    """
+    return f"""
+WITH primary_posts AS (
+    SELECT content,
+           COALESCE({sort_column}, 0) AS sort_value,
+           COALESCE(fetched_at, created_at, NOW()) AS sort_ts
+    FROM post_metrics_sql
+    WHERE {_NORM_USERNAME} = $1
+      AND content IS NOT NULL
+      AND trim(content) != ''
+    ORDER BY sort_value DESC, sort_ts DESC
+    LIMIT $2
+), fallback_posts AS (
+    SELECT content,
+           COALESCE({sort_column}, 0) AS sort_value,
+           COALESCE(created_at, fetched_at, NOW()) AS sort_ts
+    FROM playwright_post_metrics
+    WHERE NOT EXISTS (SELECT 1 FROM primary_posts)
+      AND {_NORM_USERNAME} = $1
+      AND content IS NOT NULL
+      AND trim(content) != ''
+    ORDER BY sort_value DESC, sort_ts DESC
+    LIMIT $2
+)
+SELECT content FROM (
+    SELECT content, sort_value, sort_ts FROM primary_posts
+    UNION ALL
+    SELECT content, sort_value, sort_ts FROM fallback_posts
+) merged
+ORDER BY sort_value DESC, sort_ts DESC;
+"""
+
+
+# 每種排序一條固定 SQL 文字，命中 asyncpg 的 statement cache
+USER_POSTS_QUERIES = {
+    column: _build_user_posts_query(column)
+    for column in set(SORT_COLUMNS.values())
+}
+
+USER_POSTS_COUNT_QUERY = f"""
+SELECT COUNT(*) AS total
+FROM post_metrics_sql
+WHERE {_NORM_USERNAME} = $1
+  AND content IS NOT NULL
+  AND trim(content) != '';
+"""
+
+AVAILABLE_USERS = register_query("post_analyzer.available_users", AVAILABLE_USERS_QUERY)
+USER_POSTS = {
+    column: register_query(f"post_analyzer.user_posts.{column}", query)
+    for column, query in USER_POSTS_QUERIES.items()
+}
+USER_POSTS_COUNT = register_query("post_analyzer.user_posts_count", USER_POSTS_COUNT_QUERY)
+
+
+def normalize_username(username: str) -> str:
+    """與 SQL 端 `replace(lower(username),'@','')` 相同的正規化。"""
+    return (username or "").strip().lower().replace("@", "")
 
 
 class PostDataFetcher:
     """從爬蟲數據庫獲取貼文數據"""
-    
-    def __init__(self):
-        self.settings = get_settings()
-        # 優先使用完整的 DATABASE_URL，避免容器內使用 localhost 造成連線失敗
-        raw_url = get_database_url()
-        # 在 Docker 內部時，將 localhost/127.0.0.1 自動改為 postgres（compose 服務名）
-        if os.path.exists('/.dockerenv') and raw_url:
-            self._database_url = (
-                raw_url.replace('@localhost:', '@postgres:')
-                       .replace('@127.0.0.1:', '@postgres:')
-            )
-        else:
-            self._database_url = raw_url
 
-    async def _connect(self) -> asyncpg.Connection:
-        """建立資料庫連線，優先使用 DSN(URL)。"""
-        try:
-            if self._database_url:
-                # 使用 DSN 方式，讓庫自動解析 host/port/user/password/name
-                return await asyncpg.connect(self._database_url)
-            # 後備：使用個別參數
-            return await asyncpg.connect(
-                host=self.settings.DATABASE_HOST,
-                port=self.settings.DATABASE_PORT,
-                user=self.settings.DATABASE_USER,
-                password=self.settings.DATABASE_PASSWORD,
-                database=self.settings.DATABASE_NAME
-            )
-        except Exception as exc:
-            # 將錯誤上拋，呼叫端會處理並記錄
-            raise exc
-    
-    async def get_available_users(self) -> List[str]:
+    async def _fetch(self, query_name: str, *args) -> List[Dict[str, Any]]:
+        """透過共用連線池執行具名查詢（含連線重試）。"""
+        db = await get_db_client()
+        return await db.fetch_named(query_name, *args)
+
+    async def get_available_users(self, limit: Optional[int] = None) -> List[str]:
         """獲取已爬取的用戶列表"""
         try:
-            conn = await self._connect()
-            
-            # 主要來源：post_metrics_sql（已整理的內容）
-            primary_query = """
-            SELECT DISTINCT username 
-            FROM post_metrics_sql 
-            WHERE username IS NOT NULL 
-              AND content IS NOT NULL 
-              AND trim(content) != ''
-            ORDER BY username;
-            """
-
-            rows = await conn.fetch(primary_query)
-
-            # 後備來源：playwright_post_metrics（只要有抓到貼文就列出用戶）
-            if not rows:
-                fallback_query = """
-                SELECT DISTINCT replace(lower(username),'@','') AS username
-                FROM playwright_post_metrics 
-                WHERE username IS NOT NULL AND trim(username) != ''
-                ORDER BY 1;
-                """
-                rows = await conn.fetch(fallback_query)
-
-            await conn.close()
+            # 主要來源：post_metrics_sql；為空時同一次查詢內退回 playwright_post_metrics
+            rows = await self._fetch(AVAILABLE_USERS, limit)
 
             # 去重、過濾空白
             users = [r['username'] for r in rows if r and r.get('username')]
@@ -78,94 +132,39 @@ class PostDataFetcher:
             # 可能兩張表大小寫不同，統一再去重
             users = sorted(list({u.lower(): u for u in users}.values()))
             return users
-            
+
         except Exception as e:
             print(f"❌ 獲取用戶列表失敗: {e}")
             return []
-    
-    async def get_user_posts(self, username: str, post_count: int = 25, 
+
+    async def get_user_posts(self, username: str, post_count: int = 25,
                            sort_method: str = "likes") -> List[str]:
         """獲取指定用戶的貼文內容"""
         try:
-            conn = await self._connect()
-            
-            # 根據排序方式構建查詢（允許為 NULL，使用 COALESCE 排序）
-            sort_column = {
-                "views": "views_count",
-                "likes": "likes_count",
-                "comments": "comments_count",
-                "reposts": "reposts_count",
-                "shares": "shares_count",
-                "score": "calculated_score",
-            }.get(sort_method, "views_count")
-
-            # 主要來源：post_metrics_sql（內容清洗後的語料）
-            primary_query = f"""
-            SELECT content
-            FROM post_metrics_sql
-            WHERE replace(lower(username),'@','') = replace(lower($1),'@','')
-              AND content IS NOT NULL 
-              AND trim(content) != ''
-            ORDER BY COALESCE({sort_column}, 0) DESC, COALESCE(fetched_at, created_at, NOW()) DESC
-            LIMIT $2;
-            """
-
-            rows = await conn.fetch(primary_query, username, post_count)
-
-            # 後備來源：playwright_post_metrics（直接從爬蟲入庫的 content）
-            if not rows:
-                fallback_sort_column = {
-                    "views": "views_count",
-                    "likes": "likes_count",
-                    "comments": "comments_count",
-                    "reposts": "reposts_count",
-                    "shares": "shares_count",
-                    "score": "calculated_score",
-                }.get(sort_method, "views_count")
-
-                fallback_query = f"""
-                SELECT content
-                FROM playwright_post_metrics
-                WHERE replace(lower(username),'@','') = replace(lower($1),'@','')
-                  AND content IS NOT NULL 
-                  AND trim(content) != ''
-                ORDER BY COALESCE({fallback_sort_column}, 0) DESC, COALESCE(created_at, fetched_at, NOW()) DESC
-                LIMIT $2;
-                """
-                rows = await conn.fetch(fallback_query, username, post_count)
-            await conn.close()
-            
+            sort_column = SORT_COLUMNS.get(sort_method, DEFAULT_SORT_COLUMN)
+            rows = await self._fetch(
+                USER_POSTS[sort_column], normalize_username(username), post_count
+            )
+
             # 提取markdown內容
             posts_content = []
             for row in rows:
                 content = row['content']
                 if content and content.strip():
                     posts_content.append(content.strip())
-            
+
             return posts_content
-            
+
         except Exception as e:
             print(f"❌ 獲取用戶貼文失敗: {e}")
             return []
-    
+
     async def get_user_posts_count(self, username: str) -> int:
         """獲取指定用戶的貼文總數"""
         try:
-            conn = await self._connect()
-            
-            query = """
-            SELECT COUNT(*) as total
-            FROM post_metrics_sql 
-            WHERE username = $1 
-              AND content IS NOT NULL 
-              AND trim(content) != '';
-            """
-            
-            row = await conn.fetchrow(query, username)
-            await conn.close()
-            
-            return row['total'] if row else 0
-            
+            rows = await self._fetch(USER_POSTS_COUNT, normalize_username(username))
+            return rows[0]['total'] if rows else 0
+
         except Exception as e:
             print(f"❌ 獲取用戶貼文數量失敗: {e}")
             return 0
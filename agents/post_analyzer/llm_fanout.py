@@ -0,0 +1,63 @@
+"""
+LLM 併發分派
+
+批量結構分析中，模式識別之後為各模式生成創作模板的 LLM 呼叫
+彼此獨立，只依賴模式識別的結果。LLMFanOut 讓這些呼叫並行執行：
+- 同時進行的呼叫數以 PerformanceSettings.max_concurrent_analysis 為上限
+  （環境變數 PERFORMANCE_MAX_CONCURRENT_ANALYSIS），同一次分析的各階段共用同一個上限
+- 單一呼叫失敗只影響該項（結果為 None），其他項照常完成
+- 每完成一項即呼叫 on_result，可邊算邊推送結果
+
+整批耗時約為「模式識別 + 最慢的一個呼叫」，而不是所有呼叫的總和。
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, List, Optional, Sequence, TypeVar
+
+from common.settings import get_settings
+
+
+T = TypeVar("T")
+
+ResultCallback = Callable[[int, Any], Awaitable[None]]
+
+
+class LLMFanOut:
+    """有併發上限的 LLM 呼叫執行器（一次分析建立一個，各階段共用）"""
+
+    def __init__(self, max_concurrency: Optional[int] = None):
+        limit = max_concurrency or get_settings().performance.max_concurrent_analysis
+        self.max_concurrency = max(1, limit)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def call(self, fn: Callable[..., Awaitable[T]], *args, **kwargs) -> T:
+        """在併發上限內執行單一呼叫"""
+        async with self._semaphore:
+            return await fn(*args, **kwargs)
+
+    async def map(self, jobs: Sequence[Callable[[], Awaitable[T]]],
+                  on_result: Optional[ResultCallback] = None,
+                  label: str = "LLM 呼叫") -> List[Optional[T]]:
+        """
+        並行執行一組呼叫，回傳依輸入順序排列的結果
+
+        Args:
+            jobs: 無參數的 coroutine 工廠（呼叫時才建立 coroutine）
+            on_result: 每完成一項時呼叫 (index, result)；失敗的項目不會呼叫
+            label: 錯誤訊息中的階段名稱
+        """
+        async def run(index: int, job: Callable[[], Awaitable[T]]):
+            try:
+                result = await self.call(job)
+            except Exception as e:
+                print(f"{label}錯誤 - 第 {index + 1} 項: {e}")
+                return index, None
+            if on_result is not None:
+                await on_result(index, result)
+            return index, result
+
+        results: List[Optional[T]] = [None] * len(jobs)
+        for completed in asyncio.as_completed([run(i, job) for i, job in enumerate(jobs)]):
+            index, result = await completed
+            results[index] = result
+        return results
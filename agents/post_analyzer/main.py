@@ -8,6 +8,7 @@ import json
 import uuid
 from typing import Dict, Any, List, Optional
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 import asyncio
 import sys
@@ -25,6 +26,7 @@ from common.llm_manager import get_llm_manager, chat_completion
 from common.settings import get_settings
 from common.models import PostMetrics, PostMetricsBatch
 from agents.post_analyzer.analyzer_logic import PostAnalyzerAgent as StructureAnalyzerAgent
+from agents.post_analyzer.batch_analyzer import BatchAnalyzer
 from agents.post_analyzer.data_fetcher import PostDataFetcher
 
 app = FastAPI(title="Post Analyzer Agent", version="1.0.0")
@@ -521,46 +523,34 @@ async def analyze_post_structure(request: StructureAnalyzeRequest):
 async def get_available_users():
     """獲取已爬取的用戶列表"""
     try:
+        # 主要/後備來源已在同一次查詢內合併，不需再額外降級查詢
         users = await data_fetcher.get_available_users()
-        # 若主要/後備都取不到，用更寬鬆的最後防線（避免 UI 完全空白）
-        if not users:
-            try:
-                # 嘗試僅從 playwright_post_metrics 取 50 個樣本用戶（降級）
-                conn = await data_fetcher._connect()
-                rows = await conn.fetch("""
-                    SELECT DISTINCT replace(lower(username),'@','') AS username
-                    FROM playwright_post_metrics 
-                    WHERE username IS NOT NULL AND trim(username) != ''
-                    ORDER BY 1
-                    LIMIT 50;
-                """)
-                await conn.close()
-                users = [r['username'] for r in rows if r and r.get('username')]
-            except Exception:
-                pass
         return {"users": users, "count": len(users)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"獲取用戶列表失敗: {str(e)}")
 
+async def _resolve_batch_posts(request: BatchStructureAnalyzeRequest) -> List[str]:
+    """批量分析的貼文內容：請求中提供則直接使用，否則從數據庫獲取"""
+    if request.posts_content:
+        return request.posts_content
+    
+    posts_content = await data_fetcher.get_user_posts(
+        username=request.username,
+        post_count=request.post_count,
+        sort_method=request.sort_method
+    )
+    if not posts_content:
+        raise HTTPException(
+            status_code=404, 
+            detail=f"未找到用戶 {request.username} 的貼文數據"
+        )
+    return posts_content
+
 @app.post("/batch-structure-analyze", response_model=BatchStructureAnalysisResult)
 async def analyze_batch_post_structure(request: BatchStructureAnalyzeRequest):
     """批量結構分析貼文"""
     try:
-        # 如果沒有提供貼文內容，從數據庫獲取
-        if not request.posts_content:
-            posts_content = await data_fetcher.get_user_posts(
-                username=request.username,
-                post_count=request.post_count,
-                sort_method=request.sort_method
-            )
-            
-            if not posts_content:
-                raise HTTPException(
-                    status_code=404, 
-                    detail=f"未找到用戶 {request.username} 的貼文數據"
-                )
-        else:
-            posts_content = request.posts_content
+        posts_content = await _resolve_batch_posts(request)
         
         result = await structure_analyzer_agent.analyze_batch_structure(
             posts_content=posts_content,
@@ -584,6 +574,23 @@ async def analyze_batch_post_structure(request: BatchStructureAnalyzeRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"批量結構分析處理失敗: {str(e)}")
 
+@app.post("/batch-structure-analyze/stream")
+async def stream_batch_post_structure(request: BatchStructureAnalyzeRequest):
+    """
+    批量結構分析（NDJSON 串流）：每完成一個階段 / 一個模式模板就推送一行，
+    最後一行 event=completed 為完整結果（格式同 /batch-structure-analyze）
+    """
+    posts_content = await _resolve_batch_posts(request)
+    
+    async def event_stream():
+        try:
+            async for event in BatchAnalyzer().iter_batch_structure(posts_content, request.username):
+                yield json.dumps(event, ensure_ascii=False, default=str) + "\n"
+        except Exception as e:
+            yield json.dumps({"event": "error", "message": f"批量結構分析處理失敗: {str(e)}"}, ensure_ascii=False) + "\n"
+    
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
 @app.post("/batch-summary", response_model=BatchSummaryResult)
 async def summarize_batch_template(request: BatchSummaryRequest):
     """根據模板結構指南與樣本貼文（多篇）生成精煉摘要（Markdown）。"""
@@ -3,12 +3,15 @@
 為每個識別出的結構模式生成詳細的創作模板
 """
 
+import functools
 import json
-from typing import List, Dict, Any
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 
 from common.llm_manager import chat_completion
 from common.llm_client import parse_llm_json_response
 
+from .llm_fanout import LLMFanOut
+
 
 class StructureTemplater:
     """結構模板生成器"""
@@ -18,38 +21,41 @@ class StructureTemplater:
     
     async def generate_structure_templates(self, posts_content: List[str], 
                                          pattern_analysis: Dict[str, Any],
-                                         corpus_features: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """為每個結構模式生成創作模板"""
-        templates = []
+                                         corpus_features: Dict[str, Any],
+                                         fanout: Optional[LLMFanOut] = None,
+                                         on_template: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None
+                                         ) -> List[Dict[str, Any]]:
+        """為每個結構模式生成創作模板（各模式並行；on_template 於每個模板完成時呼叫）"""
+        fanout = fanout or LLMFanOut()
         patterns = pattern_analysis.get("identified_patterns", [])
         
-        for pattern in patterns:
+        async def build(pattern: Dict[str, Any]) -> Dict[str, Any]:
             pattern_name = pattern.get("pattern_name", "未知模式")
-            structure_chars = pattern.get("structure_characteristics", {})
-            sample_indices = pattern.get("sample_indices", [])
             confidence = pattern.get("confidence", 0.5)
-            post_indices_all = pattern.get("post_indices", [])
-            
-            try:
-                template = await self._generate_adaptive_structure_template(
-                    pattern_name, structure_chars, posts_content, 
-                    sample_indices, corpus_features, confidence,
-                    post_indices_all=post_indices_all
-                )
-                
-                templates.append({
-                    "pattern_id": pattern.get("pattern_id"),
-                    "pattern_name": pattern_name,
-                    "template_type": "adaptive",
-                    "confidence": confidence,
-                    "structure_template": template
-                })
-                
-            except Exception as e:
-                print(f"結構模板生成錯誤 - 模式 {pattern_name}: {e}")
-                continue
+            template = await self._generate_adaptive_structure_template(
+                pattern_name, pattern.get("structure_characteristics", {}), posts_content,
+                pattern.get("sample_indices", []), corpus_features, confidence,
+                post_indices_all=pattern.get("post_indices", [])
+            )
+            return {
+                "pattern_id": pattern.get("pattern_id"),
+                "pattern_name": pattern_name,
+                "template_type": "adaptive",
+                "confidence": confidence,
+                "structure_template": template
+            }
+        
+        async def emit(index: int, template: Dict[str, Any]) -> None:
+            if on_template is not None:
+                await on_template(template)
         
-        return templates
+        templates = await fanout.map(
+            [functools.partial(build, pattern) for pattern in patterns],
+            on_result=emit,
+            label="結構模板生成"
+        )
+        # 依模式順序回傳；失敗的模式略過
+        return [template for template in templates if template is not None]
     
     async def _generate_adaptive_structure_template(self, pattern_name: str, 
                                                    structure_chars: Dict[str, Any],
@@ -0,0 +1,133 @@
+"""
+多圖批次描述
+
+一篇貼文常有 4–10 張圖片，逐張呼叫 Gemini 時每次請求的固定成本（連線、提示 token、排隊）
+佔了大部分時間。批次模式把多張圖片連同穩定的圖片 ID 放進同一個多模態請求，
+要求模型以 {"images": [{"id": ..., ...}]} 逐張回傳，再依 ID 拆回每張圖片的結果。
+
+- plan_image_batches：依張數上限與輸入 token 預算（PreparedMedia.tokens_est）切分批次；
+  邊下載邊組批的呼叫方可用 batch_has_room 套用同一規則，一次只持有一批圖片
+- parse_batch_response：解析模型回應，只回傳 ID 在預期集合內、且有描述內容的項目；
+  缺漏或無法解析的 ID 由呼叫方改走單張描述
+
+設定（環境變數）：
+- VISION_BATCH_DESCRIBE：false 時停用批次模式，全部逐張描述
+- VISION_BATCH_MAX_IMAGES：每批最多張數，預設 6
+- VISION_BATCH_MAX_INPUT_TOKENS：每批圖片輸入 token 上限，預設 12000
+- VISION_BATCH_OUTPUT_TOKENS_PER_IMAGE：每張圖片預留的輸出 token，預設 700
+"""
+
+import json
+import os
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+from .media_preprocess import IMAGE_TILE_TOKENS, PreparedMedia
+
+
+BATCH_DESCRIBE_ENABLED = os.getenv("VISION_BATCH_DESCRIBE", "true").lower() not in ("0", "false", "no")
+BATCH_MAX_IMAGES = int(os.getenv("VISION_BATCH_MAX_IMAGES", "6"))
+BATCH_MAX_INPUT_TOKENS = int(os.getenv("VISION_BATCH_MAX_INPUT_TOKENS", "12000"))
+BATCH_OUTPUT_TOKENS_PER_IMAGE = int(os.getenv("VISION_BATCH_OUTPUT_TOKENS_PER_IMAGE", "700"))
+
+# 未知尺寸時的保守估計（約 2x2 方塊）
+_UNKNOWN_IMAGE_TOKENS = IMAGE_TILE_TOKENS * 4
+
+BATCH_IMAGE_PROMPT = """
+你會收到同一篇 Threads 社交媒體貼文的多張圖片，每張圖片之前都有一行「[圖片 ID: xxx]」標記。
+請逐張詳細描述，每張的描述重點：
+1. **視覺元素**：圖片中的主要物件、人物、場景
+2. **文字內容**：圖片中的所有可見文字
+3. **色彩和風格**：整體色調、設計風格、視覺效果
+4. **情境和氛圍**：圖片傳達的情感、氛圍或主題
+5. **技術細節**：圖片品質、構圖、特殊效果等
+
+只回傳以下 JSON，不要加任何說明文字：
+{
+  "images": [
+    {
+      "id": "圖片 ID（照抄標記中的 ID）",
+      "main_content": "主要內容描述",
+      "text_content": "圖片中的文字內容",
+      "visual_elements": "視覺元素描述",
+      "style_and_mood": "風格和氛圍描述",
+      "technical_notes": "技術細節說明"
+    }
+  ]
+}
+
+每個圖片 ID 恰好一筆，不可遺漏、合併或新增 ID；各張描述彼此獨立。請用繁體中文回應。
+"""
+
+
+def image_id_marker(image_id: str) -> str:
+    return f"[圖片 ID: {image_id}]"
+
+
+def _tokens(prepared: PreparedMedia) -> int:
+    return prepared.tokens_est or _UNKNOWN_IMAGE_TOKENS
+
+
+def post_context_text(post_text: str) -> str:
+    """貼文原文作為圖片情境的提示段落（單張與批次描述共用，也是寫入 prompt 欄位的內容）"""
+    return f"貼文原文（作為圖片情境參考）：\n{post_text}"
+
+
+def batch_tokens(batch: Sequence[Tuple[str, PreparedMedia]]) -> int:
+    return sum(_tokens(prepared) for _, prepared in batch)
+
+
+def batch_has_room(batch: Sequence[Tuple[str, PreparedMedia]], prepared: PreparedMedia,
+                   max_images: int = BATCH_MAX_IMAGES,
+                   max_input_tokens: int = BATCH_MAX_INPUT_TOKENS) -> bool:
+    """目前批次能否再放入這張圖片（空批次一律可放）"""
+    if not batch:
+        return True
+    return len(batch) < max_images and batch_tokens(batch) + _tokens(prepared) <= max_input_tokens
+
+
+def plan_image_batches(entries: Sequence[Tuple[str, PreparedMedia]],
+                       max_images: int = BATCH_MAX_IMAGES,
+                       max_input_tokens: int = BATCH_MAX_INPUT_TOKENS) -> List[List[Tuple[str, PreparedMedia]]]:
+    """依輸入順序切分批次：每批不超過 max_images 張、圖片 token 合計不超過 max_input_tokens"""
+    batches: List[List[Tuple[str, PreparedMedia]]] = []
+    current: List[Tuple[str, PreparedMedia]] = []
+    for entry in entries:
+        if not batch_has_room(current, entry[1], max_images, max_input_tokens):
+            batches.append(current)
+            current = []
+        current.append(entry)
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _strip_fence(text: str) -> str:
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else text[3:]
+    if text.endswith("```"):
+        text = text[:-3]
+    return text.strip()
+
+
+def parse_batch_response(text: str, expected_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """解析批次回應 → {圖片 ID: 單張描述}；無法解析時回傳空 dict"""
+    expected = {str(image_id) for image_id in expected_ids}
+    try:
+        data = json.loads(_strip_fence(text or ""))
+    except (json.JSONDecodeError, IndexError):
+        return {}
+
+    entries = data.get("images") if isinstance(data, dict) else data
+    if not isinstance(entries, list):
+        return {}
+
+    results: Dict[str, Dict[str, Any]] = {}
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        image_id = str(entry.get("id", "")).strip()
+        if image_id not in expected or image_id in results or not entry.get("main_content"):
+            continue
+        results[image_id] = {key: value for key, value in entry.items() if key != "id"}
+    return results
@@ -8,13 +8,21 @@ import os
 import json
 import tempfile
 import time
-from typing import Dict, Any
-import google.generativeai as genai
-from google.generativeai.types import HarmCategory, HarmBlockThreshold
+from typing import Dict, Any, List, Sequence, Tuple
 import asyncio
 
+from common.lazy_import import lazy_module
 from common.llm_usage_recorder import log_usage, get_service_name
 from common.llm_manager import GeminiProvider, LLMRequest
+from .media_preprocess import PreparedMedia, get_media_budget, prepare_media
+from .batch_describe import (
+    BATCH_IMAGE_PROMPT, BATCH_OUTPUT_TOKENS_PER_IMAGE, image_id_marker, parse_batch_response,
+    post_context_text,
+)
+
+
+# 延遲到第一次建立分析器時才載入 SDK
+genai = lazy_module("google.generativeai")
 
 
 class GeminiVisionAnalyzer:
@@ -39,6 +47,7 @@ class GeminiVisionAnalyzer:
         self.max_output_tokens_video = int(os.getenv("GEMINI_MAX_OUTPUT_TOKENS_VIDEO", str(max(default_max, 3072))))
         
         # 安全設定 - 允許所有內容類型
+        HarmCategory, HarmBlockThreshold = genai.types.HarmCategory, genai.types.HarmBlockThreshold
         self.safety_settings = {
             HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
             HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
@@ -134,9 +143,11 @@ class GeminiVisionAnalyzer:
         """
         try:
             import base64
+            # 截圖需保留數字清晰度，使用 views 預算（長邊較大、品質較高）
+            prepared = await self.prepare_media(image_bytes, "image/jpeg", "views") # 假設截圖為 jpeg
             media_part = {
-                "mime_type": "image/jpeg", # 假設截圖為 jpeg
-                "data": base64.b64encode(image_bytes).decode('utf-8')
+                "mime_type": prepared.mime_type,
+                "data": base64.b64encode(prepared.data).decode('utf-8')
             }
             
             start_ts = time.time()
@@ -205,39 +216,82 @@ class GeminiVisionAnalyzer:
             raise Exception(f"Gemini Vision 提取瀏覽次數失敗: {str(e)}")
 
     
-    async def analyze_media(self, media_bytes: bytes, mime_type: str, extra_text: str = None) -> Dict[str, Any]:
+    async def prepare_media(self, media_bytes: bytes, mime_type: str, profile: str = "analyze") -> PreparedMedia:
+        """
+        依用途預算前處理媒體（縮圖 / 重新編碼 / 影片關鍵影格或裁切），見 media_preprocess
+        
+        Args:
+            media_bytes: 媒體的二進制數據
+            mime_type: MIME 類型
+            profile: 預算名稱（analyze / describe / generate / views）
+        """
+        prepared = await prepare_media(media_bytes, mime_type, get_media_budget(profile))
+        saved = prepared.savings()
+        if saved["bytes_saved"] > 0 or (saved["tokens_saved_est"] or 0) > 0:
+            print(f"🗜️ 媒體前處理[{profile}]: {saved['original_bytes']:,}→{saved['bytes']:,} bytes, "
+                  f"~{saved['original_tokens_est']}→{saved['tokens_est']} tokens ({'; '.join(saved['actions'])})")
+        return prepared
+    
+    async def analyze_media(self, media_bytes: bytes, mime_type: str, extra_text: str = None,
+                            profile: str = "analyze") -> Dict[str, Any]:
         """
         分析媒體（圖片或影片）並描述內容
         
         Args:
             media_bytes: 媒體的二進制數據
             mime_type: MIME 類型 (如 'image/jpeg', 'video/mp4')
+            profile: 媒體前處理預算（見 media_preprocess.MEDIA_BUDGETS）
             
         Returns:
             包含媒體內容描述的字典
         """
+        prepared = await self.prepare_media(media_bytes, mime_type, profile)
+        return await self.analyze_prepared(prepared, extra_text)
+    
+    async def analyze_prepared(self, prepared: PreparedMedia, extra_text: str = None) -> Dict[str, Any]:
+        """
+        分析已前處理的媒體（重試時可重複使用同一份前處理結果）
+        
+        Args:
+            prepared: prepare_media 的結果
+            extra_text: 額外文字上下文（僅圖片）
+            
+        Returns:
+            包含媒體內容描述的字典
+        """
+        media_bytes = prepared.data
+        mime_type = prepared.original_mime_type
         try:
-            # 根據 MIME 類型選擇處理方式
+            # 根據前處理結果選擇處理方式
             is_image = False
-            if mime_type.startswith('image/'):
+            if prepared.kind == "image":
                 # 圖片：使用正確的 API 語法
                 import base64
                 media_part = {
-                    "mime_type": mime_type,
+                    "mime_type": prepared.mime_type,
                     "data": base64.b64encode(media_bytes).decode('utf-8')
                 }
                 prompt = self.image_prompt
                 if extra_text:
                     # 將貼文原文作為額外上下文
-                    context_text = f"貼文原文（作為圖片情境參考）：\n{extra_text}"
+                    context_text = post_context_text(extra_text)
                     parts = [media_part, prompt, context_text]
                 else:
                     parts = [media_part, prompt]
                 is_image = True
                 
-            elif mime_type.startswith('video/'):
+            elif prepared.kind == "video_frames":
+                # 影片關鍵影格聯絡表：單張圖片 inline 送出，沿用影片提示
+                import base64
+                media_part = {
+                    "mime_type": prepared.mime_type,
+                    "data": base64.b64encode(media_bytes).decode('utf-8')
+                }
+                parts = [media_part, self.video_prompt, prepared.frames_note()]
+                
+            elif prepared.kind == "video":
                 # 影片：使用 File API
-                file_obj = await self._upload_video_get_file(media_bytes, mime_type)
+                file_obj = await self._upload_video_get_file(media_bytes, prepared.mime_type)
                 prompt = self.video_prompt
                 parts = [file_obj, prompt]
                 
@@ -402,7 +456,8 @@ class GeminiVisionAnalyzer:
                         latency_ms=latency_ms,
                         status="success",
                         service=get_service_name(),
-                        metadata={"component": "gemini_vision.analyze_media", "mime": mime_type},
+                        metadata={"component": "gemini_vision.analyze_media", "mime": mime_type,
+                                  "preprocess": prepared.savings()},
                     ))
                 except Exception:
                     pass
@@ -410,7 +465,7 @@ class GeminiVisionAnalyzer:
                 
             except json.JSONDecodeError:
                 # 如果 JSON 解析失敗或無文字，返回最小可用結構（避免整批失敗）
-                if mime_type.startswith('image/'):
+                if is_image:
                     if response_text is None:
                         return {
                             "blocked": True,
@@ -452,6 +507,77 @@ class GeminiVisionAnalyzer:
         except Exception as e:
             raise Exception(f"Gemini 視覺分析失敗: {str(e)}")
     
+    async def describe_images_batch(self, entries: Sequence[Tuple[str, PreparedMedia]],
+                                    extra_text: str = None) -> Dict[str, Dict[str, Any]]:
+        """
+        以單一多模態請求描述多張圖片（見 batch_describe）
+        
+        Args:
+            entries: (圖片 ID, 已前處理的圖片)，ID 需在批次內唯一
+            extra_text: 貼文原文（整批共用的情境）
+            
+        Returns:
+            {圖片 ID: 單張描述}；回應中缺漏或無法解析的 ID 不會出現，由呼叫方改走單張描述
+        """
+        import base64
+        parts: List[Any] = [BATCH_IMAGE_PROMPT]
+        if extra_text:
+            parts.append(post_context_text(extra_text))
+        for image_id, prepared in entries:
+            parts.append(image_id_marker(image_id))
+            parts.append({
+                "mime_type": prepared.mime_type,
+                "data": base64.b64encode(prepared.data).decode('utf-8')
+            })
+        
+        start_ts = time.time()
+        response = self.model.generate_content(
+            parts,
+            safety_settings=self.safety_settings,
+            generation_config=genai.types.GenerationConfig(
+                temperature=0.2,
+                top_p=0.9,
+                top_k=64,
+                max_output_tokens=BATCH_OUTPUT_TOKENS_PER_IMAGE * len(entries) + 256,
+            )
+        )
+        latency_ms = int((time.time() - start_ts) * 1000)
+        
+        try:
+            response_text = response.text
+        except Exception:
+            response_text = None
+        results = parse_batch_response(response_text, [image_id for image_id, _ in entries])
+        
+        try:
+            usage_md = getattr(response, 'usage_metadata', None)
+            usage = {
+                'prompt_tokens': getattr(usage_md, 'prompt_token_count', 0) if usage_md else 0,
+                'completion_tokens': getattr(usage_md, 'candidates_token_count', 0) if usage_md else 0,
+                'total_tokens': getattr(usage_md, 'total_token_count', 0) if usage_md else 0,
+            }
+            provider = GeminiProvider({})
+            cost = provider._calculate_cost(self.model_name, usage)
+            asyncio.create_task(log_usage(
+                provider="gemini",
+                model=self.model_name,
+                request_id=f"gemini_vision_{int(time.time()*1000)}",
+                prompt_tokens=usage['prompt_tokens'],
+                completion_tokens=usage['completion_tokens'],
+                total_tokens=usage['total_tokens'],
+                cost=cost,
+                latency_ms=latency_ms,
+                status="success" if len(results) == len(entries) else "partial",
+                service=get_service_name(),
+                metadata={"component": "gemini_vision.describe_images_batch",
+                          "images": len(entries), "parsed": len(results)},
+            ))
+        except Exception:
+            pass
+        
+        print(f"🖼️ 批次描述 {len(entries)} 張圖片，解析成功 {len(results)} 張（{latency_ms} ms）")
+        return results
+    
     async def _upload_video_get_file(self, media_bytes: bytes, mime_type: str):
         """
         上傳影片到 Gemini File API 並等待處理完成
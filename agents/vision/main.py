@@ -8,19 +8,21 @@ Vision Fill Agent 主程式 - Plan E 版本
 import asyncio
 import json
 import uuid
-from typing import Dict, Any, AsyncIterable
+from typing import Dict, Any, AsyncIterable, Optional
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks, UploadFile, File
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Header, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
 from sse_starlette.sse import EventSourceResponse
 
 from common.a2a import (
     A2AMessage, BaseAgent, stream_text, stream_error, 
-    MessageFormatError, TaskExecutionError
+    MessageFormatError, TaskExecutionError, a2a_event_response
 )
 from common.settings import get_settings
 from common.mcp_client import agent_startup, agent_shutdown, get_mcp_client
+from common.db_client import keep_pools_warm
+from common.warmup import ServiceWarmup, warm_db_pool
 from .vision_logic import VisionAgent
 
 
@@ -138,6 +140,15 @@ class VisionFillAgentService(BaseAgent):
 # 全域 Agent 實例
 vision_fill_agent = VisionFillAgentService()
 
+# 長駐服務：連線池以常駐設定建立（須在第一個池建立前，池都是第一次使用時才建）
+keep_pools_warm()
+
+# 暖機：DB 連線池、Gemini 模型（載入 SDK 並建立 GenerativeModel）、RustFS bucket 檢查
+warmup = ServiceWarmup("vision")
+warmup.add("db_pool", warm_db_pool)
+warmup.add("gemini_model", lambda: vision_fill_agent.vision_logic.gemini_analyzer.model_name)
+warmup.add("rustfs", lambda: vision_fill_agent.vision_logic.rustfs_client.bucket, required=False)
+
 
 async def register_to_mcp():
     """註冊到 MCP Server - 使用新的 MCP Client"""
@@ -174,6 +185,9 @@ async def lifespan(app: FastAPI):
     # 啟動時註冊到 MCP Server
     await register_to_mcp()
     
+    # 背景暖機：/health 立即可達，/ready 在必要步驟完成前回 503
+    warmup.start()
+    
     # 啟動清理任務
     cleanup_task = asyncio.create_task(periodic_cleanup())
     
@@ -181,6 +195,7 @@ async def lifespan(app: FastAPI):
     
     # 關閉時清理
     cleanup_task.cancel()
+    await warmup.stop()
     await agent_shutdown()
     print("🛑 Vision Fill Agent shutdown completed")
 
@@ -227,6 +242,12 @@ async def health_check():
     }
 
 
+@app.get("/ready")
+async def readiness_check():
+    """就緒探針：暖機（連線池、Gemini 模型）完成前回 503"""
+    return warmup.ready_response()
+
+
 @app.get("/agent-card")
 async def get_agent_card():
     """獲取 Agent Card"""
@@ -234,27 +255,14 @@ async def get_agent_card():
 
 
 @app.post("/a2a/message")
-async def handle_a2a_message(message_data: Dict[str, Any]):
+async def handle_a2a_message(message_data: Dict[str, Any], accept: Optional[str] = Header(default=None)):
     """處理 A2A 訊息"""
     try:
         # 解析 A2A 訊息
         message = A2AMessage.from_dict(message_data)
         
-        # 創建流式回應
-        async def event_stream():
-            try:
-                async for result in vision_fill_agent.handle_message(message):
-                    yield {
-                        "event": "data",
-                        "data": json.dumps(result)
-                    }
-            except Exception as e:
-                yield {
-                    "event": "error", 
-                    "data": json.dumps({"error": str(e)})
-                }
-        
-        return EventSourceResponse(event_stream())
+        # 創建流式回應（SSE 或 msgpack 分框，依 Accept 協商）
+        return a2a_event_response(vision_fill_agent.handle_message(message), accept)
         
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"處理訊息失敗: {str(e)}")
@@ -465,6 +473,7 @@ async def root():
         "mcp_integrated": True,
         "endpoints": {
             "health": "/health",
+            "ready": "/ready",
             "agent_card": "/agent-card",
             "a2a_message": "/a2a/message",
             "fill_missing": "/fill-missing",
@@ -1,4 +1,4 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import asyncio
 import json
 import time
@@ -6,7 +6,11 @@ import time
 from common.db_client import get_db_client
 from services.rustfs_client import get_rustfs_client
 from agents.vision.gemini_vision import GeminiVisionAnalyzer
-from common.image_primary_filter import compute_rule_score, decide_is_primary
+from agents.vision.media_preprocess import PreparedMedia
+from agents.vision.batch_describe import (
+    BATCH_DESCRIBE_ENABLED, BATCH_IMAGE_PROMPT, batch_has_room, post_context_text
+)
+from common.image_primary_filter import classify_primary_batch, persist_primary_flags
 
 
 class MediaDescribeService:
@@ -15,13 +19,12 @@ class MediaDescribeService:
     def __init__(self):
         self.analyzer = GeminiVisionAnalyzer()
         
-    async def _analyze_media_with_retry(self, media_bytes: bytes, mime_type: str, extra_text: str = None, max_retries: int = 3) -> Dict[str, Any]:
+    async def _analyze_media_with_retry(self, prepared: PreparedMedia, extra_text: str = None, max_retries: int = 3) -> Dict[str, Any]:
         """
         帶重試機制的 Gemini API 調用
         
         Args:
-            media_bytes: 媒體二進制資料
-            mime_type: MIME 類型
+            prepared: 已前處理的媒體（重試時不重複縮圖/取影格）
             extra_text: 額外文字上下文
             max_retries: 最大重試次數
             
@@ -32,7 +35,7 @@ class MediaDescribeService:
         
         for attempt in range(max_retries + 1):
             try:
-                result = await self.analyzer.analyze_media(media_bytes, mime_type, extra_text)
+                result = await self.analyzer.analyze_prepared(prepared, extra_text)
                 return result
                 
             except Exception as e:
@@ -130,7 +133,8 @@ class MediaDescribeService:
                 "reposts": "COALESCE(reposts_count, 0)",
             }
             sort_expr = sort_expr_map.get(sort_by) if sort_by and sort_by != "none" else None
-            order_clause = f"ORDER BY {sort_expr} DESC NULLS LAST" if sort_expr else "ORDER BY COALESCE(created_at, fetched_at, NOW()) DESC"
+            # COALESCE 後不會有 NULL；不加 NULLS LAST，排序才與 idx_playwright_user_views/likes 一致
+            order_clause = f"ORDER BY {sort_expr} DESC" if sort_expr else "ORDER BY COALESCE(created_at, fetched_at, NOW()) DESC"
             with_parts.append(
                 f"""
                 top_posts AS (
@@ -168,15 +172,16 @@ class MediaDescribeService:
         )
         SELECT mf.id AS media_id, mf.post_url, mf.original_url, mf.media_type, mf.rustfs_url,
                mf.width, mf.height, mf.file_size,
-               COALESCE((mf.metadata->>'primary_score')::float, NULL) AS primary_score,
-               COALESCE((mf.metadata->>'is_primary')::bool, NULL) AS is_primary
+               mf.primary_score, mf.is_primary
         FROM completed mf
         JOIN base b ON b.url = mf.post_url
         WHERE mf.media_type = ANY($2)
+          AND (NOT $3 OR mf.media_type <> 'image' OR mf.is_primary IS DISTINCT FROM FALSE)
         """
 
         mt_array = media_types
-        rows = await db.fetch_all(query, username, mt_array)
+        # only_primary 時下載階段已標為非主圖的圖片直接在 SQL 排除
+        rows = await db.fetch_all(query, username, mt_array, bool(only_primary))
 
         if only_undesc and rows:
             # 直接過濾掉已存在描述的 media_id（用 IN 子查詢避免佔位）
@@ -187,29 +192,18 @@ class MediaDescribeService:
 
         # 規則篩選（第一段）：若 only_primary（僅對圖片生效，影片不過濾）
         if only_primary and rows:
-            # 對缺少標記的項目進行規則打分，並即時寫回 metadata（僅 image）
+            # 下載前的舊資料缺少標記：整批規則打分並一次寫回（僅 image）
+            unclassified = [r for r in rows if r.get("is_primary") is None and r.get("media_type") == 'image']
             to_update = []
-            for r in rows:
-                if r.get("is_primary") is None and r.get("media_type") == 'image':
-                    score, reason = compute_rule_score(r)
-                    r["primary_score"] = score
-                    r["primary_reason"] = reason
-                    r["is_primary"] = decide_is_primary(score, primary_threshold)
-                    to_update.append((r["media_id"], score, r["is_primary"], reason))
+            for r, (score, reason, is_primary) in zip(unclassified, classify_primary_batch(unclassified, primary_threshold)):
+                r["primary_score"] = score
+                r["primary_reason"] = reason
+                r["is_primary"] = is_primary
+                to_update.append((r["media_id"], score, reason, is_primary))
 
             if to_update:
                 async with (await get_db_client()).get_connection() as conn:
-                    for media_id, score, is_primary, reason in to_update:
-                        # 合併寫入 metadata 欄位
-                        await conn.execute(
-                            """
-                            UPDATE media_files
-                            SET metadata = COALESCE(metadata, '{}'::jsonb) ||
-                                           jsonb_build_object('primary_score', $2::text, 'is_primary', $3::text, 'primary_reason', $4::text)
-                            WHERE id = $1
-                            """,
-                            media_id, str(score), 'true' if is_primary else 'false', reason
-                        )
+                    await persist_primary_flags(conn, to_update)
 
             # 最終按照標記/分數過濾：影片直接保留；圖片才依門檻
             filtered = []
@@ -233,18 +227,184 @@ class MediaDescribeService:
 
         return rows
 
-    async def run_describe(self, items: List[Dict[str, Any]], overwrite: bool = True, attach_post_text: bool = True) -> Dict[str, Any]:
-        """執行媒體描述，寫入 media_descriptions。"""
+    async def _download_media(self, client, rustfs_url: str) -> Tuple[bytes, str]:
+        """從 RustFS 讀取媒體（僅 RustFS，不再回退原始 URL）；回傳 (bytes, content-type)"""
+        import httpx
+        from urllib.parse import urlparse
+
+        # 寬鬆解析：不依賴 host，直接從 "/{bucket}/" 後截取 key
+        parsed = urlparse(rustfs_url)
+        key = None
+        # 方式1：從 path 抽取
+        path_part = (parsed.path or "").lstrip('/')
+        bucket_prefix = f"{client.bucket_name}/"
+        if path_part.startswith(bucket_prefix):
+            key = path_part[len(bucket_prefix):]
+        # 方式2：從完整字串分割
+        if not key and f"/{client.bucket_name}/" in rustfs_url:
+            key = rustfs_url.split(f"/{client.bucket_name}/", 1)[1]
+        # 產生可用 URL（優先 presigned）
+        if key:
+            presigned = client.get_public_or_presigned_url(key, prefer_presigned=True)
+        else:
+            presigned = rustfs_url
+        async with httpx.AsyncClient(timeout=60.0) as http:
+            resp = await http.get(presigned, follow_redirects=True)
+            resp.raise_for_status()
+            return resp.content, resp.headers.get("content-type", "")
+
+    async def _post_extra_text(self, conn, post_url: str, post_text_cache: Dict[str, str]) -> str:
+        """圖片描述附帶的主貼文內文（同一貼文只查一次；標題由 post_context_text 統一加上）"""
+        if post_url not in post_text_cache:
+            row = await conn.fetchrow("SELECT content FROM playwright_post_metrics WHERE url = $1", post_url)
+            post_text_cache[post_url] = (row["content"] if row and row["content"] else "")
+        return post_text_cache[post_url]
+
+    async def _finish_describe(self, conn, media_id: int, media_type: str, prompt_text: str,
+                               result: Any, overwrite: bool) -> None:
+        """規整描述結果並寫入 media_descriptions"""
+        # 規整輸出為 JSON（允許模型回傳文字時包裝）
+        if not isinstance(result, (dict, list)):
+            try:
+                result = json.loads(str(result))
+            except Exception:
+                result = {"raw": str(result)}
+
+        # 原子性覆蓋或新增（使用 transaction + advisory lock 防止並發重複）
+        async with conn.transaction():
+            # 每個 media_id 拿一把交易級別鎖，序列化同一資源的並發寫入
+            # 明確轉換為 bigint 避免類型推斷衝突
+            await conn.execute("SELECT pg_advisory_xact_lock($1::bigint)", int(media_id))
+
+            if overwrite:
+                # 覆蓋模式：先刪除，再插入
+                await conn.execute(
+                    """
+                    DELETE FROM media_descriptions WHERE media_id = $1
+                    """,
+                    int(media_id)
+                )
+                await conn.execute(
+                    """
+                    INSERT INTO media_descriptions
+                    (media_id, post_url, username, media_type, model, prompt, response_json, language, status, created_at)
+                    SELECT $1, mf.post_url, pwm.username, $2, $3, $4, $5, 'zh-TW', 'completed', NOW()
+                    FROM media_files mf
+                    JOIN playwright_post_metrics pwm ON pwm.url = mf.post_url
+                    WHERE mf.id = $1
+                    """,
+                    int(media_id), media_type, "gemini-2.5-pro", prompt_text, json.dumps(result, ensure_ascii=False)
+                )
+            else:
+                # 非覆蓋：僅在不存在時插入
+                await conn.execute(
+                    """
+                    INSERT INTO media_descriptions
+                    (media_id, post_url, username, media_type, model, prompt, response_json, language, status, created_at)
+                    SELECT $1, mf.post_url, pwm.username, $2, $3, $4, $5, 'zh-TW', 'completed', NOW()
+                    FROM media_files mf
+                    JOIN playwright_post_metrics pwm ON pwm.url = mf.post_url
+                    WHERE mf.id = $1
+                      AND NOT EXISTS (SELECT 1 FROM media_descriptions d WHERE d.media_id = $1)
+                    """,
+                    int(media_id), media_type, "gemini-2.5-pro", prompt_text, json.dumps(result, ensure_ascii=False)
+                )
+
+
+    async def _describe_image_batches(self, conn, client, items: List[Dict[str, Any]], overwrite: bool,
+                                      attach_post_text: bool, post_text_cache: Dict[str, str],
+                                      prepared_cache: Dict[int, PreparedMedia]) -> Dict[int, Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """
+        同一貼文的多張圖片以批次請求描述（見 batch_describe）
+
+        圖片邊下載邊組批，湊滿一批就送出，同一時間只持有一批圖片的前處理結果。
+        回傳 {media_id: (描述, 節省量)}；批次失敗或回應中缺漏的圖片不在結果內，
+        其已下載/前處理的媒體留在 prepared_cache，由逐張流程沿用，不重複下載。
+        """
+        candidates = [
+            item for item in items
+            if item.get("media_type") == 'image' and item.get("is_primary") is not False and item.get("rustfs_url")
+        ]
+        if candidates and not overwrite:
+            described = {
+                row["media_id"] for row in await conn.fetch(
+                    "SELECT media_id FROM media_descriptions WHERE media_id = ANY($1)",
+                    [int(item["media_id"]) for item in candidates]
+                )
+            }
+            candidates = [item for item in candidates if int(item["media_id"]) not in described]
+
+        by_post: Dict[str, List[Dict[str, Any]]] = {}
+        for item in candidates:
+            by_post.setdefault(item["post_url"], []).append(item)
+
+        batched: Dict[Any, Tuple[Dict[str, Any], Dict[str, Any]]] = {}
+
+        async def flush(batch: List[Tuple[str, PreparedMedia]], media_ids: Dict[str, Any], extra_text: str) -> None:
+            results: Dict[str, Dict[str, Any]] = {}
+            if len(batch) >= 2:
+                try:
+                    results = await self.analyzer.describe_images_batch(batch, extra_text=extra_text)
+                except Exception as e:
+                    print(f"⚠️ 批次描述失敗，改為逐張描述: {e}")
+            for image_id, prepared in batch:
+                if image_id in results:
+                    # 已完成描述的圖片只保留節省量，位元組隨批次釋放
+                    batched[media_ids[image_id]] = (results[image_id], prepared.savings())
+                else:
+                    prepared_cache[media_ids[image_id]] = prepared
+
+        for post_url, post_items in by_post.items():
+            if len(post_items) < 2:
+                continue
+
+            extra_text = await self._post_extra_text(conn, post_url, post_text_cache) if attach_post_text else ""
+            media_ids = {f"m{item['media_id']}": item["media_id"] for item in post_items}
+            batch: List[Tuple[str, PreparedMedia]] = []
+            for item in post_items:
+                try:
+                    media_bytes, mime = await self._download_media(client, item["rustfs_url"])
+                except Exception:
+                    continue  # 逐張流程會再嘗試並記錄原因
+                prepared = await self.analyzer.prepare_media(media_bytes, mime or 'image/jpeg', profile="describe")
+                if not batch_has_room(batch, prepared):
+                    await flush(batch, media_ids, extra_text)
+                    batch = []
+                batch.append((f"m{item['media_id']}", prepared))
+            await flush(batch, media_ids, extra_text)
+
+        return batched
+
+    async def run_describe(self, items: List[Dict[str, Any]], overwrite: bool = True, attach_post_text: bool = True,
+                           batch_images: Optional[bool] = None) -> Dict[str, Any]:
+        """
+        執行媒體描述，寫入 media_descriptions。
+
+        batch_images（預設依 VISION_BATCH_DESCRIBE）：同一貼文的多張圖片先以批次請求描述，
+        批次解析失敗或缺漏的圖片再逐張描述。
+        """
+        if batch_images is None:
+            batch_images = BATCH_DESCRIBE_ENABLED
         db = await get_db_client()
         client = await get_rustfs_client()  # 若需要從 RustFS 讀回檔案可擴充
 
         success, failed = 0, 0
+        bytes_saved, tokens_saved = 0, 0
         details: List[Dict[str, Any]] = []
 
         # 預讀 post 內容（圖片描述要附主貼文內文）
         post_text_cache: Dict[str, str] = {}
 
+        # 批次階段已下載並前處理、但未在批次中完成描述的媒體（media_id → PreparedMedia）
+        prepared_cache: Dict[int, PreparedMedia] = {}
+
         async with db.get_connection() as conn:
+            batched: Dict[int, Tuple[Dict[str, Any], Dict[str, Any]]] = {}
+            if batch_images:
+                batched = await self._describe_image_batches(
+                    conn, client, items, overwrite, attach_post_text, post_text_cache, prepared_cache
+                )
+
             for item in items:
                 media_id = item["media_id"]
                 post_url = item["post_url"]
@@ -265,117 +425,65 @@ class MediaDescribeService:
                             details.append({"media_id": media_id, "status": "skipped", "reason": "not_primary"})
                             continue
 
-                    # 1. 下載媒體（僅 RustFS，不再回退原始 URL）
-                    import httpx
-                    media_bytes = None
-                    mime = ""
+                    # 2. 準備提示（圖片附主貼文內文）
+                    extra_text = ""
+                    if attach_post_text and media_type == 'image':
+                        extra_text = await self._post_extra_text(conn, post_url, post_text_cache)
+
+                    # 3. 已在批次請求中完成描述者直接寫入
+                    if media_id in batched:
+                        result, media_saved = batched[media_id]
+                        prompt_text = BATCH_IMAGE_PROMPT + ("\n\n" + post_context_text(extra_text) if extra_text else "")
+                        await self._finish_describe(conn, media_id, media_type, prompt_text, result, overwrite)
+                        success += 1
+                        bytes_saved += media_saved["bytes_saved"]
+                        tokens_saved += media_saved["tokens_saved_est"] or 0
+                        details.append({"media_id": media_id, "status": "completed", "batched": True,
+                                        "media_saved": media_saved})
+                        continue
 
-                    rustfs_url = item.get("rustfs_url")
-                    if rustfs_url:
+                    # 4. 下載媒體（僅 RustFS，不再回退原始 URL）；批次階段已下載並前處理的直接沿用
+                    prepared = prepared_cache.pop(media_id, None)
+                    if prepared is None:
+                        if not item.get("rustfs_url"):
+                            # 沒有 rustfs_url（理論上不會出現，因為上面已過濾），保險起見也跳過
+                            details.append({"media_id": media_id, "status": "skipped", "error": "no_rustfs_url"})
+                            continue
                         try:
-                            # 寬鬆解析：不依賴 host，直接從 "/{bucket}/" 後截取 key
-                            from urllib.parse import urlparse
-                            parsed = urlparse(rustfs_url)
-                            key = None
-                            # 方式1：從 path 抽取
-                            path_part = (parsed.path or "").lstrip('/')
-                            bucket_prefix = f"{client.bucket_name}/"
-                            if path_part.startswith(bucket_prefix):
-                                key = path_part[len(bucket_prefix):]
-                            # 方式2：從完整字串分割
-                            if not key and f"/{client.bucket_name}/" in rustfs_url:
-                                key = rustfs_url.split(f"/{client.bucket_name}/", 1)[1]
-                            # 產生可用 URL（優先 presigned）
-                            if key:
-                                presigned = client.get_public_or_presigned_url(key, prefer_presigned=True)
-                            else:
-                                presigned = rustfs_url
-                            async with httpx.AsyncClient(timeout=60.0) as http:
-                                resp = await http.get(presigned, follow_redirects=True)
-                                resp.raise_for_status()
-                                media_bytes = resp.content
-                                mime = resp.headers.get("content-type", "") or mime
+                            media_bytes, mime = await self._download_media(client, item["rustfs_url"])
                         except Exception as e:
                             # 無法從 RustFS 讀取 → 跳過
                             details.append({"media_id": media_id, "status": "skipped", "error": f"rustfs_unavailable: {str(e)}"})
                             continue
-                    else:
-                        # 沒有 rustfs_url（理論上不會出現，因為上面已過濾），保險起見也跳過
-                        details.append({"media_id": media_id, "status": "skipped", "error": "no_rustfs_url"})
-                        continue
 
-                    # 2. 準備提示（圖片附主貼文內文）
-                    extra_text = ""
-                    if attach_post_text and media_type == 'image':
-                        if post_url not in post_text_cache:
-                            row = await conn.fetchrow("SELECT content FROM playwright_post_metrics WHERE url = $1", post_url)
-                            post_text_cache[post_url] = (row["content"] if row and row["content"] else "")
-                        if post_text_cache[post_url]:
-                            extra_text = f"貼文內文：\n{post_text_cache[post_url]}"
-
-                    # 3. 呼叫 Gemini (帶重試機制)
+                        # 5. 媒體前處理（縮圖/重新編碼、影片裁切或關鍵影格），再呼叫 Gemini (帶重試機制)
+                        default_mime = 'image/jpeg' if media_type == 'image' else 'video/mp4'
+                        prepared = await self.analyzer.prepare_media(media_bytes, mime or default_mime, profile="describe")
+                    media_saved = prepared.savings()
                     if media_type == 'image':
                         # 將貼文原文作為 extra_text 提供給模型，改善情境判讀
-                        result = await self._analyze_media_with_retry(media_bytes, mime or 'image/jpeg', extra_text=extra_text)
-                        prompt_text = self.analyzer.image_prompt + ("\n\n" + (f"貼文原文：\n{extra_text}" if extra_text else ""))
+                        result = await self._analyze_media_with_retry(prepared, extra_text=extra_text)
+                        prompt_text = self.analyzer.image_prompt + ("\n\n" + post_context_text(extra_text) if extra_text else "")
                     else:
-                        result = await self._analyze_media_with_retry(media_bytes, mime or 'video/mp4')
+                        result = await self._analyze_media_with_retry(prepared)
                         prompt_text = self.analyzer.video_prompt
+                        if prepared.kind == "video_frames":
+                            prompt_text += "\n\n" + prepared.frames_note()
 
-                    # 4. 規整輸出為 JSON（允許模型回傳文字時包裝）
-                    if not isinstance(result, (dict, list)):
-                        try:
-                            result = json.loads(str(result))
-                        except Exception:
-                            result = {"raw": str(result)}
-
-                    # 5. 原子性覆蓋或新增（使用 transaction + advisory lock 防止並發重複）
-                    async with conn.transaction():
-                        # 每個 media_id 拿一把交易級別鎖，序列化同一資源的並發寫入
-                        # 明確轉換為 bigint 避免類型推斷衝突
-                        await conn.execute("SELECT pg_advisory_xact_lock($1::bigint)", int(media_id))
-
-                        if overwrite:
-                            # 覆蓋模式：先刪除，再插入
-                            await conn.execute(
-                                """
-                                DELETE FROM media_descriptions WHERE media_id = $1
-                                """,
-                                int(media_id)
-                            )
-                            await conn.execute(
-                                """
-                                INSERT INTO media_descriptions
-                                (media_id, post_url, username, media_type, model, prompt, response_json, language, status, created_at)
-                                SELECT $1, mf.post_url, pwm.username, $2, $3, $4, $5, 'zh-TW', 'completed', NOW()
-                                FROM media_files mf
-                                JOIN playwright_post_metrics pwm ON pwm.url = mf.post_url
-                                WHERE mf.id = $1
-                                """,
-                                int(media_id), media_type, "gemini-2.5-pro", prompt_text, json.dumps(result, ensure_ascii=False)
-                            )
-                        else:
-                            # 非覆蓋：僅在不存在時插入
-                            await conn.execute(
-                                """
-                                INSERT INTO media_descriptions
-                                (media_id, post_url, username, media_type, model, prompt, response_json, language, status, created_at)
-                                SELECT $1, mf.post_url, pwm.username, $2, $3, $4, $5, 'zh-TW', 'completed', NOW()
-                                FROM media_files mf
-                                JOIN playwright_post_metrics pwm ON pwm.url = mf.post_url
-                                WHERE mf.id = $1
-                                  AND NOT EXISTS (SELECT 1 FROM media_descriptions d WHERE d.media_id = $1)
-                                """,
-                                int(media_id), media_type, "gemini-2.5-pro", prompt_text, json.dumps(result, ensure_ascii=False)
-                            )
+                    await self._finish_describe(conn, media_id, media_type, prompt_text, result, overwrite)
 
                     success += 1
-                    details.append({"media_id": media_id, "status": "completed"})
+                    bytes_saved += media_saved["bytes_saved"]
+                    tokens_saved += media_saved["tokens_saved_est"] or 0
+                    details.append({"media_id": media_id, "status": "completed", "media_saved": media_saved})
                 except Exception as e:
                     failed += 1
                     details.append({"media_id": media_id, "status": "failed", "error": str(e)})
 
-        return {"total": len(items), "success": success, "failed": failed, "details": details}
+        return {
+            "total": len(items), "success": success, "failed": failed, "details": details,
+            "bytes_saved": bytes_saved, "tokens_saved_est": tokens_saved,
+        }
 
 
     async def get_undesc_summary_by_user(self, username: str, media_types: List[str], limit: int = 20) -> List[Dict[str, Any]]:
@@ -476,8 +584,7 @@ class MediaDescribeService:
                 """
                 SELECT id AS media_id, post_url, original_url, media_type, rustfs_url,
                        width, height, file_size,
-                       COALESCE((metadata->>'primary_score')::float, NULL) AS primary_score,
-                       COALESCE((metadata->>'is_primary')::bool, NULL) AS is_primary
+                       primary_score, is_primary
                 FROM media_files
                 WHERE post_url = $1 AND media_type = ANY($2)
                 """,
@@ -501,8 +608,7 @@ class MediaDescribeService:
                     """
                     SELECT id AS media_id, post_url, original_url, media_type, rustfs_url,
                            width, height, file_size,
-                           COALESCE((metadata->>'primary_score')::float, NULL) AS primary_score,
-                           COALESCE((metadata->>'is_primary')::bool, NULL) AS is_primary
+                           primary_score, is_primary
                     FROM media_files
                     WHERE media_type = ANY($1)
                       AND (post_url ILIKE '%'||$2||'%' OR original_url ILIKE '%'||$2||'%')
@@ -14,6 +14,9 @@ if sys.platform == "win32":
         pass
 
 from common.db_client import DatabaseClient, get_db_client
+from common.metrics_history import safe_record_snapshots
+from common.post_id_index import post_id_index
+from common.query_registry import register_query
 from services.rustfs_client import get_rustfs_client
 from datetime import datetime
 import json
@@ -30,15 +33,15 @@ except Exception:
     _PLAYWRIGHT_AVAILABLE = False
 
 
-class MediaDownloadService:
-    """提供媒體下載所需的統計、清單與執行能力（基於 Playwright 資料）。"""
+# 排序方式 → playwright_post_metrics 欄位（build_download_plan 的 Top-N）
+_PLAN_SORT_COLUMNS = {
+    "views": "views_count",
+    "likes": "likes_count",
+    "comments": "comments_count",
+    "reposts": "reposts_count",
+}
 
-    async def get_account_media_stats(self, limit: int = 50) -> List[Dict[str, Any]]:
-        """彙總各帳號圖片/影片總數、已配對、已完成、待下載數。"""
-        db = DatabaseClient()
-        await db.init_pool()
-        try:
-            query = f"""
+register_query("media.account_stats", """
         WITH pv AS (
             SELECT username,
                    url AS post_url,
@@ -77,11 +80,74 @@ class MediaDownloadService:
         FROM agg a
         JOIN paired p USING(username)
         ORDER BY (GREATEST(a.total_images - COALESCE(p.completed_images,0),0) + GREATEST(a.total_videos - COALESCE(p.completed_videos,0),0)) DESC
-        LIMIT {limit}
-        """
-            return await db.fetch_all(query)
-        finally:
-            await db.close_pool()
+        LIMIT $1
+""")
+
+# 下載計畫的三種變體（全部、Top-N、僅重試失敗）都以同一規則比對用戶：
+# replace(lower(username),'@','')，與描述計畫、分析器一致（走 idx_playwright_username_norm 等表達式索引）
+_PLAN_USER_MATCH = "replace(lower({col}),'@','') = replace(lower($1),'@','')"
+
+register_query("media.failed_by_user", """
+SELECT mf.post_url AS post_url, mf.original_url AS media_url, mf.media_type
+FROM media_files mf
+JOIN playwright_post_metrics ppm ON ppm.url = mf.post_url
+WHERE """ + _PLAN_USER_MATCH.format(col="ppm.username") + """ AND mf.download_status = 'failed'
+ORDER BY mf.id ASC
+""")
+
+register_query("media.status_by_urls", """
+SELECT original_url, download_status
+FROM media_files
+WHERE original_url = ANY($1::text[])
+""")
+
+# 展開貼文的圖片/影片 URL；媒體類型以陣列參數過濾，base 由呼叫端決定貼文集合
+_PLAN_MEDIA_SQL = """
+pv AS (
+    SELECT username, url AS post_url,
+           jsonb_array_elements_text(COALESCE(images::jsonb,'[]'::jsonb)) AS media_url,
+           'image' AS media_type
+    FROM base
+    UNION ALL
+    SELECT username, url AS post_url,
+           jsonb_array_elements_text(COALESCE(videos::jsonb,'[]'::jsonb)) AS media_url,
+           'video' AS media_type
+    FROM base
+)
+SELECT post_url, media_url, media_type
+FROM pv
+WHERE media_type = ANY($2::text[])
+"""
+
+register_query("media.plan_by_user", """
+WITH base AS (
+    SELECT url, username, images, videos FROM playwright_post_metrics
+    WHERE """ + _PLAN_USER_MATCH.format(col="username") + """
+),""" + _PLAN_MEDIA_SQL)
+
+# 每個排序欄位一條固定 SQL 文字（Top-N 以 $3 參數化）；
+# 用戶與排序表達式與 idx_playwright_user_views / idx_playwright_user_likes 一致
+for _sort_col in sorted(set(_PLAN_SORT_COLUMNS.values())):
+    register_query(f"media.plan_top_posts.{_sort_col}", f"""
+WITH top_posts AS (
+    SELECT url
+    FROM playwright_post_metrics
+    WHERE {_PLAN_USER_MATCH.format(col="username")}
+    ORDER BY COALESCE({_sort_col}, 0) DESC
+    LIMIT $3
+),
+base AS (
+    SELECT url, username, images, videos FROM playwright_post_metrics WHERE url IN (SELECT url FROM top_posts)
+),""" + _PLAN_MEDIA_SQL)
+
+
+class MediaDownloadService:
+    """提供媒體下載所需的統計、清單與執行能力（基於 Playwright 資料）。"""
+
+    async def get_account_media_stats(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """彙總各帳號圖片/影片總數、已配對、已完成、待下載數。"""
+        db = await get_db_client()
+        return await db.fetch_named("media.account_stats", limit)
 
     async def build_download_plan(
         self,
@@ -94,137 +160,62 @@ class MediaDownloadService:
         retry_failed_only: bool = False,
     ) -> Dict[str, List[str]]:
         """建立下載計畫：回傳 {post_url: [media_url,...]} 的映射。"""
-        db = DatabaseClient()
-        await db.init_pool()
+        # 共用連線池：具名查詢的 prepared statement 留在連線上，下次呼叫不必重新規劃
+        db = await get_db_client()
 
-        type_filters = []
-        if "image" in media_types:
-            type_filters.append("'image'")
-        if "video" in media_types:
-            type_filters.append("'video'")
+        type_filters = [t for t in ("image", "video") if t in media_types]
         if not type_filters:
             return {}
-        type_sql = ",".join(type_filters)
 
         # 僅重試失敗：改由 media_files 取清單
         if retry_failed_only:
-            try:
-                type_filters = set(media_types)
-                rows = await db.fetch_all(
-                    """
-                    SELECT mf.post_url AS post_url, mf.original_url AS media_url, mf.media_type
-                    FROM media_files mf
-                    JOIN playwright_post_metrics ppm ON ppm.url = mf.post_url
-                    WHERE ppm.username = $1 AND mf.download_status = 'failed'
-                    ORDER BY mf.id ASC
-                    """,
-                    username,
-                )
-
-                plan: Dict[str, List[str]] = {}
-                seen: set = set()
-                for r in rows:
-                    media_url = r["media_url"]
-                    mtype = r.get("media_type") or "image"
-                    if type_filters and mtype not in type_filters:
-                        continue
-                    if media_url in seen:
-                        continue
-                    seen.add(media_url)
-                    plan.setdefault(r["post_url"], []).append(media_url)
-                return plan
-            finally:
-                await db.close_pool()
-
-        # 先鎖定貼文集合（排序 Top-N）
-        top_posts_cte = ""
-        using_top_posts = False
-        if sort_by and sort_by != "none" and top_k and isinstance(top_k, int):
-            sort_col = {
-                "views": "views_count",
-                "likes": "likes_count",
-                "comments": "comments_count",
-                "reposts": "reposts_count",
-            }.get(sort_by, None)
-            if sort_col:
-                top_posts_cte = (
-                    "top_posts AS (\n"
-                    "    SELECT url\n"
-                    "    FROM playwright_post_metrics\n"
-                    "    WHERE username = $1\n"
-                    f"    ORDER BY {sort_col} DESC NULLS LAST\n"
-                    f"    LIMIT {top_k}\n"
-                    ")\n"
-                )
-                using_top_posts = True
-        
-        # 展開媒體 URL（修正 WITH 順序，先定義 top_posts 再引用）
-        where_clause = 'WHERE url IN (SELECT url FROM top_posts)' if using_top_posts else 'WHERE username = $1'
-        # 若使用 top_posts，需在下一個 CTE 之前加逗號
-        with_prefix = f"WITH {top_posts_cte},\n" if using_top_posts else "WITH "
-        pv_cte = (
-            f"{with_prefix}"
-            "base AS (\n"
-            f"    SELECT url, username, images, videos FROM playwright_post_metrics {where_clause}\n"
-            "),\n"
-            "pv AS (\n"
-            "    SELECT username, url AS post_url,\n"
-            "           jsonb_array_elements_text(COALESCE(images::jsonb,'[]'::jsonb)) AS media_url,\n"
-            "           'image' AS media_type\n"
-            "    FROM base\n"
-            "    UNION ALL\n"
-            "    SELECT username, url AS post_url,\n"
-            "           jsonb_array_elements_text(COALESCE(videos::jsonb,'[]'::jsonb)) AS media_url,\n"
-            "           'video' AS media_type\n"
-            "    FROM base\n"
-            ")\n"
-            "SELECT post_url, media_url, media_type\n"
-            "FROM pv\n"
-            f"WHERE media_type IN ({type_sql})\n"
-        )
-        pv_cte = "".join(pv_cte)
-
-        try:
-            rows = await db.fetch_all(pv_cte, username)
-
-            # 過濾條件：已完成 / 未配對
-            if skip_completed or only_unpaired:
-                # 取 media_files 對應狀態
-                url_set = [r["media_url"] for r in rows]
-                if url_set:
-                    placeholders = ",".join([f"${i+1}" for i in range(len(url_set))])
-                    mf_rows = await db.fetch_all(
-                        f"""
-                        SELECT original_url, download_status
-                        FROM media_files
-                        WHERE original_url IN ({placeholders})
-                        """,
-                        *url_set
-                    )
-                    status_map = {m["original_url"]: m.get("download_status") for m in mf_rows}
-                else:
-                    status_map = {}
-            else:
-                status_map = {}
+            rows = await db.fetch_named("media.failed_by_user", username)
 
             plan: Dict[str, List[str]] = {}
             seen: set = set()
             for r in rows:
                 media_url = r["media_url"]
+                mtype = r.get("media_type") or "image"
+                if mtype not in type_filters:
+                    continue
                 if media_url in seen:
                     continue
                 seen.add(media_url)
-
-                if skip_completed and status_map.get(media_url) == "completed":
-                    continue
-                if only_unpaired and media_url in status_map:
-                    continue
-
-                post_url = r["post_url"]
-                plan.setdefault(post_url, []).append(media_url)
+                plan.setdefault(r["post_url"], []).append(media_url)
             return plan
-        finally:
-            await db.close_pool()
+
+        # 先鎖定貼文集合（排序 Top-N），否則取該帳號全部貼文
+        sort_col = _PLAN_SORT_COLUMNS.get(sort_by) if sort_by and sort_by != "none" else None
+        if sort_col and top_k and isinstance(top_k, int):
+            rows = await db.fetch_named(f"media.plan_top_posts.{sort_col}", username, type_filters, top_k)
+        else:
+            rows = await db.fetch_named("media.plan_by_user", username, type_filters)
+
+        # 過濾條件：已完成 / 未配對
+        status_map: Dict[str, Any] = {}
+        if skip_completed or only_unpaired:
+            # 取 media_files 對應狀態（陣列參數，走 idx_media_files_original_url_status）
+            url_set = [r["media_url"] for r in rows]
+            if url_set:
+                mf_rows = await db.fetch_named("media.status_by_urls", url_set)
+                status_map = {m["original_url"]: m.get("download_status") for m in mf_rows}
+
+        plan: Dict[str, List[str]] = {}
+        seen: set = set()
+        for r in rows:
+            media_url = r["media_url"]
+            if media_url in seen:
+                continue
+            seen.add(media_url)
+
+            if skip_completed and status_map.get(media_url) == "completed":
+                continue
+            if only_unpaired and media_url in status_map:
+                continue
+
+            post_url = r["post_url"]
+            plan.setdefault(post_url, []).append(media_url)
+        return plan
 
     async def run_download(self, plan: Dict[str, List[str]], concurrency_per_post: int = 3) -> Dict[str, Any]:
         """執行下載計畫，逐貼文批次下載到 RustFS。"""
@@ -418,6 +409,20 @@ class MediaDownloadService:
                 views_count, likes_count, comments_count, reposts_count, shares_count,
                 calculated_score, post_published_at, tags_json, images_json, videos_json,
             )
+
+            # 同步增量爬取用的 post_id 索引，避免刷新寫入的貼文被當成新貼文重爬
+            await post_id_index.add(username, [post_id])
+
+            # 刷新即一次新的觀測：追加指標歷史快照
+            await db.run_with_retry(lambda conn: safe_record_snapshots(conn, "playwright", [{
+                "url": url,
+                "username": username,
+                "views_count": views_count,
+                "likes_count": likes_count,
+                "comments_count": comments_count,
+                "reposts_count": reposts_count,
+                "shares_count": shares_count,
+            }]))
         finally:
             await db.close_pool()
 
@@ -0,0 +1,310 @@
+"""
+媒體前處理（送 Gemini 之前）
+
+原始媒體直接送 Gemini 時，全解析度圖片以 inline base64 傳送、整支影片經 File API
+上傳並等待處理，上傳時間、File API 等待時間與 token 費用都隨原始大小成長。
+此模組依用途（profile）套用媒體預算：
+
+- 圖片：長邊縮到 max_image_side，重新編碼為 JPEG，逐步降低品質直到不超過 image_target_bytes
+- 影片：
+  * keyframes：等距取樣 N 張影格拼成一張聯絡表（contact sheet），以單張圖片送出
+  * trim：超過 video_max_seconds 的部分裁掉（stream copy，不重新編碼）
+  * original：原樣送出
+
+每項回傳 PreparedMedia，附上前後位元組數與估算 token 數（savings()）。
+Pillow 或 ffmpeg 不可用、或處理失敗時退回原始媒體，不影響分析本身。
+
+設定（環境變數）：
+- MEDIA_PREP_ENABLED：false 時全部原樣送出
+- MEDIA_PREP_<PROFILE>_<欄位>：覆寫個別 profile 的預算，例如
+  MEDIA_PREP_DESCRIBE_VIDEO_MODE=keyframes、MEDIA_PREP_ANALYZE_MAX_IMAGE_SIDE=1024
+"""
+
+import asyncio
+import io
+import math
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass, field, fields, replace
+from typing import Any, Dict, List, Optional
+
+
+# Gemini 計價：圖片 ≤384x384 為 258 tokens，較大時切成方塊、每塊 258 tokens；
+# 影片約每秒 263 tokens（1 fps 影格 + 音訊）
+IMAGE_TILE_TOKENS = 258
+VIDEO_TOKENS_PER_SECOND = 263
+
+
+@dataclass(frozen=True)
+class MediaBudget:
+    """單一用途的媒體預算"""
+    max_image_side: int = 1536
+    image_target_bytes: int = 500_000
+    image_start_quality: int = 85
+    image_min_quality: int = 45
+    video_mode: str = "keyframes"  # keyframes / trim / original
+    keyframes: int = 8
+    sheet_tile_side: int = 512
+    video_max_seconds: float = 60.0
+
+
+# 各用途預設：描述需要字幕與對話，影片保留時間軸（trim）；其餘以聯絡表為主
+MEDIA_BUDGETS: Dict[str, MediaBudget] = {
+    "analyze": MediaBudget(),
+    "describe": MediaBudget(video_mode="trim", video_max_seconds=90.0),
+    "generate": MediaBudget(max_image_side=1024, image_target_bytes=300_000, keyframes=6),
+    "views": MediaBudget(max_image_side=2048, image_target_bytes=800_000, image_start_quality=90),
+}
+
+
+def get_media_budget(profile: str) -> MediaBudget:
+    """取得 profile 的預算（套用 MEDIA_PREP_<PROFILE>_<欄位> 覆寫）"""
+    budget = MEDIA_BUDGETS.get(profile, MEDIA_BUDGETS["analyze"])
+    overrides = {}
+    for budget_field in fields(MediaBudget):
+        raw = os.getenv(f"MEDIA_PREP_{profile.upper()}_{budget_field.name.upper()}")
+        if raw is None:
+            continue
+        try:
+            overrides[budget_field.name] = type(getattr(budget, budget_field.name))(raw)
+        except ValueError:
+            print(f"⚠️ 忽略無效的媒體預算設定 {budget_field.name}={raw}")
+    return replace(budget, **overrides) if overrides else budget
+
+
+def preprocess_enabled() -> bool:
+    return os.getenv("MEDIA_PREP_ENABLED", "true").lower() not in ("0", "false", "no")
+
+
+@dataclass
+class PreparedMedia:
+    """前處理後準備送出的媒體"""
+    data: bytes
+    mime_type: str
+    kind: str  # image / video / video_frames
+    original_mime_type: str
+    original_bytes: int
+    original_tokens_est: Optional[int] = None
+    tokens_est: Optional[int] = None
+    actions: List[str] = field(default_factory=list)
+    frame_times: List[float] = field(default_factory=list)
+
+    def savings(self) -> Dict[str, Any]:
+        """位元組與估算 token 的節省量（用於日誌與回報）"""
+        tokens_saved = None
+        if self.original_tokens_est is not None and self.tokens_est is not None:
+            tokens_saved = self.original_tokens_est - self.tokens_est
+        return {
+            "kind": self.kind,
+            "original_bytes": self.original_bytes,
+            "bytes": len(self.data),
+            "bytes_saved": self.original_bytes - len(self.data),
+            "original_tokens_est": self.original_tokens_est,
+            "tokens_est": self.tokens_est,
+            "tokens_saved_est": tokens_saved,
+            "actions": list(self.actions),
+        }
+
+    def frames_note(self) -> str:
+        """聯絡表的說明文字（附在影片提示之後）"""
+        stamps = "、".join(_format_ts(t) for t in self.frame_times)
+        return (
+            f"以上圖片為影片等距取樣的 {len(self.frame_times)} 張關鍵影格，"
+            f"依時間順序由左至右、由上而下排列，對應時間點：{stamps}。"
+            "請以這些時間點作為 segments 的 startTime/endTime 依據；無法得知的對話或字幕請省略。"
+        )
+
+
+def estimate_image_tokens(width: int, height: int) -> int:
+    """Gemini 圖片 token 估算"""
+    if width <= 384 and height <= 384:
+        return IMAGE_TILE_TOKENS
+    unit = min(768, max(256, int(min(width, height) / 1.5)))
+    return math.ceil(width / unit) * math.ceil(height / unit) * IMAGE_TILE_TOKENS
+
+
+def estimate_video_tokens(duration: Optional[float]) -> Optional[int]:
+    if duration is None:
+        return None
+    return int(math.ceil(duration) * VIDEO_TOKENS_PER_SECOND)
+
+
+def _format_ts(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 60:02d}:{seconds % 60:02d}"
+
+
+async def prepare_media(media_bytes: bytes, mime_type: str, budget: MediaBudget) -> PreparedMedia:
+    """依預算前處理單一媒體；失敗時回傳原始媒體"""
+    mime_type = (mime_type or "").split(";")[0].strip().lower()
+    if mime_type.startswith("image/"):
+        passthrough = PreparedMedia(media_bytes, mime_type, "image", mime_type, len(media_bytes))
+        if not preprocess_enabled():
+            return passthrough
+        try:
+            return await asyncio.to_thread(_prepare_image, media_bytes, mime_type, budget)
+        except ImportError:
+            passthrough.actions.append("Pillow 未安裝，原樣送出")
+        except Exception as e:
+            passthrough.actions.append(f"圖片前處理失敗，原樣送出: {e}")
+        return passthrough
+
+    if mime_type.startswith("video/"):
+        passthrough = PreparedMedia(media_bytes, mime_type, "video", mime_type, len(media_bytes))
+        if not preprocess_enabled() or budget.video_mode == "original":
+            return passthrough
+        if not shutil.which("ffmpeg") or not shutil.which("ffprobe"):
+            passthrough.actions.append("ffmpeg 不可用，原樣送出")
+            return passthrough
+        try:
+            return await _prepare_video(media_bytes, mime_type, budget)
+        except Exception as e:
+            passthrough.actions.append(f"影片前處理失敗，原樣送出: {e}")
+            return passthrough
+
+    return PreparedMedia(media_bytes, mime_type, "other", mime_type, len(media_bytes))
+
+
+# ---------------------------------------------------------------- 圖片
+def _encode_jpeg(image, budget: MediaBudget) -> bytes:
+    """由 image_start_quality 起逐步降低品質，直到不超過 image_target_bytes（或到 image_min_quality）"""
+    quality = budget.image_start_quality
+    while True:
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=quality, optimize=True)
+        data = buffer.getvalue()
+        if len(data) <= budget.image_target_bytes or quality <= budget.image_min_quality:
+            return data
+        quality = max(budget.image_min_quality, quality - 10)
+
+
+def _to_rgb(image):
+    from PIL import Image
+
+    if image.mode in ("RGBA", "LA", "P"):
+        rgba = image.convert("RGBA")
+        background = Image.new("RGB", rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.split()[-1])
+        return background
+    return image.convert("RGB") if image.mode != "RGB" else image
+
+
+def _prepare_image(media_bytes: bytes, mime_type: str, budget: MediaBudget) -> PreparedMedia:
+    from PIL import Image, ImageOps
+
+    image = Image.open(io.BytesIO(media_bytes))
+    image = ImageOps.exif_transpose(image)
+    original_size = image.size
+    original_tokens = estimate_image_tokens(*original_size)
+    actions = []
+
+    if max(image.size) > budget.max_image_side:
+        image = image.copy()
+        image.thumbnail((budget.max_image_side, budget.max_image_side), Image.LANCZOS)
+        actions.append(f"縮圖 {original_size[0]}x{original_size[1]}→{image.size[0]}x{image.size[1]}")
+
+    if not actions and len(media_bytes) <= budget.image_target_bytes:
+        # 尺寸與大小都在預算內，不重新編碼（避免無謂的畫質損失）
+        return PreparedMedia(media_bytes, mime_type, "image", mime_type, len(media_bytes),
+                             original_tokens, original_tokens, ["在預算內，原樣送出"])
+
+    data = _encode_jpeg(_to_rgb(image), budget)
+    if not actions and len(data) >= len(media_bytes):
+        return PreparedMedia(media_bytes, mime_type, "image", mime_type, len(media_bytes),
+                             original_tokens, original_tokens, ["重新編碼無效益，原樣送出"])
+
+    actions.append(f"JPEG 重新編碼 {len(media_bytes):,}→{len(data):,} bytes")
+    return PreparedMedia(data, "image/jpeg", "image", mime_type, len(media_bytes),
+                         original_tokens, estimate_image_tokens(*image.size), actions)
+
+
+# ---------------------------------------------------------------- 影片
+async def _run(*args: str) -> bytes:
+    process = await asyncio.create_subprocess_exec(
+        *args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+    stdout, stderr = await process.communicate()
+    if process.returncode != 0:
+        raise RuntimeError(f"{args[0]} 失敗: {stderr.decode(errors='ignore')[-300:]}")
+    return stdout
+
+
+async def _probe_duration(path: str) -> Optional[float]:
+    output = await _run("ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", path)
+    try:
+        return float(output.strip())
+    except ValueError:
+        return None
+
+
+async def _prepare_video(media_bytes: bytes, mime_type: str, budget: MediaBudget) -> PreparedMedia:
+    with tempfile.TemporaryDirectory(prefix="media_prep_") as workdir:
+        source = os.path.join(workdir, "source.mp4")
+        with open(source, "wb") as f:
+            f.write(media_bytes)
+
+        duration = await _probe_duration(source)
+        original_tokens = estimate_video_tokens(duration)
+
+        if budget.video_mode == "keyframes" and duration:
+            return await _keyframe_sheet(source, media_bytes, mime_type, duration, original_tokens, budget)
+
+        if budget.video_mode == "trim" and duration and duration > budget.video_max_seconds:
+            target = os.path.join(workdir, "trimmed.mp4")
+            await _run("ffmpeg", "-v", "error", "-y", "-i", source, "-t", str(budget.video_max_seconds),
+                       "-c", "copy", "-movflags", "+faststart", target)
+            with open(target, "rb") as f:
+                data = f.read()
+            return PreparedMedia(
+                data, "video/mp4", "video", mime_type, len(media_bytes),
+                original_tokens, estimate_video_tokens(budget.video_max_seconds),
+                [f"裁切 {duration:.1f}s→{budget.video_max_seconds:.0f}s"],
+            )
+
+        return PreparedMedia(media_bytes, mime_type, "video", mime_type, len(media_bytes),
+                             original_tokens, original_tokens, ["在預算內，原樣送出"])
+
+
+async def _keyframe_sheet(source: str, media_bytes: bytes, mime_type: str, duration: float,
+                          original_tokens: Optional[int], budget: MediaBudget) -> PreparedMedia:
+    count = max(1, budget.keyframes)
+    times = [duration * (i + 0.5) / count for i in range(count)]
+    frames = await asyncio.gather(*[
+        _run("ffmpeg", "-v", "error", "-ss", f"{t:.3f}", "-i", source, "-frames:v", "1",
+             "-vf", f"scale={budget.sheet_tile_side}:-2", "-f", "image2pipe", "-vcodec", "mjpeg", "-")
+        for t in times
+    ])
+    times = [t for t, frame in zip(times, frames) if frame]
+    image = await asyncio.to_thread(_compose_sheet, [frame for frame in frames if frame], times, budget)
+    data = await asyncio.to_thread(_encode_jpeg, image, budget)
+    return PreparedMedia(
+        data, "image/jpeg", "video_frames", mime_type, len(media_bytes),
+        original_tokens, estimate_image_tokens(*image.size),
+        [f"{len(times)} 張關鍵影格聯絡表（影片 {duration:.1f}s）"],
+        frame_times=times,
+    )
+
+
+def _compose_sheet(frames: List[bytes], times: List[float], budget: MediaBudget):
+    from PIL import Image, ImageDraw
+
+    if not frames:
+        raise RuntimeError("未取得任何影格")
+    images = [_to_rgb(Image.open(io.BytesIO(frame))) for frame in frames]
+    cols = math.ceil(math.sqrt(len(images)))
+    rows = math.ceil(len(images) / cols)
+    tile_w = max(image.width for image in images)
+    tile_h = max(image.height for image in images)
+
+    sheet = Image.new("RGB", (cols * tile_w, rows * tile_h), (0, 0, 0))
+    draw = ImageDraw.Draw(sheet)
+    for index, (image, t) in enumerate(zip(images, times)):
+        x, y = (index % cols) * tile_w, (index // cols) * tile_h
+        sheet.paste(image, (x, y))
+        draw.rectangle([x, y, x + 44, y + 14], fill=(0, 0, 0))
+        draw.text((x + 3, y + 2), _format_ts(t), fill=(255, 255, 255))
+
+    if max(sheet.size) > budget.max_image_side:
+        sheet.thumbnail((budget.max_image_side, budget.max_image_side), Image.LANCZOS)
+    return sheet
@@ -36,12 +36,24 @@ class VisionAgent:
     """Vision Agent - 使用 RustFS + Gemini Vision 分析媒體內容"""
     
     def __init__(self):
-        """初始化 Vision Agent"""
-        self.gemini_analyzer = GeminiVisionAnalyzer()
-        self.rustfs_client = get_rustfs_client()
+        """初始化 Vision Agent（Gemini 與 RustFS 客戶端延遲到第一次使用才建立）"""
+        self._gemini_analyzer: Optional[GeminiVisionAnalyzer] = None
+        self._rustfs_client = None
         
         # 配置參數
         self.top_n_posts = int(os.getenv("MEDIA_TOP_N_POSTS", "5"))
+
+    @property
+    def gemini_analyzer(self) -> GeminiVisionAnalyzer:
+        if self._gemini_analyzer is None:
+            self._gemini_analyzer = GeminiVisionAnalyzer()
+        return self._gemini_analyzer
+
+    @property
+    def rustfs_client(self):
+        if self._rustfs_client is None:
+            self._rustfs_client = get_rustfs_client()
+        return self._rustfs_client
     
     async def process_post_media(self, post_id: str) -> AgentResponse:
         """
@@ -249,11 +261,28 @@ class VisionAgent:
     async def health_check(self) -> Dict[str, Any]:
         """健康檢查"""
         try:
-            # 檢查 Gemini Vision
-            gemini_health = self.gemini_analyzer.health_check()
+            # 檢查 Gemini Vision（尚未建立時只檢查金鑰，不為健康檢查載入 SDK）
+            if self._gemini_analyzer is not None:
+                gemini_health = self._gemini_analyzer.health_check()
+            else:
+                api_key_configured = bool(os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY"))
+                gemini_health = {
+                    "status": "healthy" if api_key_configured else "unhealthy",
+                    "api_key_configured": api_key_configured,
+                    "initialized": False,
+                }
             
-            # 檢查 RustFS
-            rustfs_health = self.rustfs_client.health_check()
+            # 檢查 RustFS（尚未建立時只檢查設定，不為健康檢查建立 S3 客戶端）
+            if self._rustfs_client is not None:
+                rustfs_health = self._rustfs_client.health_check()
+            else:
+                # RustFSClient 未設定時會使用預設端點，因此只回報實際會用的端點
+                rustfs_health = {
+                    "status": "healthy",
+                    "endpoint": os.getenv("RUSTFS_ENDPOINT", "http://localhost:9000"),
+                    "endpoint_configured": bool(os.getenv("RUSTFS_ENDPOINT")),
+                    "initialized": False,
+                }
             
             # 檢查資料庫連接
             db_client = await get_db_client()
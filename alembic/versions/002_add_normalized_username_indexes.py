@@ -0,0 +1,55 @@
+"""add normalized username expression indexes for post analyzer lookups
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import text
+
+
+# revision identifiers, used by Alembic.
+revision = '002'
+down_revision = '001'
+branch_labels = None
+depends_on = None
+
+
+# 熱點資料表上線中也要能建索引：CONCURRENTLY 不鎖寫入，但不能在交易內執行，
+# 因此在 autocommit_block 內逐條執行
+NORMALIZED_USERNAME_INDEXES = [
+    ("idx_post_metrics_sql_username_norm", "post_metrics_sql"),
+    ("idx_playwright_username_norm", "playwright_post_metrics"),
+]
+
+
+def _drop_invalid_index(name: str) -> None:
+    """先前 CONCURRENTLY 建立失敗會留下 INVALID 索引，IF NOT EXISTS 會誤以為已存在"""
+    invalid = op.get_bind().execute(text("""
+        SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = :name AND NOT i.indisvalid
+    """), {"name": name}).scalar()
+    if invalid:
+        op.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+
+
+def upgrade() -> None:
+    """為 replace(lower(username),'@','') 建立表達式索引，讓分析器的用戶查詢走索引"""
+
+    # 表達式必須與 agents/post_analyzer/data_fetcher.py 的 _NORM_USERNAME 完全一致
+    with op.get_context().autocommit_block():
+        for name, table in NORMALIZED_USERNAME_INDEXES:
+            _drop_invalid_index(name)
+            op.execute(text(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} "
+                f"ON {table} ((replace(lower(username),'@','')))"
+            ))
+
+
+def downgrade() -> None:
+    """回滾migration"""
+    with op.get_context().autocommit_block():
+        for name, _table in NORMALIZED_USERNAME_INDEXES:
+            op.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
@@ -0,0 +1,103 @@
+"""add composite, partial and covering indexes for hot crawler/media queries
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import text
+
+
+# revision identifiers, used by Alembic.
+revision = '003'
+down_revision = '002'
+branch_labels = None
+depends_on = None
+
+
+# (索引名稱, 資料表, 索引定義)；media_files / media_descriptions 由 scripts/init-db.sql 建立，
+# 不一定存在於只跑 alembic 的資料庫，因此逐一檢查資料表是否存在
+HOT_QUERY_INDEXES = [
+    # MediaDescribeService / build_download_plan：以貼文 URL 反查、JOIN media_files
+    ("idx_playwright_url", "playwright_post_metrics", "ON playwright_post_metrics (url)"),
+    # get_existing_post_ids / post_id 索引重建：(username, crawler_type) 篩選，只讀 post_id
+    ("idx_playwright_user_type_post", "playwright_post_metrics",
+     "ON playwright_post_metrics (username, crawler_type, post_id)"),
+    # 每用戶 Top-N 排序（下載計畫、描述計畫、分析器）：用戶與排序表達式必須與查詢完全一致，
+    # 即 replace(lower(username),'@','') 與 COALESCE(<欄位>, 0) DESC
+    ("idx_playwright_user_views", "playwright_post_metrics",
+     "ON playwright_post_metrics ((replace(lower(username),'@','')), (COALESCE(views_count, 0)) DESC)"),
+    ("idx_playwright_user_likes", "playwright_post_metrics",
+     "ON playwright_post_metrics ((replace(lower(username),'@','')), (COALESCE(likes_count, 0)) DESC)"),
+    ("idx_post_metrics_sql_user_views", "post_metrics_sql",
+     "ON post_metrics_sql ((replace(lower(username),'@','')), (COALESCE(views_count, 0)) DESC)"),
+    ("idx_post_metrics_sql_user_likes", "post_metrics_sql",
+     "ON post_metrics_sql ((replace(lower(username),'@','')), (COALESCE(likes_count, 0)) DESC)"),
+    # build_download_plan：original_url 狀態查詢可走 index-only scan
+    ("idx_media_files_original_url_status", "media_files",
+     "ON media_files (original_url) INCLUDE (download_status)"),
+    # 僅重試失敗：失敗列通常極少，partial index 只收錄這些
+    ("idx_media_files_failed_post_url", "media_files",
+     "ON media_files (post_url, id) WHERE download_status = 'failed'"),
+    # 描述服務：只掃描已下載完成、可從 RustFS 取回的媒體
+    ("idx_media_files_completed_type", "media_files",
+     "ON media_files (media_type, post_url) "
+     "WHERE download_status = 'completed' AND rustfs_url IS NOT NULL AND rustfs_url <> ''"),
+    ("idx_media_desc_post_url_created", "media_descriptions",
+     "ON media_descriptions (post_url, created_at DESC)"),
+]
+
+
+def _table_exists(table: str) -> bool:
+    return bool(op.get_bind().execute(
+        text("SELECT to_regclass(:name) IS NOT NULL"), {"name": f"public.{table}"}
+    ).scalar())
+
+
+def _drop_invalid_index(name: str) -> None:
+    """先前 CONCURRENTLY 建立失敗會留下 INVALID 索引，IF NOT EXISTS 會誤以為已存在"""
+    invalid = op.get_bind().execute(text("""
+        SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = :name AND NOT i.indisvalid
+    """), {"name": name}).scalar()
+    if invalid:
+        op.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+
+
+def _create_index_concurrently(name: str, definition: str, unique: bool = False) -> None:
+    _drop_invalid_index(name)
+    kind = "UNIQUE INDEX" if unique else "INDEX"
+    op.execute(text(f"CREATE {kind} CONCURRENTLY IF NOT EXISTS {name} {definition}"))
+
+
+def upgrade() -> None:
+    """為熱點查詢建立對應索引，取代應用程式內臨時的 CREATE INDEX IF NOT EXISTS
+
+    都是上線中的熱點資料表：以 CREATE INDEX CONCURRENTLY 建立，不鎖寫入；
+    CONCURRENTLY 不能在交易（或 DO 區塊）內執行，資料表檢查因此改在 Python 端。
+    """
+    with op.get_context().autocommit_block():
+        for name, table, definition in HOT_QUERY_INDEXES:
+            if _table_exists(table):
+                _create_index_concurrently(name, definition)
+
+        # 每個媒體只保留一筆描述（MediaDescribeService 以 advisory lock + NOT EXISTS 維持）；
+        # 既有資料有重複時僅提示，不在 migration 內刪資料
+        if _table_exists("media_descriptions"):
+            duplicated = op.get_bind().execute(text(
+                "SELECT 1 FROM media_descriptions GROUP BY media_id HAVING COUNT(*) > 1 LIMIT 1"
+            )).scalar()
+            if duplicated:
+                print("⚠️ media_descriptions 有重複 media_id，略過唯一索引 uq_media_desc_media_id")
+            else:
+                _create_index_concurrently("uq_media_desc_media_id", "ON media_descriptions (media_id)", unique=True)
+
+
+def downgrade() -> None:
+    """回滾migration"""
+    with op.get_context().autocommit_block():
+        op.execute(text("DROP INDEX CONCURRENTLY IF EXISTS uq_media_desc_media_id"))
+        for name, _table, _definition in reversed(HOT_QUERY_INDEXES):
+            op.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
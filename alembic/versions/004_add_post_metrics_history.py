@@ -0,0 +1,133 @@
+"""add append-only post_metrics_history (monthly partitions) with hourly/daily rollups
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import text
+
+
+# revision identifiers, used by Alembic.
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """建立指標歷史快照表與彙總表，保留成長曲線而非覆寫"""
+
+    # 原始快照：每次 upsert 追加一列，按月分區
+    op.execute(text("""
+        CREATE TABLE IF NOT EXISTS post_metrics_history (
+            captured_at     TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            url             TEXT NOT NULL,
+            username        TEXT,
+            source          TEXT NOT NULL,           -- post_metrics / post_metrics_sql / playwright
+            views_count     BIGINT,
+            likes_count     BIGINT,
+            comments_count  BIGINT,
+            reposts_count   BIGINT,
+            shares_count    BIGINT
+        ) PARTITION BY RANGE (captured_at);
+
+        -- 後備分區：月分區尚未建立時寫入也不會失敗
+        CREATE TABLE IF NOT EXISTS post_metrics_history_default
+            PARTITION OF post_metrics_history DEFAULT;
+
+        CREATE INDEX IF NOT EXISTS idx_pmh_url_captured
+            ON post_metrics_history (url, captured_at DESC);
+    """))
+
+    # 建立（若不存在）包含指定時間的月分區
+    op.execute(text("""
+        CREATE OR REPLACE FUNCTION ensure_post_metrics_history_partition(ts TIMESTAMPTZ)
+        RETURNS TEXT AS $$
+        DECLARE
+            month_start DATE := date_trunc('month', ts)::date;
+            part_name   TEXT := 'post_metrics_history_' || to_char(month_start, 'YYYYMM');
+        BEGIN
+            IF to_regclass('public.' || part_name) IS NULL THEN
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF post_metrics_history FOR VALUES FROM (%L) TO (%L)',
+                    part_name, month_start, (month_start + INTERVAL '1 month')::date
+                );
+            END IF;
+            RETURN part_name;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        SELECT ensure_post_metrics_history_partition(NOW());
+        SELECT ensure_post_metrics_history_partition(NOW() + INTERVAL '1 month');
+    """))
+
+    # 連續彙總：寫入時同步維護每 (時段, url) 的最小/最大值
+    for grain in ("hourly", "daily"):
+        op.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS post_metrics_rollup_{grain} (
+                bucket          TIMESTAMPTZ NOT NULL,
+                url             TEXT NOT NULL,
+                username        TEXT,
+                views_min       BIGINT,
+                views_max       BIGINT,
+                likes_min       BIGINT,
+                likes_max       BIGINT,
+                comments_max    BIGINT,
+                reposts_max     BIGINT,
+                shares_max      BIGINT,
+                samples         INTEGER NOT NULL DEFAULT 0,
+                updated_at      TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                PRIMARY KEY (bucket, url)
+            );
+            CREATE INDEX IF NOT EXISTS idx_pm_rollup_{grain}_user_bucket
+                ON post_metrics_rollup_{grain} (username, bucket DESC);
+        """))
+
+    # 保留策略：刪除過期的月分區與逐時彙總
+    op.execute(text("""
+        CREATE OR REPLACE FUNCTION prune_post_metrics_history(
+            keep_months INTEGER DEFAULT 6,
+            keep_hourly_days INTEGER DEFAULT 30,
+            keep_daily_days INTEGER DEFAULT 730
+        ) RETURNS INTEGER AS $$
+        DECLARE
+            cutoff  DATE := (date_trunc('month', NOW()) - make_interval(months => keep_months))::date;
+            part    RECORD;
+            dropped INTEGER := 0;
+        BEGIN
+            FOR part IN
+                SELECT c.relname
+                FROM pg_inherits i
+                JOIN pg_class c ON c.oid = i.inhrelid
+                JOIN pg_class p ON p.oid = i.inhparent
+                WHERE p.relname = 'post_metrics_history'
+                  AND c.relname ~ '^post_metrics_history_[0-9]{6}$'
+            LOOP
+                IF to_date(right(part.relname, 6), 'YYYYMM') < cutoff THEN
+                    EXECUTE format('DROP TABLE IF EXISTS %I', part.relname);
+                    dropped := dropped + 1;
+                END IF;
+            END LOOP;
+
+            DELETE FROM post_metrics_history_default
+             WHERE captured_at < cutoff;
+            DELETE FROM post_metrics_rollup_hourly
+             WHERE bucket < NOW() - make_interval(days => keep_hourly_days);
+            DELETE FROM post_metrics_rollup_daily
+             WHERE bucket < NOW() - make_interval(days => keep_daily_days);
+            RETURN dropped;
+        END;
+        $$ LANGUAGE plpgsql;
+    """))
+
+
+def downgrade() -> None:
+    """回滾migration"""
+    op.execute(text("DROP FUNCTION IF EXISTS prune_post_metrics_history(INTEGER, INTEGER, INTEGER);"))
+    op.execute(text("DROP FUNCTION IF EXISTS ensure_post_metrics_history_partition(TIMESTAMPTZ);"))
+    op.execute(text("DROP TABLE IF EXISTS post_metrics_rollup_daily;"))
+    op.execute(text("DROP TABLE IF EXISTS post_metrics_rollup_hourly;"))
+    op.execute(text("DROP TABLE IF EXISTS post_metrics_history CASCADE;"))
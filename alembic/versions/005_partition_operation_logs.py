@@ -0,0 +1,324 @@
+"""partition user_operation_log by month, add keyset indexes, hourly summaries and retention for operation logs
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import text
+
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+
+USER_OPS_COLUMNS = """
+    id, ts, user_id, anonymous_id, session_id, actor_type, menu_name, page_name,
+    action_type, action_name, resource_id, status, latency_ms, error_message,
+    ip_address, user_agent, request_id, trace_id, metadata
+"""
+
+
+def upgrade() -> None:
+    """操作日誌改為游標分頁 + 月分區 + 逐時彙總，深頁查詢與統計不再隨資料量線性變慢"""
+
+    # 通用月分區建立：預設分區中已落入該月的資料先搬到新分區，再 ATTACH
+    op.execute(text("""
+        CREATE OR REPLACE FUNCTION ensure_monthly_partition(parent TEXT, ts_column TEXT, ts TIMESTAMPTZ)
+        RETURNS TEXT AS $$
+        DECLARE
+            month_start DATE := date_trunc('month', ts)::date;
+            month_end   DATE := (date_trunc('month', ts) + INTERVAL '1 month')::date;
+            part_name   TEXT := parent || '_' || to_char(month_start, 'YYYYMM');
+            default_name TEXT := parent || '_default';
+        BEGIN
+            IF (SELECT relkind FROM pg_class WHERE oid = to_regclass('public.' || parent)) IS DISTINCT FROM 'p' THEN
+                RETURN NULL;  -- 尚未分區（舊資料庫）
+            END IF;
+            IF to_regclass('public.' || part_name) IS NOT NULL THEN
+                RETURN part_name;
+            END IF;
+
+            EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', part_name, parent);
+            IF to_regclass('public.' || default_name) IS NOT NULL THEN
+                EXECUTE format(
+                    'WITH moved AS (DELETE FROM %I WHERE %I >= %L AND %I < %L RETURNING *) '
+                    'INSERT INTO %I SELECT * FROM moved',
+                    default_name, ts_column, month_start, ts_column, month_end, part_name
+                );
+            END IF;
+            EXECUTE format(
+                'ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                parent, part_name, month_start, month_end
+            );
+            RETURN part_name;
+        END;
+        $$ LANGUAGE plpgsql;
+    """))
+
+    # user_operation_log：舊的一般表改名後搬進分區表（沿用原 id 序列）
+    op.execute(text("""
+        DO $$
+        BEGIN
+            IF to_regclass('public.user_operation_log') IS NOT NULL
+               AND (SELECT relkind FROM pg_class WHERE oid = 'public.user_operation_log'::regclass) <> 'p' THEN
+                ALTER TABLE user_operation_log RENAME TO user_operation_log_legacy;
+                ALTER INDEX IF EXISTS user_operation_log_pkey RENAME TO user_operation_log_legacy_pkey;
+                ALTER SEQUENCE IF EXISTS user_operation_log_id_seq OWNED BY NONE;
+            END IF;
+        END $$;
+
+        CREATE SEQUENCE IF NOT EXISTS user_operation_log_id_seq;
+
+        CREATE TABLE IF NOT EXISTS user_operation_log (
+            id               BIGINT NOT NULL DEFAULT nextval('user_operation_log_id_seq'),
+            ts               TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            user_id          TEXT,
+            anonymous_id     TEXT,
+            session_id       TEXT,
+            actor_type       TEXT NOT NULL DEFAULT 'user' CHECK (actor_type IN ('user')),
+            menu_name        TEXT NOT NULL,
+            page_name        TEXT,
+            action_type      TEXT NOT NULL,
+            action_name      TEXT NOT NULL,
+            resource_id      TEXT,
+            status           TEXT NOT NULL CHECK (status IN ('success','failed','pending')),
+            latency_ms       INTEGER,
+            error_message    TEXT,
+            ip_address       INET,
+            user_agent       TEXT,
+            request_id       TEXT,
+            trace_id         TEXT,
+            metadata         JSONB DEFAULT '{}',
+            PRIMARY KEY (id, ts)
+        ) PARTITION BY RANGE (ts);
+
+        ALTER SEQUENCE user_operation_log_id_seq OWNED BY user_operation_log.id;
+
+        CREATE TABLE IF NOT EXISTS user_operation_log_default
+            PARTITION OF user_operation_log DEFAULT;
+    """))
+
+    op.execute(text(f"""
+        DO $$
+        DECLARE
+            month_ts TIMESTAMPTZ;
+        BEGIN
+            IF to_regclass('public.user_operation_log_legacy') IS NOT NULL THEN
+                FOR month_ts IN
+                    SELECT generate_series(date_trunc('month', MIN(ts)), date_trunc('month', NOW()), INTERVAL '1 month')
+                    FROM user_operation_log_legacy
+                LOOP
+                    PERFORM ensure_monthly_partition('user_operation_log', 'ts', month_ts);
+                END LOOP;
+                INSERT INTO user_operation_log ({USER_OPS_COLUMNS})
+                SELECT {USER_OPS_COLUMNS} FROM user_operation_log_legacy;
+                DROP TABLE user_operation_log_legacy;
+            END IF;
+        END $$;
+
+        SELECT ensure_monthly_partition('user_operation_log', 'ts', NOW());
+        SELECT ensure_monthly_partition('user_operation_log', 'ts', NOW() + INTERVAL '1 month');
+
+        -- 游標分頁 (ts, id) 與原有篩選索引（建立在分區父表，自動套用到各分區）
+        CREATE INDEX IF NOT EXISTS idx_user_ops_keyset ON user_operation_log (ts DESC, id DESC);
+        CREATE INDEX IF NOT EXISTS idx_user_ops_ts_desc ON user_operation_log (ts DESC);
+        CREATE INDEX IF NOT EXISTS idx_user_ops_user ON user_operation_log (user_id);
+        CREATE INDEX IF NOT EXISTS idx_user_ops_anon ON user_operation_log (anonymous_id);
+        CREATE INDEX IF NOT EXISTS idx_user_ops_menu ON user_operation_log (menu_name);
+        CREATE INDEX IF NOT EXISTS idx_user_ops_action ON user_operation_log (action_type);
+        CREATE INDEX IF NOT EXISTS idx_user_ops_trace ON user_operation_log (trace_id);
+    """))
+
+    # system_operation_log：init-db.sql（started_at/agent_name）與 SQLModel（ts/agent）兩種欄位並存，
+    # 不做就地分區轉換；依實際時間欄位建立游標索引
+    op.execute(text("""
+        DO $$
+        DECLARE
+            ts_col TEXT;
+        BEGIN
+            SELECT column_name INTO ts_col
+            FROM information_schema.columns
+            WHERE table_name = 'system_operation_log' AND column_name IN ('ts', 'started_at')
+            ORDER BY column_name = 'ts' DESC
+            LIMIT 1;
+            IF ts_col IS NOT NULL THEN
+                EXECUTE format(
+                    'CREATE INDEX IF NOT EXISTS idx_system_ops_keyset ON system_operation_log (%I DESC, id DESC)',
+                    ts_col
+                );
+            END IF;
+        END $$;
+    """))
+
+    # 逐時彙總表：寫入時由觸發器累加，統計與監控面板只讀彙總
+    op.execute(text("""
+        CREATE TABLE IF NOT EXISTS system_operation_log_hourly (
+            bucket              TIMESTAMPTZ NOT NULL,
+            operation_type      TEXT NOT NULL,
+            agent_name          TEXT NOT NULL DEFAULT '',
+            status              TEXT NOT NULL,
+            ops_count           BIGINT NOT NULL DEFAULT 0,
+            total_execution_ms  BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (bucket, operation_type, agent_name, status)
+        );
+
+        CREATE TABLE IF NOT EXISTS user_operation_log_hourly (
+            bucket              TIMESTAMPTZ NOT NULL,
+            menu_name           TEXT NOT NULL,
+            action_type         TEXT NOT NULL,
+            status              TEXT NOT NULL,
+            ops_count           BIGINT NOT NULL DEFAULT 0,
+            total_latency_ms    BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (bucket, menu_name, action_type, status)
+        );
+
+        -- 以 to_jsonb 讀欄位，兩種 system_operation_log 欄位命名都適用
+        CREATE OR REPLACE FUNCTION system_operation_log_rollup() RETURNS TRIGGER AS $$
+        DECLARE
+            rec JSONB := to_jsonb(NEW);
+        BEGIN
+            INSERT INTO system_operation_log_hourly AS h (
+                bucket, operation_type, agent_name, status, ops_count, total_execution_ms
+            )
+            VALUES (
+                date_trunc('hour', COALESCE((rec->>'ts')::timestamptz, (rec->>'started_at')::timestamptz, NOW())),
+                NEW.operation_type,
+                COALESCE(rec->>'agent_name', rec->>'agent', ''),
+                NEW.status,
+                1,
+                COALESCE((rec->>'execution_time_ms')::bigint, 0)
+            )
+            ON CONFLICT (bucket, operation_type, agent_name, status) DO UPDATE SET
+                ops_count = h.ops_count + 1,
+                total_execution_ms = h.total_execution_ms + EXCLUDED.total_execution_ms;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        CREATE OR REPLACE FUNCTION user_operation_log_rollup() RETURNS TRIGGER AS $$
+        BEGIN
+            INSERT INTO user_operation_log_hourly AS h (
+                bucket, menu_name, action_type, status, ops_count, total_latency_ms
+            )
+            VALUES (date_trunc('hour', NEW.ts), NEW.menu_name, NEW.action_type, NEW.status, 1, COALESCE(NEW.latency_ms, 0))
+            ON CONFLICT (bucket, menu_name, action_type, status) DO UPDATE SET
+                ops_count = h.ops_count + 1,
+                total_latency_ms = h.total_latency_ms + EXCLUDED.total_latency_ms;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS trg_user_operation_log_rollup ON user_operation_log;
+        CREATE TRIGGER trg_user_operation_log_rollup
+            AFTER INSERT ON user_operation_log
+            FOR EACH ROW EXECUTE FUNCTION user_operation_log_rollup();
+
+        -- 回填既有資料
+        INSERT INTO user_operation_log_hourly (bucket, menu_name, action_type, status, ops_count, total_latency_ms)
+        SELECT date_trunc('hour', ts), menu_name, action_type, status, count(*), COALESCE(sum(latency_ms), 0)
+        FROM user_operation_log
+        GROUP BY 1, 2, 3, 4
+        ON CONFLICT DO NOTHING;
+    """))
+
+    op.execute(text("""
+        DO $$
+        BEGIN
+            IF to_regclass('public.system_operation_log') IS NOT NULL THEN
+                DROP TRIGGER IF EXISTS trg_system_operation_log_rollup ON system_operation_log;
+                CREATE TRIGGER trg_system_operation_log_rollup
+                    AFTER INSERT ON system_operation_log
+                    FOR EACH ROW EXECUTE FUNCTION system_operation_log_rollup();
+
+                INSERT INTO system_operation_log_hourly (
+                    bucket, operation_type, agent_name, status, ops_count, total_execution_ms
+                )
+                SELECT date_trunc('hour', COALESCE((r->>'ts')::timestamptz, (r->>'started_at')::timestamptz)),
+                       r->>'operation_type',
+                       COALESCE(r->>'agent_name', r->>'agent', ''),
+                       r->>'status',
+                       count(*),
+                       COALESCE(sum((r->>'execution_time_ms')::bigint), 0)
+                FROM (SELECT to_jsonb(s) AS r FROM system_operation_log s) rows
+                WHERE COALESCE(r->>'ts', r->>'started_at') IS NOT NULL
+                GROUP BY 1, 2, 3, 4
+                ON CONFLICT DO NOTHING;
+            END IF;
+        END $$;
+    """))
+
+    # 保留策略：user_operation_log 整個月分區直接 DROP，system_operation_log 依時間欄位刪除
+    op.execute(text("""
+        CREATE OR REPLACE FUNCTION prune_operation_logs(
+            keep_days INTEGER DEFAULT 90,
+            keep_summary_days INTEGER DEFAULT 400
+        ) RETURNS INTEGER AS $$
+        DECLARE
+            cutoff  TIMESTAMPTZ := NOW() - make_interval(days => keep_days);
+            part    RECORD;
+            ts_col  TEXT;
+            dropped INTEGER := 0;
+        BEGIN
+            FOR part IN
+                SELECT c.relname
+                FROM pg_inherits i
+                JOIN pg_class c ON c.oid = i.inhrelid
+                JOIN pg_class p ON p.oid = i.inhparent
+                WHERE p.relname = 'user_operation_log'
+                  AND c.relname ~ '^user_operation_log_[0-9]{6}$'
+            LOOP
+                -- 分區的月底早於 cutoff 才整個刪除
+                IF to_date(right(part.relname, 6), 'YYYYMM') + INTERVAL '1 month' <= cutoff THEN
+                    EXECUTE format('DROP TABLE IF EXISTS %I', part.relname);
+                    dropped := dropped + 1;
+                END IF;
+            END LOOP;
+
+            IF to_regclass('public.user_operation_log_default') IS NOT NULL THEN
+                DELETE FROM user_operation_log_default WHERE ts < cutoff;
+            END IF;
+
+            SELECT column_name INTO ts_col
+            FROM information_schema.columns
+            WHERE table_name = 'system_operation_log' AND column_name IN ('ts', 'started_at')
+            ORDER BY column_name = 'ts' DESC
+            LIMIT 1;
+            IF ts_col IS NOT NULL THEN
+                EXECUTE format('DELETE FROM system_operation_log WHERE %I < $1', ts_col) USING cutoff;
+            END IF;
+
+            DELETE FROM system_operation_log_hourly
+             WHERE bucket < NOW() - make_interval(days => keep_summary_days);
+            DELETE FROM user_operation_log_hourly
+             WHERE bucket < NOW() - make_interval(days => keep_summary_days);
+            RETURN dropped;
+        END;
+        $$ LANGUAGE plpgsql;
+    """))
+
+
+def downgrade() -> None:
+    """回滾migration（分區表保留資料，不還原為一般表）"""
+    op.execute(text("DROP FUNCTION IF EXISTS prune_operation_logs(INTEGER, INTEGER);"))
+    op.execute(text("DROP TRIGGER IF EXISTS trg_user_operation_log_rollup ON user_operation_log;"))
+    op.execute(text("""
+        DO $$
+        BEGIN
+            IF to_regclass('public.system_operation_log') IS NOT NULL THEN
+                DROP TRIGGER IF EXISTS trg_system_operation_log_rollup ON system_operation_log;
+            END IF;
+        END $$;
+    """))
+    op.execute(text("DROP FUNCTION IF EXISTS user_operation_log_rollup();"))
+    op.execute(text("DROP FUNCTION IF EXISTS system_operation_log_rollup();"))
+    op.execute(text("DROP TABLE IF EXISTS user_operation_log_hourly;"))
+    op.execute(text("DROP TABLE IF EXISTS system_operation_log_hourly;"))
+    op.execute(text("DROP INDEX IF EXISTS idx_system_ops_keyset;"))
+    op.execute(text("DROP INDEX IF EXISTS idx_user_ops_keyset;"))
+    op.execute(text("DROP FUNCTION IF EXISTS ensure_monthly_partition(TEXT, TEXT, TIMESTAMPTZ);"))
@@ -0,0 +1,35 @@
+"""add post_feature_vectors cache for corpus feature extraction
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import text
+
+
+# revision identifiers, used by Alembic.
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """逐篇貼文的結構特徵向量，以內容雜湊為鍵（post_analyzer 語料庫分析快取）"""
+    op.execute(text("""
+        CREATE TABLE IF NOT EXISTS post_feature_vectors (
+            content_hash       TEXT PRIMARY KEY,          -- sha1(貼文內容)
+            extractor_version  INTEGER NOT NULL,          -- 規則版本，不符時視為未命中
+            features           JSONB NOT NULL,
+            created_at         TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            updated_at         TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        );
+    """))
+
+
+def downgrade() -> None:
+    """回滾migration"""
+    op.execute(text("DROP TABLE IF EXISTS post_feature_vectors;"))
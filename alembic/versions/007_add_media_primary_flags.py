@@ -0,0 +1,74 @@
+"""add is_primary / primary_score columns to media_files
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import text
+
+
+# revision identifiers, used by Alembic.
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+
+def _execute_if_table_exists(table: str, statement: str) -> None:
+    op.execute(text(f"""
+        DO $$
+        BEGIN
+            IF to_regclass('public.{table}') IS NOT NULL THEN
+                EXECUTE $stmt${statement}$stmt$;
+            END IF;
+        END $$;
+    """))
+
+
+def upgrade() -> None:
+    """主貼圖標記改為實體欄位（下載時整批分類寫入），並由舊的 metadata 鍵回填"""
+    _execute_if_table_exists(
+        "media_files",
+        "ALTER TABLE media_files ADD COLUMN IF NOT EXISTS is_primary BOOLEAN, "
+        "ADD COLUMN IF NOT EXISTS primary_score REAL",
+    )
+    _execute_if_table_exists(
+        "media_files",
+        """
+        UPDATE media_files
+        SET is_primary = CASE lower(metadata->>'is_primary')
+                             WHEN 'true' THEN TRUE WHEN 'false' THEN FALSE END,
+            primary_score = CASE WHEN metadata->>'primary_score' ~ '^-?[0-9]+(\\.[0-9]+)?([eE][-+]?[0-9]+)?$'
+                                 THEN (metadata->>'primary_score')::real END
+        WHERE is_primary IS NULL AND metadata ? 'is_primary'
+        """,
+    )
+    # 描述清單只取非「已知非主圖」的項目；media_files 為上線中的熱點資料表，
+    # 以 CONCURRENTLY 建立不鎖寫入（不能在交易或 DO 區塊內，資料表檢查改在 Python 端）
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        if bind.execute(text("SELECT to_regclass('public.media_files') IS NOT NULL")).scalar():
+            # 先前 CONCURRENTLY 建立失敗留下的 INVALID 索引要先移除，否則 IF NOT EXISTS 會略過重建
+            invalid = bind.execute(text("""
+                SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+                WHERE c.relname = 'idx_media_files_post_url_primary' AND NOT i.indisvalid
+            """)).scalar()
+            if invalid:
+                op.execute(text("DROP INDEX CONCURRENTLY IF EXISTS idx_media_files_post_url_primary"))
+            op.execute(text(
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_media_files_post_url_primary "
+                "ON media_files (post_url) WHERE is_primary IS DISTINCT FROM FALSE"
+            ))
+
+
+def downgrade() -> None:
+    """回滾migration"""
+    with op.get_context().autocommit_block():
+        op.execute(text("DROP INDEX CONCURRENTLY IF EXISTS idx_media_files_post_url_primary"))
+    _execute_if_table_exists(
+        "media_files",
+        "ALTER TABLE media_files DROP COLUMN IF EXISTS primary_score, DROP COLUMN IF EXISTS is_primary",
+    )
@@ -251,18 +251,21 @@ class A2AClient:
         message: A2AMessage,
         stream: bool = True
     ) -> Union[Dict[str, Any], AsyncIterable[Dict[str, Any]]]:
-        """發送 A2A 訊息"""
-        import httpx
+        """
+        發送 A2A 訊息（共用對端連線池；串流模式在迭代期間才佔用連線）
+
+        串流模式在安裝 msgpack 時要求 msgpack 分框回應，對端不支援時自動退回 SSE。
+        """
+        from common.http_clients import get_http_client
         
         url = f"{self.base_url}/a2a/message"
+        client = get_http_client(f"a2a:{self.base_url}", base_url=self.base_url)
         
-        async with httpx.AsyncClient() as client:
-            if stream:
-                return self._stream_response(client, url, message)
-            else:
-                response = await client.post(url, json=message.to_dict())
-                response.raise_for_status()
-                return response.json()
+        if stream:
+            return self._stream_response(client, url, message)
+        response = await client.post(url, json=message.to_dict())
+        response.raise_for_status()
+        return response.json()
     
     async def _stream_response(
         self, 
@@ -271,9 +274,20 @@ class A2AClient:
         message: A2AMessage
     ) -> AsyncIterable[Dict[str, Any]]:
         """處理流式回應"""
-        async with client.stream("POST", url, json=message.to_dict()) as response:
+        from common import wire_format
+
+        accept = "text/event-stream"
+        if wire_format.frames_supported():
+            accept = f"{wire_format.A2A_FRAMES}, text/event-stream;q=0.5"
+
+        async with client.stream("POST", url, json=message.to_dict(), headers={"Accept": accept}) as response:
             response.raise_for_status()
             
+            if response.headers.get("content-type", "").startswith(wire_format.A2A_FRAMES):
+                async for data in wire_format.iter_frames(response.aiter_bytes()):
+                    yield data
+                return
+            
             async for line in response.aiter_lines():
                 if line.startswith("data: "):
                     try:
@@ -283,6 +297,44 @@ class A2AClient:
                         continue
 
 
+def a2a_event_response(results: AsyncIterable[Dict[str, Any]], accept: Optional[str] = None):
+    """
+    /a2a/message 的串流回應：呼叫方接受 msgpack 分框時回傳分框串流，否則回傳 SSE
+
+    兩種格式的事件內容相同；處理中發生例外時送出 {"error": ...} 事件後結束。
+    """
+    from common import wire_format
+
+    if wire_format.accepts_frames(accept):
+        from fastapi.responses import StreamingResponse as FrameStreamingResponse
+
+        async def frame_stream():
+            try:
+                async for result in results:
+                    yield wire_format.encode_frame(result)
+            except Exception as e:
+                yield wire_format.encode_frame({"error": str(e)})
+
+        return FrameStreamingResponse(frame_stream(), media_type=wire_format.A2A_FRAMES)
+
+    from sse_starlette.sse import EventSourceResponse
+
+    async def event_stream():
+        try:
+            async for result in results:
+                yield {
+                    "event": "data",
+                    "data": json.dumps(result)
+                }
+        except Exception as e:
+            yield {
+                "event": "error", 
+                "data": json.dumps({"error": str(e)})
+            }
+
+    return EventSourceResponse(event_stream())
+
+
 class BaseAgent:
     """基礎 Agent 類別"""
     
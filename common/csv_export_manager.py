@@ -9,10 +9,146 @@ import asyncio
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional, Union
 from pathlib import Path
-import pandas as pd
 
 from .db_client import DatabaseClient
+from .query_registry import register_query
 from .incremental_crawl_manager import IncrementalCrawlManager
+from .streaming_export import ExportColumn, export_filename, export_to_file, iter_export
+
+
+def _join_array(value) -> str:
+    """JSON 陣列字串（或 list）→ 以 | 串接"""
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return ""
+    return "|".join(str(item) for item in value) if isinstance(value, list) else ""
+
+
+def _to_float(value):
+    """Decimal → float（Parquet 不接受混合 Decimal 精度）"""
+    return float(value) if value is not None else None
+
+
+HISTORY_COLUMNS = [
+    ExportColumn('貼文ID', 'post_id'),
+    ExportColumn('URL', 'url'),
+    ExportColumn('觀看數', 'views_count', kind='int'),
+    ExportColumn('按讚數', 'likes_count', kind='int'),
+    ExportColumn('留言數', 'comments_count', kind='int'),
+    ExportColumn('轉發數', 'reposts_count', kind='int'),
+    ExportColumn('分享數', 'shares_count', kind='int'),
+    ExportColumn('內容', 'content'),
+    ExportColumn('數據來源', 'source'),
+    ExportColumn('處理階段', 'processing_stage'),
+    ExportColumn('數據完整', 'is_complete'),
+    ExportColumn('計算分數', 'calculated_score', _to_float, 'float'),
+    ExportColumn('創建時間', 'created_at'),
+    ExportColumn('爬取時間', 'fetched_at'),
+    ExportColumn('觀看數更新時間', 'views_fetched_at'),
+]
+
+PLAYWRIGHT_USER_POSTS_QUERY = """
+    SELECT ROW_NUMBER() OVER (ORDER BY fetched_at DESC) AS seq,
+           username, post_id, content, views_count,
+           likes_count, comments_count, reposts_count, shares_count,
+           calculated_score, post_published_at, tags, images, videos,
+           url, source, crawler_type, crawl_id, created_at, fetched_at
+    FROM playwright_post_metrics 
+    WHERE username = $1 
+      AND COALESCE(source, '') <> 'playwright_dedup_filtered'
+    ORDER BY fetched_at DESC
+"""
+register_query("export.playwright_user_posts", PLAYWRIGHT_USER_POSTS_QUERY)
+
+# 歷史數據查詢：時間格式化與空值處理在 SQL 內完成；LIMIT 參數為 NULL 時不限筆數
+# ORDER BY 必須寫 post_metrics_sql.fetched_at：裸 fetched_at 會綁到 to_char 的輸出別名，變成字串排序
+_HISTORY_SELECT = """
+    SELECT 
+        post_id,
+        url,
+        NULLIF(views_count, 0) AS views_count,
+        NULLIF(likes_count, 0) AS likes_count,
+        NULLIF(comments_count, 0) AS comments_count,
+        NULLIF(reposts_count, 0) AS reposts_count,
+        NULLIF(shares_count, 0) AS shares_count,
+        content,
+        source,
+        processing_stage,
+        CASE WHEN is_complete THEN '是' ELSE '否' END AS is_complete,
+        NULLIF(calculated_score, 0) AS calculated_score,
+        to_char(created_at, 'YYYY-MM-DD HH24:MI:SS') AS created_at,
+        to_char(fetched_at, 'YYYY-MM-DD HH24:MI:SS') AS fetched_at,
+        to_char(views_fetched_at, 'YYYY-MM-DD HH24:MI:SS') AS views_fetched_at
+    FROM post_metrics_sql 
+"""
+register_query("export.history", _HISTORY_SELECT + """
+    WHERE username = $1
+    ORDER BY post_metrics_sql.fetched_at DESC
+    LIMIT $2
+""")
+register_query("export.history_since", _HISTORY_SELECT + """
+    WHERE username = $1 AND fetched_at >= $3
+    ORDER BY post_metrics_sql.fetched_at DESC
+    LIMIT $2
+""")
+
+register_query("export.daily_stats", """
+    SELECT 
+        DATE(fetched_at) as date,
+        COUNT(*) as posts_count,
+        COUNT(CASE WHEN views_count > 0 THEN 1 END) as posts_with_views,
+        COUNT(CASE WHEN content IS NOT NULL AND content != '' THEN 1 END) as posts_with_content,
+        AVG(views_count) as avg_views,
+        MAX(views_count) as max_views,
+        AVG(likes_count) as avg_likes,
+        MAX(likes_count) as max_likes,
+        AVG(comments_count) as avg_comments,
+        MAX(comments_count) as max_comments,
+        COUNT(DISTINCT source) as source_types
+    FROM post_metrics_sql 
+    WHERE username = $1
+    GROUP BY DATE(fetched_at)
+    ORDER BY DATE(fetched_at) DESC
+""")
+
+PLAYWRIGHT_USER_COLUMNS_ZH = [
+    ExportColumn("序號", "seq", kind="int"),
+    ExportColumn("用戶名", "username"),
+    ExportColumn("貼文ID", "post_id"),
+    ExportColumn("URL", "url"),
+    ExportColumn("內容", "content"),
+    ExportColumn("觀看數", "views_count", kind="int"),
+    ExportColumn("按讚數", "likes_count", kind="int"),
+    ExportColumn("留言數", "comments_count", kind="int"),
+    ExportColumn("轉發數", "reposts_count", kind="int"),
+    ExportColumn("分享數", "shares_count", kind="int"),
+    ExportColumn("計算分數", "calculated_score", _to_float, "float"),
+    ExportColumn("發布時間", "post_published_at", kind="timestamp"),
+    ExportColumn("標籤", "tags", _join_array),
+    ExportColumn("圖片", "images", _join_array),
+    ExportColumn("影片", "videos", _join_array),
+    ExportColumn("來源", "source"),
+    ExportColumn("爬蟲類型", "crawler_type"),
+    ExportColumn("爬取ID", "crawl_id"),
+    ExportColumn("建立時間", "created_at", kind="timestamp"),
+    ExportColumn("爬取時間", "fetched_at", kind="timestamp"),
+]
+
+PLAYWRIGHT_USER_COLUMNS_RAW = [
+    ExportColumn(key, key, transform, kind)
+    for key, transform, kind in (
+        ("url", None, "string"), ("post_id", None, "string"), ("username", None, "string"),
+        ("content", None, "string"), ("likes_count", None, "int"), ("comments_count", None, "int"),
+        ("reposts_count", None, "int"), ("shares_count", None, "int"), ("views_count", None, "int"),
+        ("calculated_score", _to_float, "float"),
+        ("created_at", None, "timestamp"), ("post_published_at", None, "timestamp"),
+        ("tags", _join_array, "string"), ("images", _join_array, "string"), ("videos", _join_array, "string"),
+        ("source", None, "string"), ("crawler_type", None, "string"), ("crawl_id", None, "string"),
+        ("fetched_at", None, "timestamp"),
+    )
+]
 
 class CSVExportManager:
     """CSV導出管理器"""
@@ -128,102 +264,66 @@ class CSVExportManager:
             raise
     
     async def export_database_history(self, username: str, output_path: str = None, 
-                                     days_back: int = None, limit: int = None) -> str:
+                                     days_back: int = None, limit: int = None, fmt: str = "csv") -> str:
         """
-        導出資料庫歷史數據到CSV
+        導出資料庫歷史數據（伺服器端游標串流寫檔，記憶體用量與筆數無關）
         
         Args:
             username: 帳號名稱
-            output_path: 輸出CSV文件路径（可選）
+            output_path: 輸出文件路径（可選）
             days_back: 回溯天數（可選）
             limit: 限制記錄數（可選）
+            fmt: csv / csv.gz / parquet
         
         Returns:
-            生成的CSV文件路径
+            生成的文件路径
         """
         try:
             # 生成輸出文件名
             if not output_path:
                 timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
                 suffix = f"_{days_back}days" if days_back else f"_top{limit}" if limit else "_all"
-                output_path = f"export_history_{username}{suffix}_{timestamp}.csv"
-            
-            # 構建查詢條件
-            where_conditions = ["username = $1"]
-            params = [username]
-            
-            if days_back:
-                where_conditions.append("fetched_at >= $2")
-                params.append(datetime.now() - timedelta(days=days_back))
+                output_path = export_filename(f"export_history_{username}{suffix}_{timestamp}", fmt)
             
-            where_clause = " AND ".join(where_conditions)
-            limit_clause = f" LIMIT {limit}" if limit else ""
+            query_name, params = self._history_query(username, days_back, limit)
+            count = await export_to_file(self.db.iter_named(query_name, *params), HISTORY_COLUMNS, output_path, fmt)
             
-            # 查詢資料庫
-            query = f"""
-                SELECT 
-                    post_id,
-                    url,
-                    content,
-                    likes_count,
-                    comments_count,
-                    reposts_count,
-                    shares_count,
-                    views_count,
-                    source,
-                    processing_stage,
-                    is_complete,
-                    created_at,
-                    fetched_at,
-                    views_fetched_at,
-                    calculated_score
-                FROM post_metrics_sql 
-                WHERE {where_clause}
-                ORDER BY fetched_at DESC
-                {limit_clause}
-            """
-            
-            results = await self.db.fetch_all(query, *params)
-            
-            if not results:
+            if not count:
+                Path(output_path).unlink(missing_ok=True)
                 raise ValueError(f"未找到帳號 @{username} 的歷史數據")
             
-            # 準備CSV數據
-            csv_data = []
-            for row in results:
-                csv_row = {
-                    '貼文ID': row['post_id'],
-                    'URL': row['url'],
-                    '觀看數': row['views_count'] or '',
-                    '按讚數': row['likes_count'] or '',
-                    '留言數': row['comments_count'] or '',
-                    '轉發數': row['reposts_count'] or '',
-                    '分享數': row['shares_count'] or '',
-                    '內容': row['content'] or '',
-                    '數據來源': row['source'] or '',
-                    '處理階段': row['processing_stage'] or '',
-                    '數據完整': '是' if row['is_complete'] else '否',
-                    '計算分數': row['calculated_score'] or '',
-                    '創建時間': row['created_at'].strftime('%Y-%m-%d %H:%M:%S') if row['created_at'] else '',
-                    '爬取時間': row['fetched_at'].strftime('%Y-%m-%d %H:%M:%S') if row['fetched_at'] else '',
-                    '觀看數更新時間': row['views_fetched_at'].strftime('%Y-%m-%d %H:%M:%S') if row['views_fetched_at'] else ''
-                }
-                csv_data.append(csv_row)
-            
-            # 寫入CSV
-            with open(output_path, 'w', newline='', encoding='utf-8-sig') as f:
-                if csv_data:
-                    writer = csv.DictWriter(f, fieldnames=csv_data[0].keys())
-                    writer.writeheader()
-                    writer.writerows(csv_data)
-            
-            print(f"✅ 歷史數據已導出到: {output_path} ({len(csv_data)} 條記錄)")
+            print(f"✅ 歷史數據已導出到: {output_path} ({count} 條記錄)")
             return output_path
             
         except Exception as e:
             print(f"❌ 導出歷史數據失敗: {e}")
             raise
     
+    @staticmethod
+    def _history_query(username: str, days_back: int = None, limit: int = None):
+        """歷史數據具名查詢與參數：有回溯天數時用 export.history_since，文字固定、LIMIT 參數化"""
+        params = [username, int(limit) if limit else None]
+        if days_back:
+            params.append(datetime.now() - timedelta(days=days_back))
+            return "export.history_since", params
+        return "export.history", params
+    
+    def stream_playwright_user_posts(self, username: str, fmt: str = "csv", layout: str = "zh"):
+        """
+        串流導出 Playwright 用戶貼文（供 StreamingResponse 直接回傳）
+        
+        Args:
+            username: 帳號名稱
+            fmt: csv / csv.gz / parquet
+            layout: zh（中文欄位、含序號）或 raw（與 JSON 欄位一致）
+        
+        Returns:
+            bytes 區塊的 async iterator
+        """
+        columns = PLAYWRIGHT_USER_COLUMNS_ZH if layout == "zh" else PLAYWRIGHT_USER_COLUMNS_RAW
+        rows = self.db.iter_named("export.playwright_user_posts", username)
+        return iter_export(rows, columns, fmt)
+    
     async def export_combined_analysis(self, username: str, output_path: str = None) -> str:
         """
         導出組合分析數據到CSV（統計摘要）
@@ -242,26 +342,7 @@ class CSVExportManager:
                 output_path = f"export_analysis_{username}_{timestamp}.csv"
             
             # 獲取統計數據
-            stats_query = """
-                SELECT 
-                    DATE(fetched_at) as date,
-                    COUNT(*) as posts_count,
-                    COUNT(CASE WHEN views_count > 0 THEN 1 END) as posts_with_views,
-                    COUNT(CASE WHEN content IS NOT NULL AND content != '' THEN 1 END) as posts_with_content,
-                    AVG(views_count) as avg_views,
-                    MAX(views_count) as max_views,
-                    AVG(likes_count) as avg_likes,
-                    MAX(likes_count) as max_likes,
-                    AVG(comments_count) as avg_comments,
-                    MAX(comments_count) as max_comments,
-                    COUNT(DISTINCT source) as source_types
-                FROM post_metrics_sql 
-                WHERE username = $1
-                GROUP BY DATE(fetched_at)
-                ORDER BY DATE(fetched_at) DESC
-            """
-            
-            results = await self.db.fetch_all(stats_query, username)
+            results = await self.db.fetch_named("export.daily_stats", username)
             
             if not results:
                 raise ValueError(f"未找到帳號 @{username} 的統計數據")
@@ -8,6 +8,7 @@
 """
 
 import asyncio
+import time
 import asyncpg
 from asyncpg import exceptions as pg_exc
 import json  # <<< 導入 json 模組
@@ -16,16 +17,36 @@ from datetime import datetime
 from contextlib import asynccontextmanager
 
 from .settings import get_settings
+from .query_registry import get_query, query_stats, record_query, resolve_statement
 import os
 
 
+# 長駐服務的連線池以常駐設定建立（閒置連線與快取語句不過期），見 DatabaseClient._pool_kwargs；
+# 服務行程在模組載入時呼叫 keep_pools_warm()，或以環境變數 DB_POOL_KEEP_WARM=true 開啟
+_KEEP_WARM_DEFAULT = os.getenv("DB_POOL_KEEP_WARM", "false").lower() in ("1", "true", "yes")
+
+
+def keep_pools_warm() -> None:
+    """之後建立的連線池一律使用常駐設定；須在第一個連線池建立前呼叫（服務模組載入時）"""
+    global _KEEP_WARM_DEFAULT
+    _KEEP_WARM_DEFAULT = True
+
+
 class DatabaseClient:
     """資料庫客戶端 - Plan E Tier-1 實現"""
     
-    def __init__(self):
+    def __init__(self, keep_warm: Optional[bool] = None):
         self.settings = get_settings()
         self.pool = None
         self._primary_url = self._compute_primary_url()
+        # None 表示沿用 keep_pools_warm() / DB_POOL_KEEP_WARM，於建立連線池時才決定
+        self._keep_warm = keep_warm
+        # 進行中的建池工作：同一事件迴圈上並行的 init_pool 共用，不會建出兩個池
+        self._pool_init_task: Optional[asyncio.Task] = None
+
+    @property
+    def keep_warm(self) -> bool:
+        return _KEEP_WARM_DEFAULT if self._keep_warm is None else self._keep_warm
 
     def _compute_primary_url(self) -> str:
         """決定主要資料庫連線 URL，優先用環境變數，再退回設定檔。
@@ -39,13 +60,75 @@ class DatabaseClient:
         return self.settings.database.url
     
     async def init_pool(self):
-        """初始化連接池"""
-        if self.pool is None:
-            self.pool = await self._create_pool_with_fallback(self._primary_url)
-        else:
-            # 若池已存在但處於關閉狀態，重新建立
-            if getattr(self.pool, "_closed", False):
-                self.pool = await self._create_pool_with_fallback(self._primary_url)
+        """初始化連接池（池不存在或已關閉時建立）
+
+        背景暖機與第一批請求可能同時呼叫：同一事件迴圈上共用同一個建池工作，
+        請求會等暖機中的池建好再借連線，而不是另外建一個冷的池。
+        """
+        if self.pool is not None and not getattr(self.pool, "_closed", False):
+            return
+        loop = asyncio.get_running_loop()
+        task = self._pool_init_task
+        if task is None or task.done() or task.get_loop() is not loop:
+            task = self._pool_init_task = loop.create_task(self._create_pool_with_fallback(self._primary_url))
+        # shield：單一等待者被取消時不取消共用的建池工作
+        pool = await asyncio.shield(task)
+        if self.pool is None or getattr(self.pool, "_closed", False):
+            self.pool = pool
+
+    def _pool_kwargs(self) -> Dict[str, Any]:
+        """
+        連線池參數
+
+        - DB_POOL_MIN_SIZE：常駐連線數（預設 1），暖機時會預先建立到此數量
+        - DB_POOL_MAX_INACTIVE_LIFETIME：閒置連線關閉秒數（預設 30；常駐池預設 0，即不關閉）
+        - DB_STATEMENT_CACHE_SIZE：每條連線快取的 prepared statement 數（預設 256，具名查詢與臨時 SQL 共用）
+        - DB_STATEMENT_CACHE_LIFETIME：prepared statement 快取秒數（預設 300；常駐池預設 0，即直到連線關閉）
+        """
+        max_size = self.settings.database.pool_size
+        min_size = min(int(os.getenv("DB_POOL_MIN_SIZE", "1")), max_size)
+        # 短命的池（如 Streamlit 每個事件迴圈一個）維持 30 秒回收；長駐服務的池保持熱連線
+        default_inactive = "0" if self.keep_warm else "30"
+        default_statement_lifetime = "0" if self.keep_warm else "300"
+        return {
+            "min_size": min_size,
+            "max_size": max_size,
+            "command_timeout": 60,
+            "max_inactive_connection_lifetime": float(os.getenv("DB_POOL_MAX_INACTIVE_LIFETIME", default_inactive)),
+            "statement_cache_size": int(os.getenv("DB_STATEMENT_CACHE_SIZE", "256")),
+            "max_cached_statement_lifetime": int(os.getenv("DB_STATEMENT_CACHE_LIFETIME", default_statement_lifetime)),
+        }
+
+    async def warm_up(self, statements: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        暖機：在既有連線池上同時借出 min_size 條連線，確保每條都已連上
+
+        只借出、PING、prepare，不關閉或重建連線池（服務已在接流量，請求同時在用這個池）。
+        常駐設定須在建池前決定（keep_pools_warm / DatabaseClient(keep_warm=True)）。
+        statements（SQL 或 query_registry 的註冊名稱）在每條連線上 prepare：伺服器端解析並完成
+        參數/欄位型別的 introspection（型別 codec 快取在連線上），第一個真正的請求不必再查型別。
+        """
+        await self.init_pool()
+        if not self.keep_warm:
+            print("⚠️ 連線池未使用常駐設定（keep_pools_warm 應在建池前呼叫），閒置連線仍會被回收")
+        size = max(self.pool.get_min_size(), 1)
+        statements = [resolve_statement(statement) for statement in statements or []]
+
+        # 先同時借出全部連線再逐條處理，確保暖到的是 size 條不同的連線
+        acquired = await asyncio.gather(*[self.pool.acquire(timeout=30) for _ in range(size)], return_exceptions=True)
+        connections = [conn for conn in acquired if not isinstance(conn, BaseException)]
+        try:
+            errors = [conn for conn in acquired if isinstance(conn, BaseException)]
+            if errors:
+                raise errors[0]
+            for conn in connections:
+                await conn.execute("SELECT 1")
+                for statement in statements:
+                    await conn.prepare(statement)
+        finally:
+            for conn in connections:
+                await self.pool.release(conn)
+        return {"connections": size, "pool_size": self.pool.get_size(), "statements": len(statements)}
 
     async def _create_pool_with_fallback(self, url: str):
         """建立連線池，處理數種常見故障：
@@ -53,45 +136,21 @@ class DatabaseClient:
         - 容器內誤用 localhost → 嘗試將 host 改成 postgres 後重試
         """
         try:
-            return await asyncpg.create_pool(
-                url,
-                min_size=1,
-                max_size=self.settings.database.pool_size,
-                command_timeout=60,
-                max_inactive_connection_lifetime=30.0,
-            )
+            return await asyncpg.create_pool(url, **self._pool_kwargs())
         except asyncpg.InvalidCatalogNameError:
             # database 不存在：嘗試用管理連線建立
             await self._ensure_database_exists(url)
-            return await asyncpg.create_pool(
-                url,
-                min_size=1,
-                max_size=self.settings.database.pool_size,
-                command_timeout=60,
-                max_inactive_connection_lifetime=30.0,
-            )
+            return await asyncpg.create_pool(url, **self._pool_kwargs())
         except Exception:
             # 若在容器內且 URL 指向 localhost/127.0.0.1，嘗試改為 postgres 後再試一次
             is_container = os.path.exists('/.dockerenv')
             if is_container and ('@localhost:' in url or '@127.0.0.1:' in url):
                 alt_url = url.replace('@localhost:', '@postgres:').replace('@127.0.0.1:', '@postgres:')
                 try:
-                    return await asyncpg.create_pool(
-                        alt_url,
-                        min_size=1,
-                        max_size=self.settings.database.pool_size,
-                        command_timeout=60,
-                        max_inactive_connection_lifetime=30.0,
-                    )
+                    return await asyncpg.create_pool(alt_url, **self._pool_kwargs())
                 except asyncpg.InvalidCatalogNameError:
                     await self._ensure_database_exists(alt_url)
-                    return await asyncpg.create_pool(
-                        alt_url,
-                        min_size=1,
-                        max_size=self.settings.database.pool_size,
-                        command_timeout=60,
-                        max_inactive_connection_lifetime=30.0,
-                    )
+                    return await asyncpg.create_pool(alt_url, **self._pool_kwargs())
             raise
 
     async def _ensure_database_exists(self, url: str) -> None:
@@ -120,6 +179,7 @@ class DatabaseClient:
     
     async def close_pool(self):
         """關閉連接池"""
+        self._pool_init_task = None
         if self.pool:
             await self.pool.close()
             self.pool = None
@@ -127,7 +187,7 @@ class DatabaseClient:
     @asynccontextmanager
     async def get_connection(self):
         """獲取資料庫連接的上下文管理器"""
-        # 池不存在或已關閉時重新初始化
+        # 池尚未建立（暖機中）或已關閉時：等共用的建池工作，不會在請求中另建一個池
         if not self.pool or getattr(self.pool, "_closed", False):
             await self.init_pool()
         
@@ -162,6 +222,83 @@ class DatabaseClient:
             return await conn.execute(query, *args)
         return await self._run_with_retry(_op)
 
+    async def iter_rows(self, query: str, *args, prefetch: int = 2000):
+        """以伺服器端游標逐批讀取查詢結果（常數記憶體，適合大量匯出）
+
+        每次向資料庫取 prefetch 筆；游標須在交易內，整個迭代期間佔用一條連線。
+        """
+        async with self.get_connection() as conn:
+            async with conn.transaction(readonly=True):
+                async for record in conn.cursor(query, *args, prefetch=prefetch):
+                    yield record
+
+    # ============================================================================
+    # 具名查詢（common.query_registry）：固定 SQL 文字命中 statement cache，並記錄統計
+    # ============================================================================
+
+    async def _run_named(self, name: str, op):
+        """執行具名查詢：op(conn, sql) 回傳 (結果, 列數)；每次嘗試各自記錄耗時"""
+        sql = get_query(name)
+
+        async def _op(conn):
+            started = time.perf_counter()
+            try:
+                result, rows = await op(conn, sql)
+            except Exception as e:
+                record_query(name, time.perf_counter() - started, error=e)
+                raise
+            record_query(name, time.perf_counter() - started, rows)
+            return result
+        return await self._run_with_retry(_op)
+
+    async def fetch_named(self, name: str, *args) -> List[Dict]:
+        """執行具名查詢並返回所有結果"""
+        async def _op(conn, sql):
+            rows = await conn.fetch(sql, *args)
+            return [dict(row) for row in rows], len(rows)
+        return await self._run_named(name, _op)
+
+    async def fetch_one_named(self, name: str, *args) -> Optional[Dict]:
+        """執行具名查詢並返回第一個結果"""
+        async def _op(conn, sql):
+            row = await conn.fetchrow(sql, *args)
+            return (dict(row), 1) if row else (None, 0)
+        return await self._run_named(name, _op)
+
+    async def execute_named(self, name: str, *args) -> str:
+        """執行具名 SQL 命令；列數取自命令狀態（如 UPDATE 3）"""
+        async def _op(conn, sql):
+            status = await conn.execute(sql, *args)
+            tail = status.rsplit(" ", 1)[-1] if status else ""
+            return status, int(tail) if tail.isdigit() else 0
+        return await self._run_named(name, _op)
+
+    async def iter_named(self, name: str, *args, prefetch: int = 2000):
+        """以伺服器端游標逐批讀取具名查詢結果；耗時只計等待資料庫的時間，不含呼叫方處理每列的時間"""
+        sql = get_query(name)
+        elapsed = 0.0
+        rows = 0
+        error = None
+        try:
+            async with self.get_connection() as conn:
+                async with conn.transaction(readonly=True):
+                    cursor = conn.cursor(sql, *args, prefetch=prefetch).__aiter__()
+                    while True:
+                        started = time.perf_counter()
+                        try:
+                            record = await cursor.__anext__()
+                        except StopAsyncIteration:
+                            elapsed += time.perf_counter() - started
+                            break
+                        elapsed += time.perf_counter() - started
+                        rows += 1
+                        yield record
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            record_query(name, elapsed, rows, error=error)
+
     async def run_with_retry(self, op):
         """對提供的操作（接受 conn 並返回 awaitable）套用連線重試。"""
         return await self._run_with_retry(op)
@@ -416,6 +553,12 @@ class DatabaseClient:
                     SELECT upsert_metrics($1, $2, $3, $4, $5, $6)
                 """, url, views, likes, comments, reposts, shares)
                 
+                from .metrics_history import safe_record_snapshots
+                await safe_record_snapshots(conn, "post_metrics", [{
+                    "url": url, "views_count": views, "likes_count": likes,
+                    "comments_count": comments, "reposts_count": reposts, "shares_count": shares,
+                }])
+                
                 return True
                 
         except Exception as e:
@@ -437,6 +580,7 @@ class DatabaseClient:
                 return 0
             
             success_count = 0
+            saved_metrics = []
             
             async with self.get_connection() as conn:
                 async with conn.transaction():
@@ -453,10 +597,25 @@ class DatabaseClient:
                             metrics.get("shares")
                             )
                             success_count += 1
+                            saved_metrics.append(metrics)
                             
                         except Exception as e:
                             print(f"批次插入單個指標失敗 {metrics.get('url')}: {e}")
                             continue
+                    
+                    # 追加歷史快照（一次往返，只含成功寫入的指標）
+                    from .metrics_history import safe_record_snapshots
+                    await safe_record_snapshots(conn, "post_metrics", [
+                        {
+                            "url": m.get("url"),
+                            "views_count": m.get("views"),
+                            "likes_count": m.get("likes"),
+                            "comments_count": m.get("comments"),
+                            "reposts_count": m.get("reposts"),
+                            "shares_count": m.get("shares"),
+                        }
+                        for m in saved_metrics
+                    ])
             
             return success_count
             
@@ -932,7 +1091,9 @@ class DatabaseClient:
                 return {
                     "status": "healthy",
                     "database_version": version,
-                    "connection_pool": pool_info
+                    "connection_pool": pool_info,
+                    # 本行程累計耗時最高的具名查詢
+                    "top_queries": query_stats(top=5)
                 }
                 
         except Exception as e:
@@ -952,21 +1113,23 @@ async def get_db_client() -> DatabaseClient:
 
     - 避免「Future attached to a different loop」。
     - 對於 Streamlit 每次互動的潛在新事件迴圈，會取得對應的連線池。
+    - 長駐服務先呼叫 keep_pools_warm()，這裡建立的池即為常駐設定。
     """
     global _db_clients
     current_loop = asyncio.get_running_loop()
     loop_key = id(current_loop)
 
     client: DatabaseClient = _db_clients.get(loop_key)
-    if client is None or (client.pool is None) or getattr(client.pool, "_closed", False):
+    if client is None or getattr(client.pool, "_closed", False):
+        # 先登記再建池：並行的呼叫者（例如背景暖機與第一個請求）拿到同一個 client，共用同一次建池
         client = DatabaseClient()
-        await client.init_pool()
         _db_clients[loop_key] = client
+    await client.init_pool()
 
-    # 清理已關閉或失效的舊池（保守清理）
+    # 清理已關閉的舊池（保守清理）
     to_delete = []
     for k, v in _db_clients.items():
-        if v is not client and (v.pool is None or getattr(v.pool, "_closed", False)):
+        if v is not client and getattr(v.pool, "_closed", False):
             to_delete.append(k)
     for k in to_delete:
         _db_clients.pop(k, None)
@@ -0,0 +1,67 @@
+"""
+匯出下載連結簽章
+
+UI 為單次下載簽發短效 token（HMAC-SHA256，內含用戶、格式、欄位版型與到期時間），
+瀏覽器帶 token 向 MCP Server 的匯出代理端點下載；代理驗證後把 Agent 的串流匯出
+逐塊轉送，檔案不落地、也不經 Streamlit 行程。
+
+簽章密鑰取自 EXPORT_LINK_SECRET（未設定時沿用 AUTH_JWT_SECRET），簽發端與驗證端需一致。
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+import time
+from typing import Any, Dict
+
+from .streaming_export import EXPORT_FORMATS
+
+EXPORT_LINK_TTL_SECONDS = int(os.getenv("EXPORT_LINK_TTL_SECONDS", "900"))
+EXPORT_LAYOUTS = ("zh", "raw")
+
+
+def _secret() -> bytes:
+    return (os.getenv("EXPORT_LINK_SECRET") or os.getenv("AUTH_JWT_SECRET", "dev-secret-change-me")).encode()
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode((text + "=" * (-len(text) % 4)).encode())
+
+
+def sign_export_token(username: str, fmt: str, layout: str, ttl: int = EXPORT_LINK_TTL_SECONDS) -> str:
+    """簽發匯出下載 token（預設 15 分鐘內有效）"""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"不支援的匯出格式: {fmt}")
+    if layout not in EXPORT_LAYOUTS:
+        raise ValueError(f"不支援的欄位版型: {layout}")
+    payload = _b64encode(json.dumps(
+        {"u": username, "f": fmt, "l": layout, "exp": int(time.time()) + ttl},
+        separators=(",", ":"), ensure_ascii=False,
+    ).encode())
+    signature = _b64encode(hmac.new(_secret(), payload.encode(), hashlib.sha256).digest())
+    return f"{payload}.{signature}"
+
+
+def verify_export_token(token: str) -> Dict[str, Any]:
+    """驗證 token，回傳 {username, fmt, layout}；簽章錯誤或已過期時拋出 ValueError"""
+    try:
+        payload, signature = token.split(".", 1)
+        expected = _b64encode(hmac.new(_secret(), payload.encode(), hashlib.sha256).digest())
+        if not hmac.compare_digest(signature, expected):
+            raise ValueError("簽章不符")
+        claims = json.loads(_b64decode(payload))
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ValueError(f"token 格式錯誤: {e}")
+    if int(claims.get("exp", 0)) < time.time():
+        raise ValueError("下載連結已過期")
+    if not claims.get("u") or claims.get("f") not in EXPORT_FORMATS or claims.get("l") not in EXPORT_LAYOUTS:
+        raise ValueError("token 內容無效")
+    return {"username": claims["u"], "fmt": claims["f"], "layout": claims["l"]}
@@ -11,11 +11,13 @@ import asyncio
 import json
 import logging
 from datetime import datetime
-from typing import Set, List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any
 from contextlib import asynccontextmanager
 
 from .db_client import DatabaseClient
 from .models import PostMetrics
+from .post_id_index import PostIdIndex, ExistingPostIds
+from .metrics_history import safe_record_snapshots
 
 
 class CrawlHistoryDAO:
@@ -23,31 +25,23 @@ class CrawlHistoryDAO:
     
     def __init__(self):
         self.db_client = DatabaseClient()
+        self.post_index = PostIdIndex(self.db_client)
     
-    async def get_existing_post_ids(self, username: str) -> Set[str]:
+    async def get_existing_post_ids(self, username: str) -> ExistingPostIds:
         """
         獲取指定用戶已抓取的post_id集合
         
-        優化：使用latest_post_id提升查詢效率
+        優化：不再整表撈出 post_id，改為回傳按需解析的集合；
+        呼叫端對新看到的候選 ID 執行 `await existing.resolve(ids)`，
+        由 Redis Bloom Filter 篩選、僅可能存在者回資料庫確認。
         """
+        existing = ExistingPostIds(self.post_index, username)
         try:
-            async with self.db_client.get_connection() as conn:
-                # 查詢已存在的post_id（目前從JSON調試文件模擬）
-                # TODO: 後續改為從真實SQL表查詢
-                # 🔥 修復：為 Playwright 爬蟲查詢專用的表
-                result = await conn.fetch("""
-                    SELECT post_id FROM playwright_post_metrics 
-                    WHERE username = $1 AND crawler_type = 'playwright'
-                    ORDER BY created_at DESC
-                """, username)
-                
-                post_ids = {row['post_id'] for row in result}
-                logging.info(f"📚 {username} 已有 {len(post_ids)} 篇貼文記錄 (Playwright專用表)")
-                return post_ids
-                
+            existing.total_count = await self.post_index.ensure_built(username)
+            logging.info(f"📚 {username} 已有約 {existing.total_count} 篇貼文記錄 (Playwright專用表)")
         except Exception as e:
-            logging.warning(f"⚠️ 讀取 {username} 歷史記錄失敗: {e}")
-            return set()
+            logging.warning(f"⚠️ 讀取 {username} 歷史索引失敗，將逐批查詢資料庫: {e}")
+        return existing
     
     async def get_crawl_state(self, username: str) -> Optional[Dict[str, Any]]:
         """獲取用戶爬取狀態"""
@@ -84,6 +78,7 @@ class CrawlHistoryDAO:
         try:
             async with self.db_client.get_connection() as conn:
                 success_count = 0
+                saved_posts = []
                 
                 # 批次UPSERT
                 for post in posts:
@@ -149,11 +144,26 @@ class CrawlHistoryDAO:
                         post.reader_status, post.dom_status, post.reader_processed_at, post.dom_processed_at
                         )
                         success_count += 1
+                        saved_posts.append(post)
                         
                     except Exception as e:
                         logging.error(f"❌ 插入貼文 {post.post_id} 失敗: {e}")
                         continue
                 
+                # 追加歷史快照（一次往返，只含成功寫入的貼文），保留指標成長曲線
+                await safe_record_snapshots(conn, "post_metrics_sql", [
+                    {
+                        "url": post.url,
+                        "username": post.username,
+                        "views_count": post.views_count,
+                        "likes_count": post.likes_count,
+                        "comments_count": post.comments_count,
+                        "reposts_count": post.reposts_count,
+                        "shares_count": post.shares_count,
+                    }
+                    for post in saved_posts
+                ])
+                
                 logging.info(f"✅ 成功處理 {success_count}/{len(posts)} 篇貼文")
                 return success_count
                 
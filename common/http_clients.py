@@ -0,0 +1,347 @@
+"""
+服務間 HTTP 客戶端註冊表
+
+各服務呼叫其他 Agent / 服務時共用長連線，不再每個請求建立一個 httpx.AsyncClient：
+- 每個對端（peer）一個連線池，keep-alive 重用 TCP 連線；安裝 h2 時對 HTTPS 對端啟用 HTTP/2
+- 每個對端可設定逾時、重試次數；重試受「重試預算」限制（約為請求數的 20%），
+  對端異常時不會被重試放大流量
+- 斷路器：連續失敗達門檻後短時間內直接拋出 CircuitOpenError（快速失敗），
+  冷卻後放行一個試探請求，成功才恢復
+- 每個對端的請求數、錯誤數、延遲分位數可由 get_http_registry().stats() 取得
+
+連線池依事件迴圈分開建立（與 db_client 相同，Streamlit 每次互動可能是新的迴圈）；
+斷路器與統計則為行程層級共用。
+
+用法：
+    client = get_http_client("form-api", base_url=settings.service_urls.form_api_url, timeout=30)
+    response = await client.post("/form/xxx/questions", json=payload)
+"""
+
+import asyncio
+import importlib.util
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Deque, Dict, FrozenSet, Optional, Tuple
+
+import httpx
+
+
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+DEFAULT_TIMEOUT = float(os.getenv("HTTP_PEER_TIMEOUT", "30"))
+DEFAULT_CONNECT_TIMEOUT = float(os.getenv("HTTP_PEER_CONNECT_TIMEOUT", "5"))
+DEFAULT_RETRIES = int(os.getenv("HTTP_PEER_RETRIES", "2"))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("HTTP_BREAKER_FAILURES", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("HTTP_BREAKER_RESET_SECONDS", "30"))
+
+RETRYABLE_STATUS = frozenset({502, 503, 504})
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+LATENCY_WINDOW = 512
+
+
+class CircuitOpenError(httpx.HTTPError):
+    """對端斷路器開啟中，請求未送出"""
+
+    def __init__(self, peer: str, retry_after: float):
+        super().__init__(f"{peer} 斷路器開啟中，{retry_after:.0f} 秒後再試")
+        self.peer = peer
+        self.retry_after = retry_after
+
+
+@dataclass(frozen=True)
+class PeerPolicy:
+    """單一對端的連線與容錯設定"""
+    timeout: float = DEFAULT_TIMEOUT
+    connect_timeout: float = DEFAULT_CONNECT_TIMEOUT
+    retries: int = DEFAULT_RETRIES
+    retry_status: FrozenSet[int] = RETRYABLE_STATUS
+    failure_threshold: int = BREAKER_FAILURE_THRESHOLD
+    reset_timeout: float = BREAKER_RESET_SECONDS
+    max_connections: int = 100
+    max_keepalive: int = 20
+    keepalive_expiry: float = 30.0
+
+
+class CircuitBreaker:
+    """連續失敗計數的斷路器（closed → open → half-open → closed）"""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probe_started: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def before_request(self, peer: str) -> None:
+        state = self.state
+        if state == "open":
+            raise CircuitOpenError(peer, self.reset_timeout - (time.monotonic() - self.opened_at))
+        if state == "half_open":
+            # 同時只放行一個試探請求；試探被取消而沒有回報結果時，冷卻時間後再放行下一個
+            now = time.monotonic()
+            if self._probe_started is not None and now - self._probe_started < self.reset_timeout:
+                raise CircuitOpenError(peer, self.reset_timeout - (now - self._probe_started))
+            self._probe_started = now
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._probe_started = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probe_started = None
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+class RetryBudget:
+    """重試預算：每個請求存入 ratio 個 token（上限 max_tokens），每次重試花 1 個"""
+
+    def __init__(self, ratio: float = 0.2, max_tokens: float = 10.0):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+
+    def deposit(self) -> None:
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        return False
+
+
+@dataclass
+class PeerStats:
+    """單一對端的呼叫統計"""
+    requests: int = 0
+    errors: int = 0
+    retries: int = 0
+    short_circuited: int = 0
+    latencies_ms: Deque[float] = field(default_factory=lambda: deque(maxlen=LATENCY_WINDOW))
+
+    def observe(self, elapsed_ms: float, ok: bool) -> None:
+        self.requests += 1
+        if not ok:
+            self.errors += 1
+        self.latencies_ms.append(elapsed_ms)
+
+    def snapshot(self) -> Dict[str, Any]:
+        ordered = sorted(self.latencies_ms)
+
+        def percentile(p: float) -> Optional[float]:
+            if not ordered:
+                return None
+            return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))], 1)
+
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "error_rate": round(self.errors / self.requests, 4) if self.requests else 0.0,
+            "retries": self.retries,
+            "short_circuited": self.short_circuited,
+            "latency_ms": {"p50": percentile(0.5), "p95": percentile(0.95), "max": percentile(1.0)},
+        }
+
+
+class PeerClient:
+    """對單一對端的呼叫介面（重試、斷路器、統計）；底層連線池由註冊表依事件迴圈提供"""
+
+    def __init__(self, registry: "HTTPClientRegistry", name: str, base_url: str, policy: PeerPolicy):
+        self.registry = registry
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.policy = policy
+        self.breaker = CircuitBreaker(policy.failure_threshold, policy.reset_timeout)
+        self.budget = RetryBudget()
+        self.stats = PeerStats()
+
+    def _url(self, url: str) -> str:
+        return url if "://" in url else f"{self.base_url}/{url.lstrip('/')}"
+
+    def _timeout(self, timeout: Optional[float]) -> httpx.Timeout:
+        return httpx.Timeout(timeout or self.policy.timeout, connect=self.policy.connect_timeout)
+
+    def _should_retry(self, method: str, attempt: int, retries: int,
+                      response: Optional[httpx.Response], error: Optional[Exception]) -> bool:
+        if attempt >= retries:
+            return False
+        if error is not None:
+            # 非冪等請求只在連線尚未建立時重試（請求確定沒有送達）
+            if method not in IDEMPOTENT_METHODS and not isinstance(error, httpx.ConnectError):
+                return False
+        elif response is None or response.status_code not in self.policy.retry_status or method not in IDEMPOTENT_METHODS:
+            return False
+        if not self.budget.withdraw():
+            return False
+        self.stats.retries += 1
+        return True
+
+    async def request(self, method: str, url: str, *, timeout: Optional[float] = None,
+                      retries: Optional[int] = None, **kwargs) -> httpx.Response:
+        """送出請求；5xx 與連線錯誤計入斷路器，可重試的情況依重試預算重試"""
+        method = method.upper()
+        retries = self.policy.retries if retries is None else retries
+        client = self.registry.pool(self)
+        self.budget.deposit()
+
+        attempt = 0
+        while True:
+            try:
+                self.breaker.before_request(self.name)
+            except CircuitOpenError:
+                self.stats.short_circuited += 1
+                raise
+
+            started = time.perf_counter()
+            response: Optional[httpx.Response] = None
+            error: Optional[Exception] = None
+            try:
+                response = await client.request(method, self._url(url), timeout=self._timeout(timeout), **kwargs)
+            except httpx.TransportError as e:
+                error = e
+
+            failed = error is not None or response.status_code >= 500
+            self.stats.observe((time.perf_counter() - started) * 1000, ok=not failed)
+            if failed:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+
+            if not self._should_retry(method, attempt, retries, response, error):
+                if error is not None:
+                    raise error
+                return response
+            attempt += 1
+            await asyncio.sleep(min(2.0, 0.1 * 2 ** attempt))
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def delete(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("DELETE", url, **kwargs)
+
+    @asynccontextmanager
+    async def stream(self, method: str, url: str, *, timeout: Optional[float] = None,
+                     **kwargs) -> AsyncIterator[httpx.Response]:
+        """串流回應（不重試；建立連線與回應標頭的結果計入斷路器與統計）"""
+        try:
+            self.breaker.before_request(self.name)
+        except CircuitOpenError:
+            self.stats.short_circuited += 1
+            raise
+
+        started = time.perf_counter()
+        client = self.registry.pool(self)
+        try:
+            async with client.stream(method.upper(), self._url(url), timeout=self._timeout(timeout), **kwargs) as response:
+                failed = response.status_code >= 500
+                self.stats.observe((time.perf_counter() - started) * 1000, ok=not failed)
+                if failed:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+                yield response
+        except httpx.TransportError:
+            self.stats.observe((time.perf_counter() - started) * 1000, ok=False)
+            self.breaker.record_failure()
+            raise
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "base_url": self.base_url,
+            "circuit": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            **self.stats.snapshot(),
+        }
+
+
+class HTTPClientRegistry:
+    """行程層級的對端註冊表"""
+
+    def __init__(self):
+        self._peers: Dict[str, PeerClient] = {}
+        self._pools: Dict[Tuple[int, str], Tuple[asyncio.AbstractEventLoop, httpx.AsyncClient]] = {}
+
+    def peer(self, name: str, base_url: Optional[str] = None, policy: Optional[PeerPolicy] = None) -> PeerClient:
+        """取得（必要時建立）對端；base_url 只在第一次建立時需要"""
+        peer = self._peers.get(name)
+        if peer is None:
+            if base_url is None:
+                raise KeyError(f"未註冊的對端: {name}")
+            peer = self._peers[name] = PeerClient(self, name, base_url, policy or PeerPolicy())
+        elif base_url is not None and base_url.rstrip("/") != peer.base_url:
+            peer.base_url = base_url.rstrip("/")
+        return peer
+
+    def pool(self, peer: PeerClient) -> httpx.AsyncClient:
+        """目前事件迴圈中該對端的連線池"""
+        loop = asyncio.get_running_loop()
+        key = (id(loop), peer.name)
+        entry = self._pools.get(key)
+        if entry is not None and entry[0] is loop and not entry[1].is_closed:
+            return entry[1]
+
+        self._drop_closed_loops()
+        policy = peer.policy
+        client = httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            timeout=httpx.Timeout(policy.timeout, connect=policy.connect_timeout),
+            limits=httpx.Limits(
+                max_connections=policy.max_connections,
+                max_keepalive_connections=policy.max_keepalive,
+                keepalive_expiry=policy.keepalive_expiry,
+            ),
+        )
+        self._pools[key] = (loop, client)
+        return client
+
+    def _drop_closed_loops(self) -> None:
+        for key, (loop, _) in list(self._pools.items()):
+            if loop.is_closed():
+                del self._pools[key]
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """各對端的斷路器狀態、請求/錯誤/重試數與延遲分位數"""
+        return {name: peer.snapshot() for name, peer in sorted(self._peers.items())}
+
+    async def aclose(self) -> None:
+        """關閉目前事件迴圈的所有連線池（服務關閉時呼叫）"""
+        loop = asyncio.get_running_loop()
+        for key, (pool_loop, client) in list(self._pools.items()):
+            if pool_loop is loop:
+                await client.aclose()
+                del self._pools[key]
+
+
+# 全域實例（單例模式）
+_registry: Optional[HTTPClientRegistry] = None
+
+
+def get_http_registry() -> HTTPClientRegistry:
+    """取得行程層級的 HTTP 客戶端註冊表"""
+    global _registry
+    if _registry is None:
+        _registry = HTTPClientRegistry()
+    return _registry
+
+
+def get_http_client(name: str, base_url: Optional[str] = None, **policy: Any) -> PeerClient:
+    """取得對端客戶端；policy 欄位同 PeerPolicy（只在第一次建立時生效）"""
+    return get_http_registry().peer(name, base_url, PeerPolicy(**policy) if policy else None)
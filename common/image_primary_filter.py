@@ -5,9 +5,31 @@
 
 輸入記錄需要包含：width、height、file_size、original_url（可選）。
 輸出：score 介於 0~1、reason 簡短字串。
+
+classify_primary_batch 以 NumPy 對整批記錄向量化打分（結果與 compute_rule_score 逐筆相同），
+下載完成時即可整批分類；persist_primary_flags 以單次 executemany 寫回 media_files。
+未安裝 NumPy 時退回逐筆計算。
+
+設定：
+- MEDIA_PRIMARY_THRESHOLD：主貼圖門檻，預設 0.7
 """
 
-from typing import Dict, Tuple
+import importlib.util
+import os
+from typing import Dict, List, Sequence, Tuple
+
+from common.lazy_import import lazy_module
+
+# 選用相依：有安裝才使用，且延遲到第一次整批打分才載入
+np = lazy_module("numpy") if importlib.util.find_spec("numpy") else None
+
+
+DEFAULT_PRIMARY_THRESHOLD = float(os.getenv("MEDIA_PRIMARY_THRESHOLD", "0.7"))
+
+BAD_URL_TOKENS = ("avatar", "profile", "emoji", "sticker", "icon")
+
+# 與 compute_rule_score 的 reason 順序一致
+_REASON_FLAGS = ("tiny", "small", "very_small_file", "small_file", "extreme_ratio", "url_pattern")
 
 
 def _safe_num(value, default: int = 0) -> int:
@@ -60,8 +82,7 @@ def compute_rule_score(record: Dict) -> Tuple[float, str]:
         reason_parts.append("extreme_ratio")
 
     # URL 模式簡單排除：頭像/表情/emoji 等關鍵詞
-    bad_tokens = ["avatar", "profile", "emoji", "sticker", "icon"]
-    if any(t in url for t in bad_tokens):
+    if any(t in url for t in BAD_URL_TOKENS):
         score -= 0.3
         reason_parts.append("url_pattern")
 
@@ -75,3 +96,92 @@ def decide_is_primary(score: float, threshold: float = 0.7) -> bool:
     return score >= threshold
 
 
+def _url_flagged(record: Dict) -> bool:
+    url = (record.get("original_url") or "").lower()
+    return any(t in url for t in BAD_URL_TOKENS)
+
+
+def classify_primary_batch(records: Sequence[Dict],
+                           threshold: float = DEFAULT_PRIMARY_THRESHOLD) -> List[Tuple[float, str, bool]]:
+    """
+    整批計算主貼圖分數，回傳與 records 同序的 (score, reason, is_primary)。
+
+    扣分順序與 compute_rule_score 相同，浮點結果逐位元一致。
+    """
+    if not records:
+        return []
+    if np is None:
+        results = []
+        for record in records:
+            score, reason = compute_rule_score(record)
+            results.append((score, reason, decide_is_primary(score, threshold)))
+        return results
+
+    width = np.array([_safe_num(r.get("width")) for r in records], dtype=np.int64)
+    height = np.array([_safe_num(r.get("height")) for r in records], dtype=np.int64)
+    file_size = np.array([_safe_num(r.get("file_size")) for r in records], dtype=np.int64)
+    url_pattern = np.array([_url_flagged(r) for r in records], dtype=bool)
+
+    missing = (width <= 0) | (height <= 0)
+    area = width * height
+    short_side = np.minimum(width, height)
+    aspect = width / np.where(height > 0, height, 1)
+
+    tiny = (short_side < 200) | (area < 80_000)
+    small = ~tiny & ((short_side < 300) | (area < 120_000))
+    has_size = file_size != 0
+    very_small_file = has_size & (file_size < 40_000)
+    small_file = has_size & ~very_small_file & (file_size < 80_000)
+    extreme_ratio = (aspect < 0.5) | (aspect > 2.0)
+
+    score = np.ones(len(records), dtype=np.float64)
+    score = np.where(tiny, score - 0.6, score)
+    score = np.where(small, score - 0.4, score)
+    score = np.where(very_small_file, score - 0.4, score)
+    score = np.where(small_file, score - 0.2, score)
+    score = np.where(extreme_ratio, score - 0.2, score)
+    score = np.where(url_pattern, score - 0.3, score)
+    score = np.clip(score, 0.0, 1.0)
+    score = np.where(missing, 0.2, score)
+
+    # 旗標組合 → reason 字串（組合數很少，查表即可）
+    flags = np.stack([tiny, small, very_small_file, small_file, extreme_ratio, url_pattern], axis=1)
+    codes = flags.astype(np.int64) @ (1 << np.arange(len(_REASON_FLAGS), dtype=np.int64))
+    reasons: Dict[int, str] = {}
+
+    results = []
+    for i, code in enumerate(codes.tolist()):
+        if missing[i]:
+            reason = "missing_size"
+        else:
+            reason = reasons.get(code)
+            if reason is None:
+                parts = [name for bit, name in enumerate(_REASON_FLAGS) if code >> bit & 1]
+                reason = reasons[code] = ",".join(parts) if parts else "ok"
+        value = float(score[i])
+        results.append((value, reason, decide_is_primary(value, threshold)))
+    return results
+
+
+async def persist_primary_flags(conn, rows: Sequence[Tuple[int, float, str, bool]]) -> None:
+    """
+    以單次 executemany 寫回主貼圖標記：rows 為 (media_id, score, reason, is_primary)。
+
+    同時寫入 is_primary / primary_score 欄位與 metadata 內的舊鍵，沿用 metadata 的讀取端不受影響。
+    """
+    if not rows:
+        return
+    await conn.executemany(
+        """
+        UPDATE media_files
+        SET is_primary = $2,
+            primary_score = $3,
+            metadata = COALESCE(metadata, '{}'::jsonb) ||
+                       jsonb_build_object('primary_score', $4::text, 'is_primary', $5::text, 'primary_reason', $6::text)
+        WHERE id = $1
+        """,
+        [
+            (media_id, bool(is_primary), float(score), str(score), 'true' if is_primary else 'false', reason)
+            for media_id, score, reason, is_primary in rows
+        ],
+    )
@@ -0,0 +1,102 @@
+"""
+圖片尺寸標頭探測
+
+只讀檔頭取得寬高，不解碼像素、不需要 PIL：
+- PNG：IHDR
+- GIF：Logical Screen Descriptor
+- WebP：VP8 / VP8L / VP8X
+- JPEG：掃描 marker 直到 SOFn（EXIF 等 APPn 區段會被略過）
+
+ImageHeaderProbe 可在串流下載時逐塊餵入，一取得尺寸就停止緩衝，
+下載完成前即可得知寬高（供主貼圖分類使用）。
+"""
+
+import struct
+from typing import Optional, Tuple
+
+
+# 超過此長度仍無法判斷（例如 JPEG 的 EXIF 縮圖極大）就放棄
+MAX_PROBE_BYTES = 256 * 1024
+
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def probe_image_size(head: bytes) -> Optional[Tuple[int, int, str]]:
+    """由檔頭解析 (width, height, format)；資料不足或格式不支援時回傳 None"""
+    if len(head) >= 24 and head[:8] == b"\x89PNG\r\n\x1a\n" and head[12:16] == b"IHDR":
+        width, height = struct.unpack(">II", head[16:24])
+        return width, height, "PNG"
+
+    if len(head) >= 10 and head[:6] in (b"GIF87a", b"GIF89a"):
+        width, height = struct.unpack("<HH", head[6:10])
+        return width, height, "GIF"
+
+    if len(head) >= 30 and head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        chunk = head[12:16]
+        if chunk == b"VP8 " and head[23:26] == b"\x9d\x01\x2a":
+            width, height = struct.unpack("<HH", head[26:30])
+            return width & 0x3FFF, height & 0x3FFF, "WEBP"
+        if chunk == b"VP8L" and head[20] == 0x2F:
+            bits = int.from_bytes(head[21:25], "little")
+            return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1, "WEBP"
+        if chunk == b"VP8X":
+            width = int.from_bytes(head[24:27], "little") + 1
+            height = int.from_bytes(head[27:30], "little") + 1
+            return width, height, "WEBP"
+        return None
+
+    if len(head) >= 4 and head[:2] == b"\xff\xd8":
+        return _probe_jpeg(head)
+
+    return None
+
+
+def _probe_jpeg(head: bytes) -> Optional[Tuple[int, int, str]]:
+    offset = 2
+    length = len(head)
+    while offset + 4 <= length:
+        if head[offset] != 0xFF:
+            return None
+        marker = head[offset + 1]
+        if marker == 0xFF:  # 填充位元組
+            offset += 1
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:  # 無長度欄位的 marker
+            offset += 2
+            continue
+        segment_length = struct.unpack(">H", head[offset + 2:offset + 4])[0]
+        if marker in _JPEG_SOF_MARKERS:
+            if offset + 9 > length:
+                return None
+            height, width = struct.unpack(">HH", head[offset + 5:offset + 9])
+            return width, height, "JPEG"
+        if marker == 0xDA:  # 進入影像資料仍未見 SOF
+            return None
+        offset += 2 + segment_length
+    return None
+
+
+class ImageHeaderProbe:
+    """串流下載時逐塊餵入檔頭，取得尺寸後不再緩衝"""
+
+    def __init__(self, max_bytes: int = MAX_PROBE_BYTES):
+        self.max_bytes = max_bytes
+        self._head = bytearray()
+        self.result: Optional[Tuple[int, int, str]] = None
+        self.done = False
+
+    def feed(self, chunk: bytes) -> None:
+        if self.done:
+            return
+        self._head += chunk[: self.max_bytes - len(self._head)]
+        self.result = probe_image_size(bytes(self._head))
+        if self.result is not None or len(self._head) >= self.max_bytes:
+            self.done = True
+            self._head = bytearray()
+
+    def metadata(self) -> dict:
+        """與 RustFSClient._extract_media_metadata 相同的欄位"""
+        if self.result is None:
+            return {}
+        width, height, image_format = self.result
+        return {"width": width, "height": height, "format": image_format}
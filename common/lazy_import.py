@@ -0,0 +1,77 @@
+"""
+延遲載入工具
+
+服務啟動時 import 重量級 SDK（google.generativeai、boto3、playwright、PIL、pandas…）
+會拖慢容器重啟與擴容，而很多請求路徑根本用不到它們。此模組提供：
+
+- lazy_module("google.generativeai")：回傳代理模組，第一次存取屬性時才真正 import
+- load_attr("ui.components.x:Component")：依字串路徑載入物件（用於延遲註冊表）
+- lazy_import_stats()：每個延遲模組實際載入的耗時（毫秒），未載入者不列出
+
+第一次載入時會印出耗時，方便確認重量級模組是在哪個請求才被拉進來。
+用法與一般 import 相同：
+
+    genai = lazy_module("google.generativeai")
+    genai.configure(api_key=...)   # 這一行才 import
+"""
+
+import importlib
+import time
+import types
+from typing import Any, Dict
+
+
+_LOAD_TIMES_MS: Dict[str, float] = {}
+
+
+class LazyModule(types.ModuleType):
+    """模組代理：屬性存取時才載入真正的模組"""
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__["_lazy_target"] = None
+
+    def _load(self) -> types.ModuleType:
+        module = self.__dict__["_lazy_target"]
+        if module is None:
+            started = time.perf_counter()
+            module = importlib.import_module(self.__name__)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            _LOAD_TIMES_MS[self.__name__] = elapsed_ms
+            self.__dict__["_lazy_target"] = module
+            print(f"⏱️ lazy import {self.__name__}: {elapsed_ms:.0f} ms")
+        return module
+
+    def __getattr__(self, item: str) -> Any:
+        return getattr(self._load(), item)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.__dict__["_lazy_target"] is not None else "deferred"
+        return f"<lazy module '{self.__name__}' ({state})>"
+
+
+def lazy_module(name: str) -> LazyModule:
+    """建立延遲載入的模組代理"""
+    return LazyModule(name)
+
+
+def load_attr(path: str) -> Any:
+    """以 "package.module:attr" 載入物件"""
+    module_name, _, attr = path.partition(":")
+    module = importlib.import_module(module_name)
+    return getattr(module, attr) if attr else module
+
+
+def is_loaded(module: Any) -> bool:
+    """延遲模組是否已真正載入（一般模組一律視為已載入）"""
+    if isinstance(module, LazyModule):
+        return module.__dict__["_lazy_target"] is not None
+    return True
+
+
+def lazy_import_stats() -> Dict[str, float]:
+    """已載入的延遲模組 → 載入耗時（毫秒）"""
+    return dict(_LOAD_TIMES_MS)
@@ -14,12 +14,14 @@ from dataclasses import dataclass, asdict
 from enum import Enum
 import httpx
 import os
-import google.generativeai as genai
-from google.generativeai.types import HarmCategory, HarmBlockThreshold
 
+from .lazy_import import lazy_module
 from .settings import get_settings
 from .llm_usage_recorder import log_usage, get_service_name
 
+# google.generativeai 載入約需秒級，延遲到第一次建立 GeminiProvider 時才 import
+genai = lazy_module("google.generativeai")
+
 
 class LLMProvider(Enum):
     """LLM 供應商枚舉"""
@@ -139,6 +141,7 @@ class GeminiProvider(BaseLLMProvider):
         self.default_model = config.get('default_model', 'gemini-2.0-flash')
         
         # 安全設定
+        HarmCategory, HarmBlockThreshold = genai.types.HarmCategory, genai.types.HarmBlockThreshold
         self.safety_settings = {
             HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
             HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
@@ -593,56 +596,62 @@ class LLMManager:
     def __init__(self):
         self.settings = get_settings()
         self.providers: Dict[LLMProvider, BaseLLMProvider] = {}
+        self._provider_factories: Dict[LLMProvider, Any] = {}
         self.logger = logging.getLogger("llm_manager")
         self.default_provider = LLMProvider.GEMINI
         self._initialize_providers()
     
     def _initialize_providers(self):
-        """初始化所有可用的供應商"""
-        # 初始化 Gemini
-        try:
-            gemini_config = {
+        """
+        登記所有可用的供應商（僅檢查金鑰，不建立 SDK）
+
+        供應商實例延遲到第一次使用時才建立，避免服務啟動就載入 google.generativeai 等 SDK。
+        """
+        factories = [
+            (LLMProvider.GEMINI, GeminiProvider, {
                 'api_key': os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY"),
                 'default_model': 'gemini-2.0-flash'
-            }
-            if gemini_config['api_key']:
-                self.providers[LLMProvider.GEMINI] = GeminiProvider(gemini_config)
-                self.logger.info("Gemini provider initialized")
-        except Exception as e:
-            self.logger.warning(f"Failed to initialize Gemini provider: {e}")
-        
-        # 初始化 OpenAI
-        try:
-            openai_config = {
+            }),
+            (LLMProvider.OPENAI, OpenAIProvider, {
                 'api_key': os.getenv("OPENAI_API_KEY"),
                 'default_model': 'gpt-4o-mini'
-            }
-            if openai_config['api_key']:
-                self.providers[LLMProvider.OPENAI] = OpenAIProvider(openai_config)
-                self.logger.info("OpenAI provider initialized")
-        except Exception as e:
-            self.logger.warning(f"Failed to initialize OpenAI provider: {e}")
-        
-        # 初始化 OpenRouter
-        try:
-            openrouter_config = {
+            }),
+            (LLMProvider.OPENROUTER, OpenRouterProvider, {
                 'api_key': os.getenv("OPENROUTER_API_KEY"),
                 'default_model': 'openai/gpt-4o-mini'
-            }
-            if openrouter_config['api_key']:
-                self.providers[LLMProvider.OPENROUTER] = OpenRouterProvider(openrouter_config)
-                self.logger.info("OpenRouter provider initialized")
-        except Exception as e:
-            self.logger.warning(f"Failed to initialize OpenRouter provider: {e}")
+            }),
+        ]
+        for provider, provider_cls, config in factories:
+            if config['api_key']:
+                self._provider_factories[provider] = (provider_cls, config)
         
         # 設置預設供應商
-        if LLMProvider.GEMINI in self.providers:
+        if LLMProvider.GEMINI in self._provider_factories:
             self.default_provider = LLMProvider.GEMINI
-        elif LLMProvider.OPENAI in self.providers:
+        elif LLMProvider.OPENAI in self._provider_factories:
             self.default_provider = LLMProvider.OPENAI
         else:
             raise ValueError("No LLM providers available")
-    
+
+    def _get_provider(self, provider: LLMProvider) -> Optional[BaseLLMProvider]:
+        """取得供應商實例；第一次使用時才建立，建立失敗則移除登記"""
+        instance = self.providers.get(provider)
+        if instance is not None:
+            return instance
+        factory = self._provider_factories.get(provider)
+        if factory is None:
+            return None
+        provider_cls, config = factory
+        try:
+            instance = provider_cls(config)
+        except Exception as e:
+            self.logger.warning(f"Failed to initialize {provider.value} provider: {e}")
+            self._provider_factories.pop(provider, None)
+            return None
+        self.providers[provider] = instance
+        self.logger.info(f"{provider.value} provider initialized")
+        return instance
+
     async def chat_completion(
         self,
         messages: List[Dict[str, str]],
@@ -661,7 +670,15 @@ class LLMManager:
         else:
             provider = self.default_provider
         
-        if provider not in self.providers:
+        provider_instance = self._get_provider(provider)
+        if provider_instance is None and provider == self.default_provider:
+            # 預設供應商建立失敗（例如 SDK 未安裝）：改用其他已登記的供應商
+            for fallback in list(self._provider_factories):
+                provider_instance = self._get_provider(fallback)
+                if provider_instance is not None:
+                    provider = self.default_provider = fallback
+                    break
+        if provider_instance is None:
             raise ValueError(f"Provider {provider.value} not available")
         
         # 創建請求
@@ -675,11 +692,16 @@ class LLMManager:
         )
         
         # 執行請求
-        return await self.providers[provider].chat_completion(request)
+        return await provider_instance.chat_completion(request)
     
     def get_available_providers(self) -> List[LLMProvider]:
-        """獲取可用的供應商列表"""
-        return [p for p, provider in self.providers.items() if provider.is_available()]
+        """獲取可用的供應商列表（會建立尚未使用過的供應商）"""
+        available = []
+        for p in list(self._provider_factories):
+            provider = self._get_provider(p)
+            if provider is not None and provider.is_available():
+                available.append(p)
+        return available
     
     def get_provider_stats(self, provider: LLMProvider) -> Optional[LLMUsageStats]:
         """獲取供應商使用統計"""
@@ -699,7 +721,7 @@ class LLMManager:
         if isinstance(provider, str):
             provider = LLMProvider(provider)
         
-        if provider not in self.providers:
+        if provider not in self._provider_factories:
             raise ValueError(f"Provider {provider.value} not available")
         
         self.default_provider = provider
@@ -4,6 +4,9 @@ LLM 使用記錄器（正式版·穩定）
 - 自動確保 Postgres 中存在 `llm_usage` 表與索引
 - 提供輕量級 `log_usage` 非侵入介面，失敗時吞錯不影響主流程
 - 欄位聚焦：服務、供應商、模型、時間、token 數、花費、延遲、狀態
+- 原始紀錄寫入後另以一條 SQL 遞增 `llm_usage_hourly` / `llm_usage_daily` 彙總（服務 × 供應商 × 模型），
+  費用面板只讀彙總表（見 common.llm_usage_stats），不再掃描整張 llm_usage
+- 彙總失敗不影響原始紀錄；彙總表漏記時刪除彙總表再執行 UI 的「初始化/修復表」即可從 llm_usage 回填
 
 注意：為避免循環依賴，本模組不導入 `common.llm_manager`。
 """
@@ -41,6 +44,135 @@ def get_service_name() -> str:
     return os.getenv("SERVICE_NAME", "app")
 
 
+_ROLLUP_COLUMNS = """
+    service TEXT NOT NULL,
+    provider TEXT NOT NULL,
+    model TEXT NOT NULL,
+    requests BIGINT NOT NULL DEFAULT 0,
+    error_count BIGINT NOT NULL DEFAULT 0,
+    prompt_tokens BIGINT NOT NULL DEFAULT 0,
+    completion_tokens BIGINT NOT NULL DEFAULT 0,
+    total_tokens BIGINT NOT NULL DEFAULT 0,
+    cost NUMERIC(16,6) NOT NULL DEFAULT 0,
+    latency_ms BIGINT NOT NULL DEFAULT 0
+"""
+
+# 彙總欄位（INSERT ... SELECT 與 ON CONFLICT 共用）
+_ROLLUP_AGGREGATES = """
+    COUNT(*), COUNT(*) FILTER (WHERE status <> 'success'),
+    SUM(prompt_tokens), SUM(completion_tokens), SUM(total_tokens),
+    SUM(cost), SUM(latency_ms)
+"""
+
+_ROLLUP_UPSERT = """
+    requests = {table}.requests + EXCLUDED.requests,
+    error_count = {table}.error_count + EXCLUDED.error_count,
+    prompt_tokens = {table}.prompt_tokens + EXCLUDED.prompt_tokens,
+    completion_tokens = {table}.completion_tokens + EXCLUDED.completion_tokens,
+    total_tokens = {table}.total_tokens + EXCLUDED.total_tokens,
+    cost = {table}.cost + EXCLUDED.cost,
+    latency_ms = {table}.latency_ms + EXCLUDED.latency_ms
+"""
+
+# 原始紀錄單獨寫入：彙總表有問題時也不會連帶遺失這筆紀錄
+_INSERT_USAGE_SQL = """
+    INSERT INTO llm_usage (
+        ts, service, provider, model, request_id,
+        prompt_tokens, completion_tokens, total_tokens,
+        cost, latency_ms, status, error, metadata
+    ) VALUES (
+        NOW(), $1, $2, $3, $4,
+        $5, $6, $7,
+        $8, $9, $10, $11, $12
+    )
+    RETURNING ts, service, provider, model, prompt_tokens, completion_tokens,
+              total_tokens, cost, latency_ms, status
+"""
+
+# 兩張彙總表在同一條語句內遞增（參數為 _INSERT_USAGE_SQL 回傳的欄位，順序相同）
+_ROLLUP_USAGE_SQL = f"""
+    WITH ins (ts, service, provider, model, prompt_tokens, completion_tokens,
+              total_tokens, cost, latency_ms, status) AS (
+        VALUES ($1::timestamptz, $2::text, $3::text, $4::text, $5::int, $6::int,
+                $7::int, $8::numeric, $9::int, $10::text)
+    ), hourly AS (
+        INSERT INTO llm_usage_hourly
+        SELECT date_trunc('hour', ts), service, provider, model, {_ROLLUP_AGGREGATES}
+        FROM ins GROUP BY 1, 2, 3, 4
+        ON CONFLICT (bucket, service, provider, model) DO UPDATE SET
+        {_ROLLUP_UPSERT.format(table="llm_usage_hourly")}
+    )
+    INSERT INTO llm_usage_daily
+    SELECT ts::date, service, provider, model, {_ROLLUP_AGGREGATES}
+    FROM ins GROUP BY 1, 2, 3, 4
+    ON CONFLICT (day, service, provider, model) DO UPDATE SET
+    {_ROLLUP_UPSERT.format(table="llm_usage_daily")}
+"""
+
+
+async def ensure_usage_schema(conn) -> None:
+    """建立 llm_usage 與彙總表（冪等）。
+
+    彙總表首次建立時以既有 llm_usage 回填；期間鎖住 llm_usage 的寫入，
+    避免回填與並行的 log_usage 重複計數。
+    """
+    await conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS llm_usage (
+            id BIGSERIAL PRIMARY KEY,
+            ts TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            service TEXT NOT NULL,
+            provider TEXT NOT NULL,
+            model TEXT NOT NULL,
+            request_id TEXT,
+            prompt_tokens INTEGER DEFAULT 0,
+            completion_tokens INTEGER DEFAULT 0,
+            total_tokens INTEGER DEFAULT 0,
+            cost NUMERIC(12,6) DEFAULT 0,
+            latency_ms INTEGER DEFAULT 0,
+            status TEXT NOT NULL DEFAULT 'success',
+            error TEXT,
+            metadata JSONB
+        )
+        """
+    )
+    await conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_usage_ts ON llm_usage (ts DESC)")
+    await conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_usage_svc ON llm_usage (service)")
+    await conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_usage_provider ON llm_usage (provider)")
+    await conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_usage_model ON llm_usage (model)")
+    await conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_usage_status ON llm_usage (status)")
+
+    if await conn.fetchval(
+        "SELECT to_regclass('llm_usage_hourly') IS NOT NULL AND to_regclass('llm_usage_daily') IS NOT NULL"
+    ):
+        return
+
+    async with conn.transaction():
+        await conn.execute("LOCK TABLE llm_usage IN SHARE ROW EXCLUSIVE MODE")
+        for table, bucket, bucket_type, bucket_expr in (
+            ("llm_usage_hourly", "bucket", "TIMESTAMPTZ", "date_trunc('hour', ts)"),
+            ("llm_usage_daily", "day", "DATE", "ts::date"),
+        ):
+            if await conn.fetchval("SELECT to_regclass($1) IS NOT NULL", table):
+                continue
+            await conn.execute(
+                f"""
+                CREATE TABLE {table} (
+                    {bucket} {bucket_type} NOT NULL,
+                    {_ROLLUP_COLUMNS},
+                    PRIMARY KEY ({bucket}, service, provider, model)
+                )
+                """
+            )
+            await conn.execute(
+                f"""
+                INSERT INTO {table}
+                SELECT {bucket_expr}, service, provider, model, {_ROLLUP_AGGREGATES}
+                FROM llm_usage GROUP BY 1, 2, 3, 4
+                """
+            )
+
+
 async def _ensure_table_exists():
     global _TABLE_READY
     if _TABLE_READY:
@@ -54,32 +186,10 @@ async def _ensure_table_exists():
             from .settings import get_settings
             dsn = get_settings().database.url
             conn = await asyncpg.connect(dsn)
-            await conn.execute(
-                """
-                CREATE TABLE IF NOT EXISTS llm_usage (
-                    id BIGSERIAL PRIMARY KEY,
-                    ts TIMESTAMPTZ NOT NULL DEFAULT NOW(),
-                    service TEXT NOT NULL,
-                    provider TEXT NOT NULL,
-                    model TEXT NOT NULL,
-                    request_id TEXT,
-                    prompt_tokens INTEGER DEFAULT 0,
-                    completion_tokens INTEGER DEFAULT 0,
-                    total_tokens INTEGER DEFAULT 0,
-                    cost NUMERIC(12,6) DEFAULT 0,
-                    latency_ms INTEGER DEFAULT 0,
-                    status TEXT NOT NULL DEFAULT 'success',
-                    error TEXT,
-                    metadata JSONB
-                )
-                """
-            )
-            await conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_usage_ts ON llm_usage (ts DESC)")
-            await conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_usage_svc ON llm_usage (service)")
-            await conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_usage_provider ON llm_usage (provider)")
-            await conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_usage_model ON llm_usage (model)")
-            await conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_usage_status ON llm_usage (status)")
-            await conn.close()
+            try:
+                await ensure_usage_schema(conn)
+            finally:
+                await conn.close()
             _TABLE_READY = True
         except Exception:
             # 不影響主流程
@@ -107,18 +217,8 @@ async def log_usage(
 
         from .db_client import get_db_client  # 延遲導入
         db = await get_db_client()
-        await db.execute(
-            """
-            INSERT INTO llm_usage (
-                ts, service, provider, model, request_id,
-                prompt_tokens, completion_tokens, total_tokens,
-                cost, latency_ms, status, error, metadata
-            ) VALUES (
-                NOW(), $1, $2, $3, $4,
-                $5, $6, $7,
-                $8, $9, $10, $11, $12
-            )
-            """,
+        row = await db.fetch_one(
+            _INSERT_USAGE_SQL,
             service or get_service_name(),
             provider,
             model,
@@ -136,4 +236,12 @@ async def log_usage(
         # 嚴格吞錯，不阻塞主流程
         return
 
+    if not row:
+        return
+    try:
+        await db.execute(_ROLLUP_USAGE_SQL, *row.values())
+    except Exception as e:
+        # 原始紀錄已寫入；漏記的彙總可刪除彙總表後由 ensure_usage_schema 回填
+        print(f"⚠️ LLM 使用彙總更新失敗（原始紀錄已保存）: {e}")
+
 
@@ -0,0 +1,157 @@
+"""
+LLM 費用統計查詢（UI 費用面板用）
+
+- 彙總只讀 `llm_usage_hourly` / `llm_usage_daily`（由 llm_usage_recorder.log_usage 同步遞增），
+  掃描量與 llm_usage 保留多久無關：本月最多 31 天 × 服務/模型組合數
+- 最近調用走 `idx_llm_usage_ts` 取前 N 筆
+- 查詢結果以短 TTL 快取（LLM_USAGE_STATS_TTL，預設 30 秒），Streamlit 重繪不會重查資料庫
+- 同步 psycopg2，沿用單一長連線（斷線時自動重連），不在每次重繪都建立新連線
+
+彙總表尚未建立時（舊資料庫），查詢回傳空結果；UI 的「初始化/修復表」會建立並回填。
+"""
+
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+
+STATS_TTL_SECONDS = float(os.getenv("LLM_USAGE_STATS_TTL", "30"))
+
+# 期間 → 日彙總表的 WHERE 條件（與舊版 ts::date / date_trunc('month', ts) 的語意一致）
+PERIOD_FILTERS = {
+    "today": "day = CURRENT_DATE",
+    "month": "day >= date_trunc('month', CURRENT_DATE)::date",
+}
+
+_RECENT_SQL = """
+    SELECT
+        to_char(ts AT TIME ZONE 'UTC' AT TIME ZONE 'Asia/Taipei', 'YYYY-MM-DD HH24:MI:SS') AS 時間,
+        service AS 服務,
+        provider AS 供應商,
+        model AS 模型,
+        COALESCE(
+            NULLIF(metadata->>'usage_scene',''),
+            NULLIF(metadata->>'component',''),
+            ''
+        ) AS 功能,
+        total_tokens AS tokens,
+        cost AS usd,
+        status AS 狀態
+    FROM llm_usage
+    ORDER BY ts DESC
+    LIMIT %s
+"""
+
+
+class LLMUsageStats:
+    """費用面板的快取查詢介面（執行緒安全，所有 Streamlit session 共用）"""
+
+    def __init__(self, ttl: float = STATS_TTL_SECONDS):
+        self.ttl = ttl
+        self._cache: Dict[Tuple, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+        self._conn = None
+
+    # ---------------------------------------------------------------- 連線與快取
+    def _get_connection(self):
+        if self._conn is None or self._conn.closed:
+            from common.settings import get_settings
+            self._conn = psycopg2.connect(get_settings().database.url)
+            self._conn.autocommit = True
+        return self._conn
+
+    def _query(self, sql: str, params: tuple = ()) -> List[Dict[str, Any]]:
+        """執行唯讀查詢；連線失效時重連一次"""
+        for attempt in range(2):
+            try:
+                with self._get_connection().cursor(cursor_factory=RealDictCursor) as cur:
+                    cur.execute(sql, params)
+                    return [dict(row) for row in cur.fetchall()]
+            except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                self._close()
+                if attempt:
+                    raise
+        return []
+
+    def _close(self) -> None:
+        try:
+            if self._conn is not None:
+                self._conn.close()
+        except Exception:
+            pass
+        self._conn = None
+
+    def _cached(self, key: Tuple, loader: Callable[[], Any]) -> Any:
+        with self._lock:
+            hit = self._cache.get(key)
+            if hit and time.monotonic() - hit[0] < self.ttl:
+                return hit[1]
+            value = loader()
+            self._cache[key] = (time.monotonic(), value)
+            return value
+
+    def invalidate(self) -> None:
+        """清空快取（例如初始化/回填彙總表之後）"""
+        with self._lock:
+            self._cache.clear()
+
+    # ---------------------------------------------------------------- 查詢
+    def get_summary(self, period: str = "month", top_services: int = 5, top_models: int = 30) -> Dict[str, Any]:
+        """期間彙總：top_line（成本/Token/請求數）、by_service、by_model"""
+        where = PERIOD_FILTERS[period]
+
+        def load() -> Dict[str, Any]:
+            top_line = self._query(f"""
+                SELECT COALESCE(SUM(cost), 0) AS usd_cost,
+                       COALESCE(SUM(total_tokens), 0) AS tokens,
+                       COALESCE(SUM(requests), 0) AS requests
+                FROM llm_usage_daily WHERE {where}
+            """)
+            by_service = self._query(f"""
+                SELECT service, SUM(cost) AS usd_cost, SUM(total_tokens) AS tokens, SUM(requests) AS requests
+                FROM llm_usage_daily WHERE {where}
+                GROUP BY service
+                ORDER BY usd_cost DESC
+                LIMIT %s
+            """, (top_services,))
+            by_model = self._query(f"""
+                SELECT provider, model, SUM(cost) AS usd_cost, SUM(total_tokens) AS tokens, SUM(requests) AS requests
+                FROM llm_usage_daily WHERE {where}
+                GROUP BY provider, model
+                ORDER BY usd_cost DESC, tokens DESC
+                LIMIT %s
+            """, (top_models,))
+            return {"top_line": top_line[0] if top_line else {}, "by_service": by_service, "by_model": by_model}
+
+        return self._cached(("summary", period, top_services, top_models), load)
+
+    def get_hourly_trend(self, hours: int = 24) -> List[Dict[str, Any]]:
+        """最近 N 小時逐時成本 / Token / 請求數"""
+        return self._cached(("hourly", hours), lambda: self._query("""
+            SELECT bucket, SUM(cost) AS usd_cost, SUM(total_tokens) AS tokens,
+                   SUM(requests) AS requests, SUM(error_count) AS errors
+            FROM llm_usage_hourly
+            WHERE bucket >= date_trunc('hour', NOW()) - make_interval(hours => %s)
+            GROUP BY bucket
+            ORDER BY bucket
+        """, (hours,)))
+
+    def get_recent(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """最近 N 筆調用（台北時間）"""
+        return self._cached(("recent", limit), lambda: self._query(_RECENT_SQL, (limit,)))
+
+
+# 全域實例（單例模式）
+_llm_usage_stats: Optional[LLMUsageStats] = None
+
+
+def get_llm_usage_stats() -> LLMUsageStats:
+    """取得費用統計查詢實例"""
+    global _llm_usage_stats
+    if _llm_usage_stats is None:
+        _llm_usage_stats = LLMUsageStats()
+    return _llm_usage_stats
@@ -7,13 +7,18 @@ import asyncio
 import os
 import socket
 import time
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
 
 import httpx
 import structlog
 
+from common.http_clients import get_http_client
+
 log = structlog.get_logger()
 
+# Agent 發現結果的本地快取秒數；過期後以 If-None-Match 重新驗證，未變更時伺服器回 304
+DISCOVERY_CACHE_TTL = float(os.getenv("MCP_DISCOVERY_CACHE_TTL", "30"))
+
 
 class MCPClient:
     """MCP 客戶端 - 供各 Agent 使用"""
@@ -26,18 +31,27 @@ class MCPClient:
         agent_port: int = None,
         version: str = "1.0.0"
     ):
+        hostname = os.getenv("HOSTNAME", socket.gethostname())
+        
         self.mcp_url = mcp_url or os.getenv("MCP_SERVER_URL", "http://mcp-server:10100")
-        self.agent_name = agent_name or os.getenv("AGENT_NAME")
+        # 多副本部署時以 AGENT_NAME=playwright-crawler-{hostname} 讓每個副本各自註冊
+        self.agent_name = (agent_name or os.getenv("AGENT_NAME") or "").replace("{hostname}", hostname) or None
         self.agent_role = agent_role or os.getenv("AGENT_ROLE")
         self.agent_port = agent_port or int(os.getenv("AGENT_PORT", 8000))
         self.version = version or os.getenv("GIT_SHA", "dev")
         
         # 自動生成 Agent URL
-        hostname = os.getenv("HOSTNAME", socket.gethostname())
         self.agent_url = f"http://{hostname}:{self.agent_port}"
         
         self._heartbeat_task = None
         self._registered = False
+        
+        # 快取鍵 → (到期時間, ETag, 資料)
+        self._discovery_cache: Dict[str, Tuple[float, Optional[str], Any]] = {}
+    
+    def _http(self):
+        """MCP Server 對端（共用長連線與斷路器）"""
+        return get_http_client("mcp-server", base_url=self.mcp_url)
     
     async def register(self, capabilities: Dict[str, Any] = None, metadata: Dict[str, Any] = None) -> bool:
         """註冊 Agent 到 MCP Server"""
@@ -59,13 +73,12 @@ class MCPClient:
         }
         
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.post(f"{self.mcp_url}/register", json=payload)
-                response.raise_for_status()
-                
-                self._registered = True
-                log.info("mcp_registered", agent=self.agent_name, role=self.agent_role, url=self.agent_url)
-                return True
+            response = await self._http().post("/register", json=payload, timeout=10.0)
+            response.raise_for_status()
+            
+            self._registered = True
+            log.info("mcp_registered", agent=self.agent_name, role=self.agent_role, url=self.agent_url)
+            return True
                 
         except Exception as e:
             log.error("mcp_register_failed", agent=self.agent_name, error=str(e))
@@ -90,9 +103,8 @@ class MCPClient:
             try:
                 await asyncio.sleep(interval)
                 
-                async with httpx.AsyncClient(timeout=5.0) as client:
-                    response = await client.post(f"{self.mcp_url}/heartbeat/{self.agent_name}")
-                    response.raise_for_status()
+                response = await self._http().post(f"/heartbeat/{self.agent_name}", timeout=5.0)
+                response.raise_for_status()
                     
                 # 只在第一次成功或從失敗恢復時記錄
                 if not hasattr(self, '_last_heartbeat_success') or not self._last_heartbeat_success:
@@ -114,8 +126,41 @@ class MCPClient:
                 pass
             log.info("heartbeat_stopped", agent=self.agent_name)
     
+    async def _cached_get(self, cache_key: str, path: str, params: Dict[str, Any] = None) -> Any:
+        """
+        帶 TTL 與 ETag 的 GET：快取未過期直接回傳本地結果；過期後條件請求，304 時續用
+        
+        請求失敗但有舊資料時回傳舊資料（MCP Server 短暫不可用不影響已知 Agent 的解析）
+        """
+        now = time.monotonic()
+        cached = self._discovery_cache.get(cache_key)
+        if cached and cached[0] > now:
+            return cached[2]
+        
+        headers = {"If-None-Match": cached[1]} if cached and cached[1] else {}
+        try:
+            response = await self._http().get(path, params=params, headers=headers, timeout=10.0)
+            if response.status_code == 304 and cached:
+                self._discovery_cache[cache_key] = (now + DISCOVERY_CACHE_TTL, cached[1], cached[2])
+                return cached[2]
+            response.raise_for_status()
+        except Exception as e:
+            client_error = isinstance(e, httpx.HTTPStatusError) and e.response.status_code < 500
+            if cached and not client_error:
+                log.warning("mcp_discovery_stale", key=cache_key)
+                return cached[2]
+            raise
+        
+        data = response.json()
+        self._discovery_cache[cache_key] = (now + DISCOVERY_CACHE_TTL, response.headers.get("ETag"), data)
+        return data
+    
+    def invalidate_discovery_cache(self) -> None:
+        """清空 Agent 發現快取（下次查詢強制向 MCP Server 取得）"""
+        self._discovery_cache.clear()
+    
     async def discover_agents(self, role: str = None, status: str = "ONLINE") -> list:
-        """發現其他 Agent"""
+        """發現其他 Agent（本地 TTL 快取，過期後以 ETag 重新驗證）"""
         try:
             params = {}
             if role:
@@ -123,28 +168,22 @@ class MCPClient:
             if status:
                 params["status"] = status
             
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(f"{self.mcp_url}/agents", params=params)
-                response.raise_for_status()
-                
-                agents = response.json()
-                log.info("agents_discovered", count=len(agents), role=role, status=status)
-                return agents
+            agents = await self._cached_get(f"agents:{role or ''}:{status or ''}", "/agents", params)
+            log.debug("agents_discovered", count=len(agents), role=role, status=status)
+            return agents
                 
         except Exception as e:
             log.error("agent_discovery_failed", role=role, error=str(e))
             return []
     
     async def get_agent(self, name: str) -> Optional[Dict[str, Any]]:
-        """獲取特定 Agent 資訊"""
+        """獲取特定 Agent 資訊（本地 TTL 快取，過期後以 ETag 重新驗證）"""
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(f"{self.mcp_url}/agents/{name}")
-                response.raise_for_status()
-                return response.json()
+            return await self._cached_get(f"agent:{name}", f"/agents/{name}")
                 
         except httpx.HTTPStatusError as e:
             if e.response.status_code == 404:
+                self._discovery_cache.pop(f"agent:{name}", None)
                 return None
             raise
         except Exception as e:
@@ -160,13 +199,12 @@ class MCPClient:
                 "max_concurrent": max_concurrent
             }
             
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(f"{self.mcp_url}/media/download", json=payload)
-                response.raise_for_status()
-                
-                result = response.json()
-                log.info("media_download_requested", post_url=post_url, media_count=len(media_urls))
-                return result
+            response = await self._http().post("/media/download", json=payload, timeout=30.0)
+            response.raise_for_status()
+            
+            result = response.json()
+            log.info("media_download_requested", post_url=post_url, media_count=len(media_urls))
+            return result
                 
         except Exception as e:
             log.error("media_download_failed", post_url=post_url, error=str(e))
@@ -179,10 +217,9 @@ class MCPClient:
             import urllib.parse
             encoded_url = urllib.parse.quote(post_url, safe='')
             
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(f"{self.mcp_url}/media/{encoded_url}")
-                response.raise_for_status()
-                return response.json()
+            response = await self._http().get(f"/media/{encoded_url}", timeout=10.0)
+            response.raise_for_status()
+            return response.json()
                 
         except Exception as e:
             log.error("get_media_files_failed", post_url=post_url, error=str(e))
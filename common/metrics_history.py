@@ -0,0 +1,198 @@
+"""
+貼文指標歷史快照（post_metrics_history）
+
+post_metrics / post_metrics_sql / playwright_post_metrics 的 upsert 會覆寫計數，
+這裡在同一條寫入路徑上追加快照，保留成長曲線：
+- 一次往返批次寫入（unnest 陣列參數），同時維護逐時/逐日彙總表
+- 月分區由 ensure_post_metrics_history_partition() 建立；確認分區已提交存在後，每個行程每月只檢查一次
+- 保留策略與下月分區預建由 MCP Server 每日排程呼叫 prune_history()
+- 趨勢查詢只掃彙總表的時間範圍，不需對原始表做差分
+"""
+
+import logging
+import re
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from .db_client import DatabaseClient, get_db_client
+
+
+_THREADS_USERNAME_RE = re.compile(r"/@([^/?#]+)/post/")
+
+# 已確認本月與下月分區都已提交存在的月份（YYYYMM），避免每次寫入都檢查/呼叫 DDL 函式
+_ensured_months = set()
+
+_ROLLUP_UPSERT = """
+    INSERT INTO post_metrics_rollup_{grain} (
+        bucket, url, username,
+        views_min, views_max, likes_min, likes_max,
+        comments_max, reposts_max, shares_max, samples, updated_at
+    )
+    SELECT date_trunc('{trunc}', NOW()), url, max(username),
+           min(views_count), max(views_count), min(likes_count), max(likes_count),
+           max(comments_count), max(reposts_count), max(shares_count), count(*), NOW()
+    FROM snap
+    GROUP BY url
+    ON CONFLICT (bucket, url) DO UPDATE SET
+        username     = COALESCE(EXCLUDED.username, post_metrics_rollup_{grain}.username),
+        views_min    = LEAST(post_metrics_rollup_{grain}.views_min, EXCLUDED.views_min),
+        views_max    = GREATEST(post_metrics_rollup_{grain}.views_max, EXCLUDED.views_max),
+        likes_min    = LEAST(post_metrics_rollup_{grain}.likes_min, EXCLUDED.likes_min),
+        likes_max    = GREATEST(post_metrics_rollup_{grain}.likes_max, EXCLUDED.likes_max),
+        comments_max = GREATEST(post_metrics_rollup_{grain}.comments_max, EXCLUDED.comments_max),
+        reposts_max  = GREATEST(post_metrics_rollup_{grain}.reposts_max, EXCLUDED.reposts_max),
+        shares_max   = GREATEST(post_metrics_rollup_{grain}.shares_max, EXCLUDED.shares_max),
+        samples      = post_metrics_rollup_{grain}.samples + EXCLUDED.samples,
+        updated_at   = NOW()
+"""
+
+RECORD_SNAPSHOTS_QUERY = f"""
+WITH snap AS (
+    SELECT *
+    FROM unnest(
+        $1::text[], $2::text[], $3::bigint[], $4::bigint[], $5::bigint[], $6::bigint[], $7::bigint[]
+    ) AS t(url, username, views_count, likes_count, comments_count, reposts_count, shares_count)
+), history AS (
+    INSERT INTO post_metrics_history (
+        captured_at, url, username, source,
+        views_count, likes_count, comments_count, reposts_count, shares_count
+    )
+    SELECT NOW(), url, username, $8,
+           views_count, likes_count, comments_count, reposts_count, shares_count
+    FROM snap
+), hourly AS (
+    {_ROLLUP_UPSERT.format(grain="hourly", trunc="hour")}
+)
+{_ROLLUP_UPSERT.format(grain="daily", trunc="day")}
+"""
+
+VIEWS_GAINED_QUERY = """
+WITH per_post AS (
+    SELECT url, max(username) AS username,
+           max(views_max) - min(views_min) AS views_gained
+    FROM post_metrics_rollup_hourly
+    WHERE bucket >= date_trunc('hour', NOW() - make_interval(hours => $1::int))
+      AND ($2::text IS NULL OR username = $2)
+    GROUP BY url
+)
+SELECT username,
+       COALESCE(sum(views_gained), 0)::bigint AS views_gained,
+       count(*) AS posts_tracked
+FROM per_post
+WHERE username IS NOT NULL
+GROUP BY username
+ORDER BY views_gained DESC
+LIMIT $3;
+"""
+
+
+def username_from_url(url: Optional[str]) -> Optional[str]:
+    """從 Threads 貼文 URL 取出用戶名（post_metrics 表沒有 username 欄位）。"""
+    if not url:
+        return None
+    match = _THREADS_USERNAME_RE.search(url)
+    return match.group(1) if match else None
+
+
+def _to_int(value: Any) -> Optional[int]:
+    if value is None or value == "":
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+async def _ensure_partition(conn) -> None:
+    now = datetime.now(timezone.utc)
+    month = now.strftime("%Y%m")
+    if month in _ensured_months:
+        return
+    next_month = f"{now.year + now.month // 12}{now.month % 12 + 1:02d}"
+    if await conn.fetchval(
+        "SELECT to_regclass($1) IS NOT NULL AND to_regclass($2) IS NOT NULL",
+        f"public.post_metrics_history_{month}", f"public.post_metrics_history_{next_month}",
+    ):
+        _ensured_months.add(month)
+        return
+    # 在呼叫端交易內建立的分區可能隨交易回滾，不記入快取；下次寫入時再以 to_regclass 確認
+    await conn.execute("SELECT ensure_post_metrics_history_partition(NOW())")
+    await conn.execute("SELECT ensure_post_metrics_history_partition(NOW() + INTERVAL '1 month')")
+    if not conn.is_in_transaction():
+        _ensured_months.add(month)
+
+
+async def record_snapshots(conn, source: str, snapshots: Iterable[Dict[str, Any]]) -> int:
+    """
+    以一次往返追加指標快照並更新逐時/逐日彙總
+
+    Args:
+        conn: asyncpg 連線（可位於呼叫端的交易中）
+        source: 來源表標記（post_metrics / post_metrics_sql / playwright）
+        snapshots: 每筆含 url、username（可省略）、views/likes/comments/reposts/shares_count
+
+    Returns:
+        寫入的快照數
+    """
+    rows = [s for s in snapshots if s.get("url")]
+    if not rows:
+        return 0
+
+    await _ensure_partition(conn)
+    await conn.execute(
+        RECORD_SNAPSHOTS_QUERY,
+        [r["url"] for r in rows],
+        [r.get("username") or username_from_url(r["url"]) for r in rows],
+        [_to_int(r.get("views_count")) for r in rows],
+        [_to_int(r.get("likes_count")) for r in rows],
+        [_to_int(r.get("comments_count")) for r in rows],
+        [_to_int(r.get("reposts_count")) for r in rows],
+        [_to_int(r.get("shares_count")) for r in rows],
+        source,
+    )
+    return len(rows)
+
+
+async def safe_record_snapshots(conn, source: str, snapshots: Iterable[Dict[str, Any]]) -> int:
+    """record_snapshots 的容錯版本：歷史表缺失或寫入失敗時只記錄警告，不影響主 upsert。"""
+    try:
+        # 以 savepoint 隔離，失敗不會讓呼叫端的交易進入 aborted 狀態
+        async with conn.transaction():
+            return await record_snapshots(conn, source, snapshots)
+    except Exception as e:
+        logging.warning(f"⚠️ 寫入指標歷史失敗 ({source}): {e}")
+        return 0
+
+
+async def get_views_gained(
+    hours: int = 24,
+    username: Optional[str] = None,
+    limit: int = 100,
+    db: Optional[DatabaseClient] = None,
+) -> List[Dict[str, Any]]:
+    """
+    最近 N 小時各用戶的觀看數成長（來自逐時彙總表）
+
+    每篇貼文取窗口內 max(views_max) - min(views_min)，再按用戶加總。
+    """
+    if db is None:
+        db = await get_db_client()
+    return await db.fetch_all(VIEWS_GAINED_QUERY, hours, username, limit)
+
+
+async def prune_history(
+    keep_months: int = 6,
+    keep_hourly_days: int = 30,
+    keep_daily_days: int = 730,
+    db: Optional[DatabaseClient] = None,
+) -> int:
+    """預建本月/下月分區並執行保留策略，回傳刪除的月分區數。"""
+    if db is None:
+        db = await get_db_client()
+    await db.execute("SELECT ensure_post_metrics_history_partition(NOW())")
+    await db.execute("SELECT ensure_post_metrics_history_partition(NOW() + INTERVAL '1 month')")
+    row = await db.fetch_one(
+        "SELECT prune_post_metrics_history($1, $2, $3) AS dropped",
+        keep_months, keep_hourly_days, keep_daily_days,
+    )
+    return row["dropped"] if row else 0
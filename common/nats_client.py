@@ -41,6 +41,32 @@ async def get_nats_client() -> Optional[NATS]:
             return None
     return _nats_client
 
+def build_progress_record(message: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    把進度訊息轉為 task:{task_id} 中保存的欄位（progress 為 0~100 百分比）
+    
+    publish_progress 寫 Redis 與 UI 端訂閱 crawler.progress 共用，兩邊看到的狀態一致
+    """
+    stage = message.get("stage", "")
+    progress_data = {"stage": stage, "timestamp": message.get("timestamp")}
+    
+    # 嘗試解析進度百分比
+    if "done" in message and (message.get("total") or 0) > 0:
+        progress_data["progress"] = round(message["done"] / message["total"] * 100, 1)
+    elif "completed" in stage:
+        progress_data["progress"] = 100.0
+    elif "start" in stage:
+        progress_data["progress"] = 0.0
+    elif "error" in stage:
+        progress_data["status"] = "error"
+        progress_data["error"] = message.get("error", "Unknown error")
+    
+    # 添加其他有用的資訊
+    for key in ["username", "posts_count", "message", "error", "final_data"]:
+        if key in message:
+            progress_data[key] = message[key]
+    return progress_data
+
 async def publish_progress(task_id: str, stage: str, **kwargs):
     """發布進度訊息到 NATS 和 Redis"""
     message = {
@@ -64,24 +90,7 @@ async def publish_progress(task_id: str, stage: str, **kwargs):
         from .redis_client import get_redis_client
         redis_client = get_redis_client()
         
-        # 計算進度百分比（如果有相關資訊）
-        progress_data = {"stage": stage, "timestamp": message["timestamp"]}
-        
-        # 嘗試解析進度百分比
-        if "done" in kwargs and "total" in kwargs and kwargs["total"] > 0:
-            progress_data["progress"] = round(kwargs["done"] / kwargs["total"] * 100, 1)
-        elif "completed" in stage:
-            progress_data["progress"] = 100.0
-        elif "start" in stage:
-            progress_data["progress"] = 0.0
-        elif "error" in stage:
-            progress_data["status"] = "error"
-            progress_data["error"] = kwargs.get("error", "Unknown error")
-        
-        # 添加其他有用的資訊
-        for key in ["username", "posts_count", "message", "error", "final_data"]:
-            if key in kwargs:
-                progress_data[key] = kwargs[key]
+        progress_data = build_progress_record(message)
         
         redis_client.set_task_status(task_id, progress_data)
         logging.info(f"💾 Saved to Redis: {stage} for {task_id}")
@@ -0,0 +1,189 @@
+"""
+已爬取貼文 ID 成員索引（Redis Bloom Filter）
+
+增量爬取只需要回答「這個 post_id 是否已在 playwright_post_metrics」：
+- 每個用戶一個固定大小的 Redis bitmap（SETBIT/GETBIT），寫入時增量更新
+- 查詢時先問 Bloom Filter，只有「可能存在」的才回資料庫批次確認
+- Bloom Filter 沒有偽陰性，因此判定為「不存在」的 ID 不需再查資料庫
+- Redis 不可用時退回單次 `post_id = ANY($2)` 查詢，結果仍然正確
+"""
+
+import hashlib
+import logging
+from datetime import datetime
+from typing import Iterable, List, Optional, Set
+
+from .db_client import DatabaseClient
+from .redis_client import get_async_redis_client
+
+
+# 2^20 bits = 128KB / 用戶；10 萬篇貼文、k=7 時偽陽性率約 0.8%
+BLOOM_BITS = 1 << 20
+BLOOM_HASHES = 7
+BUILD_BATCH_SIZE = 2000
+
+KEY_PREFIX = "crawl:post_ids"
+
+# 正陽性確認查詢（走 idx_playwright_user_type_post / UNIQUE(username, post_id, crawler_type)）
+VERIFY_POST_IDS_QUERY = """
+    SELECT post_id FROM playwright_post_metrics
+    WHERE username = $1 AND crawler_type = 'playwright'
+      AND post_id = ANY($2::text[])
+"""
+
+
+def bloom_positions(item: str, bits: int = BLOOM_BITS, hashes: int = BLOOM_HASHES) -> List[int]:
+    """以雙重雜湊計算 item 在 bitmap 中的 k 個位置。"""
+    digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+    h1 = int.from_bytes(digest[:8], "big")
+    h2 = int.from_bytes(digest[8:], "big") | 1
+    return [(h1 + i * h2) % bits for i in range(hashes)]
+
+
+class ExistingPostIds(set):
+    """
+    已確認存在的 post_id 集合（按需解析）
+
+    仍是一般 set，既有的 `in` / `|` / 迭代用法不變；
+    新看到的候選 ID 需先 `await resolve(...)`，已存在者才會被加入集合。
+    `total_count` 為該用戶在資料庫中的貼文數（估計值），僅供日誌與判斷用。
+    """
+
+    def __init__(self, index: "PostIdIndex", username: str, total_count: int = 0):
+        super().__init__()
+        self.index = index
+        self.username = username
+        self.total_count = total_count
+        self._resolved: Set[str] = set()
+
+    async def resolve(self, candidate_ids: Iterable[str]) -> Set[str]:
+        """確認候選 ID 是否已存在，把存在者加入集合並回傳。"""
+        pending = [pid for pid in dict.fromkeys(candidate_ids) if pid and pid not in self._resolved]
+        if not pending:
+            return set()
+        existing = await self.index.filter_existing(self.username, pending)
+        self._resolved.update(pending)
+        self.update(existing)
+        return existing
+
+
+class PostIdIndex:
+    """per-user post_id Bloom Filter，儲存在 Redis、以資料庫為準"""
+
+    def __init__(self, db_client: Optional[DatabaseClient] = None):
+        self.db_client = db_client or DatabaseClient()
+
+    @staticmethod
+    def _bloom_key(username: str) -> str:
+        return f"{KEY_PREFIX}:bloom:{username}"
+
+    @staticmethod
+    def _meta_key(username: str) -> str:
+        return f"{KEY_PREFIX}:meta:{username}"
+
+    async def ensure_built(self, username: str) -> int:
+        """若 Redis 中尚無此用戶的 Bloom Filter，從資料庫建立一次；回傳貼文數估計。"""
+        redis = await get_async_redis_client()
+        meta = await redis.hgetall(self._meta_key(username))
+        if meta and meta.get("built_at"):
+            return int(meta.get("count", 0))
+
+        total = 0
+        async with self.db_client.get_connection() as conn:
+            async with conn.transaction():
+                batch: List[str] = []
+                async for row in conn.cursor("""
+                    SELECT post_id FROM playwright_post_metrics
+                    WHERE username = $1 AND crawler_type = 'playwright'
+                """, username, prefetch=BUILD_BATCH_SIZE):
+                    batch.append(row['post_id'])
+                    if len(batch) >= BUILD_BATCH_SIZE:
+                        await self._set_bits(redis, username, batch)
+                        total += len(batch)
+                        batch = []
+                if batch:
+                    await self._set_bits(redis, username, batch)
+                    total += len(batch)
+
+        await redis.hset(self._meta_key(username), mapping={
+            "built_at": datetime.utcnow().isoformat(),
+            "count": total,
+        })
+        logging.info(f"📚 建立 {username} 的 post_id Bloom Filter：{total} 篇")
+        return total
+
+    async def _set_bits(self, redis, username: str, post_ids: List[str]) -> int:
+        """設置 bitmap 位元；回傳之前不在過濾器中的 ID 數量。"""
+        key = self._bloom_key(username)
+        pipe = redis.pipeline(transaction=False)
+        for pid in post_ids:
+            for pos in bloom_positions(pid):
+                pipe.setbit(key, pos, 1)
+        previous = await pipe.execute()
+
+        added = 0
+        for i in range(len(post_ids)):
+            bits = previous[i * BLOOM_HASHES:(i + 1) * BLOOM_HASHES]
+            if not all(bits):
+                added += 1
+        return added
+
+    async def add(self, username: str, post_ids: Iterable[str]) -> None:
+        """寫入路徑呼叫：把新保存的 post_id 加入過濾器（失敗不影響主流程）。"""
+        ids = [pid for pid in post_ids if pid]
+        if not ids or not username:
+            return
+        try:
+            redis = await get_async_redis_client()
+            added = await self._set_bits(redis, username, ids)
+            if added and await redis.hexists(self._meta_key(username), "built_at"):
+                await redis.hincrby(self._meta_key(username), "count", added)
+        except Exception as e:
+            logging.warning(f"⚠️ 更新 {username} post_id 索引失敗: {e}")
+
+    async def invalidate(self, username: str) -> None:
+        """刪除用戶資料後呼叫：Bloom Filter 無法移除元素，直接丟棄重建。"""
+        try:
+            redis = await get_async_redis_client()
+            await redis.delete(self._bloom_key(username), self._meta_key(username))
+        except Exception as e:
+            logging.warning(f"⚠️ 清除 {username} post_id 索引失敗: {e}")
+
+    async def _maybe_contains(self, username: str, post_ids: List[str]) -> List[str]:
+        """回傳 Bloom Filter 判定「可能存在」的 ID。"""
+        redis = await get_async_redis_client()
+        key = self._bloom_key(username)
+        pipe = redis.pipeline(transaction=False)
+        for pid in post_ids:
+            for pos in bloom_positions(pid):
+                pipe.getbit(key, pos)
+        bits = await pipe.execute()
+        return [
+            pid for i, pid in enumerate(post_ids)
+            if all(bits[i * BLOOM_HASHES:(i + 1) * BLOOM_HASHES])
+        ]
+
+    async def _verify_in_db(self, username: str, post_ids: List[str]) -> Set[str]:
+        """以單次查詢確認 ID 是否真的存在於資料庫。"""
+        if not post_ids:
+            return set()
+        rows = await self.db_client.fetch_all(VERIFY_POST_IDS_QUERY, username, post_ids)
+        return {row['post_id'] for row in rows}
+
+    async def filter_existing(self, username: str, post_ids: List[str]) -> Set[str]:
+        """回傳 post_ids 中已存在於資料庫者（偽陽性已由資料庫排除）。"""
+        try:
+            await self.ensure_built(username)
+            candidates = await self._maybe_contains(username, post_ids)
+        except Exception as e:
+            logging.warning(f"⚠️ post_id 索引不可用，改為直接查詢資料庫: {e}")
+            candidates = post_ids
+        try:
+            return await self._verify_in_db(username, candidates)
+        except Exception as e:
+            logging.warning(f"⚠️ 確認 {username} 已存在貼文失敗: {e}")
+            return set()
+
+
+# 全域實例（單例模式）
+post_id_index = PostIdIndex()
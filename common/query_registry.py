@@ -0,0 +1,111 @@
+"""
+具名查詢註冊表與查詢統計
+
+散落各模組的 f-string SQL 每次文字都不同（LIMIT、欄位、IN 清單直接拼進字串），
+asyncpg 的 statement cache 以 SQL 文字為 key，文字一變就得重新 Parse/規劃。
+註冊表讓熱點查詢以固定文字、參數化的形式登記一次：
+
+    register_query("media.status_by_urls", \"\"\"
+        SELECT original_url, download_status FROM media_files WHERE original_url = ANY($1::text[])
+    \"\"\")
+
+    db = await get_db_client()
+    rows = await db.fetch_named("media.status_by_urls", urls)
+
+- 同一條連線第一次執行時 prepare，之後命中連線的 statement cache 只做 Bind/Execute
+  （cache 大小見 DatabaseClient._pool_kwargs 的 DB_STATEMENT_CACHE_SIZE）
+- 每個具名查詢記錄呼叫次數、列數、錯誤數、累計/最大耗時，query_stats() 依累計耗時排序，
+  一眼看出哪些查詢最花時間
+- 超過 DB_SLOW_QUERY_MS（預設 500；0 表示不記錄）的單次執行印出慢查詢日誌
+- 有安裝 prometheus_client 時另外登記 db_query_duration_seconds{query} 與 db_query_rows_total{query}
+"""
+
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+try:
+    from prometheus_client import Counter, Histogram
+except ImportError:  # pragma: no cover - 選用相依
+    Counter = Histogram = None
+
+
+SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "500"))
+
+QUERY_REGISTRY: Dict[str, str] = {}
+
+if Histogram is not None:
+    QUERY_DURATION = Histogram("db_query_duration_seconds", "具名查詢耗時（秒）", ["query"])
+    QUERY_ROWS = Counter("db_query_rows_total", "具名查詢回傳/影響列數", ["query"])
+else:
+    QUERY_DURATION = QUERY_ROWS = None
+
+_stats: Dict[str, Dict[str, Any]] = {}
+_stats_lock = threading.Lock()
+
+
+def register_query(name: str, sql: str) -> str:
+    """登記具名查詢並回傳名稱；同名但 SQL 不同視為程式錯誤"""
+    sql = sql.strip()
+    existing = QUERY_REGISTRY.get(name)
+    if existing is not None and existing != sql:
+        raise ValueError(f"查詢名稱重複且 SQL 不同: {name}")
+    QUERY_REGISTRY[name] = sql
+    return name
+
+
+def get_query(name: str) -> str:
+    try:
+        return QUERY_REGISTRY[name]
+    except KeyError:
+        raise ValueError(f"未註冊的查詢: {name}") from None
+
+
+def resolve_statement(statement: str) -> str:
+    """註冊名稱 → SQL；不是註冊名稱時原樣回傳（供 warm_up 同時接受名稱與 SQL）"""
+    return QUERY_REGISTRY.get(statement, statement)
+
+
+def record_query(name: str, elapsed_s: float, rows: int = 0, error: Optional[BaseException] = None) -> None:
+    """記錄一次具名查詢的執行結果"""
+    elapsed_ms = elapsed_s * 1000
+    with _stats_lock:
+        stats = _stats.get(name)
+        if stats is None:
+            stats = _stats[name] = {
+                "calls": 0, "errors": 0, "rows": 0, "slow": 0,
+                "total_ms": 0.0, "max_ms": 0.0,
+            }
+        stats["calls"] += 1
+        stats["rows"] += rows
+        stats["total_ms"] += elapsed_ms
+        stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+        if error is not None:
+            stats["errors"] += 1
+        slow = SLOW_QUERY_MS > 0 and elapsed_ms >= SLOW_QUERY_MS
+        if slow:
+            stats["slow"] += 1
+
+    if QUERY_DURATION is not None:
+        QUERY_DURATION.labels(name).observe(elapsed_s)
+        QUERY_ROWS.labels(name).inc(rows)
+    if slow:
+        status = f"失敗：{error}" if error is not None else f"{rows} 列"
+        print(f"🐢 慢查詢 {name}: {elapsed_ms:.0f} ms（{status}）")
+
+
+def query_stats(top: Optional[int] = None) -> List[Dict[str, Any]]:
+    """具名查詢統計，依累計耗時由高到低排序"""
+    with _stats_lock:
+        snapshot = [{"query": name, **stats} for name, stats in _stats.items()]
+    for item in snapshot:
+        item["avg_ms"] = round(item["total_ms"] / item["calls"], 2) if item["calls"] else 0.0
+        item["total_ms"] = round(item["total_ms"], 2)
+        item["max_ms"] = round(item["max_ms"], 2)
+    snapshot.sort(key=lambda item: item["total_ms"], reverse=True)
+    return snapshot[:top] if top else snapshot
+
+
+def reset_query_stats() -> None:
+    with _stats_lock:
+        _stats.clear()
@@ -0,0 +1,287 @@
+"""
+Reader（Jina Reader / 本地 Reader）Markdown 單次解析器
+
+所有 Reader 消費者（rotation_pipeline、realtime_crawler_extractor、scripts/extractors、
+jina / jina_markdown agent）共用這一份解析邏輯：
+- 文件只正規化、切行一次，逐行分類為 token 後單次走訪
+- 正則全部於模組載入時預先編譯
+- 回傳型別化結果 ParsedReaderPost（觀看、按讚、留言、轉發、分享、主文、媒體 URL）
+
+Threads 貼文頁的典型結構：
+    [Thread ====== 52.9K views](...)      ← 觀看數
+    [![Image 1: xxx's profile picture](...)](...)
+    [xxx](https://www.threads.com/@xxx)     ← 作者
+    [8h](https://www.threads.com/@xxx/post/ID)  ← 時間連結，主貼文區塊開始
+    主文（可多行）
+    Translate
+    ![Image 2](...)                         ← 貼文媒體（可省略）
+    3.9K / 151 / 130 / 13                   ← 讚、留言、轉發、分享
+找不到上述結構時，退回舊版啟發式規則（前 10 行的第一段文字、Translate/圖片後的數字）。
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+
+NUMBER_RE = re.compile(r'^\d+(?:[.,]\d+)*[KMB]?$', re.IGNORECASE)
+THREAD_VIEWS_RE = re.compile(r'\[?Thread[\s=]*?(\d+(?:[.,]\d+)*[KMB]?)\s*views?\]?', re.IGNORECASE)
+VIEWS_RE = re.compile(
+    r'(\d+(?:[.,]\d+)*[KMB]?)\s*(?:views?|觀看)|views?\s*[:\-]\s*(\d+(?:[.,]\d+)*[KMB]?)',
+    re.IGNORECASE,
+)
+IMAGE_RE = re.compile(r'!\[([^\]]*)\]\((https?://[^)\s]+)\)')
+VIDEO_RE = re.compile(r'<video[^>]*src=["\']([^"\']+)["\']', re.IGNORECASE)
+LINK_RE = re.compile(r'^\[([^\]]*)\]\(([^)\s]+)\)$')
+TIME_TEXT_RE = re.compile(r'^(?:\d+[smhdw]|\d{2}/\d{2}/\d{2})$')
+INVISIBLE_RE = re.compile(r'[\u200d\u200c\ufe0f]')
+SPACE_RE = re.compile(r'[\u00a0\u2002\u2003\u2009\u200a\u3000\t]')
+
+HEADER_PREFIXES = ('Title:', 'URL Source:', 'Markdown Content:', 'Published Time:')
+BOILERPLATE_LINES = {
+    'Translate', 'views', 'Log in', 'Thread', 'Pinned', '·Author', 'Author',
+    "Sorry, we're having trouble playing this video.", 'Learn more',
+}
+# 舊版格式：標籤行後隔一行是數字
+LEGACY_LABELS = {'Like': 'likes', 'Comment': 'comments', 'Repost': 'reposts', 'Share': 'shares'}
+ENGAGEMENT_FIELDS = ('likes', 'comments', 'reposts', 'shares')
+
+# token 種類
+BLANK, NUMBER, IMAGE, LINK, TRANSLATE, VIEWS, SEPARATOR, TEXT = range(8)
+
+
+@dataclass
+class ParsedReaderPost:
+    """Reader Markdown 的解析結果；數值欄位保留原始字串（如 "3.9K"），整數請用 counts()"""
+    views: Optional[str] = None
+    likes: Optional[str] = None
+    comments: Optional[str] = None
+    reposts: Optional[str] = None
+    shares: Optional[str] = None
+    content: Optional[str] = None
+    media_urls: List[str] = field(default_factory=list)
+    raw_numbers: List[str] = field(default_factory=list)
+
+    def counts(self) -> Dict[str, Optional[int]]:
+        """views/likes/comments/reposts/shares 轉為整數（K/M/B 展開）"""
+        return {
+            'views': parse_number(self.views),
+            'likes': parse_number(self.likes),
+            'comments': parse_number(self.comments),
+            'reposts': parse_number(self.reposts),
+            'shares': parse_number(self.shares),
+        }
+
+
+def parse_number(text: Optional[str]) -> Optional[int]:
+    """解析數字字串（支援 K/M/B 後綴與千分位逗號）"""
+    if not text:
+        return None
+    text = INVISIBLE_RE.sub('', text).strip().replace(',', '')
+    if not text:
+        return None
+    try:
+        suffix = text[-1].upper()
+        if suffix == 'K':
+            return int(float(text[:-1]) * 1_000)
+        if suffix == 'M':
+            return int(float(text[:-1]) * 1_000_000)
+        if suffix == 'B':
+            return int(float(text[:-1]) * 1_000_000_000)
+        return int(float(text))
+    except (ValueError, TypeError):
+        return None
+
+
+def _valid_views(views: Optional[str]) -> bool:
+    count = parse_number(views)
+    return count is not None and 1 <= count <= 100_000_000_000
+
+
+def _classify(line: str) -> int:
+    if not line:
+        return BLANK
+    if NUMBER_RE.match(line):
+        return NUMBER
+    if line == 'Translate':
+        return TRANSLATE
+    if line[0] == '=' and line.strip('= ') == '':
+        return SEPARATOR
+    if line.startswith('![') or line.startswith('[!['):
+        return IMAGE
+    if line.startswith('[Thread') and THREAD_VIEWS_RE.search(line):
+        return VIEWS
+    if line[0] == '[' and LINK_RE.match(line):
+        return LINK
+    return TEXT
+
+
+def _is_content_candidate(line: str) -> bool:
+    """舊版「可能是主文」規則（策略 A）"""
+    return (
+        len(line) > 8
+        and line[0] not in '[!='
+        and not line.startswith('http')
+        and line not in BOILERPLATE_LINES
+        and not TIME_TEXT_RE.match(line)
+        and not line.isdigit()
+    )
+
+
+def parse_reader_markdown(markdown: str, target_username: Optional[str] = None) -> ParsedReaderPost:
+    """
+    單次走訪解析 Reader Markdown
+
+    Args:
+        markdown: Reader 回傳的原文（可含 Title/URL Source/Markdown Content 標頭）
+        target_username: 目標作者；提供時只把該作者的時間連結視為主貼文起點
+
+    Returns:
+        ParsedReaderPost
+    """
+    result = ParsedReaderPost()
+    if not markdown:
+        return result
+
+    text = SPACE_RE.sub(' ', INVISIBLE_RE.sub('', markdown.replace('\r\n', '\n').replace('\r', '\n')))
+    target = (target_username or '').lstrip('@').lower() or None
+
+    generic_views: Optional[str] = None
+    first_candidate: Optional[str] = None
+    in_header = True
+    body_index = 0
+
+    # 主貼文區塊狀態：0 未開始 → 1 主文 → 2 Translate 後（媒體）→ 3 數字 → 4 結束
+    stage = 0
+    content_lines: List[str] = []
+    block_media: List[str] = []
+    block_numbers: List[str] = []
+
+    # 舊版退路：貼文圖片後的連續數字、圖片/Translate 後 10 行內的數字、標籤格式
+    image_run: Optional[List[str]] = None
+    after_image_numbers: Optional[List[str]] = None
+    context_line = -100
+    context_numbers: List[str] = []
+    legacy_labels: Dict[str, str] = {}
+    pending_label: Optional[str] = None
+    pending_label_line = -1
+    all_media: List[str] = []
+
+    for index, raw in enumerate(text.split('\n')):
+        line = raw.strip()
+
+        # ---- Jina 標頭（Title / URL Source / Markdown Content）
+        if in_header:
+            if not line or line.startswith(HEADER_PREFIXES):
+                in_header = not line.startswith('Markdown Content:')
+                body_index = index + 1
+                continue
+            in_header = False
+
+        kind = _classify(line)
+
+        # ---- 觀看數（[Thread ... views] 優先，其次任何 "N views"）
+        if kind == VIEWS:
+            if result.views is None:
+                match = THREAD_VIEWS_RE.search(line)
+                if match and _valid_views(match.group(1)):
+                    result.views = match.group(1).replace(',', '')
+        elif generic_views is None and kind in (TEXT, LINK) and ('view' in line.lower() or '觀看' in line):
+            match = VIEWS_RE.search(line)
+            if match and _valid_views(match.group(1) or match.group(2)):
+                generic_views = (match.group(1) or match.group(2)).replace(',', '')
+
+        # ---- 媒體 URL（排除大頭貼）
+        if kind == IMAGE or (kind == TEXT and '![' in line):
+            for alt, url in IMAGE_RE.findall(line):
+                if 'profile picture' not in alt:
+                    all_media.append(url)
+                    if stage in (1, 2):
+                        block_media.append(url)
+        if '<video' in line:
+            for url in VIDEO_RE.findall(line):
+                all_media.append(url)
+                if stage in (1, 2):
+                    block_media.append(url)
+
+        # ---- 舊版內容候選（策略 A：正文前 10 行的第一段文字）
+        if first_candidate is None and kind == TEXT and index - body_index < 10 and _is_content_candidate(line):
+            first_candidate = line
+
+        # ---- 主貼文區塊
+        if stage == 0:
+            if kind == LINK:
+                link = LINK_RE.match(line)
+                href = link.group(2)
+                if TIME_TEXT_RE.match(link.group(1)) and '/post/' in href and (
+                        target is None or f'/@{target}/' in href.lower()):
+                    stage = 1
+        elif stage == 1:
+            if kind == TRANSLATE:
+                stage = 2
+            elif kind == NUMBER and (content_lines or block_media):
+                stage = 3
+                block_numbers.append(line)
+            elif kind == IMAGE:
+                stage = 2 if content_lines else 1
+            elif kind in (TEXT, LINK) and line not in BOILERPLATE_LINES:
+                content_lines.append(line)
+        elif stage == 2:
+            if kind == NUMBER:
+                stage = 3
+                block_numbers.append(line)
+            elif kind not in (BLANK, IMAGE):
+                stage = 4
+        elif stage == 3:
+            if kind == NUMBER:
+                block_numbers.append(line)
+            elif kind != BLANK:
+                stage = 4
+
+        # 主貼文區塊與觀看數都已取得：其後只剩回覆串，不必再走訪
+        if stage == 4 and result.views is not None:
+            break
+
+        # ---- 舊版退路
+        if image_run is not None:
+            if kind == NUMBER:
+                image_run.append(line)
+            elif kind != BLANK and line != 'Pinned':
+                if len(image_run) >= 3:
+                    after_image_numbers = image_run
+                image_run = None
+        if kind == IMAGE and image_run is None and after_image_numbers is None and 'profile picture' not in line:
+            image_run = []
+
+        if kind == NUMBER and index - context_line <= 10 and len(context_numbers) < 4:
+            context_numbers.append(line)
+        if kind in (IMAGE, TRANSLATE) or 'Translate' in line:
+            context_line = index
+
+        if line in LEGACY_LABELS:
+            pending_label, pending_label_line = LEGACY_LABELS[line], index
+        elif pending_label and index == pending_label_line + 2:
+            if kind == NUMBER:
+                legacy_labels.setdefault(pending_label, line)
+            pending_label = None
+
+    if image_run is not None and len(image_run) >= 3 and after_image_numbers is None:
+        after_image_numbers = image_run
+
+    # ---- 彙整
+    if result.views is None:
+        result.views = generic_views
+
+    has_block = bool(content_lines or block_media)
+    result.content = '\n'.join(content_lines) if content_lines else first_candidate
+    result.media_urls = list(dict.fromkeys(block_media if has_block else all_media))
+
+    numbers = block_numbers or after_image_numbers or context_numbers
+    result.raw_numbers = numbers[:4]
+    for name, value in zip(ENGAGEMENT_FIELDS, result.raw_numbers):
+        setattr(result, name, value)
+    # 舊版標籤格式（Like / Comment / Repost / Share）明確標示，優先採用
+    for name, value in legacy_labels.items():
+        setattr(result, name, value)
+
+    return result
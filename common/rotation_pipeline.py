@@ -6,13 +6,14 @@
 """
 
 import requests
-import re
 import time
 import random
 import json
 from typing import List, Dict, Optional
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
+from common.reader_markdown import parse_reader_markdown
+
 class RotationPipelineReader:
     """
     輪迴策略讀取器 - 10個API → 20個本地 → 輪迴
@@ -57,259 +58,34 @@ class RotationPipelineReader:
         
         return '\n'.join(normalized_lines)
     
+    # 以下提取方法保留給既有呼叫端；解析一律走 common.reader_markdown 的單次解析器
     def extract_views_count(self, content: str, post_id: str) -> Optional[str]:
-        """提取觀看數 - 使用加強的正則表達式模式"""
-        normalized_content = self.normalize_content(content)
-        
-        # 增強的觀看數模式 - 針對NBSP問題
-        view_patterns = [
-            r'(\d+(?:\.\d+)?[KMB]?)\s*views',  # 標準格式
-            r'(\d+(?:\.\d+)?[KMB]?)\s*觀看',   # 中文
-            r'Thread\s*=+\s*(\d+(?:\.\d+)?[KMB]?)\s*views',  # Thread標題格式
-            r'views\s*(\d+(?:\.\d+)?[KMB]?)',  # 倒序
-        ]
-        
-        for i, pattern in enumerate(view_patterns):
-            matches = re.findall(pattern, normalized_content, re.IGNORECASE)
-            if matches:
-                return matches[0]
-        
-        return None
+        """提取觀看數"""
+        return parse_reader_markdown(content).views
     
     def extract_post_content(self, content: str) -> Optional[str]:
         """智能提取主貼文內容 - 區分主貼文和分享貼文"""
-        lines = content.split('\n')
-        
-        # 策略1: 專門處理 Threads 頁面結構
-        main_post_content = self._extract_main_post_from_threads_structure(lines)
-        if main_post_content:
-            return main_post_content
-        
-        # 策略2: 通用結構化提取
-        main_post_content = self._extract_main_post_from_structure(lines)
-        if main_post_content:
-            return main_post_content
-        
-        # 策略3: 回到原始方法作為備選
-        return self._extract_content_fallback(lines)
-    
-    def _extract_main_post_from_threads_structure(self, lines: List[str]) -> Optional[str]:
-        """專門從 Threads 頁面結構中提取主貼文內容"""
-        # 策略A: 檢查開頭是否就是主內容（常見模式）
-        for i, line in enumerate(lines[:10]):  # 只檢查前10行
-            stripped = line.strip()
-            if (stripped and 
-                len(stripped) > 8 and
-                not stripped.startswith('[') and
-                not stripped.startswith('![') and
-                not stripped.startswith('http') and
-                not stripped.startswith('=') and  # 跳過分隔符
-                not stripped.isdigit() and
-                not stripped in ['Translate', 'views', 'Log in', 'Thread', 'Sorry, we\'re having trouble playing this video.', 'Learn more'] and
-                not re.match(r'^\d+[dhm]$', stripped) and
-                not re.match(r'^\d+$', stripped)):
-                
-                # 這很可能是主內容
-                return stripped
-        
-        # 策略B: 查找目標用戶名後的內容（需要用戶名信息）
-        # 注意：rotation_pipeline 中沒有 target_username，所以策略B暫時跳過
-        return None
-    
-    def _extract_main_post_from_structure(self, lines: List[str]) -> Optional[str]:
-        """從結構化內容中提取主貼文 - 優先提取當前頁面的主要內容"""
-        main_content_candidates = []
-        
-        # 策略1: 如果第一行就是回覆內容，優先使用它
-        if lines and lines[0].strip().startswith('>>>'):
-            reply_content = lines[0].strip()
-            if len(reply_content) > 10:  # 確保有實質內容
-                return reply_content
-        
-        for i, line in enumerate(lines):
-            stripped = line.strip()
-            
-            # 跳過明顯的回覆標識（但如果是第一行已經處理過了）
-            if i > 0 and (stripped.startswith('>>>') or stripped.startswith('回覆') or stripped.startswith('·Author')):
-                continue
-            
-            # 尋找主貼文內容的模式
-            if (stripped and 
-                not stripped.startswith('[') and  # 跳過連結
-                not stripped.startswith('![') and  # 跳過圖片
-                not stripped.startswith('http') and  # 跳過URL
-                not stripped.startswith('Log in') and  # 跳過登入提示
-                not stripped.startswith('Thread') and  # 跳過Thread標題
-                not stripped.startswith('gvmonthly') and  # 跳過用戶名
-                not stripped.startswith('=') and  # 跳過分隔符
-                not stripped.isdigit() and  # 跳過純數字
-                not re.match(r'^\d+[dhm]$', stripped) and  # 跳過時間格式
-                not stripped in ['Translate', 'views', 'Sorry, we\'re having trouble playing this video.', 'Learn more'] and  # 跳過特殊詞
-                len(stripped) > 8):  # 內容要有一定長度
-                
-                # 檢查這是否可能是主貼文內容
-                if self._is_likely_main_post_content(stripped, lines, i):
-                    main_content_candidates.append(stripped)
-        
-        # 返回第一個合理的主貼文候選
-        if main_content_candidates:
-            return main_content_candidates[0]
-        
-        return None
-    
-    def _is_likely_main_post_content(self, content: str, lines: List[str], index: int) -> bool:
-        """判斷內容是否可能是主貼文"""
-        # 檢查後續是否有 "Translate" 標識（主貼文的典型結構）
-        has_translate = False
-        for j in range(index + 1, min(index + 3, len(lines))):
-            if 'Translate' in lines[j]:
-                has_translate = True
-                break
-        
-        # 檢查是否包含常見的主貼文特徵
-        has_content_features = (
-            len(content) > 15 and  # 有一定長度
-            not content.startswith('>>>') and  # 不是回覆
-            not content.startswith('·') and  # 不是元數據
-            not content.startswith('[') and  # 不是連結
-            ('!' in content or '?' in content or '。' in content or '，' in content or
-             '😆' in content or '😅' in content or '護照' in content or '台灣' in content)  # 包含標點符號或表情
-        )
-        
-        # 必須有 Translate 標識 AND 有內容特徵
-        return has_translate and has_content_features
-    
-    def _extract_content_fallback(self, lines: List[str]) -> Optional[str]:
-        """備選內容提取方法"""
-        content_start = -1
-        for i, line in enumerate(lines):
-            if 'Markdown Content:' in line:
-                content_start = i + 1
-                break
-        
-        if content_start == -1:
-            return None
-        
-        content_lines = []
-        for i in range(content_start, min(content_start + 15, len(lines))):
-            line = lines[i].strip()
-            if (line and 
-                not line.startswith('[![Image') and 
-                not line.startswith('[Image') and
-                not line.startswith('>>>')):  # 排除回覆
-                content_lines.append(line)
-                
-                # 如果找到了合理的內容就停止
-                if len(content_lines) >= 2 and len(line) > 10:
-                    break
-        
-        return '\n'.join(content_lines) if content_lines else None
+        return parse_reader_markdown(content).content
     
     def extract_engagement_numbers(self, markdown_content: str) -> List[str]:
         """提取所有統計數字序列（按讚、留言、轉發、分享）"""
-        lines = markdown_content.split('\n')
-        
-        # 策略1: 查找貼文內容後的第一個圖片，然後提取後續數字
-        for i, line in enumerate(lines):
-            stripped = line.strip()
-            # 找到貼文圖片（通常在Translate之後）
-            if stripped.startswith('![Image') and not 'profile picture' in stripped:
-                numbers = []
-                # 在這個圖片後查找連續的數字
-                for j in range(i + 1, min(i + 20, len(lines))):
-                    candidate = lines[j].strip()
-                    if re.match(r'^\d+(?:\.\d+)?[KMB]?$', candidate):
-                        numbers.append(candidate)
-                    elif candidate and not re.match(r'^\d+(?:\.\d+)?[KMB]?$', candidate) and candidate != "Pinned":
-                        # 遇到非數字行（但跳過Pinned），停止收集
-                        break
-                
-                # 如果找到了數字序列，返回
-                if len(numbers) >= 3:
-                    return numbers
-        
-        # 策略2: 查找任何上下文中的連續數字
-        all_numbers = []
-        for i, line in enumerate(lines):
-            stripped = line.strip()
-            if re.match(r'^\d+(?:\.\d+)?[KMB]?$', stripped):
-                # 檢查上下文是否合理（附近有圖片或Translate等標識）
-                context_valid = False
-                for k in range(max(0, i-10), i):
-                    if "![Image" in lines[k] or "Translate" in lines[k]:
-                        context_valid = True
-                        break
-                
-                if context_valid:
-                    all_numbers.append(stripped)
-        
-        # 返回找到的數字（通常前4個是按讚、留言、轉發、分享）
-        if len(all_numbers) >= 4:
-            return all_numbers[:4]
-        elif len(all_numbers) >= 3:
-            return all_numbers[:3]
-        
-        return all_numbers
+        return parse_reader_markdown(markdown_content).raw_numbers
     
     def extract_likes_count(self, markdown_content: str) -> Optional[str]:
         """提取按讚數"""
-        numbers = self.extract_engagement_numbers(markdown_content)
-        if len(numbers) >= 1:
-            return numbers[0]
-        
-        # 備選方法：尋找舊格式
-        lines = markdown_content.split('\n')
-        for line in lines:
-            if '👍' in line or 'like' in line.lower():
-                match = re.search(r'(\d+(?:,\d+)*)', line)
-                if match:
-                    return match.group(1)
-        return None
+        return parse_reader_markdown(markdown_content).likes
     
     def extract_comments_count(self, markdown_content: str) -> Optional[str]:
         """提取留言數"""
-        numbers = self.extract_engagement_numbers(markdown_content)
-        if len(numbers) >= 2:
-            return numbers[1]
-        
-        # 備選方法：尋找舊格式
-        lines = markdown_content.split('\n')
-        for line in lines:
-            if '💬' in line or 'comment' in line.lower():
-                match = re.search(r'(\d+(?:,\d+)*)', line)
-                if match:
-                    return match.group(1)
-        return None
+        return parse_reader_markdown(markdown_content).comments
     
     def extract_reposts_count(self, markdown_content: str) -> Optional[str]:
         """提取轉發數"""
-        numbers = self.extract_engagement_numbers(markdown_content)
-        if len(numbers) >= 3:
-            return numbers[2]
-        
-        # 備選方法：尋找舊格式
-        lines = markdown_content.split('\n')
-        for line in lines:
-            if '🔄' in line or 'repost' in line.lower():
-                match = re.search(r'(\d+(?:,\d+)*)', line)
-                if match:
-                    return match.group(1)
-        return None
+        return parse_reader_markdown(markdown_content).reposts
     
     def extract_shares_count(self, markdown_content: str) -> Optional[str]:
         """提取分享數"""
-        numbers = self.extract_engagement_numbers(markdown_content)
-        if len(numbers) >= 4:
-            return numbers[3]
-        
-        # 備選方法：尋找舊格式
-        lines = markdown_content.split('\n')
-        for line in lines:
-            if '📤' in line or 'share' in line.lower():
-                match = re.search(r'(\d+(?:,\d+)*)', line)
-                if match:
-                    return match.group(1)
-        return None
+        return parse_reader_markdown(markdown_content).shares
     
     def fetch_content_jina_api(self, url: str) -> tuple:
         """使用Jina AI官方API獲取內容"""
@@ -343,14 +119,15 @@ class RotationPipelineReader:
     def parse_post(self, url: str, content: str, source: str) -> Dict:
         """解析貼文 - 完整版本包含互動數據"""
         post_id = url.split('/')[-1] if '/' in url else url
-        views = self.extract_views_count(content, post_id)
-        main_content = self.extract_post_content(content)
+        parsed = parse_reader_markdown(content)
+        views = parsed.views
+        main_content = parsed.content
         
         # 提取互動數據
-        likes = self.extract_likes_count(content)
-        comments = self.extract_comments_count(content)
-        reposts = self.extract_reposts_count(content)
-        shares = self.extract_shares_count(content)
+        likes = parsed.likes
+        comments = parsed.comments
+        reposts = parsed.reposts
+        shares = parsed.shares
         
         return {
             'post_id': post_id,
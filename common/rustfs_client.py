@@ -15,14 +15,17 @@ import hashlib
 import asyncio
 from typing import Optional, Dict, Any, Tuple
 from datetime import datetime, timedelta
-import boto3
-from botocore.client import Config
-from botocore.exceptions import ClientError, NoCredentialsError
 import aiohttp
 # import magic  # 暫時註解，避免 Windows 相容性問題
 
+from .lazy_import import lazy_module
 from .settings import get_settings
 
+# boto3 載入約需數百毫秒，延遲到第一次建立 S3 客戶端才 import
+boto3 = lazy_module("boto3")
+botocore_client = lazy_module("botocore.client")
+botocore_exceptions = lazy_module("botocore.exceptions")
+
 
 class RustFSClient:
     """RustFS 對象存儲客戶端"""
@@ -66,7 +69,7 @@ class RustFSClient:
                 endpoint_url=self.endpoint,
                 aws_access_key_id=self.access_key,
                 aws_secret_access_key=self.secret_key,
-                config=Config(
+                config=botocore_client.Config(
                     signature_version='s3v4',
                     retries={'max_attempts': 3, 'mode': 'adaptive'},
                     max_pool_connections=50
@@ -84,14 +87,14 @@ class RustFSClient:
         """確保 bucket 存在"""
         try:
             self.s3_client.head_bucket(Bucket=self.bucket)
-        except ClientError as e:
+        except botocore_exceptions.ClientError as e:
             error_code = e.response['Error']['Code']
             if error_code == '404':
                 # Bucket 不存在，創建它
                 try:
                     self.s3_client.create_bucket(Bucket=self.bucket)
                     print(f"已創建 RustFS bucket: {self.bucket}")
-                except ClientError as create_error:
+                except botocore_exceptions.ClientError as create_error:
                     raise Exception(f"無法創建 bucket {self.bucket}: {str(create_error)}")
             else:
                 raise Exception(f"檢查 bucket 失敗: {str(e)}")
@@ -237,7 +240,7 @@ class RustFSClient:
                     "size_bytes": len(media_bytes),
                     "mime_type": mime_type
                 }
-            except ClientError as e:
+            except botocore_exceptions.ClientError as e:
                 if e.response['Error']['Code'] != '404':
                     raise
             
@@ -261,7 +264,7 @@ class RustFSClient:
                 "mime_type": mime_type
             }
             
-        except ClientError as e:
+        except botocore_exceptions.ClientError as e:
             raise Exception(f"RustFS 上傳失敗: {str(e)}")
         except Exception as e:
             raise Exception(f"存儲媒體失敗: {str(e)}")
@@ -284,7 +287,7 @@ class RustFSClient:
             
             return media_bytes, mime_type
             
-        except ClientError as e:
+        except botocore_exceptions.ClientError as e:
             error_code = e.response['Error']['Code']
             if error_code == 'NoSuchKey':
                 raise Exception(f"媒體檔案不存在: {storage_key}")
@@ -318,7 +321,7 @@ class RustFSClient:
             )
             return url
             
-        except ClientError as e:
+        except botocore_exceptions.ClientError as e:
             raise Exception(f"生成預簽名 URL 失敗: {str(e)}")
     
     def delete_media(self, storage_key: str) -> bool:
@@ -335,7 +338,7 @@ class RustFSClient:
             self.s3_client.delete_object(Bucket=self.bucket, Key=storage_key)
             return True
             
-        except ClientError as e:
+        except botocore_exceptions.ClientError as e:
             print(f"刪除媒體失敗 {storage_key}: {str(e)}")
             return False
     
@@ -369,7 +372,7 @@ class RustFSClient:
                                 Key=obj['Key']
                             )
                             deleted_count += 1
-                        except ClientError:
+                        except botocore_exceptions.ClientError:
                             continue
             
             return {
@@ -0,0 +1,198 @@
+"""
+串流匯出引擎
+
+資料列由伺服器端游標（DatabaseClient.iter_rows）逐批讀出，直接編碼為
+CSV / gzip-CSV / Parquet 位元組區塊，全程只保留一個批次在記憶體：
+- 以 async generator 產出 bytes，可直接交給 FastAPI StreamingResponse
+- 或透過 export_to_file 寫入檔案（CLI / 腳本用）
+
+欄位以 ExportColumn 描述：(輸出欄名, 來源欄位, 可選的轉換函式, 欄位型別)。
+Parquet 的 schema 由欄位型別宣告，不從資料推斷（首批整欄為空值時也不會與後續批次衝突）。
+格式化（時間字串、布林轉中文等）儘量在 SQL 內完成，Python 端只做必要的轉換。
+"""
+
+import csv
+import io
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Sequence
+
+
+# 格式 → (MIME 類型, 副檔名)
+EXPORT_FORMATS: Dict[str, tuple] = {
+    "csv": ("text/csv", ".csv"),
+    "csv.gz": ("application/gzip", ".csv.gz"),
+    "parquet": ("application/vnd.apache.parquet", ".parquet"),
+}
+
+DEFAULT_BATCH_ROWS = 2000
+CSV_FLUSH_BYTES = 256 * 1024
+
+
+# ExportColumn.kind → Arrow 型別名稱（延遲到 Parquet 匯出時才轉成 pyarrow 型別）
+COLUMN_KINDS = ("string", "int", "float", "bool", "timestamp")
+
+
+@dataclass(frozen=True)
+class ExportColumn:
+    """匯出欄位定義；kind 為轉換後的值型別（string / int / float / bool / timestamp）"""
+    header: str
+    key: str
+    transform: Optional[Callable[[Any], Any]] = None
+    kind: str = "string"
+
+    def __post_init__(self):
+        if self.kind not in COLUMN_KINDS:
+            raise ValueError(f"不支援的欄位型別: {self.kind}（可用: {', '.join(COLUMN_KINDS)}）")
+
+    def value(self, row) -> Any:
+        value = row[self.key]
+        return self.transform(value) if self.transform else value
+
+
+def _csv_value(value: Any) -> Any:
+    return "" if value is None else value
+
+
+async def _iter_row_batches(rows: AsyncIterator, columns: Sequence[ExportColumn],
+                            batch_rows: int) -> AsyncIterator[List[List[Any]]]:
+    batch: List[List[Any]] = []
+    async for row in rows:
+        batch.append([column.value(row) for column in columns])
+        if len(batch) >= batch_rows:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def _iter_csv(rows: AsyncIterator, columns: Sequence[ExportColumn],
+                    batch_rows: int) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write("\ufeff")  # utf-8-sig BOM，Excel 才能正確辨識中文
+    writer.writerow([column.header for column in columns])
+
+    async for batch in _iter_row_batches(rows, columns, batch_rows):
+        writer.writerows([[_csv_value(v) for v in values] for values in batch])
+        if buffer.tell() >= CSV_FLUSH_BYTES:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+async def _iter_gzip(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 → gzip 標頭
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+class _ChunkSink(io.RawIOBase):
+    """ParquetWriter 的輸出端：累積寫入的位元組，由呼叫端逐段取走"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _arrow_schema(pa, columns: Sequence[ExportColumn]):
+    types = {
+        "string": pa.string(),
+        "int": pa.int64(),
+        "float": pa.float64(),
+        "bool": pa.bool_(),
+        "timestamp": pa.timestamp("us"),
+    }
+    return pa.schema([(column.header, types[column.kind]) for column in columns])
+
+
+async def _iter_parquet(rows: AsyncIterator, columns: Sequence[ExportColumn],
+                        batch_rows: int) -> AsyncIterator[bytes]:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError("Parquet 匯出需要安裝 pyarrow") from e
+
+    # schema 由欄位定義決定，每批都以同一 schema 建表
+    schema = _arrow_schema(pa, columns)
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        async for batch in _iter_row_batches(rows, columns, batch_rows):
+            arrays = [
+                pa.array([values[i] for values in batch], type=field.type)
+                for i, field in enumerate(schema)
+            ]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))  # 每批一個 row group
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def iter_export(rows: AsyncIterator, columns: Sequence[ExportColumn], fmt: str = "csv",
+                batch_rows: int = DEFAULT_BATCH_ROWS) -> AsyncIterator[bytes]:
+    """將資料列串流編碼為指定格式的位元組區塊
+
+    Args:
+        rows: 資料列的 async iterator（如 DatabaseClient.iter_rows），支援 row[key]
+        columns: 欄位定義
+        fmt: csv / csv.gz / parquet
+        batch_rows: 每批處理的列數（Parquet 即 row group 大小）
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"不支援的匯出格式: {fmt}（可用: {', '.join(EXPORT_FORMATS)}）")
+    if fmt == "parquet":
+        return _iter_parquet(rows, columns, batch_rows)
+    chunks = _iter_csv(rows, columns, batch_rows)
+    return _iter_gzip(chunks) if fmt == "csv.gz" else chunks
+
+
+async def export_to_file(rows: AsyncIterator, columns: Sequence[ExportColumn], output_path: str,
+                         fmt: str = "csv", batch_rows: int = DEFAULT_BATCH_ROWS) -> int:
+    """串流寫入檔案；回傳寫入的資料列數"""
+    count = 0
+
+    async def counted():
+        nonlocal count
+        async for row in rows:
+            count += 1
+            yield row
+
+    with open(Path(output_path), "wb") as f:
+        async for chunk in iter_export(counted(), columns, fmt, batch_rows):
+            f.write(chunk)
+    return count
+
+
+def export_filename(stem: str, fmt: str) -> str:
+    return f"{stem}{EXPORT_FORMATS[fmt][1]}"
+
+
+def export_media_type(fmt: str) -> str:
+    return EXPORT_FORMATS[fmt][0]
@@ -12,6 +12,9 @@ from dataclasses import dataclass, asdict
 from datetime import datetime
 from enum import Enum
 
+# 同時執行的爬取任務上限（搭配 crawl scheduler 的多副本部署可調高）；同一帳號永遠不會並行
+MAX_PARALLEL_CRAWLS = max(1, int(os.getenv("UI_MAX_PARALLEL_CRAWLS", "1")))
+
 class TaskStatus(str, Enum):
     """任務狀態"""
     WAITING = "waiting"      # 等待中
@@ -128,18 +131,24 @@ class TaskQueueManager:
         """獲取下一個待執行的任務"""
         queue = self._load_queue()
         
-        # 檢查是否有正在執行的任務
+        # 檢查執行中的任務是否已達上限
         running_tasks = [task for task in queue if task.status == TaskStatus.RUNNING]
-        if running_tasks:
-            return None  # 有任務正在執行，不能開始新任務
+        if len(running_tasks) >= MAX_PARALLEL_CRAWLS:
+            return None  # 已達並行上限，不能開始新任務
         
-        # 找到第一個等待中的任務
-        waiting_tasks = [task for task in queue if task.status == TaskStatus.WAITING]
+        return self._first_startable(queue)
+    
+    def _first_startable(self, queue: List[QueuedTask]) -> Optional[QueuedTask]:
+        """最早建立、且目標帳號沒有任務執行中的等待任務"""
+        busy_usernames = {task.username for task in queue if task.status == TaskStatus.RUNNING}
+        waiting_tasks = [
+            task for task in queue
+            if task.status == TaskStatus.WAITING and task.username not in busy_usernames
+        ]
         if waiting_tasks:
             # 按創建時間排序，返回最早的
             waiting_tasks.sort(key=lambda x: x.created_at)
             return waiting_tasks[0]
-        
         return None
     
     def start_task(self, task_id: str) -> bool:
@@ -261,13 +270,7 @@ class TaskQueueManager:
     
     def get_next_waiting_task(self) -> Optional[QueuedTask]:
         """獲取下一個等待中的任務"""
-        queue = self._load_queue()
-        waiting_tasks = [task for task in queue if task.status == TaskStatus.WAITING]
-        if waiting_tasks:
-            # 按創建時間排序，返回最早的任務
-            waiting_tasks.sort(key=lambda x: x.created_at)
-            return waiting_tasks[0]
-        return None
+        return self._first_startable(self._load_queue())
     
     def start_task(self, task_id: str) -> bool:
         """將任務標記為執行中"""
@@ -285,9 +288,8 @@ class TaskQueueManager:
             return False
     
     def can_start_new_task(self) -> bool:
-        """檢查是否可以啟動新任務（沒有執行中的任務）"""
-        current_running = self.get_current_running_task()
-        return current_running is None
+        """檢查是否可以啟動新任務（執行中的任務未達 MAX_PARALLEL_CRAWLS）"""
+        return len(self.get_running_tasks()) < MAX_PARALLEL_CRAWLS
     
     def try_auto_start_next_task(self) -> bool:
         """嘗試自動啟動下一個等待中的任務"""
@@ -300,17 +302,22 @@ class TaskQueueManager:
         return False
 
     def get_current_running_task(self) -> Optional[QueuedTask]:
-        """獲取當前真正執行中的任務"""
-        queue = self._load_queue()
-        for task in queue:
+        """獲取當前真正執行中的任務（並行時回傳其中第一個）"""
+        running_tasks = self.get_running_tasks()
+        return running_tasks[0] if running_tasks else None
+    
+    def get_running_tasks(self) -> List[QueuedTask]:
+        """獲取所有真正執行中的任務"""
+        running_tasks = []
+        for task in self._load_queue():
             if task.status == TaskStatus.RUNNING:
                 # 檢查任務是否真的在執行中
                 if self._is_task_actually_running(task):
-                    return task
+                    running_tasks.append(task)
                 else:
                     # 任務已停止但狀態沒更新，標記為失敗
                     self._mark_task_failed(task.task_id, "任務進程已停止")
-        return None
+        return running_tasks
     
     def _is_task_actually_running(self, task: QueuedTask) -> bool:
         """檢查任務是否真的在執行中（有活躍的進度更新）"""
@@ -0,0 +1,209 @@
+"""
+服務暖機與就緒探針
+
+各服務原本在第一個請求才建立 DB 連線池、Redis/NATS 連線、瀏覽器與 Gemini 模型，
+部署後第一位使用者要承擔全部冷啟動成本。ServiceWarmup 讓服務在 lifespan 內明確執行
+暖機步驟，並以 /ready 回報是否可接流量：
+
+    warmup = ServiceWarmup("vision")
+    warmup.add("db_pool", warm_db_pool)
+    warmup.add("gemini_model", build_model)
+    warmup.add("rustfs", check_bucket, required=False)
+
+    # lifespan 內
+    warmup.start()                # 背景並行執行全部步驟（各自有逾時），必要步驟失敗時持續重試
+    yield                         # 不等暖機：/health 立即可達，/ready 在暖機完成前回 503
+    await warmup.stop()
+
+    @app.get("/ready")
+    async def ready():
+        return warmup.ready_response()
+
+/health 仍是存活探針（行程活著即回應），/ready 才表示暖機完成；必要步驟全部成功前回 503。
+
+指標：
+- 每個步驟與整體暖機耗時列在 /ready 回應的 warmup_seconds / steps 中
+- 有安裝 prometheus_client 時另外登記 service_warmup_seconds{service, step} 與
+  service_ready{service}（mcp_server 的 /metrics 會一併輸出）
+
+設定（環境變數）：
+- WARMUP_ENABLED：false 時跳過暖機，/ready 直接回 200
+- WARMUP_STEP_TIMEOUT：單一步驟逾時秒數，預設 60
+- WARMUP_RETRY_INTERVAL：必要步驟失敗後的背景重試間隔秒數，預設 15
+"""
+
+import asyncio
+import inspect
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    from prometheus_client import Gauge
+except ImportError:  # pragma: no cover - 選用相依
+    Gauge = None
+
+
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() not in ("0", "false", "no")
+WARMUP_STEP_TIMEOUT = float(os.getenv("WARMUP_STEP_TIMEOUT", "60"))
+WARMUP_RETRY_INTERVAL = float(os.getenv("WARMUP_RETRY_INTERVAL", "15"))
+
+if Gauge is not None:
+    WARMUP_SECONDS = Gauge("service_warmup_seconds", "暖機步驟耗時（秒）", ["service", "step"])
+    SERVICE_READY = Gauge("service_ready", "服務是否已完成暖機（1/0）", ["service"])
+else:
+    WARMUP_SECONDS = SERVICE_READY = None
+
+
+class ServiceWarmup:
+    """服務暖機步驟與就緒狀態"""
+
+    def __init__(self, service: str):
+        self.service = service
+        self._steps: Dict[str, Dict[str, Any]] = {}
+        self.started_at: Optional[float] = None
+        self.duration_s: Optional[float] = None
+        self.ready = False
+        self._run_task: Optional[asyncio.Task] = None
+        self._retry_task: Optional[asyncio.Task] = None
+
+    def add(self, name: str, fn: Callable[[], Any], required: bool = True) -> None:
+        """登記暖機步驟；fn 可為 async 函式或一般函式（一般函式在執行緒中執行，避免阻塞事件迴圈）"""
+        self._steps[name] = {
+            "fn": fn,
+            "required": required,
+            "status": "pending",
+            "duration_s": None,
+            "detail": None,
+            "error": None,
+        }
+
+    @staticmethod
+    async def _call(fn: Callable[[], Any]) -> Any:
+        if inspect.iscoroutinefunction(fn):
+            return await fn()
+        result = await asyncio.to_thread(fn)
+        # lambda 包裝的 async 呼叫會在執行緒中回傳 coroutine，回到事件迴圈等待
+        if inspect.isawaitable(result):
+            return await result
+        return result
+
+    async def _run_step(self, name: str) -> None:
+        step = self._steps[name]
+        started = time.perf_counter()
+        try:
+            detail = await asyncio.wait_for(self._call(step["fn"]), timeout=WARMUP_STEP_TIMEOUT)
+            step.update(status="ok", detail=detail if isinstance(detail, (dict, str, int, float, bool)) else None, error=None)
+        except asyncio.TimeoutError:
+            step.update(status="failed", error=f"timeout after {WARMUP_STEP_TIMEOUT:.0f}s")
+        except Exception as e:
+            step.update(status="failed", error=str(e))
+        step["duration_s"] = round(time.perf_counter() - started, 3)
+        if WARMUP_SECONDS is not None:
+            WARMUP_SECONDS.labels(self.service, name).set(step["duration_s"])
+
+        icon = "✅" if step["status"] == "ok" else ("❌" if step["required"] else "⚠️")
+        suffix = f"：{step['error']}" if step["error"] else ""
+        print(f"{icon} [{self.service}] warm-up {name} {step['duration_s']:.2f}s{suffix}")
+
+    def _update_ready(self) -> None:
+        self.ready = all(step["status"] == "ok" for step in self._steps.values() if step["required"])
+        if SERVICE_READY is not None:
+            SERVICE_READY.labels(self.service).set(1 if self.ready else 0)
+
+    async def run(self) -> bool:
+        """並行執行全部暖機步驟；必要步驟失敗時啟動背景重試，回傳是否就緒"""
+        if not WARMUP_ENABLED:
+            self.ready = True
+            return True
+
+        self.started_at = time.time()
+        started = time.perf_counter()
+        await asyncio.gather(*[self._run_step(name) for name in self._steps])
+        self.duration_s = round(time.perf_counter() - started, 3)
+        if WARMUP_SECONDS is not None:
+            WARMUP_SECONDS.labels(self.service, "total").set(self.duration_s)
+        self._update_ready()
+
+        if self.ready:
+            print(f"🔥 [{self.service}] warm-up completed in {self.duration_s:.2f}s")
+        else:
+            print(f"⚠️ [{self.service}] warm-up incomplete after {self.duration_s:.2f}s, retrying in background")
+            self._retry_task = asyncio.create_task(self._retry_failed())
+        return self.ready
+
+    def start(self) -> asyncio.Task:
+        """在背景啟動暖機並立即返回，讓 lifespan 可以馬上 yield 開始接受連線"""
+        if self._run_task is None:
+            self._run_task = asyncio.create_task(self.run())
+        return self._run_task
+
+    async def _retry_failed(self) -> None:
+        while not self.ready:
+            await asyncio.sleep(WARMUP_RETRY_INTERVAL)
+            failed = [name for name, step in self._steps.items() if step["status"] != "ok"]
+            await asyncio.gather(*[self._run_step(name) for name in failed])
+            self._update_ready()
+        print(f"🔥 [{self.service}] ready after background warm-up retry")
+
+    async def stop(self) -> None:
+        for task in (self._run_task, self._retry_task):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+        self._run_task = self._retry_task = None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "service": self.service,
+            "ready": self.ready,
+            "state": "ready" if self.ready else ("retrying" if self.duration_s is not None else "warming_up"),
+            "warmup_enabled": WARMUP_ENABLED,
+            "warmup_seconds": self.duration_s,
+            "started_at": self.started_at,
+            "steps": {
+                name: {key: value for key, value in step.items() if key != "fn"}
+                for name, step in self._steps.items()
+            },
+        }
+
+    def ready_response(self):
+        """/ready 端點回應：就緒 200，否則 503"""
+        from fastapi.responses import JSONResponse
+
+        return JSONResponse(status_code=200 if self.ready else 503, content=self.status())
+
+
+async def warm_db_pool(statements: Optional[List[str]] = None, client=None) -> Dict[str, Any]:
+    """
+    共用步驟：asyncpg 連線池預先建立到 min_size，並在每條連線上 prepare 熱點語句（SQL 或具名查詢名稱）
+
+    client 預設為 get_db_client()；持有自己 DatabaseClient 的元件（如 crawl_history）傳入自己的實例。
+    """
+    if client is None:
+        from common.db_client import get_db_client
+
+        client = await get_db_client()
+    return await client.warm_up(statements)
+
+
+async def warm_redis() -> Dict[str, Any]:
+    """共用步驟：建立 async Redis 連線並 PING"""
+    from common.redis_client import get_async_redis_client
+
+    redis = await get_async_redis_client()
+    await redis.ping()
+    return {"ping": True}
+
+
+async def warm_nats() -> Dict[str, Any]:
+    """共用步驟：連上 NATS（未安裝 nats-py 或連不上時回報未連線）"""
+    from common.nats_client import get_nats_client
+
+    client = await get_nats_client()
+    if client is None or not client.is_connected:
+        raise RuntimeError("NATS not connected")
+    return {"connected": True}
@@ -0,0 +1,275 @@
+"""
+服務間傳輸格式（內容協商）
+
+內部服務之間大量傳遞 PostMetricsBatch 與 A2A 事件，JSON 文字的編碼/解碼與位元組數
+在大批次時是主要成本。此模組讓請求方以 Accept 標頭宣告能解碼的格式，回應方挑選雙方
+都支援的最精簡格式：
+
+- application/json              一律可用（安裝 orjson 時以 orjson 編碼/解碼）
+- application/msgpack           需要 msgpack
+- application/msgpack+zstd      需要 msgpack + zstandard
+- application/json+zstd         需要 zstandard
+
+沒有帶 Accept 或只接受 JSON 的呼叫方（UI、外部工具）行為與原本完全相同。
+datetime 一律編成 ISO 字串，解碼後的 dict 與 JSON 路徑一致。
+
+A2A 串流另有分框格式 application/x-a2a-frames+msgpack：每個事件為
+「4 位元組 big-endian 長度 + msgpack 內容」，取代 SSE 的 `data: <json>` 文字行。
+
+信任的內部路徑可用 `post_metrics_batch(data, trusted=True)` 跳過 pydantic 驗證，
+只把 datetime 欄位轉回 datetime，適合已由上游模型產生的資料。
+
+設定：
+- WIRE_FORMAT：呼叫方偏好（auto / json / msgpack / msgpack+zstd / json+zstd），預設 auto
+- WIRE_ZSTD_LEVEL：zstd 壓縮等級，預設 3
+"""
+
+import json
+import os
+import struct
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+from typing import Any, AsyncIterable, AsyncIterator, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - 選用相依
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - 選用相依
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - 選用相依
+    zstandard = None
+
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+MSGPACK_ZSTD = "application/msgpack+zstd"
+JSON_ZSTD = "application/json+zstd"
+A2A_FRAMES = "application/x-a2a-frames+msgpack"
+
+# 回應方的偏好順序（越前面越精簡）
+_SERVER_PREFERENCE = [MSGPACK_ZSTD, MSGPACK, JSON_ZSTD, JSON]
+_ALIASES = {
+    "application/x-msgpack": MSGPACK,
+    "application/x-msgpack+zstd": MSGPACK_ZSTD,
+}
+_PREFERENCE_NAMES = {
+    "json": JSON,
+    "msgpack": MSGPACK,
+    "msgpack+zstd": MSGPACK_ZSTD,
+    "json+zstd": JSON_ZSTD,
+}
+
+ZSTD_LEVEL = int(os.getenv("WIRE_ZSTD_LEVEL", "3"))
+_FRAME_HEADER = struct.Struct(">I")
+
+_POST_DATETIME_FIELDS = (
+    "created_at", "post_published_at", "fetched_at", "views_fetched_at",
+    "last_updated", "reader_processed_at", "dom_processed_at",
+)
+
+
+def supported_media_types() -> List[str]:
+    """本行程能編碼/解碼的格式（依偏好排序）"""
+    available = []
+    for media_type in _SERVER_PREFERENCE:
+        if media_type in (MSGPACK, MSGPACK_ZSTD) and msgpack is None:
+            continue
+        if media_type in (MSGPACK_ZSTD, JSON_ZSTD) and zstandard is None:
+            continue
+        available.append(media_type)
+    return available
+
+
+def _parse_accept(accept: Optional[str]) -> List[Tuple[str, float]]:
+    entries = []
+    for part in (accept or "").split(","):
+        fields = [field.strip() for field in part.split(";")]
+        media_type = fields[0].lower()
+        if not media_type:
+            continue
+        q = 1.0
+        for param in fields[1:]:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        entries.append((_ALIASES.get(media_type, media_type), q))
+    return entries
+
+
+def negotiate(accept: Optional[str]) -> str:
+    """依 Accept 標頭挑選回應格式；無法協商時回傳 JSON"""
+    accepted = {media_type: q for media_type, q in _parse_accept(accept) if q > 0}
+    candidates = [
+        (accepted[media_type], -rank, media_type)
+        for rank, media_type in enumerate(supported_media_types())
+        if media_type in accepted
+    ]
+    if not candidates:
+        return JSON
+    return max(candidates)[2]
+
+
+def accept_header(preference: Optional[str] = None) -> str:
+    """呼叫方的 Accept 標頭：列出能解碼的格式，JSON 永遠保底"""
+    preference = (preference or os.getenv("WIRE_FORMAT", "auto")).lower()
+    available = supported_media_types()
+    preferred = _PREFERENCE_NAMES.get(preference)
+    if preferred is not None:
+        available = [preferred] if preferred in available else []
+    media_types = [media_type for media_type in available if media_type != JSON]
+    parts = [f"{media_type};q={1.0 - i * 0.1:.1f}" for i, media_type in enumerate(media_types)]
+    parts.append(f"{JSON};q=0.5")
+    return ", ".join(parts)
+
+
+def _default(obj: Any) -> Any:
+    """msgpack / json 無法直接處理的型別"""
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    if isinstance(obj, Enum):
+        return obj.value
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    raise TypeError(f"Type {type(obj).__name__} not serializable")
+
+
+def _dumps_json(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=_default, ensure_ascii=False).encode("utf-8")
+
+
+def _loads_json(data: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _dumps_msgpack(obj: Any) -> bytes:
+    return msgpack.packb(obj, default=_default, use_bin_type=True)
+
+
+def _loads_msgpack(data: bytes) -> Any:
+    return msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+
+def _normalize(media_type: Optional[str]) -> str:
+    base = (media_type or JSON).split(";")[0].strip().lower()
+    return _ALIASES.get(base, base)
+
+
+def encode(obj: Any, media_type: str = JSON) -> bytes:
+    """依格式編碼；pydantic 模型直接傳入即可"""
+    if isinstance(obj, BaseModel):
+        obj = obj.model_dump()
+    media_type = _normalize(media_type)
+    if media_type == MSGPACK:
+        return _dumps_msgpack(obj)
+    if media_type == MSGPACK_ZSTD:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(_dumps_msgpack(obj))
+    if media_type == JSON_ZSTD:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(_dumps_json(obj))
+    return _dumps_json(obj)
+
+
+def decode(data: bytes, media_type: Optional[str] = JSON) -> Any:
+    """依 Content-Type 解碼；未知類型視為 JSON"""
+    media_type = _normalize(media_type)
+    if media_type == MSGPACK:
+        return _loads_msgpack(data)
+    if media_type == MSGPACK_ZSTD:
+        return _loads_msgpack(zstandard.ZstdDecompressor().decompress(data))
+    if media_type == JSON_ZSTD:
+        return _loads_json(zstandard.ZstdDecompressor().decompress(data))
+    return _loads_json(data)
+
+
+def wire_response(obj: Any, accept: Optional[str], status_code: int = 200):
+    """依 Accept 回傳編碼後的 Response；協商結果為 JSON 時回傳 None，由端點照原本方式回應"""
+    media_type = negotiate(accept)
+    if media_type == JSON:
+        return None
+    from fastapi import Response
+
+    return Response(
+        content=encode(obj, media_type),
+        status_code=status_code,
+        media_type=media_type,
+        headers={"Vary": "Accept"},
+    )
+
+
+def decode_response(response) -> Any:
+    """解碼 httpx 回應（依回應的 Content-Type）"""
+    return decode(response.content, response.headers.get("content-type"))
+
+
+def post_metrics_batch(data: Dict[str, Any], trusted: bool = False):
+    """
+    dict → PostMetricsBatch
+
+    trusted=True 時跳過 pydantic 驗證（model_construct），只把 datetime 欄位轉回 datetime；
+    僅用於來源為內部服務、資料本來就由同一模型產生的路徑。
+    """
+    from common.models import PostMetrics, PostMetricsBatch
+
+    if not trusted:
+        return PostMetricsBatch(**data)
+
+    posts = []
+    for post in data.get("posts") or []:
+        post = dict(post)
+        for field in _POST_DATETIME_FIELDS:
+            value = post.get(field)
+            if isinstance(value, str):
+                post[field] = datetime.fromisoformat(value)
+        posts.append(PostMetrics.model_construct(**post))
+    return PostMetricsBatch.model_construct(**{**data, "posts": posts})
+
+
+# ---------------------------------------------------------------- A2A 分框串流
+def frames_supported() -> bool:
+    return msgpack is not None
+
+
+def accepts_frames(accept: Optional[str]) -> bool:
+    """呼叫方是否接受 A2A 分框串流（且本行程有 msgpack）"""
+    return frames_supported() and any(
+        media_type == A2A_FRAMES and q > 0 for media_type, q in _parse_accept(accept)
+    )
+
+
+def encode_frame(obj: Any) -> bytes:
+    """單一 A2A 事件 → 長度前綴的 msgpack 框"""
+    payload = _dumps_msgpack(obj)
+    return _FRAME_HEADER.pack(len(payload)) + payload
+
+
+async def iter_frames(chunks: AsyncIterable[bytes]) -> AsyncIterator[Any]:
+    """由位元組串流還原 A2A 事件（框可能跨越或合併在網路分塊中）"""
+    buffer = bytearray()
+    async for chunk in chunks:
+        buffer += chunk
+        while len(buffer) >= _FRAME_HEADER.size:
+            (length,) = _FRAME_HEADER.unpack_from(buffer)
+            end = _FRAME_HEADER.size + length
+            if len(buffer) < end:
+                break
+            yield _loads_msgpack(bytes(buffer[_FRAME_HEADER.size:end]))
+            del buffer[:end]
@@ -4,21 +4,27 @@ MCP Server 主程式 - 混合優化版本
 """
 
 import asyncio
+import base64
+import hashlib
 import time
 import traceback
 from datetime import datetime, timedelta
 from typing import List, Optional
+from urllib.parse import quote
 
+import httpx
 import structlog
 import json
 import uvicorn
 from fastapi import FastAPI, HTTPException, BackgroundTasks, Request, Depends
 from fastapi.responses import StreamingResponse, JSONResponse, Response
+from fastapi.encoders import jsonable_encoder
+from starlette.background import BackgroundTask
 from fastapi.middleware.cors import CORSMiddleware
 from prometheus_fastapi_instrumentator import Instrumentator
 from sqlalchemy.exc import OperationalError
 from sqlmodel import SQLModel, Session, select, create_engine
-from sqlalchemy import text
+from sqlalchemy import text, func, tuple_
 from jose import jwt, JWTError
 from passlib.hash import bcrypt
 from contextlib import asynccontextmanager
@@ -29,6 +35,9 @@ from .models import (
 )
 from services.rustfs_client import get_rustfs_client
 from common.settings import get_settings
+from common.warmup import ServiceWarmup
+from common.export_links import verify_export_token
+from common.metrics_history import get_views_gained, prune_history
 
 # 設置日誌
 structlog.configure(
@@ -47,6 +56,35 @@ settings = get_settings()
 engine = create_engine(settings.database.url, echo=settings.development_mode)
 
 
+def _warm_sql_pool() -> dict:
+    """SQLAlchemy 連線池預先建立到 pool_size：同時借出多條連線，各自 SELECT 1 後歸還"""
+    size = max(getattr(engine.pool, "size", lambda: 1)(), 1)
+    connections = []
+    try:
+        for _ in range(size):
+            conn = engine.connect()
+            connections.append(conn)
+            conn.execute(text("SELECT 1"))
+    finally:
+        for conn in connections:
+            conn.close()
+    return {"connections": len(connections)}
+
+
+async def _warm_rustfs() -> dict:
+    """初始化 RustFS（bucket 檢查）"""
+    rustfs_client = await get_rustfs_client()
+    await rustfs_client.initialize()
+    log.info("rustfs_initialized")
+    return {"bucket": rustfs_client.bucket_name}
+
+
+# 暖機：資料表建立完成後才執行（見 lifespan），/ready 在連線池就緒前回 503
+warmup = ServiceWarmup("mcp_server")
+warmup.add("sql_pool", _warm_sql_pool)
+warmup.add("rustfs", _warm_rustfs, required=False)
+
+
 def get_session():
     """獲取資料庫 session"""
     with Session(engine) as session:
@@ -153,6 +191,46 @@ async def heartbeat_watcher():
             log.error("heartbeat_watcher_error", error=str(e))
 
 
+# 後台任務：操作日誌分區與保留策略
+async def operation_log_maintenance():
+    """每日建立本月/下月分區並執行保留策略（prune_operation_logs，見 alembic 005）"""
+    while True:
+        try:
+            with Session(engine) as session:
+                if _has_db_function(session, "prune_operation_logs(integer, integer)"):
+                    _ensure_user_ops_partitions(session)
+                    dropped = session.exec(text("SELECT prune_operation_logs(:keep_days, :keep_summary_days)"), {
+                        "keep_days": OPS_LOG_RETENTION_DAYS,
+                        "keep_summary_days": OPS_SUMMARY_RETENTION_DAYS,
+                    }).first()[0]
+                    session.commit()
+                    log.info("operation_logs_pruned", dropped_partitions=dropped, keep_days=OPS_LOG_RETENTION_DAYS)
+        except Exception as e:
+            log.error("operation_log_maintenance_error", error=str(e))
+        
+        await asyncio.sleep(24 * 3600)
+
+
+# 後台任務：貼文指標歷史分區與保留策略
+async def metrics_history_maintenance():
+    """每日預建本月/下月分區並執行保留策略（prune_post_metrics_history，見 alembic 004）"""
+    while True:
+        try:
+            with Session(engine) as session:
+                available = _has_db_function(session, "prune_post_metrics_history(integer, integer, integer)")
+            if available:
+                dropped = await prune_history(
+                    keep_months=METRICS_HISTORY_KEEP_MONTHS,
+                    keep_hourly_days=METRICS_HOURLY_RETENTION_DAYS,
+                    keep_daily_days=METRICS_DAILY_RETENTION_DAYS,
+                )
+                log.info("metrics_history_pruned", dropped_partitions=dropped, keep_months=METRICS_HISTORY_KEEP_MONTHS)
+        except Exception as e:
+            log.error("metrics_history_maintenance_error", error=str(e))
+        
+        await asyncio.sleep(24 * 3600)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """應用生命週期管理"""
@@ -218,21 +296,21 @@ async def lifespan(app: FastAPI):
             log.info(f"retrying_database_initialization_in_{retry_delay}_seconds")
             await asyncio.sleep(retry_delay)
     
-    # 啟動心跳監控
+    # 啟動心跳監控與日誌維護
     watcher_task = asyncio.create_task(heartbeat_watcher())
+    maintenance_task = asyncio.create_task(operation_log_maintenance())
+    metrics_maintenance_task = asyncio.create_task(metrics_history_maintenance())
     
-    # 初始化 RustFS（如果可用）
-    try:
-        rustfs_client = await get_rustfs_client()
-        await rustfs_client.initialize()
-        log.info("rustfs_initialized")
-    except Exception as e:
-        log.warning("rustfs_init_failed", error=str(e))
+    # 背景暖機：SQL 連線池預先建立、初始化 RustFS（如果可用）；/ready 在完成前回 503
+    warmup.start()
     
     yield
     
     # 關閉時
+    await warmup.stop()
     watcher_task.cancel()
+    maintenance_task.cancel()
+    metrics_maintenance_task.cancel()
     log.info("mcp_server_shutdown")
 
 
@@ -251,6 +329,18 @@ JWT_EXPIRES_MINUTES = int(os.getenv("AUTH_TOKEN_EXPIRES_MINUTES", "43200"))  # 3
 REG_TOKEN = os.getenv("AUTH_ADMIN_REG_TOKEN")
 ALLOWED_USER_IDS = set([u.strip() for u in (os.getenv("ALLOWED_USER_IDS", "").split(",") if os.getenv("ALLOWED_USER_IDS") else [])])
 
+# 操作日誌保留天數（原始日誌 / 逐時彙總）
+OPS_LOG_RETENTION_DAYS = int(os.getenv("OPS_LOG_RETENTION_DAYS", "90"))
+OPS_SUMMARY_RETENTION_DAYS = int(os.getenv("OPS_SUMMARY_RETENTION_DAYS", "400"))
+
+# 貼文指標歷史保留（原始快照月數 / 逐時彙總天數 / 逐日彙總天數）
+METRICS_HISTORY_KEEP_MONTHS = int(os.getenv("METRICS_HISTORY_KEEP_MONTHS", "6"))
+METRICS_HOURLY_RETENTION_DAYS = int(os.getenv("METRICS_HOURLY_RETENTION_DAYS", "30"))
+METRICS_DAILY_RETENTION_DAYS = int(os.getenv("METRICS_DAILY_RETENTION_DAYS", "730"))
+
+# 匯出代理轉送的目標（Playwright Agent 只在內部網路開放）
+PLAYWRIGHT_CRAWLER_URL = os.getenv("PLAYWRIGHT_CRAWLER_URL", "http://playwright-crawler-agent:8006")
+
 # CORS 中介軟體
 app.add_middleware(
     CORSMiddleware,
@@ -346,13 +436,49 @@ async def heartbeat(name: str, session: Session = Depends(get_session)):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _agents_etag(agents: List[AgentResponse]) -> str:
+    """
+    Agent 清單的 ETag：只涵蓋名稱、角色、URL、狀態、版本與能力
+    
+    心跳時間不列入，註冊表沒有實質變化時 ETag 不變，客戶端可用 304 續用本地快取
+    """
+    digest = hashlib.sha1()
+    for agent in sorted(agents, key=lambda a: a.name):
+        digest.update(json.dumps(
+            [agent.name, agent.role, agent.url, agent.status, agent.version, agent.capabilities],
+            sort_keys=True, default=str
+        ).encode())
+    return f'W/"{digest.hexdigest()}"'
+
+
+def _conditional_json(request: Request, payload, agents: List[AgentResponse]) -> Response:
+    """If-None-Match 與目前 ETag 相同時回 304，否則回 JSON 並附 ETag"""
+    etag = _agents_etag(agents)
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return JSONResponse(content=jsonable_encoder(payload), headers={"ETag": etag})
+
+
+def _agent_response(agent: Agent) -> AgentResponse:
+    return AgentResponse(
+        name=agent.name,
+        role=agent.role,
+        url=agent.url,
+        status=agent.status,
+        last_heartbeat=agent.last_heartbeat,
+        version=agent.version,
+        capabilities=agent.capabilities
+    )
+
+
 @app.get("/agents", response_model=List[AgentResponse])
 async def list_agents(
+    request: Request,
     role: Optional[str] = None,
     status: Optional[str] = None,
     session: Session = Depends(get_session)
 ):
-    """列出 Agent - 支援過濾"""
+    """列出 Agent - 支援過濾與條件請求（ETag / If-None-Match）"""
     try:
         query = select(Agent)
         
@@ -361,20 +487,8 @@ async def list_agents(
         if status:
             query = query.where(Agent.status == status)
         
-        agents = session.exec(query).all()
-        
-        return [
-            AgentResponse(
-                name=agent.name,
-                role=agent.role,
-                url=agent.url,
-                status=agent.status,
-                last_heartbeat=agent.last_heartbeat,
-                version=agent.version,
-                capabilities=agent.capabilities
-            )
-            for agent in agents
-        ]
+        agents = [_agent_response(agent) for agent in session.exec(query).all()]
+        return _conditional_json(request, agents, agents)
         
     except Exception as e:
         log.error("list_agents_error", error=str(e))
@@ -382,21 +496,14 @@ async def list_agents(
 
 
 @app.get("/agents/{name}", response_model=AgentResponse)
-async def get_agent(name: str, session: Session = Depends(get_session)):
-    """獲取特定 Agent"""
+async def get_agent(name: str, request: Request, session: Session = Depends(get_session)):
+    """獲取特定 Agent（支援 ETag / If-None-Match）"""
     agent = session.exec(select(Agent).where(Agent.name == name)).first()
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
     
-    return AgentResponse(
-        name=agent.name,
-        role=agent.role,
-        url=agent.url,
-        status=agent.status,
-        last_heartbeat=agent.last_heartbeat,
-        version=agent.version,
-        capabilities=agent.capabilities
-    )
+    response = _agent_response(agent)
+    return _conditional_json(request, response, [response])
 
 
 @app.get("/health")
@@ -405,6 +512,12 @@ async def health_check():
     return {"status": "ok", "timestamp": datetime.utcnow()}
 
 
+@app.get("/ready")
+async def readiness_check():
+    """就緒探針：暖機完成前回 503"""
+    return warmup.ready_response()
+
+
 # ============================================================================
 # 保留的獨特功能：媒體管理
 # ============================================================================
@@ -499,45 +612,146 @@ async def get_media_files(post_url: str, session: Session = Depends(get_session)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/exports/playwright/{token}")
+async def proxy_playwright_export(token: str):
+    """匯出下載代理：驗證 UI 簽發的短效 token，逐塊轉送 Agent 的串流匯出（不落地、不整檔緩衝）"""
+    try:
+        claims = verify_export_token(token)
+    except ValueError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+
+    client = httpx.AsyncClient(timeout=httpx.Timeout(30.0, read=None))
+    try:
+        upstream = await client.send(
+            client.build_request(
+                "GET",
+                f"{PLAYWRIGHT_CRAWLER_URL}/v1/playwright/users/{quote(claims['username'], safe='')}/export",
+                params={"format": claims["fmt"], "layout": claims["layout"]},
+            ),
+            stream=True,
+        )
+    except httpx.HTTPError as e:
+        await client.aclose()
+        log.error("export_proxy_unreachable", username=claims["username"], error=str(e))
+        raise HTTPException(status_code=502, detail="匯出服務無法連線")
+    if upstream.status_code != 200:
+        detail = (await upstream.aread()).decode(errors="replace")[:500]
+        await upstream.aclose()
+        await client.aclose()
+        log.error("export_proxy_failed", username=claims["username"], status=upstream.status_code, detail=detail)
+        raise HTTPException(status_code=502, detail=f"匯出服務回應 {upstream.status_code}")
+
+    async def close_upstream():
+        await upstream.aclose()
+        await client.aclose()
+
+    return StreamingResponse(
+        upstream.aiter_raw(),
+        media_type=upstream.headers.get("content-type"),
+        headers={"Content-Disposition": upstream.headers.get("content-disposition", "attachment")},
+        background=BackgroundTask(close_upstream),
+    )
+
+
 # ============================================================================
 # 保留的監控功能
 # ============================================================================
 
+def _has_db_function(session: Session, signature: str) -> bool:
+    """資料庫函數是否存在（alembic 005 之前的資料庫沒有分區/彙總函數）"""
+    return session.exec(text("SELECT to_regprocedure(:sig) IS NOT NULL"), {"sig": signature}).first()[0]
+
+
+def _encode_cursor(ts, row_id: int) -> str:
+    """(ts, id) → 游標字串（不透明，base64）"""
+    raw = f"{ts.isoformat() if hasattr(ts, 'isoformat') else ts}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str):
+    """游標字串 → (ts, id)；格式錯誤回 400"""
+    try:
+        raw = base64.urlsafe_b64decode((cursor + "=" * (-len(cursor) % 4)).encode()).decode()
+        ts_text, row_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(ts_text), int(row_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _operation_summaries(session: Session, hours: int) -> dict:
+    """最近 N 小時的操作彙總（讀逐時彙總表，不掃原始日誌）"""
+    system_rows = session.exec(text("""
+        SELECT operation_type, status, SUM(ops_count) AS ops, SUM(total_execution_ms) AS total_ms
+        FROM system_operation_log_hourly
+        WHERE bucket >= date_trunc('hour', NOW()) - make_interval(hours => :hours)
+        GROUP BY operation_type, status
+    """), {"hours": hours}).all()
+    user_rows = session.exec(text("""
+        SELECT menu_name, status, SUM(ops_count) AS ops, SUM(total_latency_ms) AS total_ms
+        FROM user_operation_log_hourly
+        WHERE bucket >= date_trunc('hour', NOW()) - make_interval(hours => :hours)
+        GROUP BY menu_name, status
+    """), {"hours": hours}).all()
+    
+    def summarize(rows):
+        summary = {"total": 0, "failed": 0, "by_key": {}}
+        for key, status, ops, total_ms in rows:
+            entry = summary["by_key"].setdefault(key, {"total": 0, "failed": 0, "avg_ms": 0.0, "_ms": 0})
+            entry["total"] += int(ops)
+            entry["_ms"] += int(total_ms or 0)
+            if status == "failed":
+                entry["failed"] += int(ops)
+                summary["failed"] += int(ops)
+            summary["total"] += int(ops)
+        for entry in summary["by_key"].values():
+            entry["avg_ms"] = round(entry.pop("_ms") / entry["total"], 1) if entry["total"] else 0.0
+        summary["success_rate"] = (summary["total"] - summary["failed"]) / summary["total"] if summary["total"] else 0
+        return summary
+    
+    return {"window_hours": hours, "system": summarize(system_rows), "user": summarize(user_rows)}
+
+
 @app.get("/stats", response_model=SystemStats)
-async def get_system_stats(session: Session = Depends(get_session)):
-    """系統統計 - 保留豐富的監控資訊"""
+async def get_system_stats(hours: int = 24, session: Session = Depends(get_session)):
+    """系統統計 - 計數由資料庫彙總，操作統計讀逐時彙總表"""
     try:
         # Agent 統計
-        agents = session.exec(select(Agent)).all()
-        agent_stats = {
-            "total": len(agents),
-            "online": len([a for a in agents if a.status == "ONLINE"]),
-            "down": len([a for a in agents if a.status == "DOWN"]),
-            "unknown": len([a for a in agents if a.status == "UNKNOWN"]),
-            "by_role": {}
-        }
-        
-        # 按角色統計
-        for agent in agents:
-            role = agent.role
-            if role not in agent_stats["by_role"]:
-                agent_stats["by_role"][role] = {"total": 0, "online": 0}
-            agent_stats["by_role"][role]["total"] += 1
-            if agent.status == "ONLINE":
-                agent_stats["by_role"][role]["online"] += 1
+        agent_stats = {"total": 0, "online": 0, "down": 0, "unknown": 0, "by_role": {}}
+        for role, status, count in session.exec(
+            select(Agent.role, Agent.status, func.count()).group_by(Agent.role, Agent.status)
+        ).all():
+            agent_stats["total"] += count
+            if status in ("ONLINE", "DOWN", "UNKNOWN"):
+                agent_stats[status.lower()] += count
+            
+            # 按角色統計
+            role_stats = agent_stats["by_role"].setdefault(role, {"total": 0, "online": 0})
+            role_stats["total"] += count
+            if status == "ONLINE":
+                role_stats["online"] += count
         
         # 媒體統計
-        total_media = session.exec(select(MediaFile)).all()
+        media_counts = dict(session.exec(
+            select(MediaFile.download_status, func.count()).group_by(MediaFile.download_status)
+        ).all())
         media_stats = {
-            "total": len(total_media),
-            "completed": len([m for m in total_media if m.download_status == "completed"]),
-            "failed": len([m for m in total_media if m.download_status == "failed"]),
-            "pending": len([m for m in total_media if m.download_status == "pending"])
+            "total": sum(media_counts.values()),
+            "completed": media_counts.get("completed", 0),
+            "failed": media_counts.get("failed", 0),
+            "pending": media_counts.get("pending", 0)
         }
+        database_stats = {"media_files": media_stats}
+        
+        # 操作統計（彙總表由 alembic 005 建立；尚未遷移時略過）
+        try:
+            database_stats["operations"] = _operation_summaries(session, hours)
+        except Exception as e:
+            session.rollback()
+            log.warning("operation_summaries_unavailable", error=str(e))
         
         return SystemStats(
             agents=agent_stats,
-            database={"media_files": media_stats},
+            database=database_stats,
             timestamp=time.time()
         )
         
@@ -545,21 +759,34 @@ async def get_system_stats(session: Session = Depends(get_session)):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/stats/views-gained")
+async def get_views_gained_stats(hours: int = 24, username: Optional[str] = None, limit: int = 100):
+    """最近 N 小時各用戶的觀看數成長（讀貼文指標逐時彙總表）"""
+    try:
+        return {"window_hours": hours, "users": await get_views_gained(hours, username, limit)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.get("/system/logs")
 async def get_operation_logs(
     operation_type: Optional[str] = None,
     agent: Optional[str] = None,
     limit: int = 100,
+    cursor: Optional[str] = None,
     session: Session = Depends(get_session)
 ):
-    """獲取操作日誌"""
+    """獲取操作日誌（游標分頁：帶上一頁回傳的 next_cursor 取下一頁）"""
     try:
-        query = select(OpsLog).order_by(OpsLog.ts.desc()).limit(limit)
+        query = select(OpsLog).order_by(OpsLog.ts.desc(), OpsLog.id.desc()).limit(limit)
         
         if operation_type:
             query = query.where(OpsLog.operation_type == operation_type)
         if agent:
             query = query.where(OpsLog.agent == agent)
+        if cursor:
+            cursor_ts, cursor_id = _decode_cursor(cursor)
+            query = query.where(tuple_(OpsLog.ts, OpsLog.id) < tuple_(cursor_ts, cursor_id))
         
         logs = session.exec(query).all()
         
@@ -577,9 +804,12 @@ async def get_operation_logs(
                 }
                 for log in logs
             ],
-            "count": len(logs)
+            "count": len(logs),
+            "next_cursor": _encode_cursor(logs[-1].ts, logs[-1].id) if len(logs) == limit else None
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -698,8 +928,24 @@ async def login_user(payload: UserLoginIn):
 
 
 
+def _ensure_user_ops_partitions(session: Session) -> None:
+    """確保本月與下月的 user_operation_log 分區存在（資料庫尚未分區時為 no-op）"""
+    if not _has_db_function(session, "ensure_monthly_partition(text, text, timestamptz)"):
+        return
+    session.exec(text("SELECT ensure_monthly_partition('user_operation_log', 'ts', NOW())"))
+    session.exec(text("SELECT ensure_monthly_partition('user_operation_log', 'ts', NOW() + INTERVAL '1 month')"))
+
+
+# 每個行程每月只需執行一次 schema / 分區檢查
+_user_ops_schema_month: Optional[str] = None
+
+
 def _ensure_user_ops_schema(session: Session) -> None:
-    """確保 user_operation_log 表與索引存在（請求時冪等保護）。"""
+    """確保 user_operation_log 表、索引與當月分區存在（每個行程每月檢查一次）。"""
+    global _user_ops_schema_month
+    month = datetime.utcnow().strftime("%Y-%m")
+    if _user_ops_schema_month == month:
+        return
     session.exec(text(
         """
         CREATE TABLE IF NOT EXISTS user_operation_log (
@@ -732,8 +978,12 @@ def _ensure_user_ops_schema(session: Session) -> None:
         "CREATE INDEX IF NOT EXISTS idx_user_ops_menu ON user_operation_log (menu_name)",
         "CREATE INDEX IF NOT EXISTS idx_user_ops_action ON user_operation_log (action_type)",
         "CREATE INDEX IF NOT EXISTS idx_user_ops_trace ON user_operation_log (trace_id)",
+        "CREATE INDEX IF NOT EXISTS idx_user_ops_keyset ON user_operation_log (ts DESC, id DESC)",
     ]:
         session.exec(text(idx_sql))
+    _ensure_user_ops_partitions(session)
+    session.commit()
+    _user_ops_schema_month = month
 
 
 @app.post("/user/ops")
@@ -812,12 +1062,15 @@ async def list_user_operations(
     end: Optional[str] = None,    # ISO8601
     limit: int = 100,
     offset: int = 0,
+    cursor: Optional[str] = None,
     format: Optional[str] = None,
 ):
-    """查詢使用者操作日誌。支援 CSV 匯出: ?format=csv"""
+    """查詢使用者操作日誌。支援 CSV 匯出: ?format=csv
+    分頁建議用 cursor（上一頁回傳的 next_cursor，依 (ts, id) 定位）；offset 僅在未帶 cursor 時生效。
+    """
     try:
         clauses = ["1=1"]
-        params: Dict[str, Any] = {"limit": limit, "offset": offset}
+        params: Dict[str, Any] = {"limit": limit, "offset": 0 if cursor else offset}
 
         if user_id:
             clauses.append("user_id = :user_id")
@@ -840,6 +1093,9 @@ async def list_user_operations(
         if end:
             clauses.append("ts <= :end")
             params["end"] = end
+        if cursor:
+            params["cursor_ts"], params["cursor_id"] = _decode_cursor(cursor)
+            clauses.append("(ts, id) < (:cursor_ts, :cursor_id)")
 
         where_sql = " AND ".join(clauses)
         base_sql = f"""
@@ -848,7 +1104,7 @@ async def list_user_operations(
                    ip_address, user_agent, request_id, trace_id, error_message, metadata
             FROM user_operation_log
             WHERE {where_sql}
-            ORDER BY ts DESC
+            ORDER BY ts DESC, id DESC
             LIMIT :limit OFFSET :offset
         """
 
@@ -904,8 +1160,11 @@ async def list_user_operations(
                 "error_message": r[16],
                 "metadata": r[17] if len(r) > 17 else None,
             })
-        return {"logs": json_rows, "count": len(json_rows)}
+        next_cursor = _encode_cursor(rows[-1][1], rows[-1][0]) if len(rows) == limit else None
+        return {"logs": json_rows, "count": len(json_rows), "next_cursor": next_cursor}
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -9,7 +9,8 @@ import os
 import asyncio
 import time
 import traceback
-from typing import Dict, List, Optional, Any
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Any, Set, Tuple
 from pathlib import Path
 from fastapi import FastAPI, HTTPException, BackgroundTasks, Request
 from fastapi.middleware.cors import CORSMiddleware
@@ -24,6 +25,54 @@ from common.db_client import get_db_client
 from services.rustfs_client import get_rustfs_client
 
 
+# 健康檢查：每個 Agent 的探測截止時間與自適應間隔（秒）
+HEALTH_PROBE_TIMEOUT = float(os.getenv("MCP_HEALTH_PROBE_TIMEOUT", "5"))
+HEALTH_CHECK_INTERVAL = float(os.getenv("MCP_HEALTH_CHECK_INTERVAL", "60"))
+HEALTH_CHECK_MIN_INTERVAL = float(os.getenv("MCP_HEALTH_CHECK_MIN_INTERVAL", "15"))
+HEALTH_CHECK_MAX_INTERVAL = float(os.getenv("MCP_HEALTH_CHECK_MAX_INTERVAL", "300"))
+HEALTH_CHECK_CONCURRENCY = int(os.getenv("MCP_HEALTH_CHECK_CONCURRENCY", "20"))
+
+# find_agent 查詢結果快取上限（Agent 變更時整批失效）
+FIND_CACHE_MAX_ENTRIES = 1024
+
+# 一輪健康檢查的批次寫入：插入歷史並更新 mcp_agents（與 record_health_check 函數邏輯一致）
+_RECORD_HEALTH_CHECKS_SQL = """
+    WITH checks AS (
+        SELECT c.agent_name, c.status, c.response_time_ms, c.error_message
+        FROM UNNEST($1::text[], $2::text[], $3::int[], $4::text[])
+             AS c(agent_name, status, response_time_ms, error_message)
+        JOIN mcp_agents a ON a.name = c.agent_name
+    ), history AS (
+        INSERT INTO agent_health_history (agent_name, status, response_time_ms, error_message)
+        SELECT agent_name, status, response_time_ms, error_message FROM checks
+    )
+    UPDATE mcp_agents a
+    SET
+        status = CASE
+            WHEN c.status = 'healthy' THEN 'active'
+            WHEN c.status = 'unhealthy' THEN 'inactive'
+            ELSE 'error'
+        END,
+        last_health_check = now(),
+        health_check_count = a.health_check_count + 1,
+        error_count = CASE
+            WHEN c.status != 'healthy' THEN a.error_count + 1
+            ELSE a.error_count
+        END,
+        last_seen = now()
+    FROM checks c
+    WHERE a.name = c.agent_name
+"""
+
+
+@dataclass
+class _ProbeSchedule:
+    """單一 Agent 的探測排程"""
+    interval: float = HEALTH_CHECK_INTERVAL
+    next_probe_at: float = 0.0
+    last_status: Optional[str] = None
+
+
 class AgentCard:
     """Agent 卡片數據模型"""
     
@@ -79,6 +128,70 @@ class AgentCard:
         return False
 
 
+class AgentIndex:
+    """
+    技能、角色、能力 → Agent 名稱的反向索引
+    
+    註冊、取消註冊、載入 Agent Card 時同步更新；version 於每次變更遞增，供查詢快取失效判斷
+    """
+    
+    def __init__(self):
+        self._terms: Dict[str, Set[str]] = {}
+        self._skill_names: Dict[str, Set[str]] = {}
+        self._agent_terms: Dict[str, Set[str]] = {}
+        self._agent_skills: Dict[str, Set[str]] = {}
+        self.version = 0
+    
+    @staticmethod
+    def _terms_for(agent_card: AgentCard) -> Set[str]:
+        """名稱、角色、技能名稱與標籤、啟用的能力"""
+        terms = {agent_card.name}
+        role = agent_card.metadata.get("role") if isinstance(agent_card.metadata, dict) else None
+        if role:
+            terms.add(role)
+        for skill in agent_card.skills:
+            terms.add(skill.get("name", ""))
+            terms.update(skill.get("tags", []))
+        if isinstance(agent_card.capabilities, dict):
+            terms.update(key for key, enabled in agent_card.capabilities.items() if enabled)
+        return {term.lower().strip() for term in terms if term and term.strip()}
+    
+    def add(self, agent_card: AgentCard):
+        self.remove(agent_card.name)
+        terms = self._terms_for(agent_card)
+        skills = {skill.get("name", "").lower() for skill in agent_card.skills if skill.get("name")}
+        for term in terms:
+            self._terms.setdefault(term, set()).add(agent_card.name)
+        for skill_name in skills:
+            self._skill_names.setdefault(skill_name, set()).add(agent_card.name)
+        self._agent_terms[agent_card.name] = terms
+        self._agent_skills[agent_card.name] = skills
+        self.version += 1
+    
+    def remove(self, agent_name: str):
+        for index, owned in ((self._terms, self._agent_terms), (self._skill_names, self._agent_skills)):
+            for key in owned.pop(agent_name, ()):
+                names = index.get(key)
+                if names is not None:
+                    names.discard(agent_name)
+                    if not names:
+                        del index[key]
+        self.version += 1
+    
+    def lookup(self, term: str) -> Set[str]:
+        """精確詞彙查詢"""
+        return set(self._terms.get(term.lower().strip(), ()))
+    
+    def agents_with_skill(self, skill_fragment: str) -> Set[str]:
+        """技能名稱包含 skill_fragment 的 Agent（只走訪去重後的技能名稱）"""
+        fragment = skill_fragment.lower()
+        matched: Set[str] = set()
+        for skill_name, names in self._skill_names.items():
+            if fragment in skill_name:
+                matched |= names
+        return matched
+
+
 class MCPServer:
     """MCP Server 主類別"""
     
@@ -89,6 +202,10 @@ class MCPServer:
         self.agent_cards_dir = Path("mcp_server/agent_cards")
         self.agent_cards_dir.mkdir(exist_ok=True)
         self.db_client = None
+        self._health_schedule: Dict[str, _ProbeSchedule] = {}
+        self.agent_index = AgentIndex()
+        self._find_cache: Dict[str, Tuple[str, ...]] = {}
+        self._find_cache_version = -1
     
     async def initialize(self):
         """初始化 MCP Server"""
@@ -129,7 +246,7 @@ class MCPServer:
                     card_data = json.load(f)
                 
                 agent_card = AgentCard(card_data)
-                self.agent_cards[agent_card.name] = agent_card
+                self._put_agent_card(agent_card)
                 
                 # 同步到 Redis
                 if self.redis_client:
@@ -174,7 +291,7 @@ class MCPServer:
                         "last_seen": row["last_seen"].timestamp() if row["last_seen"] else None
                     }
                     
-                    self.agent_cards[row["name"]] = AgentCard(card_data)
+                    self._put_agent_card(AgentCard(card_data))
                     
                 print(f"從資料庫載入了 {len(rows)} 個 Agent Cards")
                     
@@ -192,7 +309,7 @@ class MCPServer:
             for name, card_json in cards_data.items():
                 if name not in self.agent_cards:  # 避免覆蓋資料庫和本地檔案
                     card_data = json.loads(card_json)
-                    self.agent_cards[name] = AgentCard(card_data)
+                    self._put_agent_card(AgentCard(card_data))
                     
         except Exception as e:
             print(f"從 Redis 載入 Agent Cards 失敗: {e}")
@@ -216,8 +333,8 @@ class MCPServer:
             if self.db_client:
                 await self._save_agent_to_database(agent_card)
             
-            # 儲存到記憶體
-            self.agent_cards[agent_card.name] = agent_card
+            # 儲存到記憶體（同步更新索引）
+            self._put_agent_card(agent_card)
             
             # 儲存到 Redis
             if self.redis_client:
@@ -265,6 +382,8 @@ class MCPServer:
         try:
             if agent_name in self.agent_cards:
                 del self.agent_cards[agent_name]
+            self.agent_index.remove(agent_name)
+            self._health_schedule.pop(agent_name, None)
             
             # 從 Redis 移除
             if self.redis_client:
@@ -277,84 +396,147 @@ class MCPServer:
             print(f"取消註冊 Agent 失敗: {e}")
             return False
     
+    def _put_agent_card(self, agent_card: AgentCard):
+        """寫入記憶體並更新反向索引"""
+        self.agent_cards[agent_card.name] = agent_card
+        self.agent_index.add(agent_card)
+    
     async def find_agent(self, query: str) -> Optional[AgentCard]:
-        """根據查詢找到最匹配的 Agent"""
-        matching_agents = []
+        """
+        根據查詢找到最匹配的 Agent
+        
+        比對分兩層：
+        1. 精確詞彙：查詢（不分大小寫）恰為某 Agent 的名稱、技能名稱、標籤、角色或啟用的能力時，
+           只在精確命中的 Agent 之間挑選（走反向索引，不掃描）
+        2. 子字串：沒有任何精確命中時，退回原本的 matches_query 子字串比對
+           （名稱、描述、技能名稱/描述/標籤）
+        
+        與舊版純子字串比對的差異：有精確命中時，只是子字串命中的其他 Agent 不再列入候選。
+        候選結果依索引版本快取，Agent 變更前同一查詢不再重新比對
+        """
+        key = query.lower().strip()
+        if self._find_cache_version != self.agent_index.version:
+            self._find_cache.clear()
+            self._find_cache_version = self.agent_index.version
+        
+        names = self._find_cache.get(key)
+        if names is None:
+            if len(self._find_cache) >= FIND_CACHE_MAX_ENTRIES:
+                self._find_cache.clear()
+            matched = self.agent_index.lookup(key)
+            if not matched:
+                # 沒有精確命中：退回子字串比對
+                matched = {
+                    agent_card.name for agent_card in self.agent_cards.values() if agent_card.matches_query(query)
+                }
+            names = self._find_cache[key] = tuple(matched)
         
-        for agent_card in self.agent_cards.values():
-            if agent_card.matches_query(query):
-                matching_agents.append(agent_card)
+        matching_agents = [self.agent_cards[name] for name in names if name in self.agent_cards]
         
-        # 簡單排序：優先返回狀態為 active 的 Agent
+        # 簡單排序：優先返回狀態為 active 的 Agent（狀態隨健康檢查變動，排序不快取）
         matching_agents.sort(key=lambda x: (x.status == "active", x.name))
         
         return matching_agents[0] if matching_agents else None
     
     async def list_agents(self, skill_filter: Optional[str] = None) -> List[AgentCard]:
-        """列出所有 Agent"""
-        agents = list(self.agent_cards.values())
-        
-        if skill_filter:
-            filtered_agents = []
-            for agent in agents:
-                for skill in agent.skills:
-                    if skill_filter.lower() in skill.get("name", "").lower():
-                        filtered_agents.append(agent)
-                        break
-            agents = filtered_agents
+        """列出所有 Agent（技能過濾走反向索引）"""
+        if not skill_filter:
+            return list(self.agent_cards.values())
         
-        return agents
+        names = self.agent_index.agents_with_skill(skill_filter)
+        return [agent_card for name, agent_card in self.agent_cards.items() if name in names]
     
     async def get_agent(self, agent_name: str) -> Optional[AgentCard]:
         """獲取特定 Agent"""
         return self.agent_cards.get(agent_name)
     
-    async def health_check_agents(self):
-        """檢查所有 Agent 的健康狀態"""
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            for agent_name, agent_card in self.agent_cards.items():
-                start_time = time.time()
+    async def health_check_agents(self, due_only: bool = False):
+        """
+        並行檢查 Agent 的健康狀態
+        
+        - 每個 Agent 有獨立的截止時間（HEALTH_PROBE_TIMEOUT），單一失聯 Agent 不會拖慢整輪
+        - due_only=True 時只檢查到期的 Agent（自適應間隔，見 _schedule_next_probe）
+        - 整輪結果以一次批次寫入健康歷史、一次 pipeline HSET 更新 mcp:agent_cards
+        """
+        now = time.monotonic()
+        targets = [
+            (agent_name, agent_card)
+            for agent_name, agent_card in list(self.agent_cards.items())
+            if not due_only or self._health_schedule.get(agent_name, _ProbeSchedule()).next_probe_at <= now
+        ]
+        if not targets:
+            return
+        
+        semaphore = asyncio.Semaphore(HEALTH_CHECK_CONCURRENCY)
+        async with httpx.AsyncClient(timeout=HEALTH_PROBE_TIMEOUT) as client:
+            results = await asyncio.gather(*[
+                self._probe_agent(client, semaphore, agent_card) for _, agent_card in targets
+            ])
+        
+        checked_at = time.time()
+        for (agent_name, agent_card), (health_status, _, _) in zip(targets, results):
+            agent_card.last_seen = checked_at
+            self._schedule_next_probe(agent_name, health_status)
+        
+        # 記錄健康檢查結果到資料庫（單次批次寫入）
+        if self.db_client:
+            try:
+                await self._record_health_checks([
+                    (agent_name, health_status, response_time_ms, error_message)
+                    for (agent_name, _), (health_status, response_time_ms, error_message) in zip(targets, results)
+                ])
+            except Exception as e:
+                print(f"記錄健康檢查結果失敗: {e}")
+        
+        # 更新 Redis（單次 HSET 多欄位）
+        if self.redis_client:
+            try:
+                await self.redis_client.hset("mcp:agent_cards", mapping={
+                    agent_name: json.dumps(agent_card.to_dict()) for agent_name, agent_card in targets
+                })
+            except Exception as e:
+                print(f"更新 Redis Agent Cards 失敗: {e}")
+    
+    async def _probe_agent(self, client: httpx.AsyncClient, semaphore: asyncio.Semaphore, agent_card: AgentCard):
+        """探測單一 Agent，回傳 (health_status, response_time_ms, error_message) 並更新 agent_card.status"""
+        async with semaphore:
+            start_time = time.time()
+            try:
+                response = await asyncio.wait_for(
+                    client.get(agent_card.health_check_url), timeout=HEALTH_PROBE_TIMEOUT
+                )
+                response_time_ms = int((time.time() - start_time) * 1000)
                 
-                try:
-                    response = await client.get(agent_card.health_check_url)
-                    response_time_ms = int((time.time() - start_time) * 1000)
-                    
-                    if response.status_code == 200:
-                        agent_card.status = "active"
-                        health_status = "healthy"
-                        error_message = None
-                    else:
-                        agent_card.status = "error"
-                        health_status = "unhealthy"
-                        error_message = f"HTTP {response.status_code}"
-                        
-                except httpx.TimeoutException:
-                    agent_card.status = "inactive"
-                    health_status = "timeout"
-                    error_message = "Request timeout"
-                    response_time_ms = int((time.time() - start_time) * 1000)
+                if response.status_code == 200:
+                    agent_card.status = "active"
+                    return "healthy", response_time_ms, None
+                agent_card.status = "error"
+                return "unhealthy", response_time_ms, f"HTTP {response.status_code}"
                     
-                except Exception as e:
-                    agent_card.status = "inactive"
-                    health_status = "error"
-                    error_message = str(e)
-                    response_time_ms = int((time.time() - start_time) * 1000)
-                
-                agent_card.last_seen = time.time()
-                
-                # 記錄健康檢查結果到資料庫
-                if self.db_client:
-                    await self._record_health_check(
-                        agent_name, health_status, response_time_ms, error_message
-                    )
+            except (httpx.TimeoutException, asyncio.TimeoutError):
+                agent_card.status = "inactive"
+                return "timeout", int((time.time() - start_time) * 1000), "Request timeout"
                 
-                # 更新 Redis
-                if self.redis_client:
-                    await self.redis_client.hset(
-                        "mcp:agent_cards",
-                        agent_name,
-                        json.dumps(agent_card.to_dict())
-                    )
+            except Exception as e:
+                agent_card.status = "inactive"
+                return "error", int((time.time() - start_time) * 1000), str(e)
+    
+    def _schedule_next_probe(self, agent_name: str, health_status: str):
+        """
+        自適應探測間隔：
+        - 狀態改變（剛恢復或剛失敗，可能在抖動）→ 縮到最短間隔
+        - 持續健康 → 每次拉長 1.5 倍，直到上限
+        - 持續異常 → 維持基準間隔
+        """
+        schedule = self._health_schedule.setdefault(agent_name, _ProbeSchedule())
+        if schedule.last_status is not None and health_status != schedule.last_status:
+            schedule.interval = HEALTH_CHECK_MIN_INTERVAL
+        elif health_status == "healthy":
+            schedule.interval = min(schedule.interval * 1.5, HEALTH_CHECK_MAX_INTERVAL)
+        else:
+            schedule.interval = HEALTH_CHECK_INTERVAL
+        schedule.last_status = health_status
+        schedule.next_probe_at = time.monotonic() + schedule.interval
     
     async def _save_agent_to_database(self, agent_card: AgentCard):
         """儲存 Agent 到資料庫"""
@@ -366,12 +548,13 @@ class MCPServer:
             agent_card.url, agent_card.health_check_url, agent_card.capabilities,
             agent_card.skills, agent_card.requirements, agent_card.metadata)
     
-    async def _record_health_check(self, agent_name: str, status: str, response_time_ms: int, error_message: str):
-        """記錄健康檢查結果"""
+    async def _record_health_checks(self, checks: List[tuple]):
+        """批次記錄健康檢查結果（等同逐筆呼叫 record_health_check，未註冊於資料庫的 Agent 略過）"""
+        if not checks:
+            return
+        agent_names, statuses, response_times, error_messages = (list(column) for column in zip(*checks))
         async with self.db_client.get_connection() as conn:
-            await conn.execute("""
-                SELECT record_health_check($1, $2, $3, $4, $5)
-            """, agent_name, status, response_time_ms, error_message, {})
+            await conn.execute(_RECORD_HEALTH_CHECKS_SQL, agent_names, statuses, response_times, error_messages)
     
     async def _log_operation(
         self, operation_type: str, operation_name: str, agent_name: str = None,
@@ -447,8 +630,9 @@ async def periodic_health_check():
     """定期健康檢查"""
     while True:
         try:
-            await asyncio.sleep(60)  # 每分鐘檢查一次
-            await mcp_server.health_check_agents()
+            # 以最短間隔巡檢，只探測到期的 Agent（各自的間隔見 _schedule_next_probe）
+            await asyncio.sleep(HEALTH_CHECK_MIN_INTERVAL)
+            await mcp_server.health_check_agents(due_only=True)
         except asyncio.CancelledError:
             break
         except Exception as e:
@@ -553,7 +737,7 @@ async def get_agent(agent_name: str):
 
 @app.get("/agents/find")
 async def find_agent(query: str):
-    """根據查詢找到 Agent"""
+    """根據查詢找到 Agent（先比對精確詞彙，沒有命中才做子字串比對，見 MCPServer.find_agent）"""
     agent = await mcp_server.find_agent(query)
     if agent:
         return agent.to_dict()
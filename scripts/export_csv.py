@@ -28,6 +28,8 @@ async def main():
     history_parser.add_argument('--days', type=int, help='回溯天數')
     history_parser.add_argument('--limit', type=int, help='最大記錄數')
     history_parser.add_argument('--output', '-o', help='輸出CSV文件路径')
+    history_parser.add_argument('--format', '-f', default='csv', choices=['csv', 'csv.gz', 'parquet'],
+                                help='輸出格式（串流寫檔，大量資料建議 csv.gz / parquet）')
     
     # 統計分析導出
     analysis_parser = subparsers.add_parser('analysis', help='導出統計分析數據')
@@ -68,7 +70,8 @@ async def main():
                 args.username,
                 args.output,
                 args.days,
-                args.limit
+                args.limit,
+                fmt=args.format
             )
             print(f"✅ 成功導出到: {csv_file}")
             
@@ -77,7 +77,9 @@ CREATE TABLE IF NOT EXISTS media_files (
     download_error  TEXT,
     created_at      TIMESTAMPTZ DEFAULT now(),
     downloaded_at   TIMESTAMPTZ,
-    metadata        JSONB DEFAULT '{}'
+    metadata        JSONB DEFAULT '{}',
+    is_primary      BOOLEAN,            -- 主貼圖規則分類（下載時寫入，NULL 為尚未分類）
+    primary_score   REAL
 );
 
 -- 媒體描述結果（Gemini 產出）
@@ -255,6 +257,7 @@ CREATE INDEX IF NOT EXISTS idx_media_files_post_url ON media_files(post_url);
 CREATE INDEX IF NOT EXISTS idx_media_files_download_status ON media_files(download_status);
 CREATE INDEX IF NOT EXISTS idx_media_files_media_type ON media_files(media_type);
 CREATE INDEX IF NOT EXISTS idx_media_files_created_at ON media_files(created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_media_files_post_url_primary ON media_files(post_url) WHERE is_primary IS DISTINCT FROM FALSE;
 
 -- MCP Server 索引
 CREATE INDEX IF NOT EXISTS idx_mcp_agents_status ON mcp_agents(status);
@@ -10,6 +10,8 @@ import concurrent.futures
 from typing import Dict, Optional, Tuple
 from datetime import datetime
 
+from common.reader_markdown import parse_reader_markdown
+
 from ..extractors import ContentExtractor, MetricsExtractor
 from ..utils.helpers import safe_print
 
@@ -113,13 +115,14 @@ class PostProcessor:
         try:
             post_id = url.split('/')[-1] if '/' in url else url
             
-            # 提取各種指標
-            views = self.metrics_extractor.extract_views_count(content, post_id)
-            main_content = self.content_extractor.extract_post_content(content)
-            likes = self.metrics_extractor.extract_likes_count(content)
-            comments = self.metrics_extractor.extract_comments_count(content)
-            reposts = self.metrics_extractor.extract_reposts_count(content)
-            shares = self.metrics_extractor.extract_shares_count(content)
+            # 單次解析取得所有指標
+            parsed = parse_reader_markdown(content, self.target_username)
+            views = parsed.views
+            main_content = parsed.content
+            likes = parsed.likes
+            comments = parsed.comments
+            reposts = parsed.reposts
+            shares = parsed.shares
             
             # 構建結果
             result = {
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+各服務入口的 import 時間分析（冷啟動報告）：
+- 以 `python -X importtime -c "import <入口模組>"` 在乾淨的子行程中載入每個入口
+- 報告：總 import 時間、最重的頂層套件（累計時間）、已知重量級套件是否在啟動時被載入
+  （google.generativeai / boto3 / playwright / PIL / pandas / numpy 等應延遲到實際使用）
+- --health：另外以 uvicorn 啟動服務，量測從啟動到 /health 第一次回 200 的時間
+  （需要服務的相依服務可連線；連不上時 /health 仍可能回 200 但狀態為 unhealthy）
+
+PowerShell 執行範例：
+python scripts/profile_imports.py
+python scripts/profile_imports.py --only vision playwright_crawler --top 15
+python scripts/profile_imports.py --only vision --health
+"""
+
+import argparse
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from typing import Dict, List, Optional, Tuple
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 名稱 → (入口模組, /health 埠號；None 表示不是 HTTP 服務)
+ENTRY_POINTS: Dict[str, Tuple[str, Optional[int]]] = {
+    "orchestrator": ("agents.orchestrator.main", 8000),
+    "content_writer": ("agents.content_writer.main", 8003),
+    "clarification": ("agents.clarification.main", 8004),
+    "vision": ("agents.vision.main", 8005),
+    "playwright_crawler": ("agents.playwright_crawler.main", 8006),
+    "post_analyzer": ("agents.post_analyzer.main", 8007),
+    "content_generator": ("agents.content_generator.main", 8008),
+    "crawl_coordinator": ("services.crawl_coordinator.main", 8008),
+    "form_api": ("services.form_api.main", 8010),
+    "crawl_scheduler": ("services.crawl_scheduler.main", 8012),
+    "reader_processor": ("services.reader_processor.main", 8009),
+    "mcp_server": ("mcp_server.main", 10100),
+    "streamlit_app": ("ui.streamlit_app", None),
+}
+
+# 啟動時不應載入的重量級套件
+HEAVY_PACKAGES = [
+    "google.generativeai", "google.genai", "boto3", "botocore", "playwright",
+    "PIL", "pandas", "numpy", "openai", "matplotlib", "plotly",
+]
+
+_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def profile_import(module: str) -> Tuple[float, List[Tuple[str, int, int, int]], str]:
+    """回傳 (總毫秒, [(套件, self_us, cumulative_us, 深度)], 錯誤訊息)"""
+    code = (
+        "import time, sys; sys.path.insert(0, %r); started = time.perf_counter(); "
+        "import %s; print('__TOTAL_MS__', (time.perf_counter() - started) * 1000)" % (PROJECT_ROOT, module)
+    )
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=PROJECT_ROOT, capture_output=True, text=True,
+    )
+    entries = []
+    error = ""
+    for line in proc.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+        elif line.strip() and not line.startswith("import time:"):
+            error = line.strip()
+    total_ms = 0.0
+    for line in proc.stdout.splitlines():
+        if line.startswith("__TOTAL_MS__"):
+            total_ms = float(line.split()[1])
+    if proc.returncode != 0 and not error:
+        error = f"exit {proc.returncode}"
+    return total_ms, entries, error if proc.returncode != 0 else ""
+
+
+def top_packages(entries: List[Tuple[str, int, int, int]], top: int) -> List[Tuple[str, float]]:
+    """頂層套件（無 '.' 的名稱）依累計時間排序"""
+    roots: Dict[str, int] = {}
+    for name, _self_us, cumulative_us, _depth in entries:
+        if "." not in name:
+            roots[name] = max(roots.get(name, 0), cumulative_us)
+    ranked = sorted(roots.items(), key=lambda item: item[1], reverse=True)
+    return [(name, us / 1000) for name, us in ranked[:top]]
+
+
+def heavy_loaded(entries: List[Tuple[str, int, int, int]]) -> List[Tuple[str, float]]:
+    loaded = {name: cumulative_us for name, _s, cumulative_us, _d in entries}
+    return [(name, loaded[name] / 1000) for name in HEAVY_PACKAGES if name in loaded]
+
+
+def _free_port(preferred: int) -> int:
+    with socket.socket() as sock:
+        if sock.connect_ex(("127.0.0.1", preferred)) != 0:
+            return preferred
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_to_health(module: str, port: int, timeout: float) -> Optional[float]:
+    """以 uvicorn 啟動服務並輪詢 /health，回傳第一次 200 的秒數；逾時回傳 None"""
+    port = _free_port(port)
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", f"{module}:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=PROJECT_ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if proc.poll() is not None:
+                return None
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=2) as resp:
+                    if resp.status == 200:
+                        return time.perf_counter() - started
+            except Exception:
+                pass
+            time.sleep(0.1)
+        return None
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="各服務入口的 import 時間與冷啟動報告")
+    parser.add_argument("--only", nargs="*", choices=sorted(ENTRY_POINTS), help="只分析指定入口")
+    parser.add_argument("--top", type=int, default=10, help="每個入口列出的頂層套件數（預設 10）")
+    parser.add_argument("--health", action="store_true", help="另外量測啟動到 /health 200 的時間")
+    parser.add_argument("--timeout", type=float, default=60.0, help="/health 等待上限秒數（預設 60）")
+    args = parser.parse_args()
+
+    names = args.only or list(ENTRY_POINTS)
+    summary = []
+    for name in names:
+        module, port = ENTRY_POINTS[name]
+        total_ms, entries, error = profile_import(module)
+        print(f"📦 {name}（{module}）")
+        if error:
+            print(f"   ❌ import 失敗：{error}")
+            summary.append((name, None, [], None))
+            continue
+        print(f"   ⏱️ import 總時間 {total_ms:.0f} ms")
+        for package, ms in top_packages(entries, args.top):
+            print(f"   {package:<32}{ms:>10.1f} ms")
+        heavy = heavy_loaded(entries)
+        if heavy:
+            print("   ⚠️ 啟動時載入的重量級套件：" + "、".join(f"{pkg}（{ms:.0f} ms）" for pkg, ms in heavy))
+        else:
+            print("   ✅ 未在啟動時載入重量級套件")
+
+        health_s = None
+        if args.health and port is not None:
+            health_s = time_to_health(module, port, args.timeout)
+            if health_s is None:
+                print(f"   ❌ {args.timeout:.0f} 秒內 /health 未回 200")
+            else:
+                print(f"   🩺 啟動到 /health 200：{health_s:.2f} s")
+        summary.append((name, total_ms, heavy, health_s))
+        print()
+
+    print("📊 摘要")
+    print(f"{'入口':<22}{'import ms':>12}{'重量級套件':>12}{'/health s':>12}")
+    for name, total_ms, heavy, health_s in summary:
+        total = f"{total_ms:.0f}" if total_ms is not None else "失敗"
+        health = f"{health_s:.2f}" if health_s is not None else "-"
+        print(f"{name:<22}{total:>12}{len(heavy):>12}{health:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,7 +10,6 @@ import asyncio
 import json
 import requests
 import time
-import re
 import random
 import sys
 from datetime import datetime
@@ -19,6 +18,7 @@ import httpx
 from pathlib import Path
 from common.config import get_auth_file_path
 from common.incremental_crawl_manager import IncrementalCrawlManager
+from common.reader_markdown import ParsedReaderPost, parse_reader_markdown
 
 def safe_print(msg, fallback_msg=None):
     """安全的打印函數，避免Unicode編碼錯誤"""
@@ -66,16 +66,6 @@ class RealtimeCrawlerExtractor:
             'x-timeout': '25'
         }
         
-        # NBSP字符和提取模式
-        self.NBSP = "\u00A0"
-        self.view_patterns = [
-            re.compile(rf'\[Thread[\s{self.NBSP}=]*?(\d+(?:[\.,]\d+)?[KMB]?)\s*views\]', re.IGNORECASE),
-            re.compile(rf'Thread[\s{self.NBSP}=]*?(\d+(?:[\.,]\d+)?[KMB]?)[\s{self.NBSP}]*views', re.IGNORECASE | re.MULTILINE),
-            re.compile(r'(\d+(?:[\.,]\d+)?[KMB]?)\s*views?', re.IGNORECASE),
-            re.compile(r'(\d+(?:[\.,]\d+)?[KMB]?)\s*view(?:s|ing)', re.IGNORECASE),
-            re.compile(r'views?\s*[:\-]\s*(\d+(?:[\.,]\d+)?[KMB]?)', re.IGNORECASE),
-        ]
-        
         # 結果統計
         self.results = []
         self.start_time = None
@@ -84,336 +74,37 @@ class RealtimeCrawlerExtractor:
         self.local_success_count = 0
         self.local_failure_count = 0
     
-    def normalize_content(self, text: str) -> str:
-        """內容標準化"""
-        text = text.replace(self.NBSP, " ").replace("\u2002", " ").replace("\u2003", " ")
-        text = text.replace("\u2009", " ").replace("\u200A", " ").replace("\u3000", " ").replace("\t", " ")
-        text = text.replace("\r\n", "\n").replace("\r", "\n")
-        text = re.sub(r"[ \t]{2,}", " ", text)
-        return text
+    def parse_markdown(self, markdown_content: str) -> ParsedReaderPost:
+        """單次解析 Reader Markdown（以目標用戶定位主貼文）"""
+        return parse_reader_markdown(markdown_content, self.target_username)
 
     def extract_views_count(self, markdown_content: str, post_id: str = "") -> Optional[str]:
         """觀看數提取"""
-        normalized_content = self.normalize_content(markdown_content)
-        
-        for pattern in self.view_patterns:
-            match = pattern.search(normalized_content)
-            if match:
-                views_number = match.group(1)
-                if self.validate_views_format(views_number):
-                    return views_number
-        
-        for pattern in self.view_patterns:
-            match = pattern.search(markdown_content)
-            if match:
-                views_number = match.group(1)
-                if self.validate_views_format(views_number):
-                    return views_number
-        return None
-
-    def validate_views_format(self, views: str) -> bool:
-        """驗證觀看數格式"""
-        if not views: return False
-        pattern = re.compile(r'^\d+(?:\.\d+)?[KMB]?$', re.IGNORECASE)
-        if not pattern.match(views): return False
-        try:
-            actual_number = self.convert_to_number(views)
-            return 1 <= actual_number <= 100_000_000
-        except: return False
-    
-    def convert_to_number(self, number_str: str) -> int:
-        """K/M/B轉數字"""
-        number_str = number_str.upper()
-        if number_str.endswith('K'): return int(float(number_str[:-1]) * 1000)
-        elif number_str.endswith('M'): return int(float(number_str[:-1]) * 1000000)
-        elif number_str.endswith('B'): return int(float(number_str[:-1]) * 1000000000)
-        else: return int(number_str)
+        return self.parse_markdown(markdown_content).views
 
     def extract_post_content(self, content: str) -> Optional[str]:
         """智能提取主貼文內容 - 區分主貼文和分享貼文"""
-        lines = content.split('\n')
-        
-        # 策略1: 專門處理 Threads 頁面結構
-        main_post_content = self._extract_main_post_from_threads_structure(lines)
-        if main_post_content:
-            return main_post_content
-        
-        # 策略2: 通用結構化提取
-        main_post_content = self._extract_main_post_from_structure(lines)
-        if main_post_content:
-            return main_post_content
-        
-        # 策略3: 回到原始方法作為備選
-        return self._extract_content_fallback(lines)
-    
-    def _extract_main_post_from_threads_structure(self, lines: List[str]) -> Optional[str]:
-        """專門從 Threads 頁面結構中提取主貼文內容"""
-        current_username = self.target_username
-        
-        # 策略A: 檢查開頭是否就是主內容（常見模式）
-        for i, line in enumerate(lines[:10]):  # 只檢查前10行
-            stripped = line.strip()
-            if (stripped and 
-                len(stripped) > 8 and
-                not stripped.startswith('[') and
-                not stripped.startswith('![') and
-                not stripped.startswith('http') and
-                not stripped.startswith('=') and  # 跳過分隔符
-                not stripped.isdigit() and
-                not stripped in ['Translate', 'views', 'Log in', 'Thread', 'Sorry, we\'re having trouble playing this video.', 'Learn more'] and
-                not re.match(r'^\d+[dhm]$', stripped) and
-                not re.match(r'^\d+$', stripped)):
-                
-                # 這很可能是主內容
-                return stripped
-        
-        # 策略B: 查找目標用戶名後的內容
-        target_user_found = False
-        
-        for i, line in enumerate(lines):
-            stripped = line.strip()
-            
-            # 檢查是否找到目標用戶名（支持連結格式）
-            if (current_username in stripped and 
-                (not stripped.startswith('[') or f'[{current_username}]' in stripped)):
-                target_user_found = True
-                continue
-            
-            # 如果已經找到目標用戶，開始收集內容
-            if target_user_found:
-                # 跳過時間戳
-                if re.match(r'^\d{2}/\d{2}/\d{2}$', stripped):
-                    continue
-                
-                # 找到實質內容
-                if (stripped and 
-                    len(stripped) > 8 and
-                    not stripped.startswith('[') and
-                    not stripped.startswith('![') and
-                    not stripped.startswith('http') and
-                    not stripped.isdigit() and
-                    not stripped in ['Translate', 'views', 'Log in', 'Thread', 'Sorry, we\'re having trouble playing this video.', 'Learn more'] and
-                    not re.match(r'^\d+[dhm]$', stripped) and
-                    not re.match(r'^\d+$', stripped)):
-                    
-                    # 檢查這是否是分享的貼文
-                    is_shared_post = False
-                    for j in range(i + 1, min(i + 5, len(lines))):
-                        next_line = lines[j].strip()
-                        if ('profile picture' in next_line and current_username not in next_line):
-                            is_shared_post = True
-                            break
-                    
-                    if not is_shared_post:
-                        return stripped
-                
-                # 如果遇到其他用戶的 profile picture，停止
-                if 'profile picture' in stripped and current_username not in stripped:
-                    break
-        
-        return None
-    
-    def _extract_main_post_from_structure(self, lines: List[str]) -> Optional[str]:
-        """從結構化內容中提取主貼文 - 優先提取當前頁面的主要內容"""
-        # 查找模式：用戶名 → 時間 → 主貼文內容 → Translate → 數字（互動數據）
-        main_content_candidates = []
-        
-        # 策略1: 如果第一行就是回覆內容，優先使用它
-        if lines and lines[0].strip().startswith('>>>'):
-            reply_content = lines[0].strip()
-            if len(reply_content) > 10:  # 確保有實質內容
-                return reply_content
-        
-        for i, line in enumerate(lines):
-            stripped = line.strip()
-            
-            # 跳過明顯的回覆標識（但如果是第一行已經處理過了）
-            if i > 0 and (stripped.startswith('>>>') or stripped.startswith('回覆') or stripped.startswith('·Author')):
-                continue
-            
-            # 尋找主貼文內容的模式
-            if (stripped and 
-                not stripped.startswith('[') and  # 跳過連結
-                not stripped.startswith('![') and  # 跳過圖片
-                not stripped.startswith('http') and  # 跳過URL
-                not stripped.startswith('Log in') and  # 跳過登入提示
-                not stripped.startswith('Thread') and  # 跳過Thread標題
-                not stripped.startswith('gvmonthly') and  # 跳過用戶名
-                not stripped.isdigit() and  # 跳過純數字
-                not re.match(r'^\d+[dhm]$', stripped) and  # 跳過時間格式
-                not stripped in ['Translate', 'views'] and  # 跳過特殊詞
-                len(stripped) > 8):  # 內容要有一定長度
-                
-                # 檢查這是否可能是主貼文內容
-                if self._is_likely_main_post_content(stripped, lines, i):
-                    main_content_candidates.append(stripped)
-        
-        # 返回第一個合理的主貼文候選
-        if main_content_candidates:
-            return main_content_candidates[0]
-        
-        return None
-    
-    def _is_likely_main_post_content(self, content: str, lines: List[str], index: int) -> bool:
-        """判斷內容是否可能是主貼文"""
-        # 檢查後續是否有 "Translate" 標識（主貼文的典型結構）
-        for j in range(index + 1, min(index + 3, len(lines))):
-            if 'Translate' in lines[j]:
-                return True
-        
-        # 檢查是否包含常見的主貼文特徵
-        if (len(content) > 15 and  # 有一定長度
-            not content.startswith('>>>') and  # 不是回覆
-            not content.startswith('·') and  # 不是元數據
-            '!' in content or '?' in content or '。' in content or '，' in content):  # 包含標點符號
-            return True
-        
-        return False
-    
-    def _extract_content_fallback(self, lines: List[str]) -> Optional[str]:
-        """備選內容提取方法"""
-        content_start = -1
-        for i, line in enumerate(lines):
-            if 'Markdown Content:' in line:
-                content_start = i + 1
-                break
-        
-        if content_start == -1:
-            return None
-        
-        content_lines = []
-        for i in range(content_start, min(content_start + 15, len(lines))):
-            line = lines[i].strip()
-            if (line and 
-                not line.startswith('[![Image') and 
-                not line.startswith('[Image') and
-                not line.startswith('>>>')):  # 排除回覆
-                content_lines.append(line)
-                
-                # 如果找到了合理的內容就停止
-                if len(content_lines) >= 2 and len(line) > 10:
-                    break
-        
-        return '\n'.join(content_lines) if content_lines else None
+        return self.parse_markdown(content).content
 
     def extract_engagement_numbers(self, markdown_content: str) -> List[str]:
         """提取所有統計數字序列（按讚、留言、轉發、分享）"""
-        lines = markdown_content.split('\n')
-        
-        # 策略1: 查找貼文內容後的第一個圖片，然後提取後續數字
-        for i, line in enumerate(lines):
-            stripped = line.strip()
-            # 找到貼文圖片（通常在Translate之後）
-            if stripped.startswith('![Image') and not 'profile picture' in stripped:
-                numbers = []
-                # 在這個圖片後查找連續的數字
-                for j in range(i + 1, min(i + 20, len(lines))):
-                    candidate = lines[j].strip()
-                    if re.match(r'^\d+(?:\.\d+)?[KMB]?$', candidate):
-                        numbers.append(candidate)
-                    elif candidate and not re.match(r'^\d+(?:\.\d+)?[KMB]?$', candidate) and candidate != "Pinned":
-                        # 遇到非數字行（但跳過Pinned），停止收集
-                        break
-                
-                # 如果找到了數字序列，返回
-                if len(numbers) >= 3:
-                    return numbers
-        
-        # 策略2: 如果策略1失敗，查找任何連續的數字序列
-        all_numbers = []
-        for i, line in enumerate(lines):
-            stripped = line.strip()
-            if re.match(r'^\d+(?:\.\d+)?[KMB]?$', stripped):
-                # 檢查前後文，確保這是統計數字
-                context_valid = False
-                # 檢查前面10行是否有圖片或貼文內容
-                for k in range(max(0, i-10), i):
-                    if "![Image" in lines[k] or "Translate" in lines[k]:
-                        context_valid = True
-                        break
-                
-                if context_valid:
-                    all_numbers.append(stripped)
-        
-        # 如果找到4個或更多數字，取前4個
-        if len(all_numbers) >= 4:
-            return all_numbers[:4]
-        elif len(all_numbers) >= 3:
-            return all_numbers[:3]
-        
-        return all_numbers
+        return self.parse_markdown(markdown_content).raw_numbers
 
     def extract_likes_count(self, markdown_content: str) -> Optional[str]:
         """提取按讚數"""
-        lines = markdown_content.split('\n')
-        
-        # 方法1: 查找"Like"標籤後的數字（舊格式）
-        for i, line in enumerate(lines):
-            if line.strip() == "Like" and i + 2 < len(lines):
-                next_line = lines[i + 2].strip()
-                if re.match(r'^\d+(?:\.\d+)?[KMB]?$', next_line):
-                    return next_line
-        
-        # 方法2: 新格式 - 從數字序列中取第一個
-        numbers = self.extract_engagement_numbers(markdown_content)
-        if len(numbers) >= 1:
-            return numbers[0]
-        
-        return None
+        return self.parse_markdown(markdown_content).likes
 
     def extract_comments_count(self, markdown_content: str) -> Optional[str]:
         """提取留言數"""
-        lines = markdown_content.split('\n')
-        
-        # 方法1: 舊格式 - 查找Comment標籤
-        for i, line in enumerate(lines):
-            if line.strip() == "Comment" and i + 2 < len(lines):
-                next_line = lines[i + 2].strip()
-                if re.match(r'^\d+(?:\.\d+)?[KMB]?$', next_line):
-                    return next_line
-        
-        # 方法2: 新格式 - 從數字序列中取第二個
-        numbers = self.extract_engagement_numbers(markdown_content)
-        if len(numbers) >= 2:
-            return numbers[1]
-        
-        return None
+        return self.parse_markdown(markdown_content).comments
 
     def extract_reposts_count(self, markdown_content: str) -> Optional[str]:
         """提取轉發數"""
-        lines = markdown_content.split('\n')
-        
-        # 方法1: 舊格式 - 查找Repost標籤
-        for i, line in enumerate(lines):
-            if line.strip() == "Repost" and i + 2 < len(lines):
-                next_line = lines[i + 2].strip()
-                if re.match(r'^\d+(?:\.\d+)?[KMB]?$', next_line):
-                    return next_line
-        
-        # 方法2: 新格式 - 從數字序列中取第三個
-        numbers = self.extract_engagement_numbers(markdown_content)
-        if len(numbers) >= 3:
-            return numbers[2]
-        
-        return None
+        return self.parse_markdown(markdown_content).reposts
 
     def extract_shares_count(self, markdown_content: str) -> Optional[str]:
         """提取分享數"""
-        lines = markdown_content.split('\n')
-        
-        # 方法1: 舊格式 - 查找Share標籤
-        for i, line in enumerate(lines):
-            if line.strip() == "Share" and i + 2 < len(lines):
-                next_line = lines[i + 2].strip()
-                if re.match(r'^\d+(?:\.\d+)?[KMB]?$', next_line):
-                    return next_line
-        
-        # 方法2: 新格式 - 從數字序列中取第四個
-        numbers = self.extract_engagement_numbers(markdown_content)
-        if len(numbers) >= 4:
-            return numbers[3]
-        
-        return None
+        return self.parse_markdown(markdown_content).shares
 
     def fetch_content_jina_api(self, url: str) -> tuple:
         """從Jina API獲取內容"""
@@ -490,14 +181,15 @@ class RealtimeCrawlerExtractor:
     def parse_post(self, url: str, content: str) -> Dict:
         """解析貼文 - 完整版本包含互動數據"""
         post_id = url.split('/')[-1] if '/' in url else url
-        views = self.extract_views_count(content, post_id)
-        main_content = self.extract_post_content(content)
+        parsed = self.parse_markdown(content)
+        views = parsed.views
+        main_content = parsed.content
         
         # 提取互動數據
-        likes = self.extract_likes_count(content)
-        comments = self.extract_comments_count(content)
-        reposts = self.extract_reposts_count(content)
-        shares = self.extract_shares_count(content)
+        likes = parsed.likes
+        comments = parsed.comments
+        reposts = parsed.reposts
+        shares = parsed.shares
         
         return {
             'post_id': post_id,
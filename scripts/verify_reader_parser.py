@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Reader Markdown 解析器黃金檔案回歸檢查與吞吐量基準：
+- 以專案根目錄的 reader_raw_content_*.txt 為樣本，逐一用 common.reader_markdown 解析
+- 與 scripts/reader_golden/<樣本名>.json 的預期值逐欄比對（views/likes/comments/reposts/shares/content/media_urls）
+- 缺少黃金檔案的樣本標記 NEW；任一欄位不符時以非零狀態碼結束
+- --update 以目前解析結果重寫黃金檔案（確認解析變更正確後再執行）
+- --benchmark N 對全部樣本重複解析 N 輪，輸出 docs/s 與 MB/s
+
+PowerShell 執行範例：
+python scripts/verify_reader_parser.py
+python scripts/verify_reader_parser.py --benchmark 200
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.reader_markdown import parse_reader_markdown
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+GOLDEN_DIR = Path(__file__).resolve().parent / "reader_golden"
+SAMPLE_GLOB = "reader_raw_content_*.txt"
+FIELDS = ("views", "likes", "comments", "reposts", "shares", "content", "media_urls")
+
+
+def load_samples(sample_dir: Path) -> Dict[str, str]:
+    return {
+        path.stem: path.read_text(encoding="utf-8")
+        for path in sorted(sample_dir.glob(SAMPLE_GLOB))
+    }
+
+
+def snapshot(markdown: str) -> Dict[str, Any]:
+    parsed = parse_reader_markdown(markdown)
+    return {name: getattr(parsed, name) for name in FIELDS}
+
+
+def verify(samples: Dict[str, str], update: bool) -> int:
+    failures = 0
+    for name, markdown in samples.items():
+        golden_path = GOLDEN_DIR / f"{name}.json"
+        actual = snapshot(markdown)
+
+        if update or not golden_path.exists():
+            GOLDEN_DIR.mkdir(parents=True, exist_ok=True)
+            golden_path.write_text(json.dumps(actual, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+            print(f"{'📝 UPDATE' if update else '🆕 NEW   '} {name}")
+            continue
+
+        expected = json.loads(golden_path.read_text(encoding="utf-8"))
+        diffs: List[str] = [
+            f"    {field}: 預期 {expected.get(field)!r}，實際 {actual[field]!r}"
+            for field in FIELDS
+            if expected.get(field) != actual[field]
+        ]
+        if diffs:
+            failures += 1
+            print(f"❌ FAIL   {name}")
+            print("\n".join(diffs))
+        else:
+            print(f"✅ PASS   {name}")
+    return failures
+
+
+def benchmark(samples: Dict[str, str], rounds: int) -> None:
+    docs = list(samples.values())
+    total_bytes = sum(len(doc.encode("utf-8")) for doc in docs)
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for doc in docs:
+            parse_reader_markdown(doc)
+    elapsed = time.perf_counter() - start
+
+    parsed = rounds * len(docs)
+    print(f"\n⏱️ 解析 {parsed} 份文件（{len(docs)} 樣本 × {rounds} 輪）耗時 {elapsed:.3f}s")
+    print(f"   {parsed / elapsed:,.0f} docs/s，{rounds * total_bytes / elapsed / 1_000_000:,.1f} MB/s")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Reader Markdown 解析器黃金檔案檢查")
+    parser.add_argument("--samples", type=Path, default=PROJECT_ROOT, help="樣本目錄（預設為專案根目錄）")
+    parser.add_argument("--update", action="store_true", help="以目前解析結果重寫黃金檔案")
+    parser.add_argument("--benchmark", type=int, default=0, metavar="N", help="重複解析 N 輪並輸出吞吐量")
+    args = parser.parse_args()
+
+    samples = load_samples(args.samples)
+    if not samples:
+        print(f"⚠️ {args.samples} 下找不到 {SAMPLE_GLOB}")
+        return 1
+
+    failures = verify(samples, args.update)
+    if args.benchmark > 0:
+        benchmark(samples, args.benchmark)
+
+    print(f"\n總結：{len(samples) - failures}/{len(samples)} 通過")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -15,7 +15,6 @@ Crawl Coordinator Service - 統一爬蟲協調器
 """
 
 import asyncio
-import aiohttp
 import uuid
 import logging
 from datetime import datetime
@@ -31,6 +30,8 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 from common.models import PostMetrics, PostMetricsBatch
 from common.history import CrawlHistoryDAO
 from common.settings import get_settings
+from common.http_clients import get_http_client, get_http_registry
+from common.wire_format import accept_header, decode_response
 
 app = FastAPI(
     title="Crawl Coordinator Service", 
@@ -39,8 +40,23 @@ app = FastAPI(
 )
 
 # 服務端點配置
-READER_PROCESSOR_URL = "http://reader-processor:8009"
-PLAYWRIGHT_CRAWLER_URL = "http://playwright-crawler-agent:8006"
+READER_PROCESSOR_URL = os.getenv("READER_PROCESSOR_URL", "http://reader-processor:8009")
+PLAYWRIGHT_CRAWLER_URL = os.getenv("PLAYWRIGHT_CRAWLER_URL", "http://playwright-crawler-agent:8006")
+# 設定時，背景完整爬取改交給多副本排程器（services/crawl_scheduler）
+CRAWL_SCHEDULER_URL = os.getenv("CRAWL_SCHEDULER_URL")
+
+
+def reader_client():
+    return get_http_client("reader-processor", base_url=READER_PROCESSOR_URL, timeout=300)
+
+
+def playwright_client():
+    # 同步爬取端點會佔住連線直到爬完；POST 不做自動重試（只在連線失敗時）
+    return get_http_client("playwright-crawler", base_url=PLAYWRIGHT_CRAWLER_URL, timeout=600)
+
+
+def scheduler_client():
+    return get_http_client("crawl-scheduler", base_url=CRAWL_SCHEDULER_URL, timeout=30)
 
 class CrawlRequest(BaseModel):
     """統一爬蟲請求"""
@@ -80,14 +96,12 @@ class CrawlCoordinator:
                 return existing_urls
             
             # 方法2: 調用Playwright Crawler的URL端點（如果可用）
-            async with aiohttp.ClientSession() as session:
-                url_endpoint = f"{PLAYWRIGHT_CRAWLER_URL}/urls/{username}?max_posts={max_posts}"
-                async with session.get(url_endpoint) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        urls = [item['url'] for item in data['urls']]
-                        logging.info(f"🔗 從Playwright獲取 {username} 的 {len(urls)} 個URLs")
-                        return urls
+            response = await playwright_client().get(f"/urls/{username}", params={"max_posts": max_posts})
+            if response.status_code == 200:
+                data = response.json()
+                urls = [item['url'] for item in data['urls']]
+                logging.info(f"🔗 從Playwright獲取 {username} 的 {len(urls)} 個URLs")
+                return urls
             
             logging.warning(f"⚠️ 無法獲取 {username} 的URLs")
             return []
@@ -138,46 +152,45 @@ class CrawlCoordinator:
             )
         
         # 調用Reader Processor
-        async with aiohttp.ClientSession() as session:
-            reader_request = {
-                "urls": need_reader_urls,
-                "username": request.username,
-                "task_id": task_id,
-                "return_format": "text"
-            }
+        reader_request = {
+            "urls": need_reader_urls,
+            "username": request.username,
+            "task_id": task_id,
+            "return_format": "text"
+        }
             
-            async with session.post(f"{READER_PROCESSOR_URL}/process", json=reader_request) as response:
-                if response.status == 200:
-                    reader_result = await response.json()
+        response = await reader_client().post("/process", json=reader_request)
+        if response.status_code == 200:
+            reader_result = response.json()
                     
-                    # 構建響應
-                    posts = []
-                    for result in reader_result['results']:
-                        posts.append({
-                            "url": result['url'],
-                            "post_id": result['url'].split('/')[-1],
-                            "reader_status": result['status'],
-                            "dom_status": "pending",
-                            "content": result.get('content'),
-                            "processing_time": result.get('processing_time')
-                        })
+            # 構建響應
+            posts = []
+            for result in reader_result['results']:
+                posts.append({
+                    "url": result['url'],
+                    "post_id": result['url'].split('/')[-1],
+                    "reader_status": result['status'],
+                    "dom_status": "pending",
+                    "content": result.get('content'),
+                    "processing_time": result.get('processing_time')
+                })
                     
-                    return CrawlResponse(
-                        task_id=task_id,
-                        username=request.username,
-                        mode="fast",
-                        status="completed",
-                        message=f"Reader處理完成: {reader_result['successful']}/{reader_result['total_urls']} 成功",
-                        posts=posts,
-                        summary={
-                            "successful": reader_result['successful'],
-                            "failed": reader_result['failed'],
-                            "total_time": reader_result['total_time']
-                        }
-                    )
-                else:
-                    error_text = await response.text()
-                    raise HTTPException(status_code=500, detail=f"Reader處理失敗: {error_text}")
+            return CrawlResponse(
+                task_id=task_id,
+                username=request.username,
+                mode="fast",
+                status="completed",
+                message=f"Reader處理完成: {reader_result['successful']}/{reader_result['total_urls']} 成功",
+                posts=posts,
+                summary={
+                    "successful": reader_result['successful'],
+                    "failed": reader_result['failed'],
+                    "total_time": reader_result['total_time']
+                }
+            )
+        else:
+            error_text = response.text
+            raise HTTPException(status_code=500, detail=f"Reader處理失敗: {error_text}")
     
     async def process_full_mode(self, request: CrawlRequest) -> CrawlResponse:
         """完整模式：只使用Playwright Crawler"""
@@ -187,48 +200,48 @@ class CrawlCoordinator:
             raise HTTPException(status_code=400, detail="完整模式需要提供認證信息")
         
         # 調用Playwright Crawler
-        async with aiohttp.ClientSession() as session:
-            playwright_request = {
-                "username": request.username,
-                "max_posts": request.max_posts,
-                "auth_json_content": request.auth_json_content,
-                "task_id": task_id
-            }
+        playwright_request = {
+            "username": request.username,
+            "max_posts": request.max_posts,
+            "auth_json_content": request.auth_json_content,
+            "task_id": task_id
+        }
             
-            async with session.post(f"{PLAYWRIGHT_CRAWLER_URL}/v1/playwright/crawl", json=playwright_request) as response:
-                if response.status == 200:
-                    crawler_result = await response.json()
+        response = await playwright_client().post(
+            "/v1/playwright/crawl", json=playwright_request, headers={"Accept": accept_header()})
+        if response.status_code == 200:
+            crawler_result = decode_response(response)
                     
-                    # 轉換格式
-                    posts = []
-                    for post in crawler_result['posts']:
-                        posts.append({
-                            "url": post['url'],
-                            "post_id": post['post_id'],
-                            "reader_status": post.get('reader_status', 'success'),
-                            "dom_status": post.get('dom_status', 'success'),
-                            "content": post.get('content'),
-                            "likes_count": post.get('likes_count'),
-                            "views_count": post.get('views_count'),
-                            "images": post.get('images', []),
-                            "videos": post.get('videos', [])
-                        })
+            # 轉換格式
+            posts = []
+            for post in crawler_result['posts']:
+                posts.append({
+                    "url": post['url'],
+                    "post_id": post['post_id'],
+                    "reader_status": post.get('reader_status', 'success'),
+                    "dom_status": post.get('dom_status', 'success'),
+                    "content": post.get('content'),
+                    "likes_count": post.get('likes_count'),
+                    "views_count": post.get('views_count'),
+                    "images": post.get('images', []),
+                    "videos": post.get('videos', [])
+                })
                     
-                    return CrawlResponse(
-                        task_id=task_id,
-                        username=request.username,
-                        mode="full",
-                        status="completed",
-                        message=f"完整爬取完成: {len(posts)} 篇貼文",
-                        posts=posts,
-                        summary={
-                            "total_count": crawler_result['total_count'],
-                            "processing_stage": crawler_result.get('processing_stage')
-                        }
-                    )
-                else:
-                    error_text = await response.text()
-                    raise HTTPException(status_code=500, detail=f"Playwright爬取失敗: {error_text}")
+            return CrawlResponse(
+                task_id=task_id,
+                username=request.username,
+                mode="full",
+                status="completed",
+                message=f"完整爬取完成: {len(posts)} 篇貼文",
+                posts=posts,
+                summary={
+                    "total_count": crawler_result['total_count'],
+                    "processing_stage": crawler_result.get('processing_stage')
+                }
+            )
+        else:
+            error_text = response.text
+            raise HTTPException(status_code=500, detail=f"Playwright爬取失敗: {error_text}")
     
     async def process_hybrid_mode(self, request: CrawlRequest, background_tasks: BackgroundTasks) -> CrawlResponse:
         """混合模式：先快後全"""
@@ -283,21 +296,31 @@ class CrawlCoordinator:
         try:
             logging.info(f"🔄 [Task: {task_id}] 開始背景完整爬取: {username}")
             
-            async with aiohttp.ClientSession() as session:
-                playwright_request = {
-                    "username": username,
-                    "max_posts": max_posts,
-                    "auth_json_content": auth_json_content,
-                    "task_id": task_id
-                }
+            playwright_request = {
+                "username": username,
+                "max_posts": max_posts,
+                "auth_json_content": auth_json_content,
+                "task_id": task_id
+            }
+                
+            if CRAWL_SCHEDULER_URL:
+                scheduler_request = {**playwright_request, "operator": "crawl-coordinator"}
+                response = await scheduler_client().post("/jobs", json=scheduler_request)
+                if response.status_code == 202:
+                    logging.info(f"📥 [Task: {task_id}] 已交由排程器分派: {username}")
+                else:
+                    error_text = response.text
+                    logging.error(f"❌ [Task: {task_id}] 排程器拒絕: {error_text}")
+                return
                 
-                async with session.post(f"{PLAYWRIGHT_CRAWLER_URL}/v1/playwright/crawl", json=playwright_request) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        logging.info(f"✅ [Task: {task_id}] 背景爬取完成: {result['total_count']} 篇貼文")
-                    else:
-                        error_text = await response.text()
-                        logging.error(f"❌ [Task: {task_id}] 背景爬取失敗: {error_text}")
+            response = await playwright_client().post(
+                "/v1/playwright/crawl", json=playwright_request, headers={"Accept": accept_header()})
+            if response.status_code == 200:
+                result = decode_response(response)
+                logging.info(f"✅ [Task: {task_id}] 背景爬取完成: {result['total_count']} 篇貼文")
+            else:
+                error_text = response.text
+                logging.error(f"❌ [Task: {task_id}] 背景爬取失敗: {error_text}")
                         
         except Exception as e:
             logging.error(f"❌ [Task: {task_id}] 背景爬取異常: {e}")
@@ -314,6 +337,15 @@ async def health_check():
         "supported_modes": ["fast", "full", "hybrid"]
     }
 
+@app.get("/peers")
+async def peer_stats():
+    """下游服務的連線統計：斷路器狀態、請求/錯誤/重試數、延遲分位數"""
+    return get_http_registry().stats()
+
+@app.on_event("shutdown")
+async def close_http_clients():
+    await get_http_registry().aclose()
+
 @app.post("/crawl", response_model=CrawlResponse)
 async def unified_crawl(request: CrawlRequest, background_tasks: BackgroundTasks):
     """
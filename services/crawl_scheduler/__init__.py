@@ -0,0 +1 @@
+# Crawl Scheduler Service - 多副本爬取排程器
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Crawl Scheduler Service - 多副本爬取排程器
+
+把 Playwright 爬取 Job 分派到 MCP Registry 中所有 ONLINE 的 playwright-crawler 副本：
+- 容量感知放置（空閒瀏覽器槽位、可用記憶體）
+- 同一認證 session 黏著同一副本
+- 同一目標帳號同時只爬一次
+- 多位操作者之間公平輪流
+
+水平擴充只需要多開副本（AGENT_NAME=playwright-crawler-{hostname}），不必排隊等單一 Agent。
+"""
+
+import logging
+import os
+import sys
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+
+from fastapi import FastAPI, Header, HTTPException, Query
+from pydantic import BaseModel, Field
+
+# 添加專案根目錄到 Python 路徑
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from common.http_clients import get_http_registry
+from common.wire_format import wire_response
+from services.crawl_scheduler.scheduler import crawl_scheduler
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    crawl_scheduler.start()
+    yield
+    await crawl_scheduler.stop()
+
+
+app = FastAPI(
+    title="Crawl Scheduler Service",
+    version="1.0.0",
+    description="多副本 Playwright 爬取排程器 - 容量感知放置 / 帳號互斥 / 公平排隊",
+    lifespan=lifespan,
+)
+
+
+class ScheduleRequest(BaseModel):
+    """排程請求（欄位與 Playwright Agent 的 CrawlRequest 相同，另加操作者與 session 識別）"""
+    username: str = Field(..., description="要爬取的 Threads 使用者名稱 (不含 @)")
+    max_posts: int = Field(default=100, gt=0, le=500, description="要爬取的最大貼文數量")
+    auth_json_content: Dict[str, Any] = Field(..., description="包含認證 cookies 和狀態的 auth.json 內容")
+    task_id: Optional[str] = Field(default=None, description="任務 ID（即 job_id），未提供時自動產生")
+    incremental: bool = Field(default=True, description="增量模式：只爬取新貼文")
+    enable_deduplication: bool = Field(default=True, description="啟用去重功能")
+    realtime_download: bool = Field(default=False, description="即時下載媒體")
+    operator: str = Field(default="default", description="提交者（公平排隊以此分組）")
+    session_key: Optional[str] = Field(default=None, description="認證 session 識別；未提供時由 cookies 雜湊")
+
+
+@app.get("/health")
+async def health_check():
+    """健康檢查"""
+    return {"status": "healthy", "service": "Crawl Scheduler"}
+
+
+@app.post("/jobs", status_code=202)
+async def submit_job(request: ScheduleRequest):
+    """加入排程佇列，立即回傳 job_id；分派後可在 GET /jobs/{job_id} 看到執行副本"""
+    payload = request.model_dump(exclude={"operator", "session_key"})
+    job = await crawl_scheduler.enqueue(payload, operator=request.operator, session_key=request.session_key)
+    return {**job, "status_url": f"/jobs/{job['job_id']}", "results_url": f"/jobs/{job['job_id']}/results"}
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Job 狀態（queued / dispatched / running / completed / failed / cancelled）"""
+    job = await crawl_scheduler.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"找不到 Job {job_id}（可能已過期）")
+    return job
+
+
+@app.get("/jobs/{job_id}/results")
+async def get_job_results(
+    job_id: str,
+    offset: int = Query(default=0, ge=0),
+    limit: int = Query(default=50, ge=1, le=500),
+    accept: Optional[str] = Header(default=None),
+):
+    """分頁讀取結果（轉送到執行該 Job 的副本；格式依 Accept 協商）"""
+    try:
+        results = await crawl_scheduler.fetch_results(job_id, offset, limit)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"讀取副本結果失敗: {e}")
+    if results is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} 尚未分派或不存在")
+    return wire_response(results, accept) or results
+
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """取消排隊中的 Job（已分派的 Job 無法取消）"""
+    if not await crawl_scheduler.cancel(job_id):
+        raise HTTPException(status_code=409, detail=f"Job {job_id} 不在排隊中，無法取消")
+    return {"job_id": job_id, "status": "cancelled"}
+
+
+@app.get("/replicas")
+async def list_replicas():
+    """目前可用的 playwright-crawler 副本與容量"""
+    return {"replicas": await crawl_scheduler.list_replicas()}
+
+
+@app.get("/peers")
+async def peer_stats():
+    """各副本的連線統計：斷路器狀態、請求/錯誤/重試數、延遲分位數"""
+    return get_http_registry().stats()
+
+
+@app.get("/queue")
+async def get_queue():
+    """各操作者佇列長度與執行中的 Job"""
+    return await crawl_scheduler.queue_snapshot()
+
+
+if __name__ == "__main__":
+    import uvicorn
+    logging.basicConfig(level=logging.INFO)
+    uvicorn.run(app, host="0.0.0.0", port=8012)
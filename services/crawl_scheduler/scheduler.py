@@ -0,0 +1,387 @@
+"""
+Crawl Scheduler 核心邏輯
+
+把爬取 Job 分派到多個 playwright-crawler 副本（由 MCP Registry 發現）：
+- 容量感知放置：向各副本查 /v1/playwright/capacity，只放到有空閒瀏覽器槽位、
+  且可用記憶體 ≥ MIN_FREE_MEMORY_MB 的副本；多個候選時取空閒槽位最多者
+- 黏著認證 session：同一組 auth cookies 優先回到上次使用的副本（瀏覽器 context 較熱）
+- 目標帳號互斥：同一個 Threads 帳號同時只會有一個 Job 在爬
+- 操作者公平排隊：每位操作者一條佇列，輪流取「最久沒被服務」的操作者
+
+所有狀態放在 Redis，排程器本身可重啟、也可多開（分派迴圈以鎖互斥）：
+    crawl:sched:job:{job_id}           Job 狀態 hash
+    crawl:sched:job:{job_id}:request   原始請求 JSON（含 auth，分派後刪除）
+    crawl:sched:queue:{operator}       操作者佇列（job_id list）
+    crawl:sched:operators              有待處理 Job 的操作者（zset，分數 = 上次被服務時間）
+    crawl:sched:running                已分派、尚未結束的 job_id set
+    crawl:sched:lock:{username}        目標帳號鎖（值為 job_id，執行中定期續期）
+    crawl:sched:sticky:{session_key}   認證 session → 副本名稱
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from common.http_clients import get_http_client, get_http_registry
+from common.mcp_client import get_mcp_client
+from common.redis_client import get_async_redis_client
+from common.wire_format import accept_header, decode_response
+
+
+PLAYWRIGHT_ROLE = os.getenv("CRAWL_SCHEDULER_AGENT_ROLE", "playwright-crawler")
+MIN_FREE_MEMORY_MB = int(os.getenv("CRAWL_SCHEDULER_MIN_FREE_MEMORY_MB", "600"))
+DISPATCH_INTERVAL = float(os.getenv("CRAWL_SCHEDULER_INTERVAL", "2"))
+ACCOUNT_LOCK_TTL = int(os.getenv("CRAWL_SCHEDULER_LOCK_TTL", "600"))
+STICKY_TTL = int(os.getenv("CRAWL_SCHEDULER_STICKY_TTL", "3600"))
+JOB_TTL_SECONDS = int(os.getenv("CRAWL_SCHEDULER_JOB_TTL", str(24 * 3600)))
+MAX_STATUS_MISSES = 3      # 連續查不到 Job 狀態幾次視為副本遺失
+QUEUE_SCAN_DEPTH = 10      # 每位操作者往後看幾個 Job（前面的帳號被鎖時不阻塞後面的）
+
+KEY_PREFIX = "crawl:sched"
+OPERATORS_KEY = f"{KEY_PREFIX}:operators"
+RUNNING_KEY = f"{KEY_PREFIX}:running"
+DISPATCH_LOCK_KEY = f"{KEY_PREFIX}:dispatch"
+
+TERMINAL_STATUSES = {"completed", "failed", "cancelled"}
+
+# 只在佇列為空時移除操作者（避免與 enqueue 競態）
+_DROP_IDLE_OPERATOR = """
+if redis.call('LLEN', KEYS[1]) == 0 then
+    return redis.call('ZREM', KEYS[2], ARGV[1])
+end
+return 0
+"""
+
+# 只釋放自己持有的帳號鎖
+_RELEASE_LOCK = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def _job_key(job_id: str) -> str:
+    return f"{KEY_PREFIX}:job:{job_id}"
+
+
+def _request_key(job_id: str) -> str:
+    return f"{KEY_PREFIX}:job:{job_id}:request"
+
+
+def _queue_key(operator: str) -> str:
+    return f"{KEY_PREFIX}:queue:{operator}"
+
+
+def _lock_key(username: str) -> str:
+    return f"{KEY_PREFIX}:lock:{username.lower()}"
+
+
+def _sticky_key(session_key: str) -> str:
+    return f"{KEY_PREFIX}:sticky:{session_key}"
+
+
+def auth_session_key(auth_json_content: Dict[str, Any]) -> str:
+    """認證 session 的穩定識別：auth.json 內 cookies 的雜湊（不保存 cookie 本身）"""
+    cookies = auth_json_content.get("cookies", auth_json_content)
+    payload = json.dumps(cookies, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:24]
+
+
+class CrawlScheduler:
+    """多副本爬取排程器"""
+
+    def __init__(self):
+        self._loop_task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _replica_client(name: str, url: str):
+        """每個副本一個對端（各自的連線池與斷路器，副本掛掉時快速失敗）"""
+        return get_http_client(f"playwright:{name}", base_url=url, timeout=10, connect_timeout=3)
+
+    # ------------------------------------------------------------------ 提交 / 查詢
+    async def enqueue(self, request: Dict[str, Any], operator: str = "default",
+                      session_key: Optional[str] = None) -> Dict[str, Any]:
+        """Job 加入操作者佇列；回傳 Job 狀態"""
+        job_id = request.get("task_id") or str(uuid.uuid4())
+        request = {**request, "task_id": job_id}
+        session_key = session_key or auth_session_key(request.get("auth_json_content") or {})
+        job = {
+            "job_id": job_id,
+            "operator": operator,
+            "username": request["username"],
+            "session_key": session_key,
+            "status": "queued",
+            "created_at": datetime.utcnow().isoformat(),
+        }
+
+        redis = await get_async_redis_client()
+        pipe = redis.pipeline(transaction=True)
+        pipe.hset(_job_key(job_id), mapping=job)
+        pipe.expire(_job_key(job_id), JOB_TTL_SECONDS)
+        pipe.set(_request_key(job_id), json.dumps(request, ensure_ascii=False), ex=JOB_TTL_SECONDS)
+        pipe.rpush(_queue_key(operator), job_id)
+        # 新操作者以加入時間排序；已在集合中者保留原本的「上次被服務時間」
+        pipe.zadd(OPERATORS_KEY, {operator: time.time()}, nx=True)
+        await pipe.execute()
+
+        logging.info(f"📥 [Job: {job_id}] 加入佇列 operator={operator} @{request['username']}")
+        return job
+
+    async def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        redis = await get_async_redis_client()
+        job = await redis.hgetall(_job_key(job_id))
+        if not job:
+            return None
+        if job.get("status") == "queued":
+            queue = await redis.lrange(_queue_key(job["operator"]), 0, -1)
+            job["queue_position"] = queue.index(job_id) + 1 if job_id in queue else None
+        return job
+
+    async def cancel(self, job_id: str) -> bool:
+        """取消排隊中的 Job；已分派的 Job 無法取消，回傳 False"""
+        redis = await get_async_redis_client()
+        job = await redis.hgetall(_job_key(job_id))
+        if not job or job.get("status") != "queued":
+            return False
+        if not await redis.lrem(_queue_key(job["operator"]), 1, job_id):
+            return False  # 剛好被分派迴圈取走
+        await redis.hset(_job_key(job_id), mapping={
+            "status": "cancelled", "finished_at": datetime.utcnow().isoformat()})
+        await redis.delete(_request_key(job_id))
+        await redis.eval(_DROP_IDLE_OPERATOR, 2, _queue_key(job["operator"]), OPERATORS_KEY, job["operator"])
+        return True
+
+    async def fetch_results(self, job_id: str, offset: int, limit: int) -> Optional[Dict[str, Any]]:
+        """向執行該 Job 的副本讀取分頁結果（結果在共用 Redis，任一副本皆可回應）"""
+        job = await self.get_job(job_id)
+        if not job or not job.get("replica_url"):
+            return None
+        response = await self._replica_client(job["replica"], job["replica_url"]).get(
+            f"/v1/playwright/jobs/{job_id}/results",
+            params={"offset": offset, "limit": limit},
+            headers={"Accept": accept_header()},
+        )
+        response.raise_for_status()
+        return decode_response(response)
+
+    async def queue_snapshot(self) -> Dict[str, Any]:
+        redis = await get_async_redis_client()
+        operators = await redis.zrange(OPERATORS_KEY, 0, -1, withscores=True)
+        queues = {}
+        for operator, last_served in operators:
+            queues[operator] = {
+                "waiting": await redis.llen(_queue_key(operator)),
+                "last_served_at": datetime.utcfromtimestamp(last_served).isoformat(),
+            }
+        return {"operators": queues, "running": sorted(await redis.smembers(RUNNING_KEY))}
+
+    # ------------------------------------------------------------------ 副本容量
+    async def _replica_capacity(self, agent: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        try:
+            response = await self._replica_client(agent["name"], agent["url"]).get(
+                "/v1/playwright/capacity", timeout=3.0, retries=0)
+            response.raise_for_status()
+            return {"name": agent["name"], "url": agent["url"], **response.json()}
+        except Exception as e:
+            logging.warning(f"⚠️ 副本 {agent.get('name')} 容量查詢失敗: {e}")
+            return None
+
+    async def list_replicas(self) -> List[Dict[str, Any]]:
+        """MCP Registry 中 ONLINE 的 playwright-crawler 副本及其目前容量"""
+        agents = await get_mcp_client().discover_agents(role=PLAYWRIGHT_ROLE, status="ONLINE")
+        capacities = await asyncio.gather(*(self._replica_capacity(agent) for agent in agents))
+        return [capacity for capacity in capacities if capacity]
+
+    @staticmethod
+    def _has_room(replica: Dict[str, Any]) -> bool:
+        available_mb = (replica.get("memory") or {}).get("available_mb")
+        return replica.get("free_slots", 0) > 0 and (available_mb is None or available_mb >= MIN_FREE_MEMORY_MB)
+
+    async def _choose_replica(self, replicas: List[Dict[str, Any]], session_key: str) -> Optional[Dict[str, Any]]:
+        candidates = [replica for replica in replicas if self._has_room(replica)]
+        if not candidates:
+            return None
+        redis = await get_async_redis_client()
+        sticky = await redis.get(_sticky_key(session_key))
+        for replica in candidates:
+            if replica["name"] == sticky:
+                return replica
+        return max(candidates, key=lambda r: (r["free_slots"], (r.get("memory") or {}).get("available_mb") or 0))
+
+    # ------------------------------------------------------------------ 分派
+    async def _next_placeable(self, operator: str) -> Optional[str]:
+        """取該操作者佇列中第一個目標帳號未被鎖住的 Job，並取得帳號鎖"""
+        redis = await get_async_redis_client()
+        for job_id in await redis.lrange(_queue_key(operator), 0, QUEUE_SCAN_DEPTH - 1):
+            username = await redis.hget(_job_key(job_id), "username")
+            if username is None:
+                await redis.lrem(_queue_key(operator), 1, job_id)  # Job 已過期
+                continue
+            if await redis.set(_lock_key(username), job_id, nx=True, ex=ACCOUNT_LOCK_TTL):
+                if await redis.lrem(_queue_key(operator), 1, job_id):
+                    return job_id
+                await redis.eval(_RELEASE_LOCK, 1, _lock_key(username), job_id)  # 已被取消
+        return None
+
+    async def _dispatch(self, job_id: str, replica: Dict[str, Any]) -> bool:
+        redis = await get_async_redis_client()
+        job = await redis.hgetall(_job_key(job_id))
+        raw_request = await redis.get(_request_key(job_id))
+        if raw_request is None:
+            await self._finish(job_id, job, "failed", error="請求內容已過期")
+            return False
+
+        try:
+            response = await self._replica_client(replica["name"], replica["url"]).post(
+                "/v1/playwright/jobs", json=json.loads(raw_request))
+            response.raise_for_status()
+        except Exception as e:
+            logging.warning(f"⚠️ [Job: {job_id}] 分派到 {replica['name']} 失敗，放回佇列前端: {e}")
+            await redis.lpush(_queue_key(job["operator"]), job_id)
+            await redis.eval(_RELEASE_LOCK, 1, _lock_key(job["username"]), job_id)
+            replica["free_slots"] = 0  # 本輪不再放到這個副本
+            return False
+
+        pipe = redis.pipeline(transaction=True)
+        pipe.hset(_job_key(job_id), mapping={
+            "status": "dispatched",
+            "replica": replica["name"],
+            "replica_url": replica["url"],
+            "dispatched_at": datetime.utcnow().isoformat(),
+            "status_misses": 0,
+        })
+        pipe.delete(_request_key(job_id))
+        pipe.sadd(RUNNING_KEY, job_id)
+        pipe.set(_sticky_key(job["session_key"]), replica["name"], ex=STICKY_TTL)
+        await pipe.execute()
+        replica["free_slots"] -= 1
+        logging.info(f"🚀 [Job: {job_id}] @{job['username']} → {replica['name']}（operator={job['operator']}）")
+        return True
+
+    async def dispatch_pending(self) -> int:
+        """一輪分派：輪流服務最久沒被服務的操作者，直到沒有可用副本或可放置的 Job"""
+        redis = await get_async_redis_client()
+        if not await redis.zcard(OPERATORS_KEY):
+            return 0
+        replicas = await self.list_replicas()
+        placed = 0
+
+        while any(self._has_room(replica) for replica in replicas):
+            progressed = False
+            for operator in await redis.zrange(OPERATORS_KEY, 0, -1):
+                job_id = await self._next_placeable(operator)
+                if job_id is None:
+                    await redis.eval(_DROP_IDLE_OPERATOR, 2, _queue_key(operator), OPERATORS_KEY, operator)
+                    continue
+                session_key = await redis.hget(_job_key(job_id), "session_key") or ""
+                replica = await self._choose_replica(replicas, session_key)
+                if replica is None or not await self._dispatch(job_id, replica):
+                    if replica is None:
+                        # 理論上不會發生（迴圈條件已檢查），保險起見放回
+                        username = await redis.hget(_job_key(job_id), "username")
+                        await redis.lpush(_queue_key(operator), job_id)
+                        await redis.eval(_RELEASE_LOCK, 1, _lock_key(username), job_id)
+                    continue
+                await redis.zadd(OPERATORS_KEY, {operator: time.time()}, xx=True)
+                placed += 1
+                progressed = True
+                break  # 重新依「上次被服務時間」排序，剛被服務的操作者排到最後
+            if not progressed:
+                break
+        return placed
+
+    # ------------------------------------------------------------------ 監控
+    async def _finish(self, job_id: str, job: Dict[str, Any], status: str, **fields: Any) -> None:
+        redis = await get_async_redis_client()
+        pipe = redis.pipeline(transaction=True)
+        pipe.hset(_job_key(job_id), mapping={
+            "status": status, "finished_at": datetime.utcnow().isoformat(),
+            **{k: str(v) for k, v in fields.items()}})
+        pipe.srem(RUNNING_KEY, job_id)
+        pipe.delete(_request_key(job_id))
+        await pipe.execute()
+        if job.get("username"):
+            await redis.eval(_RELEASE_LOCK, 1, _lock_key(job["username"]), job_id)
+        logging.info(f"🏁 [Job: {job_id}] {status} @{job.get('username')}")
+
+    async def _check_running(self, job_id: str) -> None:
+        redis = await get_async_redis_client()
+        job = await redis.hgetall(_job_key(job_id))
+        if not job:
+            await redis.srem(RUNNING_KEY, job_id)
+            return
+
+        try:
+            response = await self._replica_client(job["replica"], job["replica_url"]).get(
+                f"/v1/playwright/jobs/{job_id}", timeout=5.0)
+            response.raise_for_status()
+            agent_job = response.json()
+        except Exception as e:
+            misses = await redis.hincrby(_job_key(job_id), "status_misses", 1)
+            if misses >= MAX_STATUS_MISSES:
+                await self._finish(job_id, job, "failed", error=f"副本 {job.get('replica')} 無回應: {e}")
+            return
+
+        status = agent_job.get("status")
+        if status in TERMINAL_STATUSES:
+            await self._finish(job_id, job, status, result_count=agent_job.get("result_count", 0),
+                               error=agent_job.get("error", ""))
+            return
+
+        pipe = redis.pipeline(transaction=False)
+        pipe.hset(_job_key(job_id), mapping={
+            "status": "running" if status == "running" else "dispatched",
+            "result_count": agent_job.get("result_count", 0),
+            "status_misses": 0,
+        })
+        pipe.expire(_lock_key(job["username"]), ACCOUNT_LOCK_TTL)
+        await pipe.execute()
+
+    async def monitor_running(self) -> None:
+        redis = await get_async_redis_client()
+        running = await redis.smembers(RUNNING_KEY)
+        if running:
+            await asyncio.gather(*(self._check_running(job_id) for job_id in running))
+
+    # ------------------------------------------------------------------ 背景迴圈
+    async def run_forever(self) -> None:
+        logging.info("🔁 Crawl scheduler 分派迴圈啟動")
+        while True:
+            try:
+                redis = await get_async_redis_client()
+                if await redis.set(DISPATCH_LOCK_KEY, "1", nx=True, ex=max(10, int(DISPATCH_INTERVAL * 5))):
+                    try:
+                        await self.monitor_running()
+                        await self.dispatch_pending()
+                    finally:
+                        await redis.delete(DISPATCH_LOCK_KEY)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"❌ 分派迴圈錯誤: {e}", exc_info=True)
+            await asyncio.sleep(DISPATCH_INTERVAL)
+
+    def start(self) -> None:
+        if self._loop_task is None or self._loop_task.done():
+            self._loop_task = asyncio.create_task(self.run_forever(), name="crawl-scheduler-loop")
+
+    async def stop(self) -> None:
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            try:
+                await self._loop_task
+            except asyncio.CancelledError:
+                pass
+            self._loop_task = None
+        await get_http_registry().aclose()
+
+
+# 全域實例（單例模式）
+crawl_scheduler = CrawlScheduler()
@@ -13,6 +13,7 @@ from datetime import datetime
 from pathlib import Path
 
 from common.models import PostMetricsBatch
+from common.wire_format import accept_header, decode_response, post_metrics_batch
 from common.config import get_auth_file_path # 假設我們有一個共用的設定檔
 from common.db_client import DatabaseClient
 from common.redis_client import get_redis_client
@@ -56,10 +57,14 @@ class PipelineService:
         }
 
         try:
-            response_p = await self.client.post(PLAYWRIGHT_AGENT_URL, json=playwright_payload, timeout=300)
+            response_p = await self.client.post(
+                PLAYWRIGHT_AGENT_URL, json=playwright_payload, timeout=300,
+                headers={"Accept": accept_header()},
+            )
             response_p.raise_for_status()
-            batch_v1_data = response_p.json()
-            batch_v1 = PostMetricsBatch(**batch_v1_data)
+            batch_v1_data = decode_response(response_p)
+            # Playwright Agent 回傳的就是 PostMetricsBatch，內部路徑略過重複驗證
+            batch_v1 = post_metrics_batch(batch_v1_data, trusted=True)
             print(f"✅ [Pipeline] Playwright Agent completed. Got {len(batch_v1.posts)} posts.")
         except httpx.HTTPStatusError as e:
             print(f"❌ [Pipeline] Playwright Agent failed with status {e.response.status_code}: {e.response.text}")
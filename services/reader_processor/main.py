@@ -15,6 +15,7 @@ import async_timeout
 import uuid
 import json
 import logging
+from contextlib import asynccontextmanager
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 from fastapi import FastAPI, HTTPException, BackgroundTasks
@@ -28,11 +29,23 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 from common.models import PostMetrics
 from common.history import CrawlHistoryDAO
 from common.settings import get_settings
+from common.db_client import keep_pools_warm
+from common.warmup import ServiceWarmup, warm_db_pool
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """應用生命週期：背景暖機，/health 立即可達，/ready 在必要步驟完成前回 503"""
+    warmup.start()
+    yield
+    await warmup.stop()
+
 
 app = FastAPI(
     title="Reader Processor Service",
     version="1.0.0",
-    description="批量處理Reader請求的協調服務"
+    description="批量處理Reader請求的協調服務",
+    lifespan=lifespan
 )
 
 # 配置
@@ -244,6 +257,25 @@ class ReaderProcessor:
 # 全局處理器實例
 processor = ReaderProcessor()
 
+
+async def _warm_reader_lb():
+    """確認 Reader LB 可連線（同時預先解析 DNS）"""
+    async with aiohttp.ClientSession() as session:
+        async with async_timeout.timeout(5):
+            async with session.get(f"{READER_LB_URL}/health") as response:
+                if response.status != 200:
+                    raise RuntimeError(f"reader-lb HTTP {response.status}")
+                return {"reader_lb": "connected"}
+
+
+# 長駐服務：連線池以常駐設定建立（須在第一個池建立前，池都是第一次使用時才建）
+keep_pools_warm()
+
+# 暖機：狀態回寫用的連線池（CrawlHistoryDAO 自己的 DatabaseClient）與 Reader LB 連通性
+warmup = ServiceWarmup("reader_processor")
+warmup.add("db_pool", lambda: warm_db_pool(client=processor.history_dao.db_client))
+warmup.add("reader_lb", _warm_reader_lb, required=False)
+
 @app.get("/health")
 async def health_check():
     """健康檢查"""
@@ -271,6 +303,11 @@ async def health_check():
             "reader_lb": f"error: {str(e)}"
         }
 
+@app.get("/ready")
+async def readiness_check():
+    """就緒探針：連線池暖機完成前回 503"""
+    return warmup.ready_response()
+
 @app.post("/process", response_model=ReaderBatchResponse)
 async def process_reader_batch(request: ReaderRequest, background_tasks: BackgroundTasks):
     """
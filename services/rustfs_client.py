@@ -15,14 +15,23 @@ from datetime import datetime
 from pathlib import Path
 import httpx
 import asyncio
-import boto3
-from botocore.client import Config as BotoConfig
-from botocore.exceptions import ClientError
 import json
 
 from common.settings import get_settings
 from common.db_client import get_db_client
 from common.config import get_auth_file_path
+from common.lazy_import import lazy_module
+from common.image_probe import ImageHeaderProbe
+from common.image_primary_filter import (
+    DEFAULT_PRIMARY_THRESHOLD,
+    classify_primary_batch,
+    persist_primary_flags,
+)
+
+# boto3 載入約需數百毫秒，延遲到第一次建立 S3 客戶端才 import
+boto3 = lazy_module("boto3")
+botocore_client = lazy_module("botocore.client")
+botocore_exceptions = lazy_module("botocore.exceptions")
 
 
 class RustFSClient:
@@ -62,7 +71,7 @@ class RustFSClient:
             's3', endpoint_url=self.base_url,
             aws_access_key_id=self.access_key,
             aws_secret_access_key=self.secret_key,
-            config=BotoConfig(signature_version='s3v4', s3={'addressing_style': 'path'}),
+            config=botocore_client.Config(signature_version='s3v4', s3={'addressing_style': 'path'}),
             region_name=self.region
         )
 
@@ -74,7 +83,7 @@ class RustFSClient:
                 try:
                     s3.head_bucket(Bucket=self.bucket_name)
                     return True
-                except ClientError as e:
+                except botocore_exceptions.ClientError as e:
                     code = e.response.get('Error', {}).get('Code')
                     if code in ('404', 'NoSuchBucket'):
                         return False
@@ -87,7 +96,7 @@ class RustFSClient:
                     try:
                         s3.create_bucket(Bucket=self.bucket_name)
                         return True
-                    except ClientError as e:
+                    except botocore_exceptions.ClientError as e:
                         if e.response.get('Error', {}).get('Code') in ('BucketAlreadyOwnedByYou', 'BucketAlreadyExists'):
                             return True
                         raise
@@ -103,7 +112,7 @@ class RustFSClient:
             try:
                 s3.head_bucket(Bucket=self.bucket_name)
                 return {"status": "healthy", "endpoint": self.base_url, "bucket": self.bucket_name}
-            except ClientError as e:
+            except botocore_exceptions.ClientError as e:
                 code = e.response.get('Error', {}).get('Code')
                 if code in ('404', 'NoSuchBucket', '403', 'AccessDenied'):
                     return {"status": "healthy", "endpoint": self.base_url, "bucket": self.bucket_name, "note": code}
@@ -179,8 +188,45 @@ class RustFSClient:
                 })
             else:
                 processed_results.append(result)
+
+        # 下載完成即整批分類主貼圖，描述階段可在讀回 RustFS 前就略過非主圖
+        await self._classify_primary_images(processed_results)
         
         return processed_results
+
+    async def _classify_primary_images(self, results: List[Dict[str, Any]],
+                                       threshold: float = DEFAULT_PRIMARY_THRESHOLD) -> None:
+        """對本批已完成的圖片向量化打分，單次 executemany 寫回 media_files.is_primary / primary_score"""
+        images = [
+            r for r in results
+            if r.get("status") == "completed" and r.get("media_type") == "image" and r.get("media_id") is not None
+        ]
+        if not images:
+            return
+        records = [
+            {
+                "width": (r.get("metadata") or {}).get("width"),
+                "height": (r.get("metadata") or {}).get("height"),
+                "file_size": r.get("file_size"),
+                "original_url": r.get("original_url"),
+            }
+            for r in images
+        ]
+        rows = []
+        for r, (score, reason, is_primary) in zip(images, classify_primary_batch(records, threshold)):
+            r["primary_score"] = score
+            r["primary_reason"] = reason
+            r["is_primary"] = is_primary
+            rows.append((r["media_id"], score, reason, is_primary))
+        try:
+            db_client = await get_db_client()
+            async with db_client.get_connection() as conn:
+                await persist_primary_flags(conn, rows)
+            primary_count = sum(1 for row in rows if row[3])
+            print(f"🏷️ Primary image classification: {primary_count}/{len(rows)} primary")
+        except Exception as e:
+            # 分類失敗不影響下載結果，描述階段仍會補打分
+            print(f"⚠️ Failed to persist primary image flags: {e}")
     
     async def _download_single_media(self, post_url: str, media_url: str) -> Dict[str, Any]:
         """下載單個媒體檔案"""
@@ -260,8 +306,15 @@ class RustFSClient:
                             except Exception:
                                 print(f"⚠️ HEAD check failed, trying direct download...")
                         
-                        response = await client.get(media_url, follow_redirects=True)
-                        response.raise_for_status()
+                        # 串流下載：圖片邊下載邊探測檔頭尺寸，不需等完整檔案再解碼
+                        probe = ImageHeaderProbe() if media_type == 'image' else None
+                        chunks = []
+                        async with client.stream("GET", media_url, follow_redirects=True) as response:
+                            response.raise_for_status()
+                            async for chunk in response.aiter_bytes():
+                                if probe is not None:
+                                    probe.feed(chunk)
+                                chunks.append(chunk)
                         break
                     except httpx.HTTPStatusError as e:
                         if e.response.status_code == 403:
@@ -288,7 +341,7 @@ class RustFSClient:
                     # All retries failed
                     raise last_exception or Exception("Max retries exceeded")
                 
-                file_content = response.content
+                file_content = b"".join(chunks)
                 file_size = len(file_content)
                 content_type = response.headers.get('content-type', '')
                 
@@ -298,7 +351,7 @@ class RustFSClient:
                 # 上傳到 RustFS
                 try:
                     rustfs_url = await self._upload_to_rustfs(rustfs_key, file_content, content_type)
-                except ClientError as s3e:
+                except botocore_exceptions.ClientError as s3e:
                     # 若物件已存在（重試/並發重複），改為取已存在的 URL
                     err_code = s3e.response.get('Error', {}).get('Code') if hasattr(s3e, 'response') else None
                     if err_code in ('EntityAlreadyExists', 'BucketAlreadyOwnedByYou'):
@@ -306,8 +359,10 @@ class RustFSClient:
                     else:
                         raise
                 
-                # 獲取媒體檔案的元數據（寬度、高度、時長等）
-                metadata = await self._extract_media_metadata(file_content, media_type)
+                # 獲取媒體檔案的元數據（寬度、高度、時長等）；檔頭探測不到時才交給 PIL
+                metadata = probe.metadata() if probe is not None else {}
+                if not metadata:
+                    metadata = await self._extract_media_metadata(file_content, media_type)
                 
                 # 更新資料庫記錄
                 await self._update_media_file(
@@ -318,6 +373,7 @@ class RustFSClient:
                 print(f"✅ Successfully stored: {media_url} -> {rustfs_key}")
                 
                 return {
+                    "media_id": media_id,
                     "original_url": media_url,
                     "rustfs_key": rustfs_key,
                     "rustfs_url": rustfs_url,
@@ -376,7 +376,7 @@ class SystemMonitoringComponent:
                 try:
                     ok, err = self._init_llm_usage_schema()
                     if ok:
-                        st.success("已完成 llm_usage 表與索引初始化/修復")
+                        st.success("已完成 llm_usage 表、彙總表與索引初始化/修復")
                         st.rerun()
                     else:
                         st.error(f"初始化失敗：{err}")
@@ -415,6 +415,16 @@ class SystemMonitoringComponent:
             else:
                 st.info("本月尚無模型統計資料")
 
+            # 近 24 小時逐時成本
+            hourly = stats.get("hourly", [])
+            if hourly:
+                st.markdown("**📈 近 24 小時成本 (USD)**")
+                st.bar_chart(
+                    [{"時段": str(row["bucket"])[5:16], "USD": float(row["usd_cost"] or 0)} for row in hourly],
+                    x="時段",
+                    y="USD",
+                )
+
             # 調用歷史（最近 50 筆）
             st.markdown("**🕒 最近 50 筆調用**")
             recent = stats.get("recent", [])
@@ -451,137 +461,27 @@ class SystemMonitoringComponent:
             st.warning(f"讀取費用面板失敗：{e}")
 
     def _fetch_llm_usage_stats(self) -> Dict[str, Any]:
-        """今日彙總（改用 psycopg2 同步查詢，避免 async 池問題）"""
-        from common.settings import get_settings
-        dsn = get_settings().database.url
+        """今日彙總（讀日彙總表，TTL 快取，見 common.llm_usage_stats）"""
+        from common.llm_usage_stats import get_llm_usage_stats
         try:
-            with psycopg2.connect(dsn) as conn:
-                with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                    cur.execute(
-                        """
-                        SELECT 
-                            COALESCE(SUM(cost),0) AS usd_cost,
-                            COALESCE(SUM(total_tokens),0) AS tokens,
-                            COUNT(*) AS requests
-                        FROM llm_usage
-                        WHERE ts::date = CURRENT_DATE
-                        """
-                    )
-                    top_line = cur.fetchone() or {}
-
-                    cur.execute(
-                        """
-                        SELECT service, 
-                               SUM(cost) AS usd_cost, 
-                               SUM(total_tokens) AS tokens, 
-                               COUNT(*) AS requests
-                        FROM llm_usage
-                        WHERE ts::date = CURRENT_DATE
-                        GROUP BY service
-                        ORDER BY usd_cost DESC
-                        LIMIT 5
-                        """
-                    )
-                    by_service = cur.fetchall() or []
-
-                    cur.execute(
-                        """
-                        SELECT provider, model, 
-                               SUM(cost) AS usd_cost, 
-                               SUM(total_tokens) AS tokens, 
-                               COUNT(*) AS requests
-                        FROM llm_usage
-                        WHERE ts::date = CURRENT_DATE
-                        GROUP BY provider, model
-                        ORDER BY usd_cost DESC, tokens DESC
-                        LIMIT 5
-                        """
-                    )
-                    by_model = cur.fetchall() or []
-
-                    cur.execute(
-                        """
-                        SELECT 
-                            to_char(ts AT TIME ZONE 'UTC' AT TIME ZONE 'Asia/Taipei', 'HH24:MI:SS') AS 時間,
-                            service AS 服務,
-                            provider AS 供應商,
-                            model AS 模型,
-                            COALESCE(
-                                NULLIF(metadata->>'usage_scene',''),
-                                NULLIF(metadata->>'component',''),
-                                ''
-                            ) AS 功能,
-                            total_tokens AS tokens,
-                            cost AS usd,
-                            status AS 狀態
-                        FROM llm_usage
-                        ORDER BY ts DESC
-                        LIMIT 20
-                        """
-                    )
-                    recent = cur.fetchall() or []
-
-                    return {"top_line": top_line, "by_service": by_service, "by_model": by_model, "recent": recent}
+            stats = get_llm_usage_stats()
+            summary = stats.get_summary("today", top_services=5, top_models=5)
+            return {**summary, "recent": stats.get_recent(20)}
         except Exception:
             return {}
 
     def _fetch_llm_monthly_stats(self) -> Dict[str, Any]:
-        """本月度彙總 + 模型統計 + 最近 50 筆（改用 psycopg2 同步查詢）"""
-        from common.settings import get_settings
-        dsn = get_settings().database.url
+        """本月度彙總 + 模型統計 + 近 24 小時趨勢 + 最近 50 筆（讀彙總表，TTL 快取）"""
+        from common.llm_usage_stats import get_llm_usage_stats
         try:
-            with psycopg2.connect(dsn) as conn:
-                with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                    cur.execute(
-                        """
-                        SELECT 
-                            COALESCE(SUM(cost),0) AS usd_cost,
-                            COALESCE(SUM(total_tokens),0) AS tokens,
-                            COUNT(*) AS requests
-                        FROM llm_usage
-                        WHERE date_trunc('month', ts) = date_trunc('month', now())
-                        """
-                    )
-                    top_line = cur.fetchone() or {}
-
-                    cur.execute(
-                        """
-                        SELECT provider, model,
-                               SUM(cost) AS usd_cost,
-                               SUM(total_tokens) AS tokens,
-                               COUNT(*) AS requests
-                        FROM llm_usage
-                        WHERE date_trunc('month', ts) = date_trunc('month', now())
-                        GROUP BY provider, model
-                        ORDER BY usd_cost DESC, tokens DESC
-                        LIMIT 30
-                        """
-                    )
-                    by_model = cur.fetchall() or []
-
-                    cur.execute(
-                        """
-                        SELECT 
-                            to_char(ts AT TIME ZONE 'UTC' AT TIME ZONE 'Asia/Taipei', 'YYYY-MM-DD HH24:MI:SS') AS 時間,
-                            service AS 服務,
-                            provider AS 供應商,
-                            model AS 模型,
-                            COALESCE(
-                                NULLIF(metadata->>'usage_scene',''),
-                                NULLIF(metadata->>'component',''),
-                                ''
-                            ) AS 功能,
-                            total_tokens AS tokens,
-                            cost AS usd,
-                            status AS 狀態
-                        FROM llm_usage
-                        ORDER BY ts DESC
-                        LIMIT 50
-                        """
-                    )
-                    recent = cur.fetchall() or []
-
-                    return {"top_line": top_line, "by_model": by_model, "recent": recent}
+            stats = get_llm_usage_stats()
+            summary = stats.get_summary("month", top_models=30)
+            return {
+                "top_line": summary["top_line"],
+                "by_model": summary["by_model"],
+                "hourly": stats.get_hourly_trend(24),
+                "recent": stats.get_recent(50),
+            }
         except Exception:
             return {}
 
@@ -642,35 +542,16 @@ class SystemMonitoringComponent:
             try:
                 # 使用一次性直連，避免連線池已關閉造成的初始化失敗
                 from common.settings import get_settings
+                from common.llm_usage_recorder import ensure_usage_schema
                 import asyncpg
                 dsn = get_settings().database.url
                 conn = await asyncpg.connect(dsn)
-                await conn.execute(
-                    """
-                    CREATE TABLE IF NOT EXISTS llm_usage (
-                        id BIGSERIAL PRIMARY KEY,
-                        ts TIMESTAMPTZ NOT NULL DEFAULT NOW(),
-                        service TEXT NOT NULL,
-                        provider TEXT NOT NULL,
-                        model TEXT NOT NULL,
-                        request_id TEXT,
-                        prompt_tokens INTEGER DEFAULT 0,
-                        completion_tokens INTEGER DEFAULT 0,
-                        total_tokens INTEGER DEFAULT 0,
-                        cost NUMERIC(12,6) DEFAULT 0,
-                        latency_ms INTEGER DEFAULT 0,
-                        status TEXT NOT NULL DEFAULT 'success',
-                        error TEXT,
-                        metadata JSONB
-                    )
-                    """
-                )
-                await conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_usage_ts ON llm_usage (ts DESC)")
-                await conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_usage_svc ON llm_usage (service)")
-                await conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_usage_provider ON llm_usage (provider)")
-                await conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_usage_model ON llm_usage (model)")
-                await conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_usage_status ON llm_usage (status)")
-                await conn.close()
+                try:
+                    await ensure_usage_schema(conn)
+                finally:
+                    await conn.close()
+                from common.llm_usage_stats import get_llm_usage_stats
+                get_llm_usage_stats().invalidate()
                 return True, ""
             except Exception as e:
                 return False, str(e)
@@ -560,6 +560,8 @@ class PlaywrightCrawlerComponent:
                 
                 if results and target_username:
                     saved_count = 0
+                    saved_post_ids = []
+                    snapshots = []
                     
                     async with db.get_connection() as conn:
                         # 創建 Playwright 專用資料表（如果不存在）
@@ -638,11 +640,25 @@ class PlaywrightCrawlerComponent:
                                     crawl_id
                                 )
                                 saved_count += 1
+                                saved_post_ids.append(result.get('post_id'))
+                                snapshots.append({
+                                    "url": result.get('url'),
+                                    "username": target_username,
+                                    "views_count": views_count,
+                                    "likes_count": likes_count,
+                                    "comments_count": comments_count,
+                                    "reposts_count": reposts_count,
+                                    "shares_count": shares_count,
+                                })
                                 
                             except Exception as e:
                                 self._add_log(f"⚠️ 保存單個貼文失敗 {result.get('post_id', 'N/A')}: {e}")
                                 continue
                         
+                        # 追加指標歷史快照（一次往返），保留成長曲線
+                        from common.metrics_history import safe_record_snapshots
+                        await safe_record_snapshots(conn, "playwright", snapshots)
+                        
                         # 更新 Playwright 爬取檢查點表
                         await conn.execute("""
                             CREATE TABLE IF NOT EXISTS playwright_crawl_state (
@@ -668,6 +684,10 @@ class PlaywrightCrawlerComponent:
                                     crawl_id = EXCLUDED.crawl_id
                             """, target_username, latest_post_id, saved_count, crawl_id)
                     
+                    # 同步增量爬取用的 post_id 索引（Redis Bloom Filter），只加入成功寫入的貼文
+                    from common.post_id_index import post_id_index
+                    await post_id_index.add(target_username, saved_post_ids)
+                    
                     # 更新結果狀態
                     results_data["database_saved"] = True
                     results_data["database_saved_count"] = saved_count
@@ -14,7 +14,7 @@ import time
 import requests
 import shutil
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from datetime import datetime
 import asyncio
 
@@ -22,6 +22,10 @@ from .playwright_utils import PlaywrightUtils
 from .playwright_database_handler import PlaywrightDatabaseHandler
 from .playwright_user_manager import PlaywrightUserManager
 from .playwright_data_export_handler import PlaywrightDataExportHandler
+from .progress_subscription import get_progress_hub, task_id_from_path, to_ui_progress, HEARTBEAT_SECONDS, PAGE_WAIT_SECONDS, STAGE_PRIORITY
+
+# 等待爬取 Job 的上限秒數（Agent 端另有心跳逾時判定，這是 UI 端的最後防線）
+CRAWL_JOB_WAIT_TIMEOUT = float(os.getenv("PLAYWRIGHT_JOB_WAIT_TIMEOUT", str(3 * 3600)))
 
 # 新增進度管理組件
 try:
@@ -44,12 +48,14 @@ except ImportError:
 class PlaywrightCrawlerComponentV2:
     def __init__(self):
         self.agent_url = "http://localhost:8006/v1/playwright/crawl"
+        self.jobs_url = "http://localhost:8006/v1/playwright/jobs"
         self.sse_url = "http://localhost:8000/stream"
         
         # 初始化子組件
         self.db_handler = PlaywrightDatabaseHandler()
         self.user_manager = PlaywrightUserManager()
         self.export_handler = PlaywrightDataExportHandler(self.db_handler)
+        self.progress_hub = get_progress_hub()
         
         # 初始化進度管理組件
         if PROGRESS_MANAGER_AVAILABLE:
@@ -77,26 +83,16 @@ class PlaywrightCrawlerComponentV2:
         線程安全寫入進度（增強版）：
         - 使用 tempfile + shutil.move 實現原子寫入，避免讀取到不完整的檔案
         - 同時寫入 Redis（如果可用）支援背景任務監控
+        - 合併後的狀態推送到進度快取，進度頁不必再讀檔
         """
         # 處理 Path 對象
         path_str = str(path)
-        old: Dict[str, Any] = {}
-        if os.path.exists(path_str):
-            try:
-                with open(path_str, "r", encoding="utf-8") as f:
-                    old = json.load(f)
-            except Exception:
-                pass
+        old = self._read_progress(path_str)
 
         # 合併邏輯
-        stage_priority = {
-            "initialization": 0, "fetch_start": 1, "post_parsed": 2,
-            "batch_parsed": 3, "fill_views_start": 4, "fill_views_completed": 5,
-            "api_completed": 6, "completed": 7, "error": 8
-        }
         old_stage = old.get("stage", "")
         new_stage = data.get("stage", old_stage)
-        if stage_priority.get(new_stage, 0) < stage_priority.get(old_stage, 0):
+        if STAGE_PRIORITY.get(new_stage, 0) < STAGE_PRIORITY.get(old_stage, 0):
             data.pop("stage", None)
 
         old.update(data)
@@ -111,6 +107,7 @@ class PlaywrightCrawlerComponentV2:
             if os.path.exists(tmp_path):
                 os.unlink(tmp_path)
             raise
+        self.progress_hub.publish(task_id_from_path(path_str), old)
         
         # 同時寫入 Redis（新增功能）
         if self.progress_manager and hasattr(st.session_state, 'playwright_task_id'):
@@ -127,15 +124,20 @@ class PlaywrightCrawlerComponentV2:
                 print(f"⚠️ Redis 進度寫入失敗: {e}")
 
     def _read_progress(self, path) -> Dict[str, Any]:
-        """讀取進度檔案"""
+        """讀取進度（優先進度快取，快取沒有時讀檔並補進快取）"""
         path_str = str(path)
+        _, cached = self.progress_hub.get(task_id_from_path(path_str))
+        if cached is not None:
+            return cached
         if not os.path.exists(path_str):
             return {}
         try:
             with open(path_str, "r", encoding="utf-8") as f:
-                return json.load(f)
+                data = json.load(f)
         except Exception:
             return {}
+        self.progress_hub.seed(task_id_from_path(path_str), data)
+        return data
     
     def _cleanup_invalid_file_references(self):
         """清理無效的文件引用，避免 MediaFileStorageError"""
@@ -429,6 +431,7 @@ class PlaywrightCrawlerComponentV2:
                     import shutil
                     shutil.rmtree(temp_progress_dir)
                     os.makedirs(temp_progress_dir, exist_ok=True)
+                    self.task_recovery.progress_manager.hub.clear()
                     print("✅ 歷史任務已清除")
             
             # 3. 清理Redis緩存 (60%)
@@ -744,33 +747,39 @@ class PlaywrightCrawlerComponentV2:
         progress_file = st.session_state.get('playwright_progress_file', '')
         
         # -- 數據更新邏輯 --
-        # 讀取最新進度狀態（優先從 Redis 讀取後台任務）
+        # 從進度快取讀取（背景 worker 寫入時即推送，O(1) 不讀檔）
         task_id = st.session_state.get('playwright_task_id')
-        progress_data = None
-        
-        # 嘗試從 Redis 獲取最新狀態（後台任務可能已完成）
-        if task_id:
+        progress_key = task_id_from_path(progress_file) if progress_file else task_id
+        progress_version, progress_data = self.progress_hub.get(progress_key) if progress_key else (0, None)
+        if progress_data is None and progress_file:
+            progress_data = self._read_progress(progress_file) or None
+            progress_version, _ = self.progress_hub.get(progress_key)
+        
+        # 本地狀態未結束時，確認後台任務（Redis / NATS）是否已完成或錯誤
+        if task_id and (not progress_data or progress_data.get("stage") not in ("api_completed", "completed", "error")):
             try:
-                redis_progress = self.progress_manager.get_progress(task_id, prefer_redis=True)
-                if redis_progress and redis_progress.get("stage") in ("completed", "error"):
-                    # 如果 Redis 中任務已完成或錯誤，使用 Redis 數據
-                    progress_data = redis_progress
+                _, remote_progress = self.progress_hub.get(task_id) if task_id != progress_key else (0, None)
+                last_scan = st.session_state.get('playwright_redis_scan_at', 0.0)
+                if remote_progress is None and not self.progress_hub.subscribed and time.time() - last_scan > HEARTBEAT_SECONDS:
+                    # NATS 不可用時每 HEARTBEAT_SECONDS 才重讀 Redis；任務紀錄是 0~100 百分比，換算成 UI 的 0~1
+                    st.session_state.playwright_redis_scan_at = time.time()
+                    remote_progress = self.progress_manager.read_redis_progress(task_id) if self.progress_manager else None
+                    remote_progress = to_ui_progress(remote_progress) if remote_progress else None
+                if remote_progress and remote_progress.get("stage") in ("completed", "error"):
+                    # 如果後台任務已完成或錯誤，使用該數據
+                    progress_data = remote_progress
                     # 更新本地進度文件以保持同步
                     if progress_file:
                         self._update_progress_file(progress_file, 
-                                                 redis_progress.get("progress", 100.0), 
-                                                 redis_progress.get("stage", "completed"), 
+                                                 remote_progress.get("progress", 1.0), 
+                                                 remote_progress.get("stage", "completed"), 
                                                  "後台任務已完成",
-                                                 final_data=redis_progress.get("final_data", {}))
+                                                 final_data=remote_progress.get("final_data", {}))
             except Exception as e:
-                pass  # Redis 讀取失敗時靜默處理
-        
-        # 如果 Redis 沒有完成狀態，使用本地文件
-        if not progress_data and progress_file and os.path.exists(progress_file):
-            progress_data = self._read_progress(progress_file)
+                pass  # 後台狀態讀取失敗時靜默處理
             
         if progress_data:
-                # 總是以最新檔案內容更新 session state
+                # 總是以最新狀態更新 session state
                 st.session_state.playwright_progress = progress_data.get("progress", 0.0)
                 st.session_state.playwright_current_work = progress_data.get("current_work", "")
                 
@@ -809,70 +818,71 @@ class PlaywrightCrawlerComponentV2:
         st.progress(max(0.0, min(1.0, progress)), text=f"{progress:.1%} - {current_work}")
         
         # 顯示詳細階段信息
-        if progress_file and os.path.exists(progress_file):
-            progress_data = self._read_progress(progress_file)
-            if progress_data:
-                stage = progress_data.get("stage", "unknown")
-                stage_names = {
-                    # 排隊等待階段
-                    "waiting_queue": "⏳ 等待排隊中",
-                    "queued": "📋 已排隊等待",
-                    
-                    # 初始階段
-                    "initialization": "🔧 初始化爬蟲環境",
-                    "auth_loading": "🔐 載入認證檔案",
-                    "request_preparation": "📋 準備API請求",
-                    "api_request": "🚀 發送API請求",
-                    "api_processing": "⏳ API處理中",
-                    
-                    # Playwright 處理階段
-                    "browser_launch": "🌐 啟動瀏覽器",
-                    "page_navigation": "🧭 導航到用戶頁面",
-                    "page_loading": "⏳ 頁面載入中",
-                    "scroll_start": "📜 開始智能滾動",
-                    "url_collection": "🔗 收集貼文URLs",
-                    "url_processing": "🔄 處理URLs",
-                    
-                    # 數據補齊階段
-                    "fill_details_start": "🔍 開始補齊詳細數據",
-                    "fill_details_progress": "📝 補齊貼文內容和互動",
-                    "fill_views_start": "👁️ 開始補齊觀看數",
-                    "fill_views_progress": "📊 補齊觀看數據",
-                    "deduplication": "🧹 去重處理",
-                    
-                    # 完成階段
-                    "response_processing": "📦 處理API響應",
-                    "completed": "🎉 爬取完成",
-                    "error": "❌ 發生錯誤"
-                }
-                stage_display = stage_names.get(stage, f"🔄 {stage}")
-                
-                # 根據進度顯示不同的顏色和樣式
-                if progress >= 0.9:
-                    st.success(f"**當前階段**: {stage_display}")
-                elif progress >= 0.5:
-                    st.info(f"**當前階段**: {stage_display}")
-                elif stage == "error":
-                    st.error(f"**當前階段**: {stage_display}")
-                else:
-                    st.warning(f"**當前階段**: {stage_display}")
-                
-                # 顯示進度階段圖
-                self._render_progress_stages(progress, stage)
-                
-                # 顯示日誌
-                log_messages = progress_data.get("log_messages", [])
-                if log_messages:
-                    with st.expander("📋 爬取過程日誌", expanded=True):
-                        recent_logs = log_messages[-30:] if len(log_messages) > 30 else log_messages
-                        st.code('\n'.join(recent_logs), language='text')
-        
+        if progress_data:
+            stage = progress_data.get("stage", "unknown")
+            stage_names = {
+                # 排隊等待階段
+                "waiting_queue": "⏳ 等待排隊中",
+                "queued": "📋 已排隊等待",
+                
+                # 初始階段
+                "initialization": "🔧 初始化爬蟲環境",
+                "auth_loading": "🔐 載入認證檔案",
+                "request_preparation": "📋 準備API請求",
+                "api_request": "🚀 發送API請求",
+                "api_processing": "⏳ API處理中",
+                
+                # Playwright 處理階段
+                "browser_launch": "🌐 啟動瀏覽器",
+                "page_navigation": "🧭 導航到用戶頁面",
+                "page_loading": "⏳ 頁面載入中",
+                "scroll_start": "📜 開始智能滾動",
+                "url_collection": "🔗 收集貼文URLs",
+                "url_processing": "🔄 處理URLs",
+                
+                # 數據補齊階段
+                "fill_details_start": "🔍 開始補齊詳細數據",
+                "fill_details_progress": "📝 補齊貼文內容和互動",
+                "fill_views_start": "👁️ 開始補齊觀看數",
+                "fill_views_progress": "📊 補齊觀看數據",
+                "deduplication": "🧹 去重處理",
+                
+                # 完成階段
+                "response_processing": "📦 處理API響應",
+                "completed": "🎉 爬取完成",
+                "error": "❌ 發生錯誤"
+            }
+            stage_display = stage_names.get(stage, f"🔄 {stage}")
+            
+            # 根據進度顯示不同的顏色和樣式
+            if progress >= 0.9:
+                st.success(f"**當前階段**: {stage_display}")
+            elif progress >= 0.5:
+                st.info(f"**當前階段**: {stage_display}")
+            elif stage == "error":
+                st.error(f"**當前階段**: {stage_display}")
+            else:
+                st.warning(f"**當前階段**: {stage_display}")
+            
+            # 顯示進度階段圖
+            self._render_progress_stages(progress, stage)
+            
+            # 顯示日誌
+            log_messages = progress_data.get("log_messages", [])
+            if log_messages:
+                with st.expander("📋 爬取過程日誌", expanded=True):
+                    recent_logs = log_messages[-30:] if len(log_messages) > 30 else log_messages
+                    st.code('\n'.join(recent_logs), language='text')
+    
         st.info("⏱️ 進度將自動更新，無需手動操作。")
 
         # -- 自動刷新機制 --
-        # 只要還在 running 狀態，就安排一個延遲刷新
+        # 等待進度快取的版本號變化，最多 PAGE_WAIT_SECONDS 就 rerun，不長時間佔住 script 執行緒
         if st.session_state.playwright_crawl_status in ['running', 'monitoring']:
-            time.sleep(1) # 降低刷新頻率
+            if progress_key:
+                self.progress_hub.wait_for_change(progress_key, progress_version, timeout=PAGE_WAIT_SECONDS)
+            else:
+                time.sleep(1)
             st.rerun()
     
     def _render_monitoring(self):
@@ -1149,6 +1159,8 @@ class PlaywrightCrawlerComponentV2:
                         os.remove(progress_file)
                     except:
                         pass
+                if progress_file:
+                    self.progress_hub.discard(task_id_from_path(progress_file))
                 # 檢查是否從管理任務頁面進入
                 if st.session_state.get('from_task_manager', False):
                     st.session_state.playwright_crawl_status = "task_manager"
@@ -1165,6 +1177,8 @@ class PlaywrightCrawlerComponentV2:
                         os.remove(progress_file)
                     except:
                         pass
+                if progress_file:
+                    self.progress_hub.discard(task_id_from_path(progress_file))
                 st.session_state.playwright_crawl_status = "idle"
                 st.rerun()
     
@@ -1397,25 +1411,32 @@ class PlaywrightCrawlerComponentV2:
             self._log_to_file(progress_file, "🚀 發送API請求到Playwright Agent...")
             self._update_progress_file(progress_file, 0.15, "api_request", "發送API請求...")
             
-            # 發送 API 請求並監控進度
+            # 提交 Job 並輪詢真實進度（不再以單一長連線等待整個爬取）
             try:
                 import httpx
                 import time
                 
-                # 開始API請求
-                start_time = time.time()
-                
-                with httpx.Client(timeout=1800.0) as client:  # 30分鐘超時，支援大型任務
-                    # 階段5: 等待響應 (20-25%)
-                    self._log_to_file(progress_file, "⏳ 等待Playwright處理...")
+                with httpx.Client(timeout=30.0) as client:
+                    response = client.post(self.jobs_url, json=payload)
+                    response.raise_for_status()
+                    job_id = response.json()["job_id"]
+                    
+                    # 階段5: 等待處理 (20-90%)
+                    self._log_to_file(progress_file, f"⏳ Job 已建立 ({job_id[:8]}...)，等待Playwright處理...")
                     self._update_progress_file(progress_file, 0.20, "api_processing", "Playwright正在處理...")
                     
-                    # 模擬進度更新（因為我們無法直接監控Playwright的內部進度）
-                    self._simulate_processing_progress(progress_file, start_time)
+                    job = self._wait_for_crawl_job(client, job_id, max_posts, progress_file)
+                    if job.get("status") != "completed":
+                        raise RuntimeError(job.get("error") or "爬取任務失敗")
                     
-                    response = client.post(self.agent_url, json=payload)
-                    response.raise_for_status()
-                    result = response.json()
+                    posts = self._fetch_crawl_job_results(client, job_id)
+                    result = {
+                        "posts": posts,
+                        "batch_id": job_id,
+                        "username": username,
+                        "total_count": len(posts),
+                        "processing_stage": job.get("processing_stage", "playwright_incremental_completed"),
+                    }
                 
                 # 階段9: 處理響應 (95-100%)
                 self._log_to_file(progress_file, "✅ API請求成功，正在處理響應...")
@@ -1477,39 +1498,57 @@ class PlaywrightCrawlerComponentV2:
             self._log_to_file(progress_file, f"❌ {error_msg}")
             self._update_progress_file(progress_file, 0.0, "error", error_msg, error=str(e))
     
-    def _simulate_processing_progress(self, progress_file: str, start_time: float):
-        """模擬處理進度更新"""
-        import time
-        import threading
-        
-        def update_progress():
-            stages = [
-                (0.25, "browser_launch", "啟動瀏覽器..."),
-                (0.30, "page_navigation", "導航到用戶頁面..."),
-                (0.35, "page_loading", "等待頁面加載..."),
-                (0.40, "scroll_start", "開始智能滾動..."),
-                (0.50, "url_collection", "收集貼文URLs..."),
-                (0.60, "url_processing", "處理貼文URLs..."),
-                (0.65, "fill_details_start", "開始補齊詳細數據..."),
-                (0.75, "fill_details_progress", "補齊貼文內容和互動數據..."),
-                (0.80, "fill_views_start", "開始補齊觀看數..."),
-                (0.85, "fill_views_progress", "補齊觀看數據..."),
-                (0.90, "deduplication", "去重處理...")
-            ]
-            
-            for progress, stage, description in stages:
-                elapsed = time.time() - start_time
-                # 如果API已經完成，就不再更新模擬進度
-                if elapsed > 900:  # 15分鐘後停止模擬（配合30分鐘超時）
+    # 後端階段 → 進度圖階段（前綴比對）與該階段的最低進度
+    _JOB_STAGE_MAP = [
+        ("process_round", "url_processing", 0.60),
+        ("details_fetched", "fill_details_progress", 0.75),
+        ("fill_details", "fill_details_progress", 0.75),
+        ("views_fetched", "fill_views_progress", 0.85),
+        ("fill_views", "fill_views_progress", 0.85),
+    ]
+    
+    def _wait_for_crawl_job(self, client, job_id: str, max_posts: int, progress_file: str,
+                            poll_interval: float = 2.0,
+                            timeout: float = CRAWL_JOB_WAIT_TIMEOUT) -> Dict[str, Any]:
+        """輪詢 Job 狀態並把真實階段、已完成貼文數寫入進度檔案，直到完成、失敗或等待逾時"""
+        last_stage, last_count, progress = None, -1, 0.20
+        deadline = time.monotonic() + timeout
+        while True:
+            if time.monotonic() > deadline:
+                return {"status": "failed", "error": f"等待 Job 逾時（超過 {int(timeout)} 秒）"}
+            response = client.get(f"{self.jobs_url}/{job_id}")
+            response.raise_for_status()
+            job = response.json()
+            if job.get("status") in ("completed", "failed"):
+                return job
+            
+            backend_stage = (job.get("progress") or {}).get("stage") or job.get("status", "queued")
+            ui_stage, floor = "api_processing", 0.20
+            for prefix, mapped_stage, stage_floor in self._JOB_STAGE_MAP:
+                if backend_stage.startswith(prefix):
+                    ui_stage, floor = mapped_stage, stage_floor
                     break
-                    
-                self._log_to_file(progress_file, f"📊 {description}")
-                self._update_progress_file(progress_file, progress, stage, description)
-                time.sleep(8)  # 每8秒更新一次
-        
-        # 在背景線程中運行進度模擬
-        progress_thread = threading.Thread(target=update_progress, daemon=True)
-        progress_thread.start()
+            
+            done = int(job.get("result_count") or 0)
+            progress = max(progress, floor, 0.25 + 0.65 * min(1.0, done / max(1, max_posts)))
+            if backend_stage != last_stage or done != last_count:
+                self._log_to_file(progress_file, f"📊 {backend_stage}（已完成 {done}/{max_posts} 篇）")
+                self._update_progress_file(progress_file, min(progress, 0.90), ui_stage,
+                                           f"{backend_stage}：已完成 {done}/{max_posts} 篇")
+                last_stage, last_count = backend_stage, done
+            time.sleep(poll_interval)
+    
+    def _fetch_crawl_job_results(self, client, job_id: str, page_size: int = 200) -> List[Dict[str, Any]]:
+        """分頁取回 Job 的全部貼文"""
+        posts, offset = [], 0
+        while True:
+            response = client.get(f"{self.jobs_url}/{job_id}/results", params={"offset": offset, "limit": page_size})
+            response.raise_for_status()
+            page = response.json()
+            posts.extend(page["posts"])
+            if not page["has_more"] or page["next_offset"] == offset:
+                return posts
+            offset = page["next_offset"]
     
     def _render_progress_stages(self, progress: float, current_stage: str):
         """渲染進度階段圖"""
@@ -80,18 +80,10 @@ class PlaywrightDatabaseHandler:
                             )
                         """)
                         
-                        # 創建索引（如果不存在）
-                        await conn.execute("""
-                            CREATE INDEX IF NOT EXISTS idx_playwright_username_created 
-                            ON playwright_post_metrics(username, created_at DESC)
-                        """)
-                        
-                        await conn.execute("""
-                            CREATE INDEX IF NOT EXISTS idx_playwright_crawl_id 
-                            ON playwright_post_metrics(crawl_id)
-                        """)
+                        # 索引由 alembic migrations（001/002/003）統一管理
                         
-                        # 插入數據（保留後的）
+                        # 插入數據（保留後的）；只為成功寫入的貼文記錄歷史快照
+                        snapshots = []
                         for result in results:
                             try:
                                 # 解析數字字段
@@ -162,11 +154,24 @@ class PlaywrightDatabaseHandler:
                                     created_at
                                 )
                                 saved_count += 1
+                                snapshots.append({
+                                    "url": result.get('url'),
+                                    "username": target_username,
+                                    "views_count": views_count,
+                                    "likes_count": likes_count,
+                                    "comments_count": comments_count,
+                                    "reposts_count": reposts_count,
+                                    "shares_count": shares_count,
+                                })
                                 
                             except Exception as e:
                                 self._log(f"⚠️ 保存單個貼文失敗 {result.get('post_id', 'N/A')}: {e}")
                                 continue
 
+                        # 追加指標歷史快照（一次往返），保留成長曲線
+                        from common.metrics_history import safe_record_snapshots
+                        await safe_record_snapshots(conn, "playwright", snapshots)
+
                         # 追加：插入被去重丟棄的貼文作為「已看過指紋」，標記 source='playwright_dedup_filtered'
                         # 僅保存最少欄位：post_id/url/username/views/likes/crawl_id，content 留空
                         for dropped in dedup_filtered:
@@ -223,6 +228,15 @@ class PlaywrightDatabaseHandler:
                                     crawl_id = EXCLUDED.crawl_id
                             """, target_username, latest_post_id, saved_count, crawl_id)
                     
+                    # 同步增量爬取用的 post_id 索引（Redis Bloom Filter）
+                    from common.post_id_index import post_id_index
+                    await post_id_index.add(
+                        target_username,
+                        [r.get('post_id') for r in results]
+                        + [d.get('post_id') for d in dedup_filtered
+                           if (d.get('username') or target_username) == target_username]
+                    )
+                    
                     # 更新結果狀態
                     results_data["database_saved"] = True
                     results_data["database_saved_count"] = saved_count
@@ -432,6 +446,10 @@ class PlaywrightDatabaseHandler:
                 deleted_rows = int(result.split()[-1]) if result else 0
                 self._log(f"實際刪除了 {deleted_rows} 筆記錄")
                 
+                # Bloom Filter 無法移除元素，丟棄後於下次增量爬取時重建
+                from common.post_id_index import post_id_index
+                await post_id_index.invalidate(username)
+                
                 # 驗證刪除是否成功
                 verify_query = "SELECT COUNT(*) FROM playwright_post_metrics WHERE username = $1"
                 verify_result = await conn.fetchrow(verify_query, username)
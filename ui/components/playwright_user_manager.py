@@ -4,15 +4,16 @@ Playwright 用戶數據管理模組
 """
 
 import streamlit as st
-import asyncio
-import pandas as pd
-import io
-import json
-from datetime import datetime, timezone, timedelta
-from typing import Any, Dict
+import os
+from typing import Any, Optional
 
+from common.export_links import EXPORT_LINK_TTL_SECONDS, sign_export_token
 from .playwright_database_handler import PlaywrightDatabaseHandler
 
+EXPORT_FORMAT_LABELS = {"csv": "CSV", "csv.gz": "CSV (gzip)", "parquet": "Parquet"}
+# 瀏覽器可連到的匯出代理位址（MCP Server）
+EXPORT_PUBLIC_URL = os.getenv("EXPORT_PUBLIC_URL") or os.getenv("MCP_SERVER_URL", "http://localhost:10100")
+
 # 添加調試用的日誌函數
 def debug_log(message: str):
     """調試日誌函數"""
@@ -27,127 +28,41 @@ class PlaywrightUserManager:
     def __init__(self):
         self.db_handler = PlaywrightDatabaseHandler()
     
-    def show_user_csv_download(self, username: str):
-        """顯示用戶CSV直接下載按鈕"""
-        try:
-            # 獲取用戶貼文
-            posts = asyncio.run(self.db_handler.get_user_posts_async(username))
-            
-            if not posts:
-                st.warning(f"❌ 用戶 @{username} 沒有貼文記錄")
-                return
-            
-            # 準備CSV數據（與 JSON 格式完全一致）
-            csv_data = []
-            for post in posts:
-                # 處理資料庫中可能存在的陣列字段（如果以 JSON 字符串存儲）
-                tags = self._process_array_field(post.get('tags', []))
-                images = self._process_array_field(post.get('images', []))
-                videos = self._process_array_field(post.get('videos', []))
-                
-                csv_data.append({
-                    "url": post.get('url', ''),
-                    "post_id": post.get('post_id', ''),
-                    "username": post.get('username', ''),
-                    "content": post.get('content', ''),
-                    "likes_count": post.get('likes_count', 0),
-                    "comments_count": post.get('comments_count', 0),
-                    "reposts_count": post.get('reposts_count', 0),
-                    "shares_count": post.get('shares_count', 0),
-                    "views_count": post.get('views_count', 0),
-                    "calculated_score": post.get('calculated_score', ''),
-                    "created_at": post.get('created_at', ''),
-                    "post_published_at": post.get('post_published_at', ''),
-                    "tags": "|".join(tags) if tags else "",
-                    "images": "|".join(images) if images else "",
-                    "videos": "|".join(videos) if videos else "",
-                    "source": post.get('source', 'playwright_agent'),
-                    "crawler_type": post.get('crawler_type', 'playwright'),
-                    "crawl_id": post.get('crawl_id', ''),
-                    "fetched_at": post.get('fetched_at', '')
-                })
-            
-            # 轉換為DataFrame並生成CSV
-            df = pd.DataFrame(csv_data)
-            csv_content = self._dataframe_to_csv(df)
-            
-            # 直接顯示下載按鈕
-            timestamp = datetime.now(timezone(timedelta(hours=8))).strftime('%Y%m%d_%H%M%S')
-            filename = f"user_posts_{username}_{timestamp}.csv"
-            
-            st.download_button(
-                label=f"📥 導出CSV ({len(posts)}筆)",
-                data=csv_content,
-                file_name=filename,
-                mime="text/csv",
-                help=f"直接下載 @{username} 的所有貼文記錄",
-                use_container_width=True
-            )
-            
-        except Exception as e:
-            st.error(f"❌ 準備CSV下載失敗: {e}")
+    def _export_download(self, username: str, fmt: str, layout: str, label: str, help_text: str,
+                         use_container_width: bool = False):
+        """以簽章短效連結下載：瀏覽器經 MCP Server 匯出代理直接串流，不經 Streamlit 行程也不產生暫存檔"""
+        token = sign_export_token(username, fmt, layout)
+        st.link_button(
+            label,
+            f"{EXPORT_PUBLIC_URL.rstrip('/')}/exports/playwright/{token}",
+            help=f"{help_text}（連結 {EXPORT_LINK_TTL_SECONDS // 60} 分鐘內有效）",
+            use_container_width=use_container_width,
+        )
     
-    def export_user_csv(self, username: str):
-        """導出指定用戶的所有貼文為CSV（中文欄位名）"""
-        try:
-            # 使用 asyncio 獲取用戶貼文
-            posts = asyncio.run(self.db_handler.get_user_posts_async(username))
-            
-            if not posts:
-                st.warning(f"❌ 用戶 @{username} 沒有找到任何貼文記錄")
-                return
-            
-            # 準備CSV數據 - 完整欄位（中文名稱）
-            csv_data = []
-            for i, post in enumerate(posts, 1):
-                # 處理陣列字段
-                tags = self._process_array_field(post.get('tags', []))
-                images = self._process_array_field(post.get('images', []))
-                videos = self._process_array_field(post.get('videos', []))
-                
-                csv_data.append({
-                    "序號": i,
-                    "用戶名": post.get('username', ''),
-                    "貼文ID": post.get('post_id', ''),
-                    "URL": post.get('url', ''),
-                    "內容": post.get('content', ''),
-                    "觀看數": post.get('views_count', post.get('views', 0)),
-                    "按讚數": post.get('likes_count', post.get('likes', 0)),
-                    "留言數": post.get('comments_count', post.get('comments', 0)),
-                    "轉發數": post.get('reposts_count', post.get('reposts', 0)),
-                    "分享數": post.get('shares_count', post.get('shares', 0)),
-                    "計算分數": post.get('calculated_score', ''),
-                    "發布時間": post.get('post_published_at', ''),
-                    "標籤": "|".join(tags) if tags else "",
-                    "圖片": "|".join(images) if images else "",
-                    "影片": "|".join(videos) if videos else "",
-                    "來源": post.get('source', ''),
-                    "爬蟲類型": post.get('crawler_type', ''),
-                    "爬取ID": post.get('crawl_id', ''),
-                    "建立時間": post.get('created_at', ''),
-                    "爬取時間": post.get('fetched_at', '')
-                })
-            
-            # 轉換為DataFrame並生成CSV
-            df = pd.DataFrame(csv_data)
-            csv_content = self._dataframe_to_csv(df)
-            
-            # 提供下載
-            timestamp = datetime.now(timezone(timedelta(hours=8))).strftime('%Y%m%d_%H%M%S')
-            filename = f"user_posts_{username}_{timestamp}.csv"
-            
-            st.download_button(
-                label=f"📥 下載 @{username} 的貼文CSV",
-                data=csv_content,
-                file_name=filename,
-                mime="text/csv",
-                help=f"下載用戶 @{username} 的所有貼文記錄"
-            )
-            
-            st.success(f"✅ 成功導出 @{username} 的 {len(posts)} 筆貼文記錄")
-            
-        except Exception as e:
-            st.error(f"❌ 導出用戶CSV失敗: {e}")
+    def show_user_csv_download(self, username: str, post_count: Optional[int] = None):
+        """顯示用戶貼文下載按鈕（與 JSON 格式欄位一致）"""
+        fmt = st.selectbox(
+            "匯出格式",
+            options=list(EXPORT_FORMAT_LABELS),
+            format_func=EXPORT_FORMAT_LABELS.get,
+            key="playwright_export_format",
+            label_visibility="collapsed",
+        )
+        count_label = f" ({post_count:,}筆)" if post_count else ""
+        self._export_download(
+            username, fmt, "raw",
+            f"📥 導出{EXPORT_FORMAT_LABELS[fmt]}{count_label}",
+            f"下載 @{username} 的所有貼文記錄（伺服器端串流產生，不受筆數限制）",
+            use_container_width=True,
+        )
+    
+    def export_user_csv(self, username: str, fmt: str = "csv"):
+        """導出指定用戶的所有貼文（中文欄位名，伺服器端串流）"""
+        self._export_download(
+            username, fmt, "zh",
+            f"📥 下載 @{username} 的貼文{EXPORT_FORMAT_LABELS.get(fmt, fmt)}",
+            f"下載用戶 @{username} 的所有貼文記錄",
+        )
     
     def manage_user_data(self, user_stats: list[dict[str, Any]]):
         """整合用戶資料管理 UI，包括選擇、導出和刪除"""
@@ -191,7 +106,9 @@ class PlaywrightUserManager:
             # 操作按鈕
             col1, col2 = st.columns(2)
             with col1:
-                self.show_user_csv_download(selected_user)
+                self.show_user_csv_download(
+                    selected_user, selected_user_info.get('post_count') if selected_user_info else None
+                )
             with col2:
                 # 刪除流程現在由此方法完全管理
                 self.handle_delete_button(selected_user)
@@ -325,21 +242,3 @@ class PlaywrightUserManager:
             3. 檢查資料庫連接字符串和權限
             4. 檢查 PostgreSQL 服務狀態
             """)
-    
-    def _process_array_field(self, field_value) -> list:
-        """處理陣列字段（可能是 list 或 JSON 字符串）"""
-        if isinstance(field_value, list):
-            return field_value
-        elif isinstance(field_value, str):
-            try:
-                return json.loads(field_value)
-            except:
-                return []
-        else:
-            return []
-    
-    def _dataframe_to_csv(self, df: pd.DataFrame) -> bytes:
-        """將 DataFrame 轉換為 CSV 字節內容"""
-        output = io.BytesIO()
-        df.to_csv(output, index=False, encoding='utf-8-sig')
-        return output.getvalue()
\ No newline at end of file
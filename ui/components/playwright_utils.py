@@ -282,9 +282,9 @@ class PlaywrightUtils:
     @staticmethod
     def deduplicate_results_by_content_keep_max_views(results_data: Dict[str, Any]) -> Dict[str, Any]:
         """
-        防禦性守門：依據「相同 content、不同 post_id → 保留 views 較高者」過濾。
+        防禦性守門：依據「相同或近似 content、不同 post_id → 保留 views 較高者」過濾。
         - 只在 content 非空時才參與同組比較
-        - 比較主鍵：同 (username, normalized_content)
+        - 比較範圍：同 username；內容以 MinHash/LSH 判斷近似重複（見 post_deduplicator）
         - views 比較：優先使用 views_count，回退解析 views 字串
         - 平手時以 likes_count 作為次序，仍平手則保留先到者
 
@@ -294,31 +294,14 @@ class PlaywrightUtils:
             新的 results_data（淺複製），其中 "results" 已過濾
         """
         try:
+            from agents.playwright_crawler.utils.post_deduplicator import IncrementalDeduplicator
+
             results_list = list(results_data.get("results", []) or [])
             if not results_list:
                 return results_data
 
             target_username = results_data.get("target_username", "")
 
-            # 以 (username, normalized_content) 分組
-            groups = {}
-            singles = []
-
-            for item in results_list:
-                content = item.get("content") or ""
-                normalized = PlaywrightUtils._normalize_content(content)
-                # 僅對非空內容進行分組去重
-                if not normalized:
-                    singles.append(item)
-                    continue
-
-                username = item.get("username") or target_username or ""
-                key = (username, normalized)
-                groups.setdefault(key, []).append(item)
-
-            deduped = []
-
-            # 保留每組中 views 最大者
             def views_of(x: Dict[str, Any]) -> int:
                 v = x.get("views_count")
                 if v is None or v == "":
@@ -333,22 +316,15 @@ class PlaywrightUtils:
                 parsed = PlaywrightUtils.parse_number_safe(l)
                 return int(parsed or 0)
 
-            dropped = []
-            for _, items in groups.items():
-                if len(items) == 1:
-                    deduped.append(items[0])
-                else:
-                    # 先以 views 由大到小排序，平手再以 likes 由大到小
-                    items_sorted = sorted(
-                        items,
-                        key=lambda x: (views_of(x), likes_of(x)),
-                        reverse=True,
-                    )
-                    deduped.append(items_sorted[0])
-                    dropped.extend(items_sorted[1:])
-
-            # 合併單筆（無內容或未分組）+ 去重後結果
-            final_results = singles + deduped
+            index = IncrementalDeduplicator(
+                text_of=lambda x: x.get("content") or "",
+                # 無內容的項目不參與比較：以物件身分作為 id，不會與其他項目同組
+                id_of=lambda x: (x.get("post_id") or x.get("url") or f"#{id(x)}") if x.get("content") else f"#{id(x)}",
+                score_of=lambda x: (views_of(x), likes_of(x)),
+                scope_of=lambda x: x.get("username") or target_username or "",
+            )
+            dropped = index.add_batch(results_list)
+            final_results = index.items
 
             # 回寫到新的資料結構，避免外部引用被就地修改
             new_data = dict(results_data)
@@ -10,6 +10,8 @@ from pathlib import Path
 from dataclasses import dataclass
 from datetime import datetime, timezone
 
+from .progress_subscription import get_progress_hub, to_ui_progress, HEARTBEAT_SECONDS
+
 @dataclass
 class TaskInfo:
     """任務資訊"""
@@ -75,6 +77,8 @@ class ProgressManager:
     def __init__(self):
         self.temp_progress_dir = Path("temp_progress")
         self.temp_progress_dir.mkdir(exist_ok=True)
+        self.hub = get_progress_hub()
+        self._last_scan = 0.0
         
     def get_redis_client(self):
         """取得 Redis 客戶端（延遲載入）"""
@@ -154,6 +158,9 @@ class ProgressManager:
         except Exception as e:
             print(f"⚠️ 檔案進度寫入失敗: {e}")
         
+        # 推送到進度快取（進度頁與任務列表直接讀記憶體）
+        self.hub.publish(task_id, data)
+        
         # 2. 寫入 Redis（新增功能）
         if write_both:
             redis_client = self.get_redis_client()
@@ -164,37 +171,37 @@ class ProgressManager:
                     print(f"⚠️ Redis 進度寫入失敗: {e}")
     
     def list_active_tasks(self) -> List[TaskInfo]:
-        """列出所有活躍任務"""
-        tasks = []
-        
-        # 1. 從檔案掃描
-        file_tasks = self._scan_file_tasks()
-        
-        # 2. 從 Redis 掃描
-        redis_tasks = self._scan_redis_tasks()
-        
-        # 3. 合併（檔案優先，Redis 補充）
-        all_task_ids = set()
-        task_dict = {}
+        """
+        列出所有活躍任務
         
-        for task in file_tasks:
-            all_task_ids.add(task.task_id)
-            task_dict[task.task_id] = task
+        首次呼叫掃描檔案與 Redis 並填入進度快取；之後由推送（本行程寫入 + NATS 訂閱）維持快取，
+        直接以快取內容組成列表。NATS 未訂閱時每 HEARTBEAT_SECONDS 才重新掃描一次。
+        """
+        if not self.hub.seeded or (not self.hub.subscribed and time.time() - self._last_scan > HEARTBEAT_SECONDS):
+            self._rescan_tasks()
         
-        for task in redis_tasks:
-            if task.task_id not in all_task_ids:
-                all_task_ids.add(task.task_id)
-                task_dict[task.task_id] = task
+        tasks = []
+        for task_id, data in self.hub.snapshot().items():
+            task = self._data_to_task_info(task_id, data)
+            if task:
+                tasks.append(task)
         
         # 按最後更新時間排序
-        tasks = list(task_dict.values())
         tasks.sort(key=lambda x: x.last_update or 0, reverse=True)
         
         return tasks
     
-    def _scan_file_tasks(self) -> List[TaskInfo]:
-        """掃描檔案任務"""
-        tasks = []
+    def _rescan_tasks(self):
+        """完整掃描檔案與 Redis 任務並寫入快取（檔案優先，Redis 補充）"""
+        for task_id, data in self._scan_file_task_data() + self._scan_redis_task_data():
+            self.hub.seed(task_id, data)
+        
+        self.hub.seeded = True
+        self._last_scan = time.time()
+    
+    def _scan_file_task_data(self) -> List[tuple]:
+        """掃描檔案任務，回傳 (task_id, 進度資料)"""
+        results = []
         
         for progress_file in self.temp_progress_dir.glob("playwright_progress_*.json"):
             try:
@@ -202,44 +209,37 @@ class ProgressManager:
                 data = self.read_file_progress(task_id)
                 
                 if data:
-                    task = self._data_to_task_info(task_id, data)
-                    if task:
-                        tasks.append(task)
+                    results.append((task_id, data))
             except Exception:
                 continue
         
-        return tasks
+        return results
     
-    def _scan_redis_tasks(self) -> List[TaskInfo]:
-        """掃描 Redis 任務"""
-        tasks = []
+    def _scan_redis_task_data(self) -> List[tuple]:
+        """掃描 Redis 任務（SCAN 取代 KEYS，不阻塞 Redis），回傳 (task_id, 進度資料)"""
+        results = []
         redis_client = self.get_redis_client()
         
         if not redis_client:
-            return tasks
+            return results
         
         try:
-            # 嘗試掃描 Redis 中的任務鍵
-            import redis
-            r = redis.Redis.from_url("redis://localhost:6379/0")  # 直接連接掃描
-            task_keys = r.keys("task:*")
-            
-            for key in task_keys:
+            for key in redis_client.redis.scan_iter(match="task:*", count=500):
                 try:
-                    task_id = key.decode().replace("task:", "")
+                    key = key.decode() if isinstance(key, bytes) else key
+                    task_id = key.replace("task:", "", 1)
                     data = self.read_redis_progress(task_id)
                     
                     if data:
-                        task = self._data_to_task_info(task_id, data)
-                        if task:
-                            tasks.append(task)
+                        # 快取內統一為 UI 的 0~1 進度（Redis 任務紀錄是 0~100）
+                        results.append((task_id, to_ui_progress(data)))
                 except Exception:
                     continue
                     
         except Exception:
             pass
         
-        return tasks
+        return results
     
     def _data_to_task_info(self, task_id: str, data: Dict[str, Any]) -> Optional[TaskInfo]:
         """將資料轉換為 TaskInfo"""
@@ -283,7 +283,7 @@ class ProgressManager:
                 task_id=task_id,
                 username=data.get("username", "unknown"),
                 stage=stage,
-                progress=float(data.get("progress", 0.0)),
+                progress=float(data.get("progress") or 0.0) * 100.0,  # 快取為 0~1，TaskInfo 以百分比顯示
                 start_time=start_time,
                 last_update=data.get("timestamp") or time.time(),
                 status=status,
@@ -303,6 +303,7 @@ class ProgressManager:
             try:
                 if current_time - progress_file.stat().st_mtime > max_age_seconds:
                     progress_file.unlink()
+                    self.hub.discard(progress_file.stem.replace("playwright_progress_", ""))
             except Exception:
                 pass
     
@@ -0,0 +1,241 @@
+"""
+進度訂閱服務 - 推送式即時進度
+
+取代 Streamlit 每秒 sleep + st.rerun() 重讀 temp_progress/*.json、掃描 Redis 的輪詢：
+- UI 背景 worker 寫進度時直接推送到記憶體（同一行程，不需再讀檔）
+- 整個 Streamlit 行程只訂閱一次 NATS `crawler.progress`，Agent 端事件即時合併到快取
+- 每個任務保存最新狀態與版本號，讀取為 O(1)；頁面以 wait_for_change 最多等待
+  PAGE_WAIT_SECONDS（約 1 秒）再 rerun，不長時間佔住 script 執行緒；
+  HEARTBEAT_SECONDS 只用於 NATS 不可用時重新掃描檔案 / Redis 的間隔
+- 已結束的任務超過 FINISHED_TTL_SECONDS 未更新即從快取移除，快取另有 MAX_TASKS 上限
+- Agent 事件的 progress 是 0~100 百分比，UI 進度是 0~1：合併前先換算（to_ui_progress），
+  並以 STAGE_PRIORITY 防止較舊的階段或 *_start 事件把進度往回拉（merge_progress）
+
+進度檔案仍照常寫入，供重啟後的任務恢復使用。
+"""
+
+import asyncio
+import copy
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+PROGRESS_SUBJECT = "crawler.progress"
+HEARTBEAT_SECONDS = float(os.getenv("UI_PROGRESS_HEARTBEAT_SECONDS", "15"))
+PAGE_WAIT_SECONDS = float(os.getenv("UI_PROGRESS_WAIT_SECONDS", "1"))
+FINISHED_TTL_SECONDS = float(os.getenv("UI_PROGRESS_FINISHED_TTL_SECONDS", "600"))
+MAX_TASKS = int(os.getenv("UI_PROGRESS_MAX_TASKS", "200"))
+FINISHED_STAGES = ("api_completed", "completed", "error")
+RESUBSCRIBE_SECONDS = 60
+FILE_PREFIX = "playwright_progress_"
+
+
+# 階段先後順序（UI worker 寫進度與合併 Agent 事件共用）
+STAGE_PRIORITY = {
+    "initialization": 0, "fetch_start": 1, "post_parsed": 2,
+    "batch_parsed": 3, "fill_views_start": 4, "fill_views_completed": 5,
+    "api_completed": 6, "completed": 7, "error": 8
+}
+
+
+def to_ui_progress(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Agent / Redis 任務紀錄（progress 0~100）→ UI 進度紀錄（progress 0~1）"""
+    record = dict(record)
+    if record.get("progress") is not None:
+        try:
+            record["progress"] = max(0.0, min(1.0, float(record["progress"]) / 100.0))
+        except (TypeError, ValueError):
+            record.pop("progress")
+    return record
+
+
+def merge_progress(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """合併 Agent 事件：階段不倒退，進度不倒退（*_start 事件的 0% 不會覆蓋已有進度）"""
+    new = dict(new)
+    old_stage = old.get("stage", "")
+    if STAGE_PRIORITY.get(new.get("stage", old_stage), 0) < STAGE_PRIORITY.get(old_stage, 0):
+        new.pop("stage", None)
+    if new.get("progress") is not None and (old.get("progress") or 0) > new["progress"]:
+        new.pop("progress")
+    return {**old, **new}
+
+
+def task_id_from_path(path) -> str:
+    """temp_progress/playwright_progress_{task_id}.json → task_id"""
+    return Path(str(path)).stem.replace(FILE_PREFIX, "")
+
+
+class ProgressHub:
+    """各任務最新進度的記憶體快取（執行緒安全，所有 Streamlit session 共用）"""
+
+    def __init__(self):
+        self._states: Dict[str, Dict[str, Any]] = {}
+        self._versions: Dict[str, int] = {}
+        self._touched: Dict[str, float] = {}
+        self._version = 0
+        self._condition = threading.Condition()
+        self._subscriber: Optional[threading.Thread] = None
+        self._subscribe_attempt = 0.0
+        self.subscribed = False
+        self.seeded = False
+
+    # ---------------------------------------------------------------- 寫入
+    def publish(self, task_id: str, data: Dict[str, Any], replace: bool = False) -> int:
+        """合併（或取代）任務狀態並喚醒等待中的頁面；回傳新版本號"""
+        if not task_id:
+            return 0
+        with self._condition:
+            state = {} if replace else self._states.get(task_id, {})
+            merged = {**state, **data}
+            if merged == state:
+                return self._versions.get(task_id, 0)
+            self._store_locked(task_id, merged)
+            return self._version
+
+    def merge(self, task_id: str, data: Dict[str, Any]) -> int:
+        """以 merge_progress 合併 Agent 事件（在鎖內完成，不會與 UI worker 的寫入交錯）"""
+        if not task_id:
+            return 0
+        with self._condition:
+            state = self._states.get(task_id, {})
+            merged = merge_progress(state, data)
+            if merged == state:
+                return self._versions.get(task_id, 0)
+            self._store_locked(task_id, merged)
+            return self._version
+
+    def seed(self, task_id: str, data: Dict[str, Any]) -> None:
+        """以檔案 / Redis 讀到的狀態補進快取（不覆蓋已推送的較新狀態）"""
+        if not task_id or not data:
+            return
+        with self._condition:
+            if task_id in self._states:
+                return
+            self._store_locked(task_id, dict(data))
+
+    def _store_locked(self, task_id: str, state: Dict[str, Any]) -> None:
+        """寫入狀態、遞增版本號並喚醒等待者（呼叫端需持有鎖）"""
+        self._version += 1
+        self._states[task_id] = state
+        self._versions[task_id] = self._version
+        self._touched[task_id] = time.monotonic()
+        self._evict_locked(keep=task_id)
+        self._condition.notify_all()
+
+    def _evict_locked(self, keep: str) -> None:
+        """移除結束已久的任務；仍超過 MAX_TASKS 時依最後更新時間淘汰最舊的（優先淘汰已結束的）"""
+        now = time.monotonic()
+        for task_id in [
+            task_id for task_id, state in self._states.items()
+            if state.get("stage") in FINISHED_STAGES and now - self._touched.get(task_id, now) > FINISHED_TTL_SECONDS
+        ]:
+            self._drop_locked(task_id)
+        overflow = len(self._states) - MAX_TASKS
+        if overflow > 0:
+            oldest = sorted(
+                (t for t in self._states if t != keep),
+                key=lambda t: (self._states[t].get("stage") not in FINISHED_STAGES, self._touched.get(t, 0.0)),
+            )
+            for task_id in oldest[:overflow]:
+                self._drop_locked(task_id)
+
+    def _drop_locked(self, task_id: str) -> None:
+        self._states.pop(task_id, None)
+        self._versions.pop(task_id, None)
+        self._touched.pop(task_id, None)
+
+    def discard(self, task_id: str) -> None:
+        with self._condition:
+            self._drop_locked(task_id)
+            self._version += 1
+            self._condition.notify_all()
+
+    def clear(self) -> None:
+        """清空快取（下一次 list_active_tasks 會重新掃描）"""
+        with self._condition:
+            self._states.clear()
+            self._versions.clear()
+            self._touched.clear()
+            self._version += 1
+            self.seeded = False
+            self._condition.notify_all()
+
+    # ---------------------------------------------------------------- 讀取
+    def get(self, task_id: str) -> Tuple[int, Optional[Dict[str, Any]]]:
+        """(版本號, 狀態副本)；快取中沒有時為 (0, None)"""
+        with self._condition:
+            state = self._states.get(task_id)
+            if state is None:
+                return 0, None
+            return self._versions[task_id], copy.deepcopy(state)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """全部任務狀態的淺層副本（任務列表用）"""
+        with self._condition:
+            return {task_id: dict(state) for task_id, state in self._states.items()}
+
+    def wait_for_change(self, task_id: str, since_version: int, timeout: float = PAGE_WAIT_SECONDS) -> bool:
+        """阻塞到任務版本號超過 since_version 或逾時；回傳是否有變化"""
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: self._versions.get(task_id, 0) > since_version, timeout=timeout
+            )
+
+    # ---------------------------------------------------------------- NATS 訂閱
+    def ensure_subscribed(self) -> None:
+        """啟動（僅一次）背景訂閱執行緒；連線失敗後至少間隔 RESUBSCRIBE_SECONDS 才重試"""
+        with self._condition:
+            if self._subscriber is not None and self._subscriber.is_alive():
+                return
+            if time.monotonic() - self._subscribe_attempt < RESUBSCRIBE_SECONDS and self._subscriber is not None:
+                return
+            self._subscribe_attempt = time.monotonic()
+            self._subscriber = threading.Thread(
+                target=self._run_subscriber, name="progress-subscriber", daemon=True
+            )
+            self._subscriber.start()
+
+    def _run_subscriber(self) -> None:
+        try:
+            asyncio.run(self._subscribe())
+        except Exception as e:
+            logging.warning(f"⚠️ 進度訂閱結束，退回心跳刷新: {e}")
+        finally:
+            self.subscribed = False
+
+    async def _subscribe(self) -> None:
+        from common.nats_client import get_nats_client, build_progress_record
+
+        nc = await get_nats_client()
+        if nc is None:
+            logging.info("📡 NATS 不可用，進度頁以心跳刷新")
+            return
+
+        async def on_message(msg):
+            try:
+                message = json.loads(msg.data.decode())
+            except (ValueError, UnicodeDecodeError):
+                return
+            task_id = message.get("task_id")
+            if task_id:
+                self.merge(task_id, to_ui_progress(build_progress_record(message)))
+
+        await nc.subscribe(PROGRESS_SUBJECT, cb=on_message)
+        self.subscribed = True
+        logging.info(f"📡 已訂閱 {PROGRESS_SUBJECT}")
+        while not nc.is_closed:
+            await asyncio.sleep(5)
+
+
+# 全域實例（單例模式）
+progress_hub = ProgressHub()
+
+
+def get_progress_hub() -> ProgressHub:
+    """取得進度快取並確保已訂閱 NATS"""
+    progress_hub.ensure_subscribed()
+    return progress_hub
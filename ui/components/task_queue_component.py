@@ -156,9 +156,8 @@ class TaskQueueComponent:
         return None
     
     def is_queue_available(self) -> bool:
-        """檢查佇列是否可用（沒有任務執行中）"""
-        running_task = self.queue_manager.get_current_running_task()
-        return running_task is None
+        """檢查佇列是否可用（執行中的任務未達並行上限）"""
+        return self.queue_manager.can_start_new_task()
     
     def get_queue_position(self, task_id: str) -> int:
         """獲取任務在佇列中的位置"""
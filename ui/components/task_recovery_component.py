@@ -270,6 +270,7 @@ class TaskRecoveryComponent:
             for progress_file in possible_files:
                 if progress_file.exists():
                     progress_file.unlink()
+            self.progress_manager.hub.discard(task_id)
             
         except Exception as e:
             print(f"❌ 刪除任務 {task_id} 失敗: {e}")
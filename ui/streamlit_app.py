@@ -38,15 +38,31 @@ if sys.platform == "win32":
     except Exception as e:
         print(f"⚠️ Windows 兼容性設置警告: {e}")
 
-# 導入組件
-# from ui.components.crawler_component import ThreadsCrawlerComponent  # 舊版本
-from ui.components.crawler_component_refactored import ThreadsCrawlerComponent  # 重構版本
-from ui.components.realtime_crawler_component import RealtimeCrawlerComponent  # 實時爬蟲
-from ui.components.playwright_crawler_component_v2 import PlaywrightCrawlerComponentV2  # Playwright 爬蟲 V2
-from ui.components.monitoring_component import SystemMonitoringComponent
-from ui.components.content_generator_component import ContentGeneratorComponent
-from ui.components.analyzer_component import AnalyzerComponent
-from ui.components.post_writer_component import PostWriterComponent
+from common.lazy_import import load_attr
+
+# 組件延遲註冊表：名稱 → (匯入路徑, 依賴的其他組件)
+# 只在第一次渲染對應分頁時才 import 與建立，首頁不必載入整個 ui/components
+COMPONENT_REGISTRY = {
+    # "crawler": ("ui.components.crawler_component:ThreadsCrawlerComponent", ()),  # 舊版本
+    "crawler": ("ui.components.crawler_component_refactored:ThreadsCrawlerComponent", ()),  # 重構版本
+    "realtime_crawler": ("ui.components.realtime_crawler_component:RealtimeCrawlerComponent", ()),  # 實時爬蟲
+    "playwright_crawler": ("ui.components.playwright_crawler_component_v2:PlaywrightCrawlerComponentV2", ()),  # Playwright 爬蟲 V2
+    "monitoring": ("ui.components.monitoring_component:SystemMonitoringComponent", ()),
+    "content_generator": ("ui.components.content_generator_component:ContentGeneratorComponent", ()),
+    "analyzer": ("ui.components.analyzer_component:AnalyzerComponent", ()),
+    "post_writer": ("ui.components.post_writer_component:PostWriterComponent", ("analyzer",)),
+    "media_processor": ("ui.components.media_processor_component:MediaProcessorComponent", ()),
+}
+
+# 主功能選單 → 組件
+NAV_COMPONENTS = {
+    "🚀 實時智能爬蟲": "realtime_crawler",
+    "🎭 Playwright 爬蟲": "playwright_crawler",
+    "📊 內容分析": "analyzer",
+    "✍️ 智能撰寫": "post_writer",
+    "🛠 監控面板": "monitoring",
+    "👁️ 媒體處理器": "media_processor",
+}
 
 # 設置頁面配置
 st.set_page_config(
@@ -59,16 +75,20 @@ st.set_page_config(
 
 class SocialMediaGeneratorApp:
     def __init__(self):
-        self.crawler_component = ThreadsCrawlerComponent()
-        self.realtime_crawler_component = RealtimeCrawlerComponent()
-        self.playwright_crawler_component = PlaywrightCrawlerComponentV2()
-        self.monitoring_component = SystemMonitoringComponent()
-        self.content_generator_component = ContentGeneratorComponent()
-        self.analyzer_component = AnalyzerComponent()
-        self.post_writer_component = PostWriterComponent(self.analyzer_component)
+        self._components = {}
         
         # 初始化會話狀態
         self._init_session_state()
+
+    def component(self, name: str):
+        """取得組件實例；第一次使用時才 import 並建立（依賴的組件一併建立）"""
+        instance = self._components.get(name)
+        if instance is None:
+            path, dependencies = COMPONENT_REGISTRY[name]
+            component_cls = load_attr(path)
+            instance = component_cls(*[self.component(dep) for dep in dependencies])
+            self._components[name] = instance
+        return instance
     
     def _init_session_state(self):
         """初始化會話狀態"""
@@ -250,14 +270,7 @@ class SocialMediaGeneratorApp:
         if 'main_nav' not in st.session_state:
             st.session_state.main_nav = "🚀 實時智能爬蟲"
 
-        options = [
-            "🚀 實時智能爬蟲",
-            "🎭 Playwright 爬蟲",
-            "📊 內容分析",
-            "✍️ 智能撰寫",
-            "🛠 監控面板",
-            "👁️ 媒體處理器"
-        ]
+        options = list(NAV_COMPONENTS)
         current = st.session_state.get('main_nav')
         index = options.index(current) if current in options else 0
         nav = st.radio(
@@ -297,29 +310,14 @@ class SocialMediaGeneratorApp:
         except Exception:
             pass
 
-        if nav == "🚀 實時智能爬蟲":
-            self.realtime_crawler_component.render()
-        elif nav == "🎭 Playwright 爬蟲":
-            self.playwright_crawler_component.render()
-        elif nav == "📊 內容分析":
-            self.analyzer_component.render()
-        elif nav == "✍️ 智能撰寫":
-            self.post_writer_component.render()
-        elif nav == "🛠 監控面板":
-            self.monitoring_component.render()
-        elif nav == "👁️ 媒體處理器":
-            from ui.components.media_processor_component import MediaProcessorComponent
-            MediaProcessorComponent().render()
+        self.component(NAV_COMPONENTS[nav]).render()
 
         # with tabs[4]:
-        #     self.content_generator_component.render()
-        # 
-        # with tabs[4]:
-        #     self.monitoring_component.render()
+        #     self.component("content_generator").render()
         # 
         # 舊的 Threads 爬蟲 (可選)
         # with st.expander("🕷️ 舊版 Threads 爬蟲"):
-        #      self.crawler_component.render()
+        #      self.component("crawler").render()
     
     def _reset_all_states(self):
         """重置所有狀態"""